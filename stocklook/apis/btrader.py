@@ -1,6 +1,7 @@
-import io
+import numpy as np
 from pandas import Timestamp
 from stocklook.config import config
+from stocklook.utils.ohlc import get_feed_arrays, FEED_TIME_COLUMNS
 import os
 
 try:
@@ -29,79 +30,113 @@ class SmaCross(bt.SignalStrategy):
         self.signal_add(bt.SIGNAL_LONG, crossover)
 
 
-class PoloniexDataFeed(bt.feeds.feed.CSVDataBase):
+class NumpyData(bt.feed.DataBase):
+    """
+    A backtrader feed over in-memory arrays.
+
+    Bars are loaded straight from numpy arrays so nothing is
+    written to or parsed from text. The dataname can be a DataFrame
+    or a dict of arrays (see stocklook.utils.ohlc.get_feed_arrays):
+
+        cerebro.adddata(NumpyData(dataname=df, price_multiplier=btc_usd), name='LTC')
+
+    NumpyData.from_candle_cache reads Gdax candles stored locally
+    and add_frames adds many symbols to one Cerebro.
+    """
+    TIME_COLUMNS = FEED_TIME_COLUMNS
+    PRICES = ('open', 'high', 'low', 'close')
+    LINES = ('datetime',) + PRICES + ('volume', 'openinterest')
+
+    params = (('price_multiplier', 1.0),)
+
+    def get_arrays(self):
+        """
+        Returns the arrays to load - override to
+        load data when the feed is started.
+        """
+        return get_feed_arrays(self.p.dataname, self.p.price_multiplier)
 
     def start(self):
-        from pandas import DateOffset
+        super(NumpyData, self).start()
+        arrays = self.get_arrays()
+        # Lists index faster than arrays one item at a time.
+        self._columns = [(getattr(self.lines, c), arrays[c].tolist())
+                         for c in self.LINES]
+        self._size = len(arrays['datetime'])
+        self._idx = 0
+
+    def _load(self):
+        idx = self._idx
+        if idx >= self._size:
+            return False
+        for line, values in self._columns:
+            line[0] = values[idx]
+        self._idx += 1
+        return True
+
+    @classmethod
+    def from_candle_cache(cls, product, start, end, granularity, cache=None, **kwargs):
+        """
+        Returns a NumpyData of the candles in a GdaxCandleCache
+        (nothing is requested from the API).
+
+        :param cache: (GdaxCandleCache, default GdaxCandleCache())
+        """
+        from stocklook.crypto.gdax.candle_cache import GdaxCandleCache, get_bucket_range
+        if cache is None:
+            cache = GdaxCandleCache()
+        s, e = get_bucket_range(start, end, granularity)
+        rows = cache.read_candles(product, granularity, s, e)
+        arr = np.array(rows, dtype=np.float64).reshape(-1, len(GdaxCandleCache.COLUMNS))
+        data = {c: arr[:, i] for i, c in enumerate(GdaxCandleCache.COLUMNS)}
+        return cls(dataname=data, **kwargs)
+
+
+def add_frames(cerebro, frames, **kwargs):
+    """
+    Adds a NumpyData feed for every symbol to :param cerebro.
+
+    :param frames: (dict) {symbol: pd.DataFrame or dict of arrays}
+    :param kwargs: NumpyData params (fromdate, todate, price_multiplier...)
+    :return: (list) The feeds added.
+    """
+    feeds = list()
+    for name, data in frames.items():
+        feed = NumpyData(dataname=data, **kwargs)
+        cerebro.adddata(feed, name=name)
+        feeds.append(feed)
+    return feeds
+
+
+class PoloniexDataFeed(NumpyData):
+    """
+    Downloads Poloniex chart data for the dataname currency pair
+    (BTC-quoted prices are converted to USD) when started.
+    """
+    params = (('period', 14400),)
+
+    def get_arrays(self):
         from stocklook.crypto.poloniex import (polo_return_chart_data,
-                                               timestamp_to_utc,
-                                               today)
+                                               timestamp_to_utc)
 
         start = timestamp_to_utc(Timestamp(self.params.fromdate))
         end = timestamp_to_utc(Timestamp(self.p.todate))
         period = self.params.period
 
-        data = polo_return_chart_data(self.p.dataname,
-                                          start_unix=start,
-                                          end_unix=end,
-                                          period_unix=period,
-                                          format_dates=True,
-                                          to_frame=False)
-        self.params.period = 'd'
-        prices = ['open', 'high', 'low', 'close']
-        takes = prices + ['volume', 'date']
+        df = polo_return_chart_data(self.p.dataname,
+                                    start_unix=start,
+                                    end_unix=end,
+                                    period_unix=period,
+                                    format_dates=True,
+                                    to_frame=True)
 
         n = self.params.dataname
-        convert_price = n.startswith('BTC') and not n.endswith('USDT')
-
-        if convert_price:
-            from stocklook.crypto import btc_to_usd
-            for d in data:
-                for c in prices:
-                    d[c] = btc_to_usd(d[c])
-
-        f = io.StringIO(newline=None)
-        for d in data:
-            line = ",".join(str(d[t]) for t in takes)
-            f.write(line + '\n')
-
-        f.seek(0)
-        self.f = f
-        super(PoloniexDataFeed, self).start()
-
-    def _loadline(self, linetokens):
-        while True:
-            nullseen = False
-            for tok in linetokens[1:]:
-                if tok == 'null':
-                    nullseen = True
-                    linetokens = self._getnextline()  # refetch tokens
-                    if not linetokens:
-                        return False  # cannot fetch, go away
-
-                    # out of for to carry on with while True logic
-                    break
-
-            if not nullseen:
-                break  # can proceed
-
-        o = float(linetokens[0])
-        h = float(linetokens[1])
-        l = float(linetokens[2])
-        c = float(linetokens[3])
-        v = float(linetokens[4])
-        d = Timestamp(linetokens[5])
-        d = bt.utils.date2num(d)
-
-        self.lines.datetime[0] = d
-        self.lines.openinterest[0] = 0.0
-        self.lines.open[0] = o
-        self.lines.high[0] = h
-        self.lines.low[0] = l
-        self.lines.close[0] = c
-        self.lines.volume[0] = v
+        multiplier = self.p.price_multiplier
+        if n.startswith('BTC') and not n.endswith('USDT'):
+            from stocklook.crypto import btc_get_price_usd
+            multiplier *= btc_get_price_usd()
 
-        return True
+        return get_feed_arrays(df, multiplier)
 
 
 
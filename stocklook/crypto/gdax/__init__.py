@@ -327,7 +327,7 @@ def generate_candles(product, gdax=None, out_path=None, start=None, end=None, gr
         end = now()
 
     data = GdaxChartData(gdax, product, start, end, granularity)
-    data.df.to_csv(out_path, index=False)
+    data.df.compute(*data.INDICATOR_COLUMNS).to_csv(out_path, index=False)
     get_buypoint(data)
 
     return data, out_path
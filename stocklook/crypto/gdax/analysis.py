@@ -93,25 +93,55 @@ How to determine an entry, target, and exit price:
 
 """
 import os
-from stockstats import StockDataFrame
+import numpy as np
 import pandas as pd
+from collections import OrderedDict
 from stocklook.crypto.gdax import GdaxChartData, Gdax
-from stocklook.utils.timetools import now, now_minus, now_plus, timestamp_to_path
+from stocklook.utils.timetools import now
 from stocklook.config import config
+from stocklook.crypto.gdax.backtest import (get_macd_rsi_grid, halve_macd_rsi, successive_halving,
+                                           BacktestCache, SweepPool)
+from stocklook.quant.frame import IndicatorFrame
 
 
 def get_velocity(df, price='price', date='date'):
     df.sort_values(date, ascending=True, inplace=True)
 
 class TradeSet:
+    """
+    A ledger of simulated trades.
+
+    Trades are stored in preallocated numpy columns (time, size, price, side)
+    that double in length as they fill up, and running totals (position, funds,
+    bought, sold, net size, trade count) are kept as trades are added so none
+    of the getters need a DataFrame. One is only built by TradeSet.to_frame().
+    Sizes are signed: buys are negative (funds spent) and sells positive.
+    """
     BUY = 'buy'
     SELL = 'sell'
     TYPES = [BUY, SELL]
+    COLUMNS = ['time', 'size', 'price', 'type']
 
-    def __init__(self, margin=False, funds=10000):
-        self.data = list()
+    def __init__(self, margin=False, funds=10000, capacity=16):
+        """
+        :param margin: (bool, default False)
+            True allows selling more than the position held.
+        :param funds: (int, float, default 10000)
+            The starting funds.
+        :param capacity: (int, default 16)
+            The number of trades to preallocate room for.
+        """
+        capacity = max(int(capacity), 1)
+        self._time = np.empty(capacity, dtype=object)
+        self._size = np.empty(capacity, dtype=np.float64)
+        self._price = np.empty(capacity, dtype=np.float64)
+        self._side = np.empty(capacity, dtype=np.int8)
+        self._n = 0
         self._df = None
         self._pos_size = 0
+        self._bought = 0
+        self._sold = 0
+        self._net = 0
         self.margin = margin
         self.funds = funds
         self.start_funds = funds
@@ -119,10 +149,21 @@ class TradeSet:
 
     @property
     def df(self):
-        if self._df is None:
+        if self._df is None or len(self._df.index) != self._n:
             self.to_frame()
         return self._df
 
+    @property
+    def data(self):
+        """
+        The trades as a list of [time, size, price, type] lists.
+        """
+        return [[t, s, p, self.BUY if d > 0 else self.SELL]
+                for t, s, p, d in zip(self._time[:self._n].tolist(),
+                                      self._size[:self._n].tolist(),
+                                      self._price[:self._n].tolist(),
+                                      self._side[:self._n].tolist())]
+
     @property
     def trades(self):
         return self._trades
@@ -131,6 +172,14 @@ class TradeSet:
     def position_size(self):
         return self._pos_size
 
+    def _grow(self):
+        capacity = len(self._size) * 2
+        for name in ('_time', '_size', '_price', '_side'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+
     def add_trade(self, time, size, price, type):
         assert type in self.TYPES
         if type == self.SELL:
@@ -145,6 +194,7 @@ class TradeSet:
                 size = self._pos_size
 
             self._pos_size -= abs(size)
+            self._sold += abs(size)
 
         elif type == self.BUY:
             if size > 0:
@@ -159,14 +209,21 @@ class TradeSet:
                 size = -size
 
             self._pos_size += abs(size)
+            self._bought += abs(size)
 
         self.funds += size * price
 
         assert price > 0
 
-        contents = [time, size, price, type]
-        self.data.append(contents)
-        #print("Trade: {} - position: {} - funds: {}".format(contents, self._pos_size, self.funds))
+        if self._n == len(self._size):
+            self._grow()
+        n = self._n
+        self._time[n] = time
+        self._size[n] = size
+        self._price[n] = price
+        self._side[n] = 1 if type == self.BUY else -1
+        self._n += 1
+        self._net += size
         self._trades += 1
         return True
 
@@ -177,11 +234,16 @@ class TradeSet:
         return self.add_trade(time, size, price, self.SELL)
 
     def clear(self):
-        self.data.clear()
+        """
+        Empties the ledger. Funds, position
+        and trade count are left as they are.
+        """
+        self._n = 0
+        self._bought = self._sold = self._net = 0
+        self._df = None
 
     def close_positions(self, time, price):
-        df = self.to_frame()
-        size_sum = df['size'].sum()
+        size_sum = self._net
         if size_sum < 0:
             self.add_trade(time, size_sum, price, self.SELL)
         elif size_sum > 0:
@@ -194,22 +256,18 @@ class TradeSet:
         return round(((self.funds / self.start_funds) * 100) - 100, 2)
 
     def get_total_bought(self):
-        df = self.df
-        msk = df['type'].isin([self.BUY])
-        t = df.loc[msk, 'size'].sum()
-        return abs(t)
+        return self._bought
 
     def get_total_sold(self):
-        df = self.df
-        msk = df['type'].isin([self.SELL])
-        t = df.loc[msk, 'size'].sum()
-        return abs(t)
+        return self._sold
 
     def to_frame(self):
-        data = self.data
-        columns = ['time', 'size', 'price', 'type']
-        idx = range(len(data))
-        df = pd.DataFrame(data=data, columns=columns, index=idx)
+        n = self._n
+        df = pd.DataFrame({'time': self._time[:n].tolist(),
+                           'size': self._size[:n].copy(),
+                           'price': self._price[:n].copy(),
+                           'type': np.where(self._side[:n] > 0, self.BUY, self.SELL).astype(object)},
+                          columns=self.COLUMNS, index=range(n))
         df.loc[:, 'total'] = df['size'] * df['price']
         self._df = df
         return df
@@ -347,12 +405,55 @@ class Strategy:
         """
         sdf = self.stock_data_frame
         sdf.sort_values(['time'], ascending=[True], inplace=True)
+        self._execute(self.makers, sdf)
 
-        [[maker.execute(rec) for maker in self.makers]
+    def _execute(self, makers, sdf):
+        [[maker.execute(rec) for maker in makers]
          for _, rec in sdf.iterrows()]
         rec = sdf.iloc[-1]
         [maker.tset.close_positions(rec['time'], rec['close'])
-         for maker in self.makers]
+         for maker in makers]
+
+    def search(self, min_bars=None, keep=0.5, min_candidates=1):
+        """
+        Prunes Strategy.makers with successive halving: every decision
+        maker is run on the earliest :param min_bars bars, the most
+        profitable :param keep fraction is run again on a longer prefix,
+        and so on until the survivors have run over every bar.
+
+        Survivors keep the TradeSet of their full-history run.
+
+        :param min_bars: (int, default see backtest.get_halving_schedule)
+        :param keep: (float, default 0.5)
+        :param min_candidates: (int, default 1)
+        :return: (backtest.HalvingResult) - survivors index the
+            makers as they were before the search.
+        """
+        sdf = self.stock_data_frame
+        sdf.sort_values(['time'], ascending=[True], inplace=True)
+        makers = self.makers
+        for maker in makers:
+            # Indicator columns are added to the full frame.
+            maker.sdf = sdf
+            maker.calculate()
+
+        def evaluate(idx, bars):
+            prefix = sdf.iloc[:bars]
+            run = [makers[i] for i in idx]
+            for maker in run:
+                maker.tset = TradeSet(margin=self.tset.margin,
+                                      funds=self.tset.funds)
+                maker.trades = list()
+                maker.sdf = prefix
+                maker.calculate()
+            self._execute(run, prefix)
+            return [maker.tset.get_profit() for maker in run]
+
+        result = successive_halving(evaluate, len(makers), len(sdf.index),
+                                    min_bars=min_bars, keep=keep,
+                                    min_candidates=min_candidates)
+        self.makers = [makers[i] for i in result.survivors]
+        return result
 
     def set_stock_df(self, df):
         self.stock_data_frame = df
@@ -365,184 +466,222 @@ class Strategy:
 
 
 
-def run_macd_rsi_decisions(data_dir, product, start, end, granularity, overwrite=True, strat=None):
-    # File paths to be saved at the end.
-    out_name = '{}-BTEST-{}-{}.csv'.format(product, granularity, timestamp_to_path(end))
-    tout_name = out_name.split('.')[0] + '-TRADES.csv'
-    pout_name = out_name.split('.')[0] + '-PNL.csv'
-    out_path = os.path.join(data_dir, out_name)  # Chart Data
-    tout_path = os.path.join(data_dir, tout_name)  # Trade Data
-    pout_path = os.path.join(data_dir, pout_name)  # PNL Data
+def get_backtest_cache(data_dir):
+    """
+    Returns the BacktestCache kept under :param data_dir.
+    """
+    return BacktestCache(os.path.join(data_dir, 'btest_cache'))
 
-    if os.path.exists(tout_path) and not overwrite:
-        tdf = pd.read_csv(tout_path, parse_dates=['time'])
-        return tout_path, tdf
 
-    if os.path.exists(out_path) and not overwrite:
-        df = pd.read_csv(out_path, parse_dates=['time'])
-    else:
+def get_macd_rsi_frame(cache, product, start, end, granularity, overwrite=False):
+    """
+    Returns an IndicatorFrame of candles with macd and rsi_6 computed.
+    The candles are read from :param cache (unless :param overwrite) or
+    requested from Gdax and cached without indicator columns, so the
+    indicators are always computed by the current code.
+    None is returned when there's no data.
+    """
+    def load():
         data = GdaxChartData(Gdax(), product, start, end, granularity=granularity)
         try:
             df = data.df
         except ValueError:
-            return None, pd.DataFrame()
+            return None
+        if df.empty:
+            return None
+        return pd.DataFrame(df.invalidate())
+
+    key = cache.get_key(versioned=False, kind='candles', product=product,
+                        granularity=granularity, start=start, end=end)
+    df = cache.get_frame(key, load, name='candles', overwrite=overwrite)
+    if df is None or df.empty:
+        return None
+    # Drops indicators cached by older versions.
+    sdf = IndicatorFrame(df).invalidate()
+    sdf.compute('macd', 'rsi_6')
+    return sdf
+
+
+def get_macd_rsi_key(cache, product, start, end, granularity, funds=1500,
+                     position_size=5, margin=False):
+    """
+    Returns the cache key of MACDRSIMaker results for one window.
+    """
+    return cache.get_key(kind='results', strategy=MACDRSIMaker.__name__,
+                         product=product, granularity=granularity,
+                         start=start, end=end, funds=funds,
+                         position_size=position_size, margin=margin)
+
 
+def run_macd_rsi_windows(data_dir, product, windows, granularity, buy_ratios=None,
+                         sell_ratios=None, workers=None, overwrite=False, **kwargs):
+    """
+    Sweeps MACDRSIMaker ratios over several (start, end) windows
+    in parallel with a SweepPool. Candles and results are cached in
+    the data directory's BacktestCache: only (window, parameter set)
+    cells that haven't been swept before are computed.
+
+    :param windows: (list) [(start, end), ...]
+    :param buy_ratios: (list, default get_macd_rsi_grid()[0])
+    :param sell_ratios: (list, default get_macd_rsi_grid()[1])
+    :param workers: (int, default os.cpu_count())
+    :param overwrite: (bool, default False)
+        True requests candles from Gdax again.
+    :param kwargs: funds, position_size, margin (see backtest.sweep_macd_rsi).
+    :return: (pd.DataFrame) The summary of every window and parameter set
+        with window, granularity, start and end columns.
+    """
+    if buy_ratios is None:
+        buy_ratios, sell_ratios = get_macd_rsi_grid()
+    buy_ratios = np.asarray(buy_ratios, dtype=float)
+    sell_ratios = np.asarray(sell_ratios, dtype=float)
+    cache = get_backtest_cache(data_dir)
+    kwargs.pop('record_trades', None)
+    keys, bounds, groups = dict(), dict(), OrderedDict()
+
+    with SweepPool(workers=workers) as pool:
+        for i, (start, end) in enumerate(windows):
+            key = get_macd_rsi_key(cache, product, start, end, granularity, **kwargs)
+            missing = cache.get_missing(key, buy_ratios, sell_ratios)
+            if not missing.any():
+                keys[i], bounds[i] = key, (start, end)
+                continue
+            sdf = get_macd_rsi_frame(cache, product, start, end,
+                                     granularity, overwrite=overwrite)
+            if sdf is None:
+                print("No data for window {} - {}".format(start, end))
+                continue
+            keys[i], bounds[i] = key, (start, end)
+            pool.add_series((i, granularity), sdf)
+            # Windows missing the same parameter sets run together.
+            groups.setdefault(missing.tobytes(), (missing, list()))[1].append((i, granularity))
+
+        for missing, series in groups.values():
+            print("Sweeping {} parameter sets over {} windows.".format(missing.sum(), len(series)))
+            df = pool.run(buy_ratios[missing], sell_ratios[missing], keys=series, **kwargs)
+            for (i, _), res in df.groupby(['key_0', 'key_1']):
+                cache.add(keys[i], res)
+
+    results = list()
+    for i, key in keys.items():
+        df = cache.get_summary(key, buy_ratios, sell_ratios)
+        df.insert(0, 'window', i)
+        df.insert(1, 'granularity', granularity)
+        df['start'], df['end'] = bounds[i]
+        results.append(df)
+    if not results:
+        return pd.DataFrame()
+    return pd.concat(results, ignore_index=True)
+
+
+def run_macd_rsi_decisions(data_dir, product, start, end, granularity, overwrite=False, strat=None,
+                           search=False, **search_kwargs):
+    """
+    Sweeps MACDRSIMaker ratios over one window recording trades.
+    Results are cached like run_macd_rsi_windows.
+
+    :param overwrite: (bool, default False)
+        True requests candles from Gdax again.
+    :param strat: (Strategy, default None)
+        Sweeps the ratios, funds, position size and margin of
+        the strategy's decision makers instead of the default grid.
+    :param search: (bool, default False)
+        True prunes the parameter sets with backtest.halve_macd_rsi
+        first and only records trades of the survivors.
+    :param search_kwargs: min_bars, keep, min_candidates (see halve_macd_rsi).
+    :return: (str, pd.DataFrame) The path of the cached trades and the
+        trades merged with their parameter set summary and candles.
+    """
     if strat is None:
-        sdf = StockDataFrame.retype(df)
-        strat = Strategy(sdf, margin=False, funds=1500, position_size=5)
-        print("Composing decision makers.")
-        ratios = ((0.1, 0.1), (0.1, 0.5),
-                  (0.5, 0.1), (0.2, 0.1),
-                  (0.1, 0.2), (0.25, 0.35),
-                  (0.01, 0.02), (0.09, 0.075),
-                  (1, 2), (0.005, 0.003),
-                  (0.003, 0.005),
-                  (0.9, 0.45), (0.8, 0.64),
-                  (1.3, .9), (1.5, .6))
-
-        for b, s in ratios:
-            for i in range(1, 100):
-                b1, s1 = b * i, s * i
-                strat.add_decision_maker(MACDRSIMaker,
-                                         buy_ratio=b1,
-                                         sell_ratio=s1)
-        for s, b in ratios:
-            for i in range(1, 100):
-                b1, s1 = b * i, s * i
-                strat.add_decision_maker(MACDRSIMaker,
-                                         buy_ratio=b1,
-                                         sell_ratio=s1)
+        buy_ratios, sell_ratios = get_macd_rsi_grid()
+        funds, position_size, margin = 1500, 5, False
     else:
-        if strat.stock_data_frame is None:
-            strat.set_stock_df(StockDataFrame.retype(df))
-        sdf = strat.stock_data_frame
-
-    print("Processing decisions.")
-    strat.execute()
-    print("Execution finished. Compiling results.")
-    results, trade_list = list(), list()
-
-    for idx, maker in enumerate(strat.makers):
-        inputs = maker.inputs()
-        tset = maker.tset
-        inputs['profit'] = tset.get_profit()
-        inputs['bought'] = tset.get_total_bought()
-        inputs['trades'] = tset.trades
-        inputs['start_funds'] = tset.start_funds
-        inputs['end_funds'] = tset.funds
-        inputs['pnl'] = tset.get_pnl()
-        inputs['maker_id'] = idx
-        tdf = tset.df
-        if not tdf.empty:
-            tdf.loc[:, 'maker_id'] = idx
-
-        results.append(inputs)
-        trade_list.append(tdf)
-
-    print("Calculating PNL")
-    strat_df = pd.DataFrame(data=results, index=range(len(results)))
+        # Sweep the ratios of the strategy's decision makers.
+        buy_ratios = [m.buy_ratio for m in strat.makers]
+        sell_ratios = [m.sell_ratio for m in strat.makers]
+        funds = strat.tset.funds
+        position_size = strat.position_size
+        margin = strat.tset.margin
+
+    cache = get_backtest_cache(data_dir)
+    sdf = get_macd_rsi_frame(cache, product, start, end, granularity, overwrite=overwrite)
+    if sdf is None:
+        return None, pd.DataFrame()
+
+    key = get_macd_rsi_key(cache, product, start, end, granularity, funds=funds,
+                           position_size=position_size, margin=margin)
+    if search:
+        _, result = halve_macd_rsi(sdf, buy_ratios, sell_ratios, funds=funds,
+                                   position_size=position_size, margin=margin,
+                                   **search_kwargs)
+        print("Search kept {} of {} parameter sets in {} rounds, "
+              "skipping {:.1%} of the exhaustive sweep.".format(
+               len(result.survivors), result.n_candidates,
+               len(result.rounds), result.saved))
+        buy_ratios = np.asarray(buy_ratios, dtype=float)[result.survivors]
+        sell_ratios = np.asarray(sell_ratios, dtype=float)[result.survivors]
+
+    print("Processing decisions for {} parameter sets.".format(len(buy_ratios)))
+    strat_df, trade_df = cache.sweep(key, sdf, buy_ratios, sell_ratios,
+                                     funds=funds,
+                                     position_size=position_size,
+                                     margin=margin,
+                                     record_trades=True)
     strat_df.sort_values(['profit'], ascending=[False], inplace=True)
     strat_df = strat_df.loc[strat_df['profit'] > -100, :]
 
     print("Composing trade data")
-    trade_df = pd.concat(trade_list)
     if not trade_df.empty:
+        trade_df = trade_df.drop(['buy_ratio', 'sell_ratio'], axis=1)
         trade_df = pd.merge(strat_df, trade_df, how='left', on='maker_id')
         sdf_bit = sdf.loc[:, ['open', 'low', 'high', 'close', 'rsi_6', 'macd', 'time']]
         trade_df = pd.merge(trade_df, sdf_bit, how='left', on=['time'])
 
-    print("Writing files.")
-    sdf.to_csv(out_path, index=False)
-    strat_df.to_csv(pout_path, index=False)
-    trade_df.to_csv(tout_path, index=False)
-    print("Done: {}".format(out_path))
-    try:
-        top_id = int(strat_df.iloc[0]['maker_id'])
-        print("Top decision maker: {}".format(strat.makers[top_id]))
-    except:
-        pass
-    return tout_path, trade_df
-
+    if not strat_df.empty:
+        top = strat_df.iloc[0]
+        print("Top decision maker: buy_ratio={}, sell_ratio={}, "
+              "pnl={}".format(top['buy_ratio'], top['sell_ratio'], top['pnl']))
+    return cache.get_path(key, cache.TRADES), trade_df
 
 
 if __name__ == '__main__':
     data_dir = config['DATA_DIRECTORY']
     product = 'LTC-USD'
     day_range = 60
-    start = now_minus(days=60)
-    end = now()
     granularity = 60*60*4
     grans = [(60*60, 4), (60*15, 3)]
 
-    results = list()
-    for i in range(30):
-        fp, df = run_macd_rsi_decisions(data_dir,
-                                        product,
-                                        start,
-                                        end,
-                                        granularity,
-                                        overwrite=False)
-        results.append((fp, df))
-        start -= pd.DateOffset(day_range)
-        end -= pd.DateOffset(day_range)
-        print("Start: {}, End: {}".format(start, end))
-        if fp is None:
-            break
-
-    master_path = os.path.join(data_dir, '{}-BTEST-MASTER-TRADES-{}.csv'.format(product, granularity))
-    if not os.path.exists(master_path):
-        df = pd.concat([r[1] for r in results])
-        df.to_csv(master_path, index=False)
-        print("Entry tests complete: {}".format(master_path))
-    else:
-        df = pd.read_csv(master_path, parse_dates=['time'])
+    # Walk-forward: 30 windows of day_range days, most recent first.
+    # Window bounds are floored to the granularity so re-runs hit the cache.
+    end = pd.Timestamp(now()).floor('{}s'.format(granularity))
+    windows = [(end - pd.DateOffset(day_range * (i + 1)),
+                end - pd.DateOffset(day_range * i))
+               for i in range(30)]
+
+    master_path = os.path.join(data_dir, '{}-BTEST-MASTER-PNL-{}.csv'.format(product, granularity))
+    df = run_macd_rsi_windows(data_dir, product, windows, granularity,
+                              funds=1500, position_size=5, margin=False)
+    df.to_csv(master_path, index=False)
+    print("Entry tests complete: {}".format(master_path))
 
     df.sort_values(['pnl'], ascending=[False], inplace=True)
     # Get buy ratio and sell ratio with highest average return.
     df.drop_duplicates(subset=['pnl', 'buy_ratio', 'sell_ratio'], inplace=True)
     tops = df.iloc[:15]
-    avg_buy_ratio = tops.buy_ratio.mean()
-    avg_sell_ratio = tops.sell_ratio.mean()
 
     results = list()
     for gran, days in grans:
-        start = now_minus(days=days)
-        end = now()
-        for _ in range(int(365/days)):
-            strat = Strategy(margin=False, funds=1500, position_size=5)
-            for idx, row in tops.iterrows():
-                strat.add_decision_maker(MACDRSIMaker,
-                                         buy_ratio=row['buy_ratio'],
-                                         sell_ratio=row['sell_ratio'])
-            fp, df = run_macd_rsi_decisions(data_dir,
-                                            product,
-                                            start,
-                                            end,
-                                            gran,
-                                            overwrite=False,
-                                            strat=strat)
-            if fp is not None and not df.empty:
-                df.loc[:, 'granularity'] = gran
-            results.append((fp, df))
-            day_change = pd.DateOffset(days=days)
-            start -= day_change
-            end -= day_change
-    df = pd.concat([r[1] for r in results])
-
-    final_path = os.path.join(data_dir, '{}-BTEST-FINAL-TRADES.csv'.format(product))
+        end = pd.Timestamp(now()).floor('{}s'.format(gran))
+        gran_windows = [(end - pd.DateOffset(days=days * (i + 1)),
+                         end - pd.DateOffset(days=days * i))
+                        for i in range(int(365/days))]
+        res = run_macd_rsi_windows(data_dir, product, gran_windows, gran,
+                                   buy_ratios=tops['buy_ratio'].values,
+                                   sell_ratios=tops['sell_ratio'].values,
+                                   funds=1500, position_size=5, margin=False)
+        results.append(res)
+    df = pd.concat(results)
+
+    final_path = os.path.join(data_dir, '{}-BTEST-FINAL-PNL.csv'.format(product))
     df.to_csv(final_path, index=False)
     print("Final tests complete: {}".format(final_path))
-
-
-
-
-
-
-
-
-
-
-
-
-
-
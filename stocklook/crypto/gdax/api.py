@@ -25,16 +25,19 @@ SOFTWARE.
 import pandas as pd
 import logging as lg
 from warnings import warn
-import hmac, hashlib, time, requests, base64, json
+import hmac, hashlib, time, requests, base64, json, copy
 from requests.auth import AuthBase
 from stocklook.utils import rate_limited
 from stocklook.utils.api import call_api
 from stocklook.utils.security import Credentials
 from stocklook.config import config, GDAX_SECRET, GDAX_KEY, GDAX_PASSPHRASE
-from stocklook.utils.timetools import timestamp_to_iso8601, timestamp_from_utc, timeout_check
+from stocklook.utils.timetools import timeout_check
+from concurrent.futures import ThreadPoolExecutor
 from .account import GdaxAccount
+from .candle_cache import GdaxCandleCache, get_bucket_range
 from .product import GdaxProduct, GdaxProducts
 from .feeds.memory_client import GdaxMemoryWebSocketClient
+from .feeds.websocket_client import WS_URL
 logger = lg.getLogger(__name__)
 
 
@@ -42,7 +45,7 @@ class GdaxAPIError(Exception):
     pass
 
 
-@rate_limited(0.33)
+@rate_limited(3)
 def gdax_call_api(url, method='get', **kwargs):
     """
     This method is rate limited to ~3 calls per second max.
@@ -115,7 +118,11 @@ class Gdax:
     for calling the API.
     """
     API_URL = 'https://api.gdax.com/'
-    API_URL_TESTING = 'https://public.sandbox.gdax.com'
+    MAX_CANDLES = 300
+    API_URL_TESTING = 'https://public.sandbox.gdax.com/'
+    WS_URL = WS_URL
+    # RequestScheduler priorities: cancels go first, then new orders.
+    REQUEST_PRIORITY = dict(delete=0, post=1, get=2)
     Credentials.register_config_object_mapping(
         Credentials.GDAX,
             {
@@ -124,7 +131,8 @@ class Gdax:
             GDAX_PASSPHRASE: 'api_passphrase'
         })
 
-    def __init__(self, key=None, secret=None, passphrase=None, wallet_auth=None, coinbase_client=None):
+    def __init__(self, key=None, secret=None, passphrase=None, wallet_auth=None,
+                 coinbase_client=None, candle_cache=None, scheduler=None):
         """
         The main interface to the Gdax Private API. Most of the API data
         gets broken down into other objects like GdaxAccount, GdaxProduct, GdaxDatabase,
@@ -152,6 +160,13 @@ class Gdax:
             None defaults to a gdax.api.CoinbaseExchangeAuth object.
         :param coinbase_client: (stocklook.crypto.coinbase_api.CoinbaseClient)
             An optionally pre-configured CoinbaseClient.
+
+        :param candle_cache: (stocklook.crypto.gdax.candle_cache.GdaxCandleCache, default None)
+            None generates a default GdaxCandleCache when first used by Gdax.get_candles.
+
+        :param scheduler: (stocklook.utils.scheduler.RequestScheduler, default None)
+            Shares a request budget between Gdax objects (see Gdax.with_scheduler).
+            None rate limits through gdax_call_api.
         """
         self.api_key = key
         self.api_secret = secret
@@ -164,7 +179,13 @@ class Gdax:
 
         self._wallet_auth = wallet_auth
         self._coinbase_client = coinbase_client
+        self._candle_cache = candle_cache
+        self._candle_manager = None
+        self.candle_workers = 3
         self.base_url = self.API_URL
+        self.ws_url = self.WS_URL
+        self.scheduler = scheduler
+        self.scheduler_client = None
         self.timeout_intervals = dict(
             accounts=120,
         )
@@ -200,7 +221,55 @@ class Gdax:
         address.
         :return: None
         """
-        self.base_url = self.API_URL
+        self.set_base_url(self.API_URL, self.WS_URL)
+
+    def set_base_url(self, url, ws_url=None):
+        """
+        Points the API (and optionally the websocket feeds created
+        from this object) at another exchange address such as
+        a stocklook.crypto.gdax.emulator.GdaxEmulator.
+
+        :param url: (str) e.g. 'http://127.0.0.1:8080/'
+        :param ws_url: (str, default None) e.g. 'ws://127.0.0.1:8080'
+            None leaves Gdax.ws_url unchanged.
+        :return: None
+        """
+        if not url.endswith('/'):
+            url += '/'
+        self.base_url = url
+        if ws_url is not None:
+            self.ws_url = ws_url
+
+    def with_scheduler(self, scheduler, client=None):
+        """
+        Returns a copy of this Gdax object making its requests in :param client's
+        share of the RequestScheduler. Credentials and cached
+        data (accounts, products, ...) are shared with the original.
+
+        :param scheduler: (stocklook.utils.scheduler.RequestScheduler)
+        :param client: (str, default None) e.g. a product id.
+        :return: (Gdax)
+        """
+        gdax = copy.copy(self)
+        gdax.scheduler = scheduler
+        gdax.scheduler_client = client
+        return gdax
+
+    def call_api(self, url, **kwargs):
+        """
+        Makes a request through gdax_call_api. With a Gdax.scheduler
+        each attempt (retries included) waits for a scheduler slot.
+        """
+        if self.scheduler is None:
+            return gdax_call_api(url, **kwargs)
+        scheduler, client = self.scheduler, self.scheduler_client
+        priority = self.REQUEST_PRIORITY.get(kwargs.get('method', 'get'), 2)
+
+        def acquire():
+            scheduler.acquire(client, priority)
+
+        return call_api(url, _api_exception_cls=GdaxAPIError,
+                        _before_attempt=acquire, **kwargs)
 
     @property
     def accounts(self) -> dict:
@@ -256,9 +325,32 @@ class Gdax:
     def ws(self):
         # gdax.feeds.websocket_client.GdaxWebsocketClient
         if self._ws is None:
-            self._ws = GdaxMemoryWebSocketClient(products=GdaxProducts.LIST)
+            self._ws = GdaxMemoryWebSocketClient(products=GdaxProducts.LIST, url=self.ws_url)
         return self._ws
 
+    @property
+    def candle_cache(self):
+        """
+        Generates/returns a default GdaxCandleCache when first accessed.
+        :return: stocklook.crypto.gdax.candle_cache.GdaxCandleCache
+        """
+        if self._candle_cache is None:
+            self._candle_cache = GdaxCandleCache()
+        return self._candle_cache
+
+    @property
+    def candle_manager(self):
+        """
+        Generates/returns a default GdaxCandleManager when first accessed.
+        Charts sharing it derive every timeframe of a product
+        from a single base candle series.
+        :return: stocklook.crypto.gdax.candles.GdaxCandleManager
+        """
+        if self._candle_manager is None:
+            from .candles import GdaxCandleManager
+            self._candle_manager = GdaxCandleManager(self)
+        return self._candle_manager
+
     @property
     def db(self):
         """
@@ -418,7 +510,7 @@ class Gdax:
             'auth': kwargs.pop('auth', self.wallet_auth),
             'method': 'get'
         })
-        return gdax_call_api(self.base_url + url_extension, **kwargs)
+        return self.call_api(self.base_url + url_extension, **kwargs)
 
     def post(self, url_extension, **kwargs) -> requests.Response:
         """
@@ -433,7 +525,7 @@ class Gdax:
             'auth': kwargs.pop('auth', self.wallet_auth),
             'method': 'post'
         })
-        return gdax_call_api(self.base_url + url_extension, **kwargs)
+        return self.call_api(self.base_url + url_extension, **kwargs)
 
     def delete(self, url_extension, **kwargs) -> requests.Response:
         """
@@ -452,7 +544,7 @@ class Gdax:
             'auth': kwargs.pop('auth', self.wallet_auth),
             'method': 'delete'
         })
-        return gdax_call_api(self.base_url + url_extension, **kwargs)
+        return self.call_api(self.base_url + url_extension, **kwargs)
 
     def get_current_user(self):
         """
@@ -626,7 +718,8 @@ class Gdax:
         ext = 'products/{}/trades'.format(product)
         return self.get(ext).json()
 
-    def get_candles(self, product, start, end, granularity=60, convert_dates=False, to_frame=False):
+    def get_candles(self, product, start, end, granularity=60,
+                    convert_dates=False, to_frame=False, use_cache=True):
         """
         Historic rates for a product.
         Rates are returned in grouped buckets based on requested granularity.
@@ -643,39 +736,103 @@ class Gdax:
         Historical rates should not be polled frequently.
         If you need real-time information, use the trade and book endpoints along with the websocket feed.
 
+        Gdax returns at most Gdax.MAX_CANDLES buckets per request so larger
+        ranges are split into chunks that are fetched concurrently (within the
+        gdax_call_api rate limit) and merged back together.
+
         :return:
-        Each bucket is an array of the following information:
+        Each bucket is an array of the following information (sorted by time descending):
         time               bucket start time
         low                lowest price during the bucket interval
         high               highest price during the bucket interval
         open               opening price (first trade) in the bucket interval
         close              closing price (last trade) in the bucket interval
         volume             volume of trading activity during the bucket interval
+
+        :param use_cache: (bool, default True)
+            True serves closed buckets from Gdax.candle_cache and only
+            requests the sub-ranges that haven't been downloaded before.
+            The current (partial) bucket is always re-requested.
         """
+        if to_frame:
+            return self.get_candles_frame(product, start, end,
+                                          granularity=granularity,
+                                          convert_dates=convert_dates,
+                                          use_cache=use_cache)
         self._validate_product(product)
 
-        if not isinstance(start, str):
-            start = timestamp_to_iso8601(start)
+        if use_cache:
+            res = self.candle_cache.get_candles(product, start, end,
+                                                granularity, self._fetch_candles)
+        else:
+            s, e = get_bucket_range(start, end, granularity)
+            res = self._fetch_candles(product, s, e, granularity)
 
-        if not isinstance(end, str):
-            end = timestamp_to_iso8601(end)
+        if convert_dates and res:
+            times = pd.to_datetime([row[0] for row in res], unit='s')
+            for row, t in zip(res, times):
+                row[0] = t
 
-        ext = 'products/{}/candles'.format(product)
-        params = dict(start=start,
-                      end=end,
-                      granularity=granularity)
+        return res
 
-        res = self.get(ext, params=params).json()
+    def get_candles_frame(self, product, start, end, granularity=60,
+                          convert_dates=True, use_cache=True):
+        """
+        Returns Gdax.get_candles as a pandas.DataFrame with columns
+        ['time', 'low', 'high', 'open', 'close', 'volume'] sorted by time descending.
 
+        :param convert_dates: (bool, default True)
+            True converts the UTC integer time column to (naive UTC) datetimes.
+        """
+        rows = self.get_candles(product, start, end,
+                                granularity=granularity,
+                                use_cache=use_cache)
+        columns = ['time', 'low', 'high', 'open', 'close', 'volume']
+        df = pd.DataFrame(columns=columns, data=rows, index=range(len(rows)))
         if convert_dates:
-            for row in res:
-                row[0] = timestamp_from_utc(row[0])
+            df['time'] = pd.to_datetime(df['time'], unit='s')
+        return df
 
-        if to_frame:
-            columns = ['time', 'low', 'high', 'open', 'close', 'volume']
-            res = pd.DataFrame(columns=columns, data=res, index=range(len(res)))
+    def get_candle_chunks(self, start, end, granularity):
+        """
+        Splits a UTC integer range [start, end) into
+        consecutive [start, end) ranges of at most
+        Gdax.MAX_CANDLES buckets each.
+        """
+        step = self.MAX_CANDLES * granularity
+        return [(s, min(s + step, end)) for s in range(start, end, step)]
 
-        return res
+    def _request_candles(self, product, start, end, granularity):
+        fmt = "%Y-%m-%dT%H:%M:%SZ"
+        ext = 'products/{}/candles'.format(product)
+        params = dict(start=time.strftime(fmt, time.gmtime(start)),
+                      end=time.strftime(fmt, time.gmtime(end - 1)),
+                      granularity=granularity)
+        return self.get(ext, params=params).json()
+
+    def _fetch_candles(self, product, start, end, granularity):
+        """
+        Requests all candles from the API for the UTC integer
+        range [start, end), chunking and fetching concurrently as needed.
+        Used by GdaxCandleCache.get_candles.
+
+        :return: (list) rows de-duplicated and sorted by time descending.
+        """
+        chunks = self.get_candle_chunks(start, end, granularity)
+        if len(chunks) == 1:
+            results = [self._request_candles(product, start, end, granularity)]
+        else:
+            workers = min(self.candle_workers, len(chunks))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(
+                    lambda c: self._request_candles(product, c[0], c[1], granularity),
+                    chunks))
+
+        rows = dict()
+        for res in results:
+            for row in res:
+                rows[row[0]] = row
+        return [rows[t] for t in sorted(rows, reverse=True)]
 
     def get_24hr_stats(self, product):
         """
@@ -832,6 +989,20 @@ class Gdax:
         """
         return self.post('orders', json=order_json).json()
 
+    def cancel_all_orders(self, product_id=None):
+        """
+        Cancels all open orders in one call (DELETE /orders).
+
+        :param product_id: (str, default None)
+            Only cancel orders for this product ('BTC-USD', etc).
+            None cancels orders for every product.
+        :return: (list) The canceled order ids.
+        """
+        params = dict()
+        if product_id is not None:
+            params['product_id'] = product_id
+        return self.delete('orders', params=params).json()
+
     def get_account_ledger_history(self, paginate=True):
         """
         Returns a pandas.DataFrame containing historical transactions for each GdaxAccount
@@ -0,0 +1,823 @@
+"""
+MIT License
+
+Copyright (c) 2017 Zeke Barge
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Vectorized parameter sweeps of the MACDRSIMaker decision maker.
+
+Every (buy_ratio, sell_ratio) pair of a grid is simulated at once:
+the bar loop runs once and each step updates the funds/position
+state of all parameter sets as numpy arrays. Results match running
+one MACDRSIMaker + TradeSet per pair through Strategy.execute.
+
+Example:
+    df = GdaxChartData(gdax, 'LTC-USD', start, end, granularity=60*60*4).df
+    buy_ratios, sell_ratios = get_macd_rsi_grid()
+    res = sweep_macd_rsi(df, buy_ratios, sell_ratios)
+    res.summary().sort_values('profit', ascending=False)
+"""
+import os
+import json
+import inspect
+import hashlib
+import logging as lg
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from shutil import rmtree
+from tempfile import mkdtemp
+from stocklook.quant import frame as indicator_frame
+from stocklook.quant.frame import IndicatorFrame
+
+logger = lg.getLogger(__name__)
+
+BUY = 'buy'
+SELL = 'sell'
+
+# (buy, sell) ratio pairs scaled by 1 - 99 to build the default grid.
+MACD_RSI_RATIOS = ((0.1, 0.1), (0.1, 0.5),
+                   (0.5, 0.1), (0.2, 0.1),
+                   (0.1, 0.2), (0.25, 0.35),
+                   (0.01, 0.02), (0.09, 0.075),
+                   (1, 2), (0.005, 0.003),
+                   (0.003, 0.005),
+                   (0.9, 0.45), (0.8, 0.64),
+                   (1.3, .9), (1.5, .6))
+
+
+def get_macd_rsi_grid(ratios=MACD_RSI_RATIOS, multipliers=range(1, 100)):
+    """
+    Returns (buy_ratios, sell_ratios) arrays for every ratio pair
+    scaled by every multiplier, then again with each pair reversed.
+    """
+    buys, sells = list(), list()
+    for pairs in (ratios, [(s, b) for b, s in ratios]):
+        for b, s in pairs:
+            for i in multipliers:
+                buys.append(b * i)
+                sells.append(s * i)
+    return np.array(buys, dtype=float), np.array(sells, dtype=float)
+
+
+def get_macd_rsi_points(macd, rsi):
+    """
+    Returns (min_macd, max_macd, min_rsi, max_rsi) of the rows where
+    both values are greater than 0.1 like MACDRSIMaker.calculate.
+    """
+    macd = np.asarray(macd, dtype=float)
+    rsi = np.asarray(rsi, dtype=float)
+    with np.errstate(invalid='ignore'):
+        msk = (rsi > 0.1) & (macd > 0.1)
+    if not msk.any():
+        return np.nan, np.nan, np.nan, np.nan
+    macd, rsi = macd[msk], rsi[msk]
+    return macd.min(), macd.max(), rsi.min(), rsi.max()
+
+
+class SweepResult:
+    """
+    The final state of every parameter set in a sweep.
+    """
+    def __init__(self, inputs, funds, start_funds, position, net_size,
+                 bought, trades, times=None, prices=None,
+                 trade_sizes=None, trade_sides=None):
+        self.inputs = inputs
+        self.funds = funds
+        self.start_funds = start_funds
+        self.position = position
+        self.net_size = net_size
+        self.bought = bought
+        self.trades = trades
+        self.times = times
+        self.prices = prices
+        self.trade_sizes = trade_sizes
+        self.trade_sides = trade_sides
+
+    @property
+    def profit(self):
+        return self.funds - self.start_funds
+
+    @property
+    def pnl(self):
+        return np.array([round(((f / self.start_funds) * 100) - 100, 2)
+                         for f in self.funds.tolist()])
+
+    def summary(self):
+        """
+        Returns a DataFrame with one row per parameter set like
+        analysis.run_macd_rsi_decisions compiled from its makers.
+        """
+        df = pd.DataFrame(self.inputs)
+        df['profit'] = self.profit
+        df['bought'] = self.bought
+        df['trades'] = self.trades
+        df['start_funds'] = self.start_funds
+        df['end_funds'] = self.funds
+        df['pnl'] = self.pnl
+        df['maker_id'] = np.arange(len(self.funds))
+        return df
+
+    def get_trades(self, maker_ids=None):
+        """
+        Returns the trades of each parameter set like TradeSet.df
+        (time, size, price, type, total) with a maker_id column.
+        Requires the sweep to have been run with record_trades=True.
+
+        :param maker_ids: (list, default None) None returns all trades.
+        """
+        if self.trade_sides is None:
+            raise ValueError("Trades weren't recorded, run the "
+                             "sweep with record_trades=True.")
+        sides = self.trade_sides
+        if maker_ids is not None:
+            maker_ids = np.asarray(maker_ids)
+            sides = sides[:, maker_ids]
+        makers, rows = np.nonzero(sides.T)
+        cols = makers if maker_ids is None else maker_ids[makers]
+        size = self.trade_sizes[rows, cols]
+        price = self.prices[rows]
+        df = pd.DataFrame({'time': self.times[rows],
+                           'size': size,
+                           'price': price,
+                           'type': np.where(sides.T[makers, rows] > 0, BUY, SELL)})
+        df['total'] = df['size'] * df['price']
+        df['maker_id'] = cols
+        return df
+
+
+def sweep_macd_rsi(df, buy_ratios, sell_ratios, funds=1500, position_size=5,
+                   margin=False, record_trades=False):
+    """
+    Simulates MACDRSIMaker for every (buy_ratio, sell_ratio) pair.
+
+    :param df: (pd.DataFrame)
+        Candles with time, close, macd and rsi_6 columns
+        (an IndicatorFrame computes the indicators if missing).
+
+    :param buy_ratios: (np.array)
+    :param sell_ratios: (np.array)
+        The same length - one parameter set per position.
+
+    :param funds: (float, default 1500)
+        Starting funds of every parameter set.
+
+    :param position_size: (int, default 5)
+        The minimum trade size.
+
+    :param margin: (bool, default False)
+        True allows selling more than the position.
+
+    :param record_trades: (bool, default False)
+        True keeps a (bars + 1, params) matrix of trades
+        for SweepResult.get_trades.
+
+    :return: (SweepResult)
+    """
+    macd, rsi = df['macd'], df['rsi_6']
+    return sweep_macd_rsi_arrays(df['time'].values, df['close'].values,
+                                 macd.values, rsi.values,
+                                 buy_ratios, sell_ratios,
+                                 funds=funds,
+                                 position_size=position_size,
+                                 margin=margin,
+                                 record_trades=record_trades)
+
+
+def sweep_macd_rsi_arrays(time, close, macd, rsi, buy_ratios, sell_ratios,
+                          funds=1500, position_size=5, margin=False,
+                          record_trades=False):
+    """
+    sweep_macd_rsi on plain (or memory-mapped) arrays
+    of equal length in any time order.
+    """
+    buy_ratios = np.asarray(buy_ratios, dtype=float)
+    sell_ratios = np.asarray(sell_ratios, dtype=float)
+    n_params = len(buy_ratios)
+
+    min_macd, max_macd, min_rsi, max_rsi = get_macd_rsi_points(macd, rsi)
+    macd_buy = min_macd * buy_ratios
+    macd_sell = max_macd * sell_ratios
+    rsi_buy = min_rsi * buy_ratios
+    rsi_sell = max_rsi * sell_ratios
+
+    order = np.argsort(time, kind='mergesort')
+    times = np.asarray(time)[order]
+    close = np.asarray(close, dtype=float)[order]
+    macd = np.asarray(macd, dtype=float)[order]
+    rsi = np.asarray(rsi, dtype=float)[order]
+
+    n_bars = len(close)
+    cash = np.full(n_params, float(funds))
+    pos = np.zeros(n_params)
+    net = np.zeros(n_params)
+    bought = np.zeros(n_params)
+    trades = np.zeros(n_params, dtype=int)
+    size = position_size
+
+    if record_trades:
+        trade_sizes = np.zeros((n_bars + 1, n_params))
+        trade_sides = np.zeros((n_bars + 1, n_params), dtype=np.int8)
+    else:
+        trade_sizes = trade_sides = None
+
+    def buy(i, msk, s, price):
+        # TradeSet.add_trade(type=BUY)
+        nonlocal cash, pos, net, bought, trades
+        s = np.where(s > 0, -s, s)
+        over = cash + s * price < 0
+        ok = msk & ~(over & (cash <= 0))
+        s = np.where(over, -(cash / price), s)
+        pos = np.where(ok, pos + np.abs(s), pos)
+        cash = np.where(ok, cash + s * price, cash)
+        net = np.where(ok, net + s, net)
+        bought = np.where(ok, bought + np.abs(s), bought)
+        trades += ok
+        if record_trades:
+            trade_sizes[i, ok] = s[ok]
+            trade_sides[i, ok] = 1
+
+    def sell(i, msk, s, price):
+        # TradeSet.add_trade(type=SELL)
+        nonlocal cash, pos, net, trades
+        s = np.where(s < 0, np.abs(s), s)
+        ok = msk
+        if not margin:
+            short = pos < s
+            ok = msk & ~(short & (pos <= 0))
+            s = np.where(short, pos, s)
+        pos = np.where(ok, pos - np.abs(s), pos)
+        cash = np.where(ok, cash + s * price, cash)
+        net = np.where(ok, net + s, net)
+        trades += ok
+        if record_trades:
+            trade_sizes[i, ok] = s[ok]
+            trade_sides[i, ok] = -1
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for i in range(n_bars):
+            price, m, r = close[i], macd[i], rsi[i]
+            buy_msk = (m <= macd_buy) | (r <= rsi_buy)
+            sell_msk = ~buy_msk & ((m >= macd_sell) | (r >= rsi_sell))
+
+            if buy_msk.any():
+                buyable = cash / price
+                s = np.round(np.where(buyable > size * 3, buyable / 3, size), 0)
+                buy(i, buy_msk, s, price)
+
+            if sell_msk.any():
+                s = np.where(pos > size * 3, np.round(pos * .5, 0), size)
+                sell(i, sell_msk, s, price)
+
+        if n_bars:
+            # TradeSet.close_positions
+            price, short, long = close[-1], net > 0, net < 0
+            s = net.copy()
+            sell(n_bars, long, s, price)
+            buy(n_bars, short, s, price)
+
+    inputs = dict(buy_ratio=buy_ratios,
+                  sell_ratio=sell_ratios,
+                  macd_buy_point=macd_buy,
+                  macd_sell_point=macd_sell,
+                  rsi_buy_point=rsi_buy,
+                  rsi_sell_point=rsi_sell)
+    if record_trades and n_bars:
+        times = np.append(times, times[-1])
+        close = np.append(close, close[-1])
+
+    return SweepResult(inputs, cash, float(funds), pos, net, bought, trades,
+                       times=times, prices=close,
+                       trade_sizes=trade_sizes, trade_sides=trade_sides)
+
+
+# ------------------------------------------------
+# Parallel sweeps
+# ------------------------------------------------
+
+SERIES_COLUMNS = ('time', 'close', 'macd', 'rsi_6')
+
+
+def _sweep_chunk(paths, offset, buy_ratios, sell_ratios, kwargs):
+    """
+    Process pool task: sweeps one chunk of parameter sets over
+    one memory-mapped series and returns its summary frame.
+    """
+    arrays = [np.load(paths[c], mmap_mode='r') for c in SERIES_COLUMNS]
+    res = sweep_macd_rsi_arrays(*arrays, buy_ratios, sell_ratios, **kwargs)
+    df = res.summary()
+    df['maker_id'] += offset
+    return df
+
+
+class SweepPool:
+    """
+    Runs sweep_macd_rsi over many series (walk-forward windows,
+    granularities, products...) and parameter chunks on a process pool.
+
+    Each series is written once to .npy files which workers open
+    memory-mapped, so only file paths and parameter chunks are pickled
+    to the workers. Chunk summaries are collected as they complete.
+
+    Example:
+        with SweepPool(workers=8) as pool:
+            for i, df in enumerate(window_frames):
+                pool.add_series((i, 60*60*4), df)
+            summary = pool.run(*get_macd_rsi_grid())
+    """
+    def __init__(self, workers=None, chunk_size=500, directory=None):
+        """
+        :param workers: (int, default os.cpu_count())
+        :param chunk_size: (int, default 500)
+            Parameter sets per task.
+        :param directory: (str, default None)
+            Where series .npy files are written.
+            None uses a temporary directory removed by SweepPool.close().
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._tmp_dir = None
+        if directory is None:
+            self._tmp_dir = mkdtemp(prefix='stocklook_sweep_')
+            directory = self._tmp_dir
+        self.directory = directory
+        self._series = OrderedDict()  # key: {column: .npy path}
+
+    def add_series(self, key, df):
+        """
+        Writes the time, close, macd and rsi_6 columns of :param df
+        to .npy files. An IndicatorFrame computes missing indicators.
+
+        :param key: (hashable) Identifies the series in results -
+            a tuple like (window, granularity) is split across
+            key_0, key_1... columns.
+        :param df: (pd.DataFrame)
+        """
+        if not isinstance(df, IndicatorFrame):
+            df = IndicatorFrame(df)
+        paths = dict()
+        prefix = 'series_{}'.format(len(self._series))
+        for c in SERIES_COLUMNS:
+            values = df[c].values
+            if c == 'time' and values.dtype == object:
+                values = pd.to_datetime(values).values
+            elif c != 'time':
+                values = np.asarray(values, dtype=float)
+            path = os.path.join(self.directory, '{}_{}.npy'.format(prefix, c))
+            np.save(path, values)
+            paths[c] = path
+        self._series[key] = paths
+
+    def get_tasks(self, buy_ratios, sell_ratios, keys=None):
+        """
+        Yields (key, paths, offset, buy_chunk, sell_chunk) tasks.
+        """
+        buy_ratios = np.asarray(buy_ratios, dtype=float)
+        sell_ratios = np.asarray(sell_ratios, dtype=float)
+        if keys is None:
+            keys = list(self._series.keys())
+        for key in keys:
+            paths = self._series[key]
+            for offset in range(0, len(buy_ratios), self.chunk_size):
+                end = offset + self.chunk_size
+                yield key, paths, offset, buy_ratios[offset:end], sell_ratios[offset:end]
+
+    def run(self, buy_ratios, sell_ratios, keys=None, callback=None, **kwargs):
+        """
+        Sweeps every (buy_ratio, sell_ratio) pair over every series.
+
+        :param keys: (list, default None) Series keys to run, None runs all.
+        :param callback: (callable, default None)
+            callback(key, summary_chunk) called as each task completes.
+        :param kwargs: funds, position_size, margin (see sweep_macd_rsi).
+        :return: (pd.DataFrame) Summaries of every series with key columns.
+        """
+        kwargs.pop('record_trades', None)
+        results = list()
+
+        def collect(key, df):
+            parts = key if isinstance(key, tuple) else (key,)
+            for i, part in enumerate(parts):
+                df.insert(i, 'key_{}'.format(i), part)
+            results.append(df)
+            if callback is not None:
+                callback(key, df)
+
+        tasks = list(self.get_tasks(buy_ratios, sell_ratios, keys=keys))
+        if self.workers <= 1 or len(tasks) <= 1:
+            for key, paths, offset, b, s in tasks:
+                collect(key, _sweep_chunk(paths, offset, b, s, kwargs))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                futures = {executor.submit(_sweep_chunk, paths, offset, b, s, kwargs): key
+                           for key, paths, offset, b, s in tasks}
+                for future in as_completed(futures):
+                    collect(futures[future], future.result())
+
+        if not results:
+            return pd.DataFrame()
+        df = pd.concat(results, ignore_index=True)
+        key_cols = [c for c in df.columns if c.startswith('key_')]
+        return df.sort_values(key_cols + ['maker_id']).reset_index(drop=True)
+
+    def close(self):
+        """
+        Removes the temporary series directory (if one was created).
+        """
+        if self._tmp_dir is not None:
+            rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
+        self._series.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# ------------------------------------------------
+# Successive halving
+# ------------------------------------------------
+
+class HalvingResult:
+    """
+    The outcome of successive_halving.
+
+    survivors are the candidate indices evaluated on every bar,
+    scores their final scores (same order) and rounds a list
+    of dicts (round, bars, candidates, kept, best_score).
+    """
+    def __init__(self, survivors, scores, rounds, n_candidates, n_bars):
+        self.survivors = survivors
+        self.scores = scores
+        self.rounds = rounds
+        self.n_candidates = n_candidates
+        self.n_bars = n_bars
+
+    @property
+    def evaluated_bars(self):
+        """ Candidate-bars simulated by the search. """
+        return sum(r['candidates'] * r['bars'] for r in self.rounds)
+
+    @property
+    def exhaustive_bars(self):
+        """ Candidate-bars simulated by evaluating every candidate on every bar. """
+        return self.n_candidates * self.n_bars
+
+    @property
+    def saved(self):
+        """ The fraction of exhaustive_bars the search didn't simulate. """
+        if not self.exhaustive_bars:
+            return 0.0
+        return 1 - self.evaluated_bars / self.exhaustive_bars
+
+    def summary(self):
+        return pd.DataFrame(self.rounds, columns=['round', 'bars', 'candidates',
+                                                  'kept', 'best_score'])
+
+    def __repr__(self):
+        return "HalvingResult(candidates={}, survivors={}, rounds={}, " \
+               "saved={:.1%})".format(self.n_candidates, len(self.survivors),
+                                      len(self.rounds), self.saved)
+
+
+def get_halving_schedule(n_bars, min_bars=None, keep=0.5):
+    """
+    Returns the number of bars evaluated each round: min_bars
+    growing by 1 / :param keep per round up to :param n_bars.
+
+    :param min_bars: (int, default max(n_bars // 16, 50))
+        The first round's prefix. Enough bars to warm up
+        the indicators should be used.
+    """
+    if min_bars is None:
+        min_bars = max(n_bars // 16, 50)
+    bars = [min(int(min_bars), n_bars)]
+    while bars[-1] < n_bars:
+        bars.append(min(int(np.ceil(bars[-1] / keep)), n_bars))
+    return bars
+
+
+def successive_halving(evaluate, n_candidates, n_bars, min_bars=None,
+                       keep=0.5, min_candidates=1):
+    """
+    Evaluates every candidate on a short prefix of the bars, keeps
+    the best :param keep fraction and re-evaluates the survivors on
+    progressively longer prefixes until the full series is reached.
+
+    :param evaluate: (callable)
+        evaluate(indices, bars) returns an array of scores (higher is better)
+        of the candidates at :param indices run over the first :param bars bars.
+    :param n_candidates: (int)
+    :param n_bars: (int)
+    :param min_bars: (int, default see get_halving_schedule)
+    :param keep: (float, default 0.5) The fraction kept each round.
+    :param min_candidates: (int, default 1) Never prune below this many.
+    :return: (HalvingResult)
+    """
+    if not 0 < keep < 1:
+        raise ValueError("keep must be between 0 and 1, not {}".format(keep))
+    idx = np.arange(n_candidates)
+    scores = np.array([])
+    rounds = list()
+    schedule = get_halving_schedule(n_bars, min_bars=min_bars, keep=keep)
+    for i, bars in enumerate(schedule):
+        scores = np.asarray(evaluate(idx, bars), dtype=float)
+        final = i == len(schedule) - 1
+        n_keep = len(idx) if final else max(int(np.ceil(len(idx) * keep)),
+                                              min(min_candidates, len(idx)))
+        rounds.append(dict(round=i, bars=bars, candidates=len(idx), kept=n_keep,
+                           best_score=np.nanmax(scores) if len(scores) else np.nan))
+        # Stable so ties keep grid order.
+        order = np.argsort(-np.nan_to_num(scores, nan=-np.inf), kind='mergesort')[:n_keep]
+        idx, scores = idx[order], scores[order]
+        logger.debug("Halving round {}: {} bars, kept {}/{}".format(
+            i, bars, n_keep, rounds[-1]['candidates']))
+    return HalvingResult(idx, scores, rounds, n_candidates, n_bars)
+
+
+def halve_macd_rsi(df, buy_ratios, sell_ratios, min_bars=None, keep=0.5,
+                   metric='profit', min_candidates=1, **kwargs):
+    """
+    Searches (buy_ratio, sell_ratio) pairs with successive_halving,
+    sweeping the survivors of each round over a longer prefix of
+    :param df (the earliest bars) with sweep_macd_rsi.
+
+    :param metric: (str, default 'profit') The summary column to maximize.
+    :param kwargs: funds, position_size, margin (see sweep_macd_rsi).
+    :return: (pd.DataFrame, HalvingResult)
+        The full-history summary of the survivors (maker_id is the
+        position in :param buy_ratios) and the search result.
+    """
+    kwargs.pop('record_trades', None)
+    buy_ratios = np.asarray(buy_ratios, dtype=float)
+    sell_ratios = np.asarray(sell_ratios, dtype=float)
+    if not isinstance(df, IndicatorFrame):
+        df = IndicatorFrame(df)
+    df.compute('macd', 'rsi_6')
+    order = np.argsort(df['time'].values, kind='mergesort')
+    cols = [df[c].values[order] for c in SERIES_COLUMNS]
+    last = dict()
+
+    def evaluate(idx, bars):
+        res = sweep_macd_rsi_arrays(*[c[:bars] for c in cols],
+                                    buy_ratios=buy_ratios[idx],
+                                    sell_ratios=sell_ratios[idx], **kwargs)
+        summary = res.summary()
+        summary['maker_id'] = idx
+        last['summary'] = summary
+        return summary[metric].values
+
+    result = successive_halving(evaluate, len(buy_ratios), len(order),
+                                min_bars=min_bars, keep=keep,
+                                min_candidates=min_candidates)
+    summary = last['summary'].set_index('maker_id').loc[result.survivors].reset_index()
+    return summary.loc[:, last['summary'].columns], result
+
+
+# ------------------------------------------------
+# Result cache
+# ------------------------------------------------
+
+def get_code_version(*objs):
+    """
+    Returns a short hash of the source code of :param objs
+    (functions, classes or modules) so cached results are
+    invalidated when the code producing them changes.
+    Defaults to everything MACD/RSI sweep results depend on:
+    the sweep, its signal points, SweepResult and the
+    stocklook.quant.frame indicators.
+    """
+    objs = objs or (sweep_macd_rsi, sweep_macd_rsi_arrays,
+                    get_macd_rsi_points, SweepResult, indicator_frame)
+    h = hashlib.sha1()
+    for obj in objs:
+        h.update(inspect.getsource(obj).encode('utf-8'))
+    return h.hexdigest()[:12]
+
+
+def write_frame(path, df):
+    """
+    Writes :param df to a compressed .npz file with one array per
+    column. Object columns are stored as unicode strings. The file
+    is written next to :param path and moved into place so readers
+    never see a partial file.
+    """
+    arrays = OrderedDict()
+    for c in df.columns:
+        values = df[c].values
+        if values.dtype == object:
+            values = values.astype(str)
+        arrays['col_{}'.format(len(arrays))] = values
+    arrays['columns'] = np.array([str(c) for c in df.columns])
+    tmp_path = path + '.tmp.npz'
+    np.savez_compressed(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def read_frame(path):
+    """
+    Reads a DataFrame written by write_frame.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        columns = data['columns'].tolist()
+        return pd.DataFrame(OrderedDict(
+            (c, data['col_{}'.format(i)]) for i, c in enumerate(columns)),
+            columns=columns)
+
+
+class BacktestCache:
+    """
+    Caches candles and sweep results in compressed columnar
+    .npz files named by a hash of their inputs:
+
+        key = cache.get_key(product='LTC-USD', granularity=14400,
+                            start=start, end=end, strategy='MACDRSIMaker',
+                            funds=1500, position_size=5, margin=False)
+
+    Result keys include the code version, so results are recomputed
+    when the simulation changes. Results are stored per parameter set
+    (buy_ratio, sell_ratio): BacktestCache.get_missing returns the
+    sets a new sweep still needs, and BacktestCache.get_summary
+    reassembles any requested grid from what's stored.
+    """
+    SUMMARY = 'summary'
+    TRADES = 'trades'
+    CELL_COLUMNS = ['buy_ratio', 'sell_ratio']
+
+    def __init__(self, directory, version=None):
+        """
+        :param directory: (str) Created if it doesn't exist.
+        :param version: (str, default get_code_version())
+            Mixed into versioned keys.
+        """
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.version = version or get_code_version()
+
+    def get_key(self, versioned=True, **parts):
+        """
+        Returns a hex digest of :param parts (JSON encoded,
+        sorted by name) and the code version if :param versioned.
+        """
+        if versioned:
+            parts['_version'] = self.version
+        raw = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get_path(self, key, name=SUMMARY):
+        return os.path.join(self.directory, '{}.{}.npz'.format(key, name))
+
+    def has(self, key, name=SUMMARY):
+        return os.path.exists(self.get_path(key, name))
+
+    def read(self, key, name=SUMMARY):
+        """
+        Returns the cached DataFrame or None.
+        """
+        path = self.get_path(key, name)
+        if not os.path.exists(path):
+            return None
+        return read_frame(path)
+
+    def write(self, key, df, name=SUMMARY):
+        write_frame(self.get_path(key, name), df)
+
+    def get_frame(self, key, func, name='frame', overwrite=False):
+        """
+        Returns the DataFrame cached under :param key or
+        the result of func() (cached unless it's None).
+        """
+        df = None if overwrite else self.read(key, name)
+        if df is None:
+            df = func()
+            if df is not None:
+                self.write(key, df, name)
+        return df
+
+    @staticmethod
+    def _cells(buy_ratios, sell_ratios):
+        return list(zip(np.round(np.asarray(buy_ratios, dtype=float), 12).tolist(),
+                        np.round(np.asarray(sell_ratios, dtype=float), 12).tolist()))
+
+    def get_missing(self, key, buy_ratios, sell_ratios, trades=False):
+        """
+        Returns a boolean mask of the (buy_ratio, sell_ratio)
+        pairs without a cached summary under :param key
+        (or without cached trades if :param trades).
+        Only the first of duplicate pairs is flagged.
+        """
+        cells = self._cells(buy_ratios, sell_ratios)
+        df = self.read(key, self.SUMMARY)
+        have = set()
+        if df is not None:
+            if trades:
+                df = df.loc[df['recorded'], :]
+            have.update(self._cells(df['buy_ratio'].values, df['sell_ratio'].values))
+        missing = np.zeros(len(cells), dtype=bool)
+        for i, c in enumerate(cells):
+            if c not in have:
+                missing[i] = True
+                have.add(c)
+        return missing
+
+    def add(self, key, summary, trades=None):
+        """
+        Stores newly computed parameter sets under :param key.
+
+        :param summary: (pd.DataFrame) SweepResult.summary() rows.
+        :param trades: (pd.DataFrame, default None)
+            SweepResult.get_trades() rows of the same sweep.
+        """
+        summary = summary.loc[:, [c for c in summary.columns if not c.startswith('key_')]]
+        summary['recorded'] = trades is not None
+        if trades is not None:
+            ratios = summary.loc[:, self.CELL_COLUMNS + ['maker_id']]
+            trades = pd.merge(trades, ratios, how='inner', on='maker_id')
+            self._append(key, trades.drop('maker_id', axis=1), self.TRADES, dedupe=False)
+        self._append(key, summary.drop('maker_id', axis=1), self.SUMMARY)
+
+    def _append(self, key, df, name, dedupe=True):
+        old = self.read(key, name)
+        if old is not None:
+            df = pd.concat([old, df], ignore_index=True)
+            if dedupe:
+                cells = pd.Series(self._cells(df['buy_ratio'].values, df['sell_ratio'].values))
+                df = df.loc[~cells.duplicated(keep='last').values, :]
+        self.write(key, df.reset_index(drop=True), name)
+
+    def _select(self, df, buy_ratios, sell_ratios):
+        # Rows of every requested pair (repeated for duplicate
+        # pairs) with maker_id set to the position requested.
+        columns = df.columns.tolist()
+        req = pd.DataFrame(self._cells(buy_ratios, sell_ratios), columns=['_buy', '_sell'])
+        req['maker_id'] = np.arange(len(req.index))
+        cells = pd.DataFrame(self._cells(df['buy_ratio'].values, df['sell_ratio'].values),
+                             columns=['_buy', '_sell'], index=df.index)
+        df = pd.merge(req, pd.concat([df, cells], axis=1), how='inner', on=['_buy', '_sell'])
+        return df.loc[:, columns + ['maker_id']]
+
+    def get_summary(self, key, buy_ratios, sell_ratios):
+        """
+        Returns the cached summaries of the requested pairs with
+        maker_id set to their position in :param buy_ratios.
+        """
+        df = self.read(key, self.SUMMARY)
+        if df is None:
+            return pd.DataFrame()
+        df = self._select(df, buy_ratios, sell_ratios).drop('recorded', axis=1)
+        return df.sort_values('maker_id').reset_index(drop=True)
+
+    def get_trades(self, key, buy_ratios, sell_ratios):
+        """
+        Returns the cached trades of the requested pairs like
+        SweepResult.get_trades() (with buy_ratio/sell_ratio columns).
+        """
+        df = self.read(key, self.TRADES)
+        if df is None:
+            return pd.DataFrame()
+        df = self._select(df, buy_ratios, sell_ratios)
+        return df.sort_values(['maker_id', 'time'], kind='mergesort').reset_index(drop=True)
+
+    def sweep(self, key, df, buy_ratios, sell_ratios, record_trades=False, **kwargs):
+        """
+        sweep_macd_rsi over only the pairs missing under :param key,
+        then returns (summary, trades) of every requested pair from
+        the cache. trades is None unless :param record_trades.
+
+        Cached pairs swept without record_trades are swept again
+        when trades are requested.
+        """
+        buy_ratios = np.asarray(buy_ratios, dtype=float)
+        sell_ratios = np.asarray(sell_ratios, dtype=float)
+        missing = self.get_missing(key, buy_ratios, sell_ratios, trades=record_trades)
+        if missing.any():
+            logger.debug("Sweeping {}/{} missing parameter sets.".format(
+                missing.sum(), len(missing)))
+            res = sweep_macd_rsi(df, buy_ratios[missing], sell_ratios[missing],
+                                 record_trades=record_trades, **kwargs)
+            self.add(key, res.summary(), res.get_trades() if record_trades else None)
+        summary = self.get_summary(key, buy_ratios, sell_ratios)
+        trades = self.get_trades(key, buy_ratios, sell_ratios) if record_trades else None
+        return summary, trades
+
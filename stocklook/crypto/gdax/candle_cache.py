@@ -0,0 +1,266 @@
+"""
+MIT License
+
+Copyright (c) 2017 Zeke Barge
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import os
+import sqlite3
+import logging as lg
+from time import time
+from threading import Lock
+from stocklook.config import config
+from stocklook.utils.timetools import timestamp_to_utc_int
+
+logger = lg.getLogger(__name__)
+
+GDAX_CANDLE_CACHE_PATH = 'GDAX_CANDLE_CACHE_PATH'
+
+
+def align_down(utc_int, granularity):
+    return int(utc_int) - (int(utc_int) % granularity)
+
+
+def get_bucket_range(start, end, granularity):
+    """
+    Converts a requested start/end into an aligned
+    half-open [first_bucket, last_bucket + granularity) UTC range.
+    """
+    s = align_down(timestamp_to_utc_int(start), granularity)
+    e = align_down(timestamp_to_utc_int(end), granularity) + granularity
+    return s, e
+
+
+def merge_intervals(intervals):
+    """
+    Merges overlapping or touching half-open [start, end) intervals.
+    :param intervals: (list) [[start, end], [start, end]]
+    :return: (list) sorted and merged intervals.
+    """
+    merged = list()
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def subtract_intervals(start, end, covered):
+    """
+    Returns the parts of [start, end) not found in :param covered.
+    :param start: (int)
+    :param end: (int)
+    :param covered: (list) Sorted, merged [start, end) intervals.
+    :return: (list) [[start, end], [start, end]]
+    """
+    missing = list()
+    cursor = start
+    for c_start, c_end in covered:
+        if c_end <= cursor:
+            continue
+        if c_start >= end:
+            break
+        if c_start > cursor:
+            missing.append([cursor, c_start])
+        cursor = max(cursor, c_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        missing.append([cursor, end])
+    return missing
+
+
+class GdaxCandleCache:
+    """
+    Persistent SQLite cache of Gdax candles keyed by (product, granularity).
+
+    Historical candles never change so once a time range has been
+    downloaded it's recorded in a coverage table and served locally
+    from then on. Only uncovered sub-ranges are requested from the API.
+
+    The current (partial) bucket is never marked as covered so it's
+    re-fetched on every call, as are any buckets in the future.
+
+    Times are UTC integers aligned to the granularity and
+    coverage intervals are half-open: [start, end).
+    """
+    COLUMNS = ['time', 'low', 'high', 'open', 'close', 'volume']
+
+    def __init__(self, path=None):
+        """
+        :param path: (str, default None)
+            The path to the sqlite database file.
+            None defaults to stocklook.config.config['GDAX_CANDLE_CACHE_PATH']
+            or DATA_DIRECTORY/gdax_candles.sqlite3
+        """
+        if path is None:
+            path = config.get(GDAX_CANDLE_CACHE_PATH, None)
+        if path is None:
+            path = os.path.join(config['DATA_DIRECTORY'], 'gdax_candles.sqlite3')
+        if path != ':memory:':
+            d = os.path.dirname(path)
+            if d and not os.path.exists(d):
+                os.makedirs(d)
+        self.path = path
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._setup()
+
+    def _setup(self):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "create table if not exists gdax_candles ("
+                "product text not null, "
+                "granularity integer not null, "
+                "time integer not null, "
+                "low real, high real, open real, close real, volume real, "
+                "primary key (product, granularity, time)) without rowid")
+            self._conn.execute(
+                "create table if not exists gdax_candle_coverage ("
+                "product text not null, "
+                "granularity integer not null, "
+                "start integer not null, "
+                "end integer not null)")
+
+    def get_coverage(self, product, granularity):
+        """
+        Returns a sorted list of covered [start, end) intervals.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "select start, end from gdax_candle_coverage "
+                "where product = ? and granularity = ? "
+                "order by start", (product, granularity)).fetchall()
+        return [list(r) for r in rows]
+
+    def get_missing_ranges(self, product, granularity, start, end):
+        """
+        Returns a list of [start, end) UTC ranges that
+        need to be requested from the API.
+        """
+        s, e = get_bucket_range(start, end, granularity)
+        return subtract_intervals(s, e, self.get_coverage(product, granularity))
+
+    def add_candles(self, product, granularity, rows, start=None, end=None, now_time=None):
+        """
+        Upserts candle rows and marks [start, end) as covered.
+        Coverage stops at the current (partial) bucket.
+
+        :param rows: (list) [[time, low, high, open, close, volume], ...]
+        :param start: (int, default None) UTC start of the fetched range.
+        :param end: (int, default None) UTC end (exclusive) of the fetched range.
+        :param now_time: (int, default time.time())
+        :return: None
+        """
+        if now_time is None:
+            now_time = time()
+        live = align_down(now_time, granularity)
+        data = [(product, granularity, int(r[0]), r[1], r[2], r[3], r[4], r[5])
+                for r in rows]
+
+        with self._lock, self._conn:
+            if data:
+                self._conn.executemany(
+                    "insert or replace into gdax_candles "
+                    "values (?, ?, ?, ?, ?, ?, ?, ?)", data)
+
+            if start is None or end is None:
+                return None
+
+            end = min(end, live)
+            if end <= start:
+                return None
+
+            covered = self._conn.execute(
+                "select start, end from gdax_candle_coverage "
+                "where product = ? and granularity = ?",
+                (product, granularity)).fetchall()
+            merged = merge_intervals([list(c) for c in covered] + [[start, end]])
+            self._conn.execute(
+                "delete from gdax_candle_coverage "
+                "where product = ? and granularity = ?",
+                (product, granularity))
+            self._conn.executemany(
+                "insert into gdax_candle_coverage values (?, ?, ?, ?)",
+                [(product, granularity, s, e) for s, e in merged])
+
+    def read_candles(self, product, granularity, start, end):
+        """
+        Returns cached rows within [start, end) sorted by time descending
+        like the Gdax API does.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "select time, low, high, open, close, volume "
+                "from gdax_candles "
+                "where product = ? and granularity = ? "
+                "and time >= ? and time < ? "
+                "order by time desc",
+                (product, granularity, start, end)).fetchall()
+        return [list(r) for r in rows]
+
+    def get_candles(self, product, start, end, granularity, fetch):
+        """
+        Returns candles for the requested range, calling :param fetch
+        only for the sub-ranges that aren't already cached.
+
+        :param fetch: (callable)
+            fetch(product, start_utc, end_utc, granularity)
+            should return ALL API rows for that range, chunking as needed
+            (see Gdax._fetch_candles): [[time, low, high, open, close, volume], ...]
+        :return: (list) rows sorted by time descending.
+        """
+        s, e = get_bucket_range(start, end, granularity)
+        missing = subtract_intervals(s, e, self.get_coverage(product, granularity))
+
+        for m_start, m_end in missing:
+            rows = fetch(product, m_start, m_end, granularity)
+            self.add_candles(product, granularity, rows, m_start, m_end)
+
+        if missing:
+            logger.debug("{} {}: fetched {} missing range(s) "
+                         "of [{}, {})".format(product, granularity, len(missing), s, e))
+
+        return self.read_candles(product, granularity, s, e)
+
+    def clear(self, product=None, granularity=None):
+        """
+        Deletes cached candles and coverage for a product/granularity,
+        or everything when both are None.
+        """
+        crit, params = list(), list()
+        if product is not None:
+            crit.append('product = ?')
+            params.append(product)
+        if granularity is not None:
+            crit.append('granularity = ?')
+            params.append(granularity)
+        where = (' where ' + ' and '.join(crit) if crit else '')
+        with self._lock, self._conn:
+            self._conn.execute('delete from gdax_candles' + where, params)
+            self._conn.execute('delete from gdax_candle_coverage' + where, params)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,187 @@
+"""
+MIT License
+
+Copyright (c) 2017 Zeke Barge
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import logging as lg
+import pandas as pd
+from time import time, monotonic
+from threading import RLock
+from stocklook.utils.ohlc import resample_ohlcv
+from stocklook.utils.timetools import timestamp_to_utc_int
+from .candle_cache import align_down
+
+logger = lg.getLogger(__name__)
+
+
+class GdaxCandleManager:
+    """
+    Keeps one fine-grained base candle series per product and derives
+    any coarser granularity from it by resampling locally, so every
+    timeframe of a product costs a single REST candle series.
+
+    Coarser buckets are aligned to the UTC epoch like Gdax's own
+    candles. The last bucket is the partial "current" bar built
+    from the base candles seen so far.
+
+    Example:
+        m = GdaxCandleManager(gdax, base_granularity=60*5)
+        m.get_candles('BTC-USD', 60*60*4, start=now_minus(days=14))
+    """
+    VALID_GRANULARITIES = (60, 300, 900, 3600, 21600, 86400)
+    COLUMNS = ['time', 'low', 'high', 'open', 'close', 'volume']
+
+    def __init__(self, gdax, base_granularity=60*5, refresh_seconds=60):
+        """
+        :param gdax: (stocklook.crypto.gdax.api.Gdax)
+
+        :param base_granularity: (int, default 300)
+            The granularity (seconds) of the series requested from Gdax.
+            Must be a granularity Gdax supports. Requested granularities must
+            be multiples of it.
+
+        :param refresh_seconds: (int, default 60)
+            The minimum number of seconds between requests for
+            new candles on a product's base series.
+        """
+        if base_granularity not in self.VALID_GRANULARITIES:
+            raise ValueError("base_granularity must be one of "
+                             "{}".format(self.VALID_GRANULARITIES))
+        self.gdax = gdax
+        self.base_granularity = base_granularity
+        self.refresh_seconds = refresh_seconds
+        self._series = dict()      # product: DataFrame (time ascending, UTC int times)
+        self._updated = dict()     # product: monotonic time of last refresh
+        self._lock = RLock()
+
+    def _fetch(self, product, start, end):
+        rows = self.gdax.get_candles(product, start, end, self.base_granularity)
+        df = pd.DataFrame(rows, columns=self.COLUMNS)
+        return df.sort_values('time').reset_index(drop=True)
+
+    def get_base(self, product, start=None, refresh=None):
+        """
+        Returns the base candle series for a product (time ascending,
+        UTC integer times) covering at least :param start to now.
+
+        :param start: (datetime, int, default None)
+            None returns whatever is loaded (or the last 300 base candles).
+        :param refresh: (bool, default None)
+            True forces new candles to be requested, False never requests them.
+            None requests them when the series is older than refresh_seconds.
+        :return: (pd.DataFrame)
+        """
+        g = self.base_granularity
+        now_utc = int(time())
+        if start is None:
+            start_utc = None
+        else:
+            start_utc = align_down(timestamp_to_utc_int(start), g)
+
+        with self._lock:
+            df = self._series.get(product, None)
+
+            if df is None:
+                if start_utc is None:
+                    start_utc = align_down(now_utc, g) - g * 299
+                df = self._fetch(product, start_utc, now_utc)
+                self._updated[product] = monotonic()
+                self._series[product] = df
+                return df
+
+            first = int(df['time'].iloc[0]) if not df.empty else now_utc
+            if start_utc is not None and start_utc < first:
+                older = self._fetch(product, start_utc, first - g)
+                df = pd.concat([older[older['time'] < first], df], ignore_index=True)
+
+            if refresh is None:
+                refresh = monotonic() - self._updated.get(product, 0) >= self.refresh_seconds
+            if refresh:
+                # Re-request from the last (partial) candle forward.
+                last = int(df['time'].iloc[-1]) if not df.empty else align_down(now_utc, g)
+                newer = self._fetch(product, last, now_utc)
+                df = pd.concat([df[df['time'] < last], newer[newer['time'] >= last]],
+                               ignore_index=True)
+                self._updated[product] = monotonic()
+
+            self._series[product] = df
+            return df
+
+    def get_candles(self, product, granularity, start=None, end=None, include_partial=True):
+        """
+        Returns candles like Gdax.get_candles_frame (time descending,
+        naive UTC datetimes) resampled from the product's base series.
+
+        :param product: (str) 'BTC-USD', 'ETH-USD', etc.
+        :param granularity: (int) Seconds - a multiple of base_granularity.
+        :param start: (datetime, int, default None)
+        :param end: (datetime, int, default None) None includes the current bar.
+            An end within a bucket makes it the partial last bar.
+        :param include_partial: (bool, default True)
+            False drops the current (incomplete) bar.
+        :return: (pd.DataFrame)
+        """
+        if granularity % self.base_granularity:
+            raise ValueError("granularity {} is not a multiple of the base "
+                             "granularity {}".format(granularity, self.base_granularity))
+        start_utc = None
+        if start is not None:
+            # Load from the start of the first bucket so it isn't partial.
+            start_utc = align_down(timestamp_to_utc_int(start), granularity)
+
+        base = self.get_base(product, start=start_utc)
+        if start_utc is not None:
+            base = base[base['time'] >= start_utc]
+        now_time = int(time())
+        if end is not None:
+            end_utc = timestamp_to_utc_int(end)
+            base = base[base['time'] <= end_utc]
+            # Buckets aren't complete past the last base candle before end.
+            g = self.base_granularity
+            now_time = min(now_time, align_down(end_utc, g) + g)
+
+        df = resample_ohlcv(base, granularity,
+                            base_granularity=self.base_granularity,
+                            now_time=now_time,
+                            include_partial=include_partial)
+        df = df.iloc[::-1].reset_index(drop=True)
+        df['time'] = pd.to_datetime(df['time'], unit='s')
+        return df
+
+    def get_current_bar(self, product, granularity):
+        """
+        Returns the partial (current) bar for a product and granularity
+        as a dictionary or None.
+        """
+        start = align_down(int(time()), granularity)
+        df = self.get_candles(product, granularity, start=start)
+        if df.empty:
+            return None
+        return df.iloc[0].to_dict()
+
+    def clear(self, product=None):
+        with self._lock:
+            if product is None:
+                self._series.clear()
+                self._updated.clear()
+            else:
+                self._series.pop(product, None)
+                self._updated.pop(product, None)
@@ -21,8 +21,9 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
-from stockstats import StockDataFrame
-from stocklook.patterns import InsideBars, HigherHighs
+from stocklook.patterns import (PatternScanner, INSIDE_BARS,
+                                HIGHER_HIGHS, LOWER_LOWS)
+from stocklook.quant.frame import IndicatorFrame
 
 
 def mean(numbers):
@@ -71,8 +72,21 @@ class GdaxChartData:
     VELOCITY = 'velocity'
     VOLUME = 'volume'
 
-    def __init__(self, gdax, product, start, end, granularity=60*60, df=None):
+    # Every indicator column GdaxChartData.df provides (computed on access).
+    INDICATOR_COLUMNS = [SMA5, SMA8, SMA18, SMA50, SMA100, SMA200,
+                         RANGE, RSI, PRICE_CHANGE, VELOCITY,
+                         SMA5 + '_diff', SMA8 + '_diff', SMA18 + '_diff',
+                         SMA50 + '_diff', SMA100 + '_diff', SMA200 + '_diff',
+                         MACD, MACDS, MACDH, RSI6, RSI12, TR, ATR]
+
+    def __init__(self, gdax, product, start, end, granularity=60*60, df=None, candle_manager=None):
+        """
+        :param candle_manager: (stocklook.crypto.gdax.candles.GdaxCandleManager, default None)
+            When provided candles are resampled from the manager's base
+            series rather than requested from Gdax for this granularity.
+        """
         self.gdax = gdax
+        self.candle_manager = candle_manager
         self.product = product
         self.start = start
         self.end = end
@@ -81,6 +95,8 @@ class GdaxChartData:
         self._price = None
         self._volume = None
         self._ticker_updated = None
+        self._indicators = None
+        self._patterns = None
 
     @property
     def df(self):
@@ -88,6 +104,22 @@ class GdaxChartData:
             self.get_candles()
         return self._df
 
+    @property
+    def indicators(self):
+        """
+        A streaming IndicatorPipeline seeded from GdaxChartData.df
+        the first time it's accessed after the candles are loaded.
+        Feed it new closed bars with GdaxChartData.indicators.update(bar)
+        to get the latest indicator values without recomputing the frame.
+        :return: stocklook.quant.streaming.IndicatorPipeline
+        """
+        if self._indicators is None:
+            from stocklook.quant.streaming import IndicatorPipeline
+            p = IndicatorPipeline.default(self.product, self.granularity)
+            p.seed(self.df)
+            self._indicators = p
+        return self._indicators
+
     @property
     def avg_range(self):
         rng = self.RANGE
@@ -120,124 +152,75 @@ class GdaxChartData:
         self.get_candles()
 
     def get_candles(self):
-        from stocklook.quant import RSI
-        df = self.gdax.get_candles(self.product,
-                                   self.start,
-                                   self.end,
-                                   self.granularity,
-                                   convert_dates=True,
-                                   to_frame=True)
-        df = StockDataFrame.retype(df)
-        close = df[self.CLOSE]
-        df.loc[:, self.SMA5] = close.rolling(5).mean()
-        df.loc[:, self.SMA8] = close.rolling(8).mean()
-        df.loc[:, self.SMA18] = close.rolling(18).mean()
-        df.loc[:, self.SMA50] = close.rolling(50).mean()
-        df.loc[:, self.SMA100] = close.rolling(100).mean()
-        df.loc[:, self.SMA200] = close.rolling(200).mean()
-        df.loc[:, self.RANGE] = df.high - df.low
-        df.loc[:, self.RSI] = RSI(close, 14)
-        df.loc[:, self.PRICE_CHANGE] = close - close.shift(-1)
-        self._df = df
-
-        ar = self.avg_range
-        av = self.avg_vol
-        v = velocity
-
-        df.loc[:, self.VELOCITY] = df.apply(lambda row: v(row[self.RANGE],
-                                                          ar,
-                                                          row[self.VOLUME],
-                                                          av),
-                                            axis=1)
-
-        for c in df.columns:
-            if not c.startswith('sma'):
-                continue
-            label = c + '_diff'
-            df.loc[:, label] = close - df[c]
+        """
+        Loads candles into GdaxChartData.df, an IndicatorFrame.
+        Indicator columns (sma5, rsi, velocity, macdh, atr, sma50_diff, ...)
+        are computed the first time they're accessed and are recomputed
+        whenever the candles are reloaded.
+        """
+        if self.candle_manager is not None:
+            df = self.candle_manager.get_candles(self.product,
+                                                 self.granularity,
+                                                 start=self.start,
+                                                 end=self.end)
+        else:
+            df = self.gdax.get_candles(self.product,
+                                       self.start,
+                                       self.end,
+                                       self.granularity,
+                                       convert_dates=True,
+                                       to_frame=True)
+        self._df = IndicatorFrame(df)
+        self._indicators = None
+        return self._df
 
-        df['macd']
-        df['macds']
-        df['macdh']
-        df['rsi_6']
-        df['rsi_12']
-        df['tr']
-        df['atr']
+    @property
+    def patterns(self):
+        """
+        A PatternScanner over GdaxChartData.df, rebuilt when the candles are reloaded.
+        :return: stocklook.patterns.PatternScanner
+        """
+        df = self.df
+        if self._patterns is None or self._patterns.df is not df:
+            self._patterns = PatternScanner(df)
+        return self._patterns
 
-        return df
+    def _get_scanner(self, df=None):
+        if df is None:
+            return self.patterns
+        return PatternScanner(df)
 
     def get_inside_bars(self, df=None):
-        data = []
-        if df is None:
-            df = self.df
-
-        for idx, rec in df.iterrows():
-            o, h, l, c, t = rec['open'], rec['high'], rec['low'], rec['close'], rec['time']
-            if not data:
-                data.append([o, h, l, c, t])
-            else:
-                _, last_h, last_l, _, _ = data[-1]
-                if h <= last_h and l >= last_l:
-                    # current bar is inside the last bar
-                    data.append([o, h, l, c, t])
-                else:
-                    break
-
-        if len(data) > 1:
-            return InsideBars(data)
+        """
+        Returns the InsideBars run beginning at the first row of :param df or None.
+        """
+        return self._get_scanner(df).at(INSIDE_BARS, 0)
 
     def get_last_inside_bars(self, df=None):
-        inside_bars = None
-        if df is None:
-            df = self.df
-        for i in range(df.index.size):
-            inside_bars = self.get_inside_bars(df[i:])
-            if inside_bars is not None:
-                break
-        return inside_bars
+        """
+        Returns the first InsideBars run found in :param df (the most recent for
+        Gdax candles) or None.
+        """
+        return self._get_scanner(df).first(INSIDE_BARS)
+
+    def get_all_inside_bars(self, df=None):
+        return self._get_scanner(df).scan(INSIDE_BARS)
 
     def get_higher_highs(self, df=None):
-        data = list()
-        if df is None:
-            df = self.df
-        for idx, rec in df.iterrows():
-            o, h, l, c, t = rec['open'], rec['high'], rec['low'], rec['close'], rec['time']
-            if not data:
-                data.append([o, h, l, c, t])
-            else:
-                _, last_h, last_l, _, _ = data[-1]
-                if h > last_h and l > last_l:
-                    data.append([o, h, l, c, t])
-                else:
-                    break
-        if len(data) > 1:
-            return HigherHighs(data=data)
+        return self._get_scanner(df).at(HIGHER_HIGHS, 0)
 
     def get_last_higher_highs(self, df=None):
-        highs = None
-        if df is None:
-            df = self.df
+        return self._get_scanner(df).first(HIGHER_HIGHS)
 
-        for i in range(df.index.size):
-            highs = self.get_higher_highs(df[i:])
-            if highs is not None:
-                break
-        return highs
+    def get_all_higher_highs(self, df=None):
+        return self._get_scanner(df).scan(HIGHER_HIGHS)
 
     def get_lower_lows(self, df=None):
-        data = list()
-        if df is None:
-            df = self.df
-        for idx, rec in df.iterrows():
-            o, h, l, c, t = rec['open'], rec['high'], rec['low'], rec['close'], rec['time']
-            if not data:
-                data.append([o, h, l, c, t])
-            else:
-                _, last_h, last_l, _, _ = data[-1]
-                if h < last_h and l < last_l:
-                    data.append([o, h, l, c, t])
-                else:
-                    break
-        if len(data) > 1:
-            return HigherHighs(data=data)
+        return self._get_scanner(df).at(LOWER_LOWS, 0)
+
+    def get_last_lower_lows(self, df=None):
+        return self._get_scanner(df).first(LOWER_LOWS)
+
+    def get_all_lower_lows(self, df=None):
+        return self._get_scanner(df).scan(LOWER_LOWS)
 
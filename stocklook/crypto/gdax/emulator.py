@@ -0,0 +1,728 @@
+"""
+MIT License
+
+Copyright (c) 2017 Zeke Barge
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+A local stand-in for the GDAX REST API and websocket feed
+for load and integration tests of the whole stack.
+
+    emulator = GdaxEmulator(rate=2000)   # synthetic order flow, 2000 msgs/s
+    emulator.start()
+    gdax = Gdax(key, secret, passphrase)
+    emulator.configure(gdax)             # Gdax.set_base_url(emulator.url, emulator.ws_url)
+    feed = GdaxBookFeed('BTC-USD', gdax=gdax)
+    feed.start()
+    ...
+    emulator.close()
+
+A capture recorded with GdaxBookFeed(log_to=...) replays with
+GdaxEmulator(*load_feed_log(path), rate=None, speed=10) (10x its recorded pace).
+
+The market is the replayed (or generated) full channel. Orders posted
+to the emulator are matched by a stocklook.crypto.gdax.simulation.SimulatedOrderGateway:
+they fill against the book and trades of the market, and their messages go out
+on the user channel only, like the simulation. REST serves the endpoints Gdax
+uses: products, book, ticker, trades, candles, stats, orders, fills and accounts.
+The websocket serves the full, matches, ticker, heartbeat and user channels.
+Authentication is accepted but not checked.
+"""
+import re
+import json
+import base64
+import socket
+import struct
+import hashlib
+import logging as lg
+import numpy as np
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Queue, Empty, Full
+from threading import Thread, Event, Lock, RLock
+from time import time, monotonic, strftime, gmtime
+from urllib.parse import urlparse, parse_qs
+from stocklook.utils.clock import SystemClock
+from stocklook.crypto.gdax.api import GdaxAPIError
+from stocklook.crypto.gdax.feeds.bar_feed import match_time_to_utc
+from stocklook.crypto.gdax.feeds.user_feed import GdaxOrderEventBus
+from stocklook.crypto.gdax.simulation import (SimulatedOrderGateway, GdaxReplayBookFeed,
+                                              get_message_time)
+
+logger = lg.getLogger(__name__)
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+OP_TEXT, OP_CLOSE, OP_PING, OP_PONG = 0x1, 0x8, 0x9, 0xA
+CHANNELS = ('full', 'matches', 'ticker', 'heartbeat', 'user')
+
+
+def to_iso(t):
+    """ UTC seconds to a message time like "2017-09-02T17:05:49.250000Z". """
+    return strftime('%Y-%m-%dT%H:%M:%S', gmtime(t)) + '.{:06d}Z'.format(int(t % 1 * 1e6))
+
+
+def to_wire(data):
+    """ Formats numbers the way the API does (as strings). """
+    return {k: (str(v) if isinstance(v, float) else v) for k, v in data.items()}
+
+
+def generate_order_flow(product_id='BTC-USD', mid=100.0, seed=None, levels=40,
+                        sequence=1000, start=None, interval=0.5):
+    """
+    Generates a random full channel: a level 3 book and an endless
+    stream of consistent open/match/done messages around :param mid.
+
+    :param product_id: (str, default 'BTC-USD')
+    :param mid: (float, default 100.0) The starting mid price.
+    :param seed: (int, default None)
+    :param levels: (int, default 40) Orders on each side of the starting book.
+    :param sequence: (int, default 1000) The book's sequence.
+    :param start: (float, default None) The first message's UTC time. None is now.
+    :param interval: (float, default 0.5) Seconds between message times.
+    :return: (snapshot, generator)
+    """
+    rng = np.random.RandomState(seed)
+    book = {'buy': dict(), 'sell': dict()}   # id: [price, size]
+    ids = iter(range(10 ** 12))
+    for i in range(levels):
+        size = 25.0 if i % 7 == 3 else 1.0 + i % 3
+        book['buy']['b{}'.format(next(ids))] = [round(mid - 0.05 - i * 0.05, 2), size]
+        book['sell']['a{}'.format(next(ids))] = [round(mid + 0.05 + i * 0.05, 2), size]
+    snapshot = dict(sequence=sequence,
+                    bids=[[p, s, k] for k, (p, s) in book['buy'].items()],
+                    asks=[[p, s, k] for k, (p, s) in book['sell'].items()])
+    if start is None:
+        start = time()
+
+    def best(side):
+        orders = book[side]
+        if side == 'buy':
+            return max(orders.items(), key=lambda kv: (kv[1][0], -int(kv[0][1:])))
+        return min(orders.items(), key=lambda kv: (kv[1][0], int(kv[0][1:])))
+
+    def messages():
+        seq = sequence
+        trade_id = 0
+        i = 0
+        while True:
+            seq += 1
+            t = to_iso(start + i * interval)
+            i += 1
+            r = rng.rand()
+            side = 'buy' if rng.rand() < 0.5 else 'sell'
+            if r < 0.45 or len(book[side]) < 5:
+                oid = '{}{}'.format('b' if side == 'buy' else 'a', next(ids))
+                bid, ask = best('buy')[1][0], best('sell')[1][0]
+                if side == 'buy':
+                    price = min(round(bid - 0.05 * rng.randint(-1, 6), 2), round(ask - 0.01, 2))
+                else:
+                    price = max(round(ask + 0.05 * rng.randint(-1, 6), 2), round(bid + 0.01, 2))
+                size = float(rng.randint(1, 4))
+                book[side][oid] = [price, size]
+                yield dict(type='open', sequence=seq, time=t, product_id=product_id,
+                           order_id=oid, side=side, price=str(price), remaining_size=str(size))
+            elif r < 0.8:
+                oid, (price, size) = best(side)
+                fill = min(size, float(rng.randint(1, 3)))
+                trade_id += 1
+                yield dict(type='match', sequence=seq, time=t, product_id=product_id,
+                           trade_id=trade_id, maker_order_id=oid,
+                           taker_order_id='t{}'.format(next(ids)),
+                           side=side, price=str(price), size=str(fill))
+                if fill >= size:
+                    del book[side][oid]
+                    seq += 1
+                    yield dict(type='done', sequence=seq, time=t, product_id=product_id,
+                               order_id=oid, side=side, price=str(price),
+                               remaining_size='0', reason='filled')
+                else:
+                    book[side][oid][1] = size - fill
+            else:
+                oid = rng.choice(sorted(book[side]))
+                price, size = book[side].pop(oid)
+                yield dict(type='done', sequence=seq, time=t, product_id=product_id,
+                           order_id=oid, side=side, price=str(price),
+                           remaining_size=str(size), reason='canceled')
+
+    return snapshot, messages()
+
+
+def encode_frame(payload, opcode=OP_TEXT):
+    """ Returns an unmasked (server to client) websocket frame. """
+    if isinstance(payload, str):
+        payload = payload.encode('utf8')
+    header = bytearray([0x80 | opcode])
+    n = len(payload)
+    if n < 126:
+        header.append(n)
+    elif n < 65536:
+        header.append(126)
+        header += struct.pack('>H', n)
+    else:
+        header.append(127)
+        header += struct.pack('>Q', n)
+    return bytes(header) + payload
+
+
+def read_frame(rfile):
+    """
+    Reads a (masked, client to server) websocket frame.
+    :return: (opcode, bytes) or (None, None) when the connection closed.
+    """
+    head = rfile.read(2)
+    if len(head) < 2:
+        return None, None
+    opcode = head[0] & 0x0F
+    n = head[1] & 0x7F
+    if n == 126:
+        n = struct.unpack('>H', rfile.read(2))[0]
+    elif n == 127:
+        n = struct.unpack('>Q', rfile.read(8))[0]
+    mask = rfile.read(4) if head[1] & 0x80 else None
+    data = rfile.read(n)
+    if mask:
+        data = bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+    return opcode, data
+
+
+class _Subscriber:
+    """ A websocket connection and the channels it subscribed to. """
+    def __init__(self, connection, wfile, max_queue):
+        self.connection = connection
+        self.wfile = wfile
+        self.queue = Queue(maxsize=max_queue)
+        self.channels = dict()  # name: set(product ids)
+        self.closed = False
+        self.dropped = 0
+        self._lock = Lock()
+
+    def subscribe(self, message):
+        products = message.get('product_ids', list())
+        channels = message.get('channels', None) or ['full']
+        for c in channels:
+            if hasattr(c, 'get'):
+                name, ids = c['name'], c.get('product_ids', products)
+            else:
+                name, ids = c, products
+            self.channels.setdefault(name, set()).update(ids)
+        return dict(type='subscriptions',
+                    channels=[dict(name=k, product_ids=sorted(v))
+                              for k, v in self.channels.items()])
+
+    def wants(self, channel, product_id):
+        return product_id in self.channels.get(channel, ())
+
+    def put(self, payload):
+        try:
+            self.queue.put_nowait(payload)
+        except Full:
+            self.dropped += 1
+
+    def send(self, payload, opcode=OP_TEXT):
+        with self._lock:
+            self.wfile.write(encode_frame(payload, opcode))
+
+    def close(self):
+        self.closed = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class GdaxEmulatorHandler(BaseHTTPRequestHandler):
+    """ Serves GdaxEmulator REST requests and websocket connections. """
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def emulator(self):
+        return self.server.emulator
+
+    def log_message(self, fmt, *args):
+        logger.debug("{} {}".format(self.address_string(), fmt % args))
+
+    def do_GET(self):
+        if self.headers.get('Upgrade', '').lower() == 'websocket':
+            return self.serve_websocket()
+        self._dispatch('get')
+
+    def do_POST(self):
+        self._dispatch('post')
+
+    def do_DELETE(self):
+        self._dispatch('delete')
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length', 0) or 0)
+        body = self.rfile.read(length) if length else b''
+        try:
+            if body:
+                body = json.loads(body.decode('utf8'))
+                if isinstance(body, str):
+                    # Gdax.post(json=json.dumps(...))
+                    body = json.loads(body)
+            parts = [p for p in url.path.split('/') if p]
+            status, data = self.emulator.handle_request(method, parts, params, body)
+        except GdaxAPIError as e:
+            code = re.search(r'<(\d+)>', str(e))
+            status, data = int(code.group(1)) if code else 400, dict(message=str(e))
+        except Exception as e:
+            logger.exception("Emulator error on {} {}".format(method, self.path))
+            status, data = 500, dict(message=str(e))
+        payload = json.dumps(data).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def serve_websocket(self):
+        key = self.headers.get('Sec-WebSocket-Key', '')
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.send_response(101, 'Switching Protocols')
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+        self.close_connection = True
+
+        emulator = self.emulator
+        sub = _Subscriber(self.connection, self.wfile, emulator.max_queue)
+        reader = Thread(target=self._read_websocket, args=(sub,), daemon=True)
+        reader.start()
+        try:
+            while not sub.closed and emulator.running:
+                try:
+                    payload = sub.queue.get(timeout=0.5)
+                except Empty:
+                    continue
+                sub.send(payload)
+        except OSError:
+            pass
+        finally:
+            emulator.unsubscribe(sub)
+            sub.close()
+
+    def _read_websocket(self, sub):
+        emulator = self.emulator
+        try:
+            while not sub.closed:
+                opcode, data = read_frame(self.rfile)
+                if opcode is None:
+                    break
+                if opcode == OP_TEXT:
+                    message = json.loads(data.decode('utf8'))
+                    if message.get('type') == 'subscribe':
+                        emulator.subscribe(sub, message)
+                elif opcode == OP_PING:
+                    sub.send(data, OP_PONG)
+                elif opcode == OP_CLOSE:
+                    sub.send(data[:2], OP_CLOSE)
+                    break
+        except (OSError, ValueError) as e:
+            logger.debug("Websocket reader stopped: {}".format(e))
+        sub.closed = True
+
+
+class GdaxEmulator:
+    """
+    Serves the GDAX REST API and websocket feed on a local port from
+    replayed or generated market messages (see the module docstring).
+    """
+    # products/<product_id>/<endpoint>: the query parameters used.
+    PRODUCT_ENDPOINTS = dict(book=('level',),
+                             ticker=(),
+                             trades=('limit',),
+                             candles=('start', 'end', 'granularity'),
+                             stats=())
+
+    def __init__(self, messages=None, snapshot=None, product_id='BTC-USD',
+                 host='127.0.0.1', port=0, rate=None, speed=1.0,
+                 balances=None, maker_fee=0.0, taker_fee=0.003,
+                 restamp=True, max_queue=100000, max_trades=100000):
+        """
+        :param messages: (iterable, default None)
+            Full channel messages in sequence order. None generates
+            an endless random flow (see generate_order_flow).
+        :param snapshot: (dict, default None)
+            The level 3 book at the start of :param messages.
+        :param product_id: (str, default 'BTC-USD')
+        :param host: (str, default '127.0.0.1')
+        :param port: (int, default 0) 0 picks a free port.
+        :param rate: (int, float, default None)
+            Messages per second. None paces messages by their recorded
+            times sped up by :param speed (a generated flow's messages are 0.5s apart).
+        :param speed: (float, default 1.0)
+            A multiple of the recorded pace. None replays as fast as possible.
+        :param balances: (dict, default {'USD': 10000, coin: 0})
+        :param maker_fee: (float, default 0.0)
+        :param taker_fee: (float, default 0.003)
+        :param restamp: (bool, default True)
+            Replace message times with the time they're sent.
+        :param max_queue: (int, default 100000)
+            Messages buffered per websocket connection before dropping.
+        :param max_trades: (int, default 100000)
+            Trades remembered for the trades, candles and stats endpoints.
+        """
+        if messages is None:
+            snapshot, messages = generate_order_flow(product_id)
+        self.product_id = product_id
+        self.messages = messages
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.speed = speed
+        self.restamp = restamp
+        self.max_queue = max_queue
+        self.trades = deque(maxlen=max_trades)  # (utc time, price, size, side, trade_id)
+        self.sent = 0
+        self.requests = 0
+        self.running = False
+        self.finished = False
+
+        self.clock = SystemClock()
+        self.gateway = SimulatedOrderGateway(product_id, self.clock, balances=balances,
+                                             maker_fee=maker_fee, taker_fee=taker_fee,
+                                             snapshot=snapshot)
+        self.gateway.user_bus = GdaxOrderEventBus()
+        self.gateway.user_bus.subscribe(None, self._on_user_message)
+        self.book = GdaxReplayBookFeed([], product_id, self.gateway)
+
+        self._lock = RLock()
+        self._stop = Event()
+        self._subscribers = list()
+        self._server = None
+        self._threads = list()
+
+    # ------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------
+
+    @property
+    def url(self):
+        return 'http://{}:{}/'.format(self.host, self.port)
+
+    @property
+    def ws_url(self):
+        return 'ws://{}:{}'.format(self.host, self.port)
+
+    def configure(self, gdax):
+        """ Points a stocklook.crypto.gdax.api.Gdax object at the emulator. """
+        gdax.set_base_url(self.url, self.ws_url)
+        return gdax
+
+    def start(self):
+        """ Starts serving and streaming messages on background threads. """
+        # Load the opening book before the first request can ask for it.
+        with self._lock:
+            self.book.on_message(dict(type='heartbeat', sequence=self._get_snapshot_sequence()))
+        self._server = ThreadingHTTPServer((self.host, self.port), GdaxEmulatorHandler)
+        self._server.daemon_threads = True
+        self._server.emulator = self
+        self.port = self._server.server_address[1]
+        self.running = True
+        self._stop.clear()
+        self._threads = [Thread(target=self._server.serve_forever, daemon=True),
+                         Thread(target=self._pump, daemon=True)]
+        for t in self._threads:
+            t.start()
+        logger.info("GDAX emulator serving {} and {}".format(self.url, self.ws_url))
+
+    def _get_snapshot_sequence(self):
+        snapshot = self.gateway.snapshot
+        if snapshot is None:
+            self.gateway.snapshot = snapshot = dict(sequence=0, bids=[], asks=[])
+        return snapshot['sequence']
+
+    def close(self):
+        self.running = False
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._lock:
+            subs, self._subscribers = self._subscribers, list()
+        for sub in subs:
+            sub.close()
+        for t in self._threads:
+            t.join(2)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # ------------------------------------------------
+    # Websocket
+    # ------------------------------------------------
+
+    def subscribe(self, sub, message):
+        with self._lock:
+            reply = sub.subscribe(message)
+            if sub not in self._subscribers:
+                self._subscribers.append(sub)
+            sub.put(json.dumps(reply))
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    @property
+    def dropped(self):
+        """ Messages dropped for connections that fell behind. """
+        with self._lock:
+            return sum(s.dropped for s in self._subscribers)
+
+    def _broadcast(self, channel, message):
+        product_id = message.get('product_id', self.product_id)
+        payload = None
+        for sub in self._subscribers:
+            if sub.wants(channel, product_id):
+                if payload is None:
+                    payload = json.dumps(message)
+                sub.put(payload)
+
+    def _pump(self):
+        """ Streams :param messages at the configured pace. """
+        start = monotonic()
+        first = None
+        next_heartbeat = start
+        for message in self.messages:
+            if self._stop.is_set():
+                break
+            if self.rate:
+                due = start + self.sent / float(self.rate)
+            elif self.speed:
+                t = get_message_time(message)
+                if first is None:
+                    first = t
+                due = start + (t - first) / self.speed if t is not None else 0
+            else:
+                due = 0
+            wait = due - monotonic()
+            if wait > 0 and self._stop.wait(wait):
+                break
+            self.publish(message)
+            if monotonic() >= next_heartbeat:
+                next_heartbeat += 1
+                self._heartbeat()
+        self.finished = True
+
+    def _heartbeat(self):
+        with self._lock:
+            last = self.trades[-1][4] if self.trades else 0
+            self._broadcast('heartbeat', dict(type='heartbeat', product_id=self.product_id,
+                                              sequence=self.book._sequence,
+                                              last_trade_id=last, time=to_iso(time())))
+
+    def publish(self, message):
+        """
+        Applies a full channel message to the emulated market
+        and sends it to the websocket subscribers.
+        """
+        with self._lock:
+            if self.restamp:
+                message = dict(message, time=to_iso(time()))
+            self.book.on_message(message)
+            self.gateway.on_feed_message(message)
+            self.sent += 1
+            self._broadcast('full', message)
+            if message.get('type') == 'match':
+                self._on_match(message)
+
+    def _on_match(self, message):
+        price, size = float(message['price']), float(message['size'])
+        trade_id = message.get('trade_id', len(self.trades) + 1)
+        self.trades.append((get_message_time(message) or time(), price, size,
+                            message['side'], trade_id))
+        self._broadcast('matches', message)
+        ticker = dict(type='ticker', trade_id=trade_id, sequence=message.get('sequence'),
+                      time=message.get('time'), product_id=self.product_id,
+                      price=message['price'], side=message['side'], last_size=message['size'])
+        bid, ask = self.book.get_top_price('buy'), self.book.get_top_price('sell')
+        ticker.update(best_bid=str(bid) if bid is not None else None,
+                      best_ask=str(ask) if ask is not None else None)
+        self._broadcast('ticker', ticker)
+
+    def _on_user_message(self, message, state):
+        message = dict(message)
+        if isinstance(message.get('time'), float):
+            message['time'] = to_iso(message['time'])
+        self._broadcast('user', to_wire(message))
+
+    # ------------------------------------------------
+    # REST
+    # ------------------------------------------------
+
+    def handle_request(self, method, parts, params, body):
+        """
+        Serves a REST request.
+        :param method: (str) 'get', 'post' or 'delete'
+        :param parts: (list) The url path split by '/', e.g. ['products', 'BTC-USD', 'book']
+        :param params: (dict) The query string.
+        :param body: (dict) The JSON body.
+        :return: (status code, JSON data)
+        """
+        self.requests += 1
+        not_found = 404, dict(message='NotFound')
+        if not parts:
+            return not_found
+        root, rest = parts[0], parts[1:]
+        with self._lock:
+            if root == 'products':
+                if not rest:
+                    return 200, [self.get_product()]
+                if rest[0] != self.product_id:
+                    return not_found
+                if len(rest) == 1:
+                    return 200, self.get_product()
+                args = self.PRODUCT_ENDPOINTS.get(rest[1], None)
+                if method != 'get' or args is None:
+                    return not_found
+                func = getattr(self, 'get_{}'.format(rest[1]))
+                return 200, func(**{k: v for k, v in params.items() if k in args})
+            if root == 'orders':
+                return self._orders(method, rest, params, body)
+            if root == 'fills':
+                fills = self.gateway.get_fills(order_id=params.get('order_id'),
+                                               product_id=params.get('product_id'))
+                return 200, [self._wire_fill(f) for f in fills]
+            if root == 'accounts':
+                accounts = [self._wire_account(c) for c in self.gateway.balances]
+                if not rest:
+                    return 200, accounts
+                for a in accounts:
+                    if a['id'] == rest[0]:
+                        return 200, a
+                return not_found
+            if root == 'time':
+                t = time()
+                return 200, dict(iso=to_iso(t), epoch=t)
+        return not_found
+
+    def _orders(self, method, rest, params, body):
+        gateway = self.gateway
+        if method == 'post':
+            return 200, self._wire_order(gateway.post_order(body))
+        if method == 'delete':
+            if rest:
+                return 200, gateway.delete('orders/{}'.format(rest[0])).json()
+            return 200, gateway.cancel_all_orders(params.get('product_id'))
+        if rest:
+            return 200, self._wire_order(gateway.get_orders(rest[0]))
+        return 200, [self._wire_order(o) for o in gateway.get_orders()]
+
+    def get_product(self):
+        coin, currency = self.product_id.split('-')
+        return dict(id=self.product_id, base_currency=coin, quote_currency=currency,
+                    base_min_size='0.01', base_max_size='10000', quote_increment='0.01',
+                    display_name='{}/{}'.format(coin, currency), status='online')
+
+    def get_book(self, level='2'):
+        level = int(level)
+        book = self.book.get_current_book()
+        if level == 3:
+            return dict(sequence=book['sequence'],
+                        bids=[[str(p), str(s), i] for p, s, i in book['bids']],
+                        asks=[[str(p), str(s), i] for p, s, i in book['asks']])
+        depth = 1 if level == 1 else 50
+        data = dict(sequence=book['sequence'])
+        for key, side in (('bids', 'buy'), ('asks', 'sell')):
+            levels = list()
+            tree = self.book._bids if side == 'buy' else self.book._asks
+            for price in tree.keys(reverse=(side == 'buy')):
+                if len(levels) >= depth:
+                    break
+                orders = tree[price]
+                levels.append([str(price), str(sum(o['size'] for o in orders)), len(orders)])
+            data[key] = levels
+        return data
+
+    def get_ticker(self):
+        last = self.trades[-1] if self.trades else None
+        bid, ask = self.book.get_top_price('buy'), self.book.get_top_price('sell')
+        return dict(trade_id=last[4] if last else None,
+                    price=str(last[1]) if last else None,
+                    size=str(last[2]) if last else None,
+                    bid=str(bid) if bid is not None else None,
+                    ask=str(ask) if ask is not None else None,
+                    volume=str(self._volume(time() - 86400)),
+                    time=to_iso(last[0] if last else time()))
+
+    def get_trades(self, limit='100'):
+        trades = list(self.trades)[-int(limit):]
+        return [dict(time=to_iso(t), trade_id=i, price=str(p), size=str(s), side=side)
+                for t, p, s, side, i in reversed(trades)]
+
+    def get_candles(self, start=None, end=None, granularity='60'):
+        """ Rows of [time, low, high, open, close, volume], newest first. """
+        granularity = int(granularity)
+        start = match_time_to_utc(start) if start else 0
+        end = match_time_to_utc(end) if end else time()
+        bars = dict()
+        for t, price, size, _, _ in self.trades:
+            if t < start or t > end + granularity:
+                continue
+            bucket = int(t // granularity * granularity)
+            bar = bars.get(bucket)
+            if bar is None:
+                bars[bucket] = [bucket, price, price, price, price, size]
+            else:
+                bar[1] = min(bar[1], price)
+                bar[2] = max(bar[2], price)
+                bar[4] = price
+                bar[5] += size
+        return [bars[b] for b in sorted(bars, reverse=True)]
+
+    def get_stats(self):
+        since = time() - 86400
+        prices = [p for t, p, _, _, _ in self.trades if t >= since]
+        return dict(open=str(prices[0]) if prices else None,
+                    high=str(max(prices)) if prices else None,
+                    low=str(min(prices)) if prices else None,
+                    last=str(prices[-1]) if prices else None,
+                    volume=str(self._volume(since)))
+
+    def _volume(self, since):
+        return sum(s for t, _, s, _, _ in self.trades if t >= since)
+
+    def _wire_order(self, order):
+        order = dict(order)
+        order['created_at'] = to_iso(order['created_at'])
+        return to_wire(order)
+
+    def _wire_fill(self, fill):
+        fill = dict(fill)
+        fill['created_at'] = to_iso(fill['created_at'])
+        return to_wire(fill)
+
+    def _wire_account(self, currency):
+        balance = self.gateway.balances[currency]
+        hold = sum(o['price'] * (o['size'] - o['filled_size']) if currency == self.gateway.currency
+                   else o['size'] - o['filled_size']
+                   for o in self.gateway._open.values()
+                   if (o['side'] == 'buy') == (currency == self.gateway.currency))
+        return to_wire(dict(id=currency, currency=currency, balance=balance,
+                            hold=float(hold), available=balance - hold, profile_id='emulator'))
@@ -3,6 +3,8 @@ from .book_feed import GdaxBookFeed
 from .websocket_client import GdaxWebsocketClient
 from stocklook.utils.timetools import timestamp_to_local
 from .db_loader import GdaxDatabaseLoader
+from .bar_feed import BarAggregator, GdaxBarFeed, GdaxOHLCWriter
+from .user_feed import GdaxOrderEventBus, GdaxUserFeed
 
 
 class GdaxTickerFeed(GdaxDatabaseFeed):
@@ -0,0 +1,382 @@
+"""
+MIT License
+
+Copyright (c) 2017 Zeke Barge
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import logging as lg
+import pandas as pd
+from calendar import timegm
+from datetime import datetime
+from threading import RLock, Thread
+from time import sleep, time
+from stocklook.crypto.gdax.feeds.websocket_client import GdaxWebsocketClient
+
+logger = lg.getLogger(__name__)
+
+
+def match_time_to_utc(iso_time):
+    """
+    Converts a websocket message time like
+    "2017-09-02T17:05:49.250000Z" to UTC seconds (float).
+    """
+    secs = timegm(datetime.strptime(iso_time[:19], '%Y-%m-%dT%H:%M:%S').timetuple())
+    frac = iso_time[19:].rstrip('Z')
+    if frac.startswith('.'):
+        secs += float('0' + frac)
+    return secs
+
+
+class OHLCVBar:
+    """
+    An OHLCV bar being built from trades.
+    Trades may arrive out of order - open/close
+    are the prices of the earliest/latest trades seen.
+    """
+    __slots__ = ['product', 'granularity', 'time', 'open', 'high',
+                 'low', 'close', 'volume', 'trades', 'first_time',
+                 'last_time', 'amended']
+
+    def __init__(self, product, granularity, bucket, price, size, utc_time):
+        self.product = product
+        self.granularity = granularity
+        self.time = bucket
+        self.open = self.high = self.low = self.close = price
+        self.volume = size
+        self.trades = 1
+        self.first_time = self.last_time = utc_time
+        self.amended = 0
+
+    @property
+    def end(self):
+        return self.time + self.granularity
+
+    def add(self, price, size, utc_time):
+        if price > self.high:
+            self.high = price
+        if price < self.low:
+            self.low = price
+        if utc_time < self.first_time:
+            self.first_time = utc_time
+            self.open = price
+        if utc_time >= self.last_time:
+            self.last_time = utc_time
+            self.close = price
+        self.volume += size
+        self.trades += 1
+
+    def to_dict(self):
+        return dict(product=self.product,
+                    granularity=self.granularity,
+                    time=self.time,
+                    low=self.low,
+                    high=self.high,
+                    open=self.open,
+                    close=self.close,
+                    volume=self.volume,
+                    trades=self.trades,
+                    amended=self.amended)
+
+    def __repr__(self):
+        return "OHLCVBar(product='{}', granularity={}, time={}, open={}, " \
+               "high={}, low={}, close={}, volume={})".format(
+                self.product, self.granularity, self.time, self.open,
+                self.high, self.low, self.close, self.volume)
+
+
+class BarAggregator:
+    """
+    Builds OHLCV bars for any number of products and
+    granularities from individual trades (websocket matches).
+
+    Bars are aligned to the UTC epoch like Gdax candles and
+    handed to callbacks as dictionaries with the keys
+    product, granularity, time (UTC int, bucket start),
+    low, high, open, close, volume, trades and amended.
+
+    Callbacks
+    ------------------
+    on_bar: A bar closed - a trade arrived in a later bucket
+            or BarAggregator.flush() passed the end of the bar.
+    on_amend: A late trade changed a closed bar. The bar is
+            passed again with its amended count incremented.
+    on_final: A closed bar can no longer be amended
+            (allowed_lateness has passed). Persist bars here.
+
+    Late trades
+    ------------------
+    A trade for a bucket older than the open bar amends the last closed
+    bar if it arrives within allowed_lateness seconds of that bar's end.
+    Anything older is dropped and counted in BarAggregator.late_trades.
+    """
+    def __init__(self, granularities=(60*5,), allowed_lateness=5,
+                 on_bar=None, on_amend=None, on_final=None):
+        """
+        :param granularities: (list, default (300,))
+            Bar sizes in seconds.
+
+        :param allowed_lateness: (int, default 5)
+            Seconds after a bar's end that trades
+            belonging to it are still applied.
+
+        :param on_bar: (callable, list, default None)
+        :param on_amend: (callable, list, default None)
+        :param on_final: (callable, list, default None)
+            callback(bar_dict)
+        """
+        if hasattr(granularities, 'real'):
+            granularities = [granularities]
+        self.granularities = sorted(set(int(g) for g in granularities))
+        self.allowed_lateness = allowed_lateness
+        self.late_trades = 0
+        self._bars = dict()    # (product, granularity): open OHLCVBar
+        self._closed = dict()  # (product, granularity): last closed OHLCVBar (amendable)
+        self._last_time = dict()  # product: latest trade time
+        self._callbacks = dict(on_bar=list(), on_amend=list(), on_final=list())
+        self._lock = RLock()
+        for key, funcs in (('on_bar', on_bar),
+                           ('on_amend', on_amend),
+                           ('on_final', on_final)):
+            if funcs is None:
+                continue
+            if callable(funcs):
+                funcs = [funcs]
+            for f in funcs:
+                self.add_callback(key, f)
+
+    def add_callback(self, event, func):
+        """
+        :param event: (str) 'on_bar', 'on_amend' or 'on_final'
+        :param func: (callable) func(bar_dict)
+        """
+        try:
+            self._callbacks[event].append(func)
+        except KeyError:
+            raise KeyError("Unknown event '{}', expected one "
+                           "of {}".format(event, list(self._callbacks)))
+
+    def _emit(self, event, bar):
+        d = bar.to_dict()
+        for func in self._callbacks[event]:
+            try:
+                func(d)
+            except Exception as e:
+                logger.error("BarAggregator {} callback {} "
+                             "failed: {}".format(event, func, e))
+
+    def _close(self, key, bar):
+        prev = self._closed.pop(key, None)
+        if prev is not None:
+            self._emit('on_final', prev)
+        self._emit('on_bar', bar)
+        if self.allowed_lateness > 0:
+            self._closed[key] = bar
+        else:
+            self._emit('on_final', bar)
+
+    def _expire(self, key, now):
+        bar = self._closed.get(key, None)
+        if bar is not None and now > bar.end + self.allowed_lateness:
+            del self._closed[key]
+            self._emit('on_final', bar)
+
+    def add_trade(self, product, price, size, utc_time):
+        """
+        Applies one trade to every granularity.
+
+        :param product: (str) 'BTC-USD', etc.
+        :param price: (float)
+        :param size: (float)
+        :param utc_time: (int, float) UTC seconds.
+        """
+        with self._lock:
+            last = self._last_time.get(product, utc_time)
+            if utc_time > last:
+                last = utc_time
+            self._last_time[product] = last
+
+            for g in self.granularities:
+                key = (product, g)
+                bucket = int(utc_time // g) * g
+                self._expire(key, last)
+                bar = self._bars.get(key, None)
+
+                if bar is not None and bucket == bar.time:
+                    bar.add(price, size, utc_time)
+                    continue
+
+                closed = self._closed.get(key, None)
+                if (bar is not None and bucket < bar.time) \
+                        or (closed is not None and bucket <= closed.time):
+                    # Late trade
+                    if closed is not None and bucket == closed.time \
+                            and last <= closed.end + self.allowed_lateness:
+                        closed.add(price, size, utc_time)
+                        closed.amended += 1
+                        self._emit('on_amend', closed)
+                    else:
+                        self.late_trades += 1
+                        logger.debug("{} {}: dropped late trade at {} "
+                                     "(bucket {})".format(product, g, utc_time, bucket))
+                    continue
+
+                if bar is not None:
+                    self._close(key, bar)
+                self._bars[key] = OHLCVBar(product, g, bucket, price, size, utc_time)
+
+    def add_match(self, msg):
+        """
+        Applies a websocket 'match' (or 'last_match') message.
+        """
+        self.add_trade(msg['product_id'],
+                       float(msg['price']),
+                       float(msg['size']),
+                       match_time_to_utc(msg['time']))
+
+    def flush(self, now=None):
+        """
+        Closes open bars that ended before :param now
+        and finalizes closed bars past allowed_lateness.
+        Call periodically so bars close during quiet markets.
+
+        :param now: (int, float, default time.time())
+        """
+        if now is None:
+            now = time()
+        with self._lock:
+            for key, bar in list(self._bars.items()):
+                if now >= bar.end:
+                    del self._bars[key]
+                    self._close(key, bar)
+            for key in list(self._closed.keys()):
+                self._expire(key, now)
+
+    def get_open_bar(self, product, granularity):
+        """
+        Returns the bar currently being built as a dictionary or None.
+        """
+        with self._lock:
+            bar = self._bars.get((product, granularity), None)
+            return None if bar is None else bar.to_dict()
+
+
+class GdaxOHLCWriter:
+    """
+    BarAggregator.on_final callback writing finalized
+    bars to the GdaxOHLC5 table through GdaxOHLCViewer.load_df.
+    Bars of other granularities are ignored.
+    """
+    def __init__(self, db=None, viewer_cls=None):
+        """
+        :param db: (stocklook.crypto.gdax.db.GdaxDatabase, default None)
+        :param viewer_cls: (class, default stocklook.crypto.gdax.db.GdaxOHLCViewer)
+        """
+        if viewer_cls is None:
+            from stocklook.crypto.gdax.db import GdaxOHLCViewer
+            viewer_cls = GdaxOHLCViewer
+        self.db = db
+        self.viewer_cls = viewer_cls
+        self.granularity = viewer_cls.GRANULARITY
+        self._viewers = dict()
+
+    def get_viewer(self, product):
+        try:
+            return self._viewers[product]
+        except KeyError:
+            if self.db is None:
+                from stocklook.crypto.gdax.db import GdaxDatabase
+                self.db = GdaxDatabase()
+            v = self.viewer_cls(pair=product, db=self.db)
+            self._viewers[product] = v
+            return v
+
+    def __call__(self, bar):
+        if bar['granularity'] != self.granularity:
+            return
+        df = pd.DataFrame([bar], columns=['open', 'high', 'low',
+                                          'close', 'volume', 'time'])
+        self.get_viewer(bar['product']).load_df(df, thread=False,
+                                                raise_on_error=False)
+
+
+class GdaxBarFeed(GdaxWebsocketClient):
+    """
+    Subscribes to the matches channel for a list of products
+    and builds OHLCV bars from the trades as they happen.
+
+    Example:
+        feed = GdaxBarFeed(products=['BTC-USD', 'ETH-USD'],
+                           granularities=[60, 60*5],
+                           write_ohlc=True)
+        feed.aggregator.add_callback('on_bar', print)
+        feed.start()
+    """
+    def __init__(self, products=None, granularities=(60*5,), allowed_lateness=5,
+                 aggregator=None, write_ohlc=False, db=None,
+                 flush_interval=1, **kwargs):
+        """
+        :param products: (list) 'BTC-USD', 'ETH-USD', etc.
+
+        :param granularities: (list, default (300,))
+            Ignored when :param aggregator is given.
+
+        :param allowed_lateness: (int, default 5)
+            Ignored when :param aggregator is given.
+
+        :param aggregator: (BarAggregator, default None)
+
+        :param write_ohlc: (bool, default False)
+            True writes finalized 5 minute bars to the GdaxOHLC5 table.
+
+        :param db: (stocklook.crypto.gdax.db.GdaxDatabase, default None)
+            The database written to when :param write_ohlc is True.
+
+        :param flush_interval: (int, default 1)
+            Seconds between checks for bars that ended without a new trade.
+        """
+        kwargs['channels'] = kwargs.get('channels', None) or [self.MATCHES]
+        GdaxWebsocketClient.__init__(self, products=products, **kwargs)
+        if aggregator is None:
+            aggregator = BarAggregator(granularities,
+                                       allowed_lateness=allowed_lateness)
+        self.aggregator = aggregator
+        self.flush_interval = flush_interval
+        self.writer = None
+        self._flush_thread = None
+        if write_ohlc:
+            self.writer = GdaxOHLCWriter(db=db)
+            self.aggregator.add_callback('on_final', self.writer)
+
+    def on_open(self):
+        self._flush_thread = Thread(target=self._flush_loop, daemon=True)
+        self._flush_thread.start()
+
+    def _flush_loop(self):
+        while not self.stop:
+            sleep(self.flush_interval)
+            self.aggregator.flush()
+
+    def on_message(self, msg):
+        if msg.get('type', None) not in ('match', 'last_match'):
+            return
+        try:
+            self.aggregator.add_match(msg)
+        except (KeyError, ValueError) as e:
+            logger.error("GdaxBarFeed: bad match message {}: {}".format(msg, e))
@@ -28,7 +28,8 @@ SOFTWARE.
 """
 import pickle
 from bintrees import RBTree
-from stocklook.crypto.gdax.feeds.websocket_client import GdaxWebsocketClient
+from stocklook.crypto.gdax.feeds.websocket_client import GdaxWebsocketClient, WS_URL
+from stocklook.crypto.gdax.feeds.wall_index import GdaxWallIndex
 
 
 class BookSnapshot:
@@ -82,6 +83,9 @@ class BookSnapshot:
             walls = walls[0] + walls[1]
 
         wall_sort = sorted(walls, key=lambda x: x[1], reverse=True)[measure_size:]
+        if not wall_sort:
+            # No walls near the spread - fall back to the minimum.
+            return min_size
         return sum([w[1] for w in wall_sort]) / len(wall_sort)
 
     def calculate_bid_depth(self, to_price):
@@ -138,13 +142,35 @@ class BookSnapshot:
 
 
 class GdaxBookFeed(GdaxWebsocketClient):
-    def __init__(self, product_id='LTC-USD', log_to=None, gdax=None, auth=True):
+    """
+    Maintains a level 3 order book from the full channel.
+
+    Listeners added with GdaxBookFeed.add_listener(func) are called
+    func(event, message) from the websocket thread when:
+        - EVENT_TOP: the best bid or ask price changed.
+        - EVENT_MATCH: a trade happened (message is the match).
 
+    Price levels holding walls are indexed as the book
+    changes in GdaxBookFeed.walls (a GdaxWallIndex).
+    """
+    EVENT_TOP = 'top'
+    EVENT_MATCH = 'match'
+
+    def __init__(self, product_id='LTC-USD', log_to=None, gdax=None, auth=True, walls=None):
+        """
+        :param product_id: (str, default 'LTC-USD')
+        :param log_to: (file, default None) Messages are pickled to this file.
+        :param gdax: (stocklook.crypto.gdax.api.Gdax, default None)
+        :param auth: (bool, default True)
+        :param walls: (stocklook.crypto.gdax.feeds.wall_index.GdaxWallIndex, default None)
+            None creates a default GdaxWallIndex.
+        """
         if gdax is None:
             from stocklook.crypto.gdax.api import Gdax
             gdax = Gdax()
 
-        super(GdaxBookFeed, self).__init__(products=product_id,
+        super(GdaxBookFeed, self).__init__(url=getattr(gdax, 'ws_url', WS_URL),
+                                           products=product_id,
                                            auth=auth,
                                            api_key=gdax.api_key,
                                            api_secret=gdax.api_secret,
@@ -159,7 +185,10 @@ class GdaxBookFeed(GdaxWebsocketClient):
         self._current_ticker = None
         self._key_errs = 0
         self._errs = 0
+        self._listeners = list()
+        self._top = (None, None)
         self.message_count = 0
+        self.walls = GdaxWallIndex() if walls is None else walls
 
     @property
     def product_id(self):
@@ -189,6 +218,7 @@ class GdaxBookFeed(GdaxWebsocketClient):
         if self._sequence == -1:
             self._asks = RBTree()
             self._bids = RBTree()
+            self.walls.clear()
             res = self._client.get_book(self.product_id, level=3)
             for bid in res['bids']:
                 self.add({
@@ -230,6 +260,15 @@ class GdaxBookFeed(GdaxWebsocketClient):
 
         self._sequence = sequence
 
+        if self._listeners:
+            if msg_type == 'match':
+                self.publish(self.EVENT_MATCH, message)
+            top = (self._bids.max_key() if self._bids else None,
+                   self._asks.min_key() if self._asks else None)
+            if top != self._top:
+                self._top = top
+                self.publish(self.EVENT_TOP, message)
+
         # bid = self.get_bid()
         # bids = self.get_bids(bid)
         # bid_depth = sum([b['size'] for b in bids])
@@ -238,6 +277,19 @@ class GdaxBookFeed(GdaxWebsocketClient):
         # ask_depth = sum([a['size'] for a in asks])
         # print('bid: %f @ %f - ask: %f @ %f' % (bid_depth, bid, ask_depth, ask))
 
+    def add_listener(self, func):
+        """
+        Registers func(event, message) to be called on book events.
+        """
+        self._listeners.append(func)
+
+    def remove_listener(self, func):
+        self._listeners.remove(func)
+
+    def publish(self, event, message):
+        for func in self._listeners:
+            func(event, message)
+
     def on_error(self, e):
         self._sequence = -1
         self._errs += 1
@@ -391,9 +443,11 @@ class GdaxBookFeed(GdaxWebsocketClient):
 
     def remove_asks(self, price):
         self._asks.remove(price)
+        self.walls.update('sell', price, 0)
 
     def set_asks(self, price, asks):
         self._asks.insert(price, asks)
+        self.walls.update('sell', price, sum(o['size'] for o in asks))
 
     def get_bid(self):
         return self._bids.max_key()
@@ -403,9 +457,38 @@ class GdaxBookFeed(GdaxWebsocketClient):
 
     def remove_bids(self, price):
         self._bids.remove(price)
+        self.walls.update('buy', price, 0)
 
     def set_bids(self, price, bids):
         self._bids.insert(price, bids)
+        self.walls.update('buy', price, sum(o['size'] for o in bids))
+
+    def get_top_price(self, side):
+        """ Returns the best bid (buy) or ask (sell) price or None. """
+        tree = self._bids if side == 'buy' else self._asks
+        if not tree:
+            return None
+        return tree.max_key() if side == 'buy' else tree.min_key()
+
+    def get_nearest_wall(self, side, size=None, skip_top=False):
+        """
+        Returns the (price, size) bid (buy) or ask (sell) wall
+        nearest the spread or None. See GdaxWallIndex.get_nearest.
+        """
+        return self.walls.get_nearest(side, self.get_top_price(side),
+                                      size=size, skip_top=skip_top)
+
+    def get_top_walls(self, side, n=None, size=None):
+        """
+        Returns the n largest (price, size) walls on a side.
+        See GdaxWallIndex.get_top.
+        """
+        return self.walls.get_top(side, self.get_top_price(side), n=n, size=size)
+
+    def get_wall_size(self, n=None):
+        """ See GdaxWallIndex.get_wall_size. """
+        return self.walls.get_wall_size(self.get_top_price('buy'),
+                                        self.get_top_price('sell'), n=n)
 
 
 if __name__ == '__main__':
@@ -24,7 +24,7 @@ SOFTWARE.
 from time import sleep
 from stocklook.utils.timetools import now_minus
 from stocklook.crypto.gdax.feeds.db_loader import GdaxDatabaseLoader
-from stocklook.crypto.gdax.feeds.websocket_client import GdaxWebsocketClient
+from stocklook.crypto.gdax.feeds.websocket_client import GdaxWebsocketClient, WS_URL
 from stocklook.crypto.gdax.tables import GDAX_FEED_CLASS_MAP
 from queue import Queue
 
@@ -117,13 +117,18 @@ class GdaxDatabaseFeed(GdaxWebsocketClient):
                 key = gdax.api_key
                 secret = gdax.api_secret
                 phrase = gdax.api_passphrase
-                auth = False # figure out why auth is broke
+                auth = True
             except Exception as e:
                 print("Ignored error configuring "
                       "default Gdax object. "
                       "Using public API.\n{}".format(e))
                 key, secret, phrase = None, None, None
                 auth = False
+        else:
+            key = gdax.api_key
+            secret = gdax.api_secret
+            phrase = gdax.api_passphrase
+            auth = True
 
         super(GdaxDatabaseFeed, self).__init__(products=products,
                                                api_key=key,
@@ -134,7 +139,7 @@ class GdaxDatabaseFeed(GdaxWebsocketClient):
         self.session = None
         self.db = gdax_db
         self.gdax = gdax
-        self.url = "wss://ws-feed.gdax.com/"
+        self.url = getattr(gdax, 'ws_url', WS_URL)
 
         self.queues = dict()
         self._loaders = dict()
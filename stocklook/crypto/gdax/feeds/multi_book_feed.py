@@ -0,0 +1,130 @@
+"""
+MIT License
+
+Copyright (c) 2017 Zeke Barge
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import pickle
+import logging as lg
+from collections import OrderedDict
+from threading import Lock
+from stocklook.crypto.gdax.feeds.websocket_client import GdaxWebsocketClient, WS_URL
+from stocklook.crypto.gdax.feeds.book_feed import GdaxBookFeed
+
+logger = lg.getLogger(__name__)
+
+
+class GdaxProductBook(GdaxBookFeed):
+    """
+    One product's level 3 book inside a GdaxMultiBookFeed.
+    It works like a GdaxBookFeed (listeners, walls, snapshots)
+    but receives its messages from the shared socket.
+    """
+    def __init__(self, parent, product_id, gdax, walls=None):
+        super(GdaxProductBook, self).__init__(product_id=product_id,
+                                              gdax=gdax,
+                                              auth=parent.auth,
+                                              walls=walls)
+        self.parent = parent
+
+    def start(self):
+        """ Starts the shared socket if it isn't running. """
+        self.parent.start()
+
+    def close(self):
+        """
+        The shared socket keeps running for the other products; the
+        book is reloaded from the API on the next message instead
+        (this is also how GdaxBookFeed recovers from a sequence gap).
+        """
+        self._sequence = -1
+
+
+class GdaxMultiBookFeed(GdaxWebsocketClient):
+    """
+    Maintains the level 3 books of several products
+    from one full channel subscription.
+
+    Example:
+        feed = GdaxMultiBookFeed(['BTC-USD', 'ETH-USD'], gdax=gdax)
+        feed.start()
+        btc = feed.get_book('BTC-USD')  # a GdaxProductBook
+        btc.get_nearest_wall('buy')
+    """
+    def __init__(self, product_ids, gdax=None, auth=True, log_to=None):
+        """
+        :param product_ids: (list)
+        :param gdax: (stocklook.crypto.gdax.api.Gdax, default None)
+            Loads the books. None creates a default object.
+        :param auth: (bool, default True)
+        :param log_to: (file, default None) Messages are pickled to this file.
+        """
+        if gdax is None:
+            from stocklook.crypto.gdax.api import Gdax
+            gdax = Gdax()
+
+        super(GdaxMultiBookFeed, self).__init__(url=getattr(gdax, 'ws_url', WS_URL),
+                                                products=list(product_ids),
+                                                auth=auth,
+                                                api_key=gdax.api_key,
+                                                api_secret=gdax.api_secret,
+                                                api_passphrase=gdax.api_passphrase)
+        self.gdax = gdax
+        self._log_to = log_to
+        self._lock = Lock()
+        self.running = False
+        self.books = OrderedDict((p, GdaxProductBook(self, p, gdax))
+                                 for p in self.products)
+
+    def get_book(self, product_id):
+        return self.books[product_id]
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self.running = True
+        super(GdaxMultiBookFeed, self).start()
+
+    def close(self):
+        with self._lock:
+            if not self.running:
+                return
+            self.running = False
+        super(GdaxMultiBookFeed, self).close()
+
+    def on_open(self):
+        logger.debug("Subscribing to the full channel: {}".format(self.products))
+
+    def on_close(self):
+        logger.debug("Book feed closed.")
+
+    def on_message(self, message):
+        if self._log_to:
+            pickle.dump(message, self._log_to)
+        book = self.books.get(message.get('product_id', None), None)
+        if book is not None:
+            book.on_message(message)
+
+    def on_error(self, e):
+        logger.error("Book feed error: {}".format(e))
+        for book in self.books.values():
+            book._sequence = -1
+        super(GdaxMultiBookFeed, self).on_error(e)
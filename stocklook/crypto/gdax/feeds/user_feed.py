@@ -0,0 +1,233 @@
+"""
+MIT License
+
+Copyright (c) 2017 Zeke Barge
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import logging as lg
+from collections import OrderedDict, defaultdict
+from threading import Lock
+from stocklook.crypto.gdax.feeds.websocket_client import GdaxWebsocketClient, USER, WS_URL
+
+logger = lg.getLogger(__name__)
+
+
+class GdaxOrderEventBus:
+    """
+    Routes order lifecycle messages (received, open, match, change, done)
+    to listeners subscribed by order id and keeps the latest state of
+    each order:
+
+        {'id', 'status', 'side', 'price', 'size', 'remaining_size',
+         'filled_size', 'executed_value', 'done_reason'}
+
+    Listeners are called func(message, state) where state is the
+    order's state after the message is applied. A listener that
+    subscribes after an order's messages arrived (a crossing order can
+    fill before post returns its id) should read GdaxOrderEventBus.get_state.
+
+    Matches are applied to the maker and taker orders already known
+    to the bus (from their received message).
+    """
+    TYPES = ('received', 'open', 'match', 'change', 'done')
+
+    def __init__(self, max_done=1000):
+        """
+        :param max_done: (int, default 1000)
+            The number of done order states to remember.
+        """
+        self.max_done = max_done
+        self._lock = Lock()
+        self._states = dict()
+        self._done = OrderedDict()
+        self._listeners = defaultdict(list)
+        self.message_count = 0
+
+    def subscribe(self, order_id, func):
+        """
+        Calls func(message, state) on messages about :param order_id.
+        None subscribes to every order.
+        """
+        with self._lock:
+            self._listeners[order_id].append(func)
+
+    def unsubscribe(self, order_id, func=None):
+        """
+        Removes func (or every listener when None) from :param order_id.
+        """
+        with self._lock:
+            if func is None:
+                self._listeners.pop(order_id, None)
+                return
+            funcs = self._listeners.get(order_id, [])
+            if func in funcs:
+                funcs.remove(func)
+            if not funcs:
+                self._listeners.pop(order_id, None)
+
+    def seed(self, order_id, state):
+        """
+        Sets the state of an order the bus hasn't seen (e.g. one loaded
+        through the API, or whose received message came before the
+        socket connected) so its later match/done messages are applied.
+        Does nothing when the bus already knows the order.
+        :param state: (dict) Like GdaxOrderEventBus.get_state.
+        :return: (bool) True if the state was set.
+        """
+        with self._lock:
+            if order_id in self._states or order_id in self._done:
+                return False
+            state = dict(state, id=order_id)
+            if state.get('status') == 'done':
+                self._done[order_id] = state
+            else:
+                self._states[order_id] = state
+            return True
+
+    def get_state(self, order_id):
+        """
+        Returns a copy of the order's state or None.
+        """
+        with self._lock:
+            state = self._states.get(order_id, None) or self._done.get(order_id, None)
+            return dict(state) if state is not None else None
+
+    def _apply(self, order_id, msg_type, message):
+        state = self._states.get(order_id, None)
+        if state is None:
+            if msg_type != 'received':
+                return self._done.get(order_id, None)
+            state = dict(id=order_id,
+                         status='pending',
+                         side=message.get('side'),
+                         price=float(message.get('price', 0) or 0),
+                         size=float(message.get('size', 0) or 0),
+                         remaining_size=float(message.get('size', 0) or 0),
+                         filled_size=0.0,
+                         executed_value=0.0,
+                         done_reason=None)
+            self._states[order_id] = state
+        elif msg_type == 'open':
+            state['status'] = 'open'
+            state['remaining_size'] = float(message.get('remaining_size', state['remaining_size']))
+        elif msg_type == 'match':
+            size = float(message['size'])
+            state['filled_size'] += size
+            state['executed_value'] += size * float(message['price'])
+            state['remaining_size'] = max(state['remaining_size'] - size, 0.0)
+        elif msg_type == 'change':
+            state['size'] = float(message.get('new_size', state['size']))
+            state['remaining_size'] = state['size'] - state['filled_size']
+        elif msg_type == 'done':
+            state['status'] = 'done'
+            state['done_reason'] = message.get('reason')
+            state['remaining_size'] = float(message.get('remaining_size', 0) or 0)
+            self._states.pop(order_id, None)
+            self._done[order_id] = state
+            while len(self._done) > self.max_done:
+                self._done.popitem(last=False)
+        return state
+
+    def publish(self, message):
+        """
+        Applies a user/full channel message and notifies listeners.
+        :return: (int) The number of listeners called.
+        """
+        msg_type = message.get('type', None)
+        if msg_type not in self.TYPES:
+            return 0
+        if msg_type == 'match':
+            ids = [message.get('maker_order_id'), message.get('taker_order_id')]
+        else:
+            ids = [message.get('order_id')]
+
+        calls = list()
+        with self._lock:
+            self.message_count += 1
+            for order_id in ids:
+                if order_id is None:
+                    continue
+                state = self._apply(order_id, msg_type, message)
+                funcs = self._listeners.get(order_id, []) + self._listeners.get(None, [])
+                if funcs:
+                    state = dict(state) if state is not None else None
+                    calls.extend((func, state) for func in funcs)
+
+        for func, state in calls:
+            try:
+                func(message, state)
+            except Exception as e:
+                logger.error("Order event listener {} failed on {}: {}".format(func, message, e))
+        return len(calls)
+
+
+class GdaxUserFeed(GdaxWebsocketClient):
+    """
+    Subscribes to the authenticated user channel (messages about
+    our own orders) and publishes them to a GdaxOrderEventBus.
+
+    Example:
+        feed = GdaxUserFeed(products=['BTC-USD'], gdax=gdax)
+        feed.start()
+        order.attach(feed.bus)
+        order.fill_future.result(timeout=60)
+    """
+    def __init__(self, products=None, gdax=None, bus=None):
+        """
+        :param products: (str, list, default ['LTC-USD'])
+        :param gdax: (stocklook.crypto.gdax.api.Gdax, default None)
+            Supplies the API credentials. None creates a default object.
+        :param bus: (GdaxOrderEventBus, default None) None creates one.
+        """
+        if gdax is None:
+            from stocklook.crypto.gdax.api import Gdax
+            gdax = Gdax()
+        if bus is None:
+            bus = GdaxOrderEventBus()
+
+        super(GdaxUserFeed, self).__init__(url=getattr(gdax, 'ws_url', WS_URL),
+                                           products=products,
+                                           auth=True,
+                                           api_key=gdax.api_key,
+                                           api_secret=gdax.api_secret,
+                                           api_passphrase=gdax.api_passphrase,
+                                           channels=[USER])
+        self.gdax = gdax
+        self.bus = bus
+        self.connections = 0
+
+    def _connect(self):
+        # Messages are lost while reconnecting so
+        # consumers compare this to reconcile orders.
+        self.connections += 1
+        super(GdaxUserFeed, self)._connect()
+
+    def on_open(self):
+        logger.debug("Subscribing to the user channel: {}".format(self.products))
+
+    def on_close(self):
+        logger.debug("User channel closed.")
+
+    def on_message(self, message):
+        msg_type = message.get('type', None)
+        if msg_type == 'error':
+            logger.error("User channel error: {}".format(message))
+        else:
+            self.bus.publish(message)
@@ -0,0 +1,193 @@
+"""
+MIT License
+
+Copyright (c) 2017 Zeke Barge
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from heapq import nlargest, nsmallest
+from threading import Lock
+from bintrees import RBTree
+
+
+class GdaxWallIndex:
+    """
+    Tracks walls: aggregated book levels holding at least
+    GdaxWallIndex.min_size coins. GdaxBookFeed calls
+    GdaxWallIndex.update(side, price, size) whenever a level changes,
+    so wall queries never scan the book.
+
+    Walls are kept per side ('buy', 'sell') in a tree sorted by price.
+    Queries only look at walls within GdaxWallIndex.within_percent of the
+    best price (:param top) and cache their result until that side's
+    walls or the top price change. Queries for walls smaller than
+    GdaxWallIndex.min_size scan the price levels within the band instead.
+
+    Example:
+        walls = feed.walls
+        walls.get_nearest('buy', feed.get_bid())       # (price, size) or None
+        walls.get_top('sell', feed.get_ask(), n=3)     # [(price, size), ...]
+    """
+    SIDES = ('buy', 'sell')
+
+    def __init__(self, min_size=20, within_percent=0.01, measure_size=7):
+        """
+        :param min_size: (float, default 20)
+            The smallest level size indexed as a wall.
+            See GdaxWallIndex.set_min_size.
+        :param within_percent: (float, default 0.01)
+            The band from the best price that walls are returned from.
+        :param measure_size: (int, default 7)
+            The number of walls GdaxWallIndex.get_wall_size averages.
+        """
+        self.min_size = min_size
+        self.within_percent = within_percent
+        self.measure_size = measure_size
+        self._lock = Lock()
+        self.clear()
+
+    def clear(self):
+        """ Forgets every level (the book was reloaded). """
+        self._levels = {s: dict() for s in self.SIDES}   # price: total size
+        self._walls = {s: RBTree() for s in self.SIDES}  # price: total size >= min_size
+        self._version = {s: 0 for s in self.SIDES}
+        self._level_version = {s: 0 for s in self.SIDES}
+        self._cache = dict()
+
+    def update(self, side, price, size):
+        """
+        Sets the total size resting at a price level (0 removes it).
+        """
+        with self._lock:
+            levels = self._levels[side]
+            walls = self._walls[side]
+            if size > 0:
+                levels[price] = size
+            else:
+                levels.pop(price, None)
+            self._level_version[side] += 1
+            if size >= self.min_size:
+                walls.insert(price, size)
+                self._version[side] += 1
+            elif price in walls:
+                walls.remove(price)
+                self._version[side] += 1
+
+    def set_min_size(self, min_size):
+        """ Rebuilds the walls with a new minimum size. """
+        with self._lock:
+            self.min_size = min_size
+            for side in self.SIDES:
+                self._walls[side] = RBTree((p, s) for p, s in self._levels[side].items()
+                                           if s >= min_size)
+                self._version[side] += 1
+
+    def get_level_size(self, side, price):
+        """ Returns the total size resting at a price level. """
+        return self._levels[side].get(price, 0.0)
+
+    def _cached(self, key, side, top, func, levels=False):
+        # One entry per query key: the result for the latest top price.
+        # Queries reading GdaxWallIndex._levels expire on any level change.
+        version = (self._level_version if levels else self._version)[side]
+        hit = self._cache.get(key, None)
+        if hit is not None and hit[0] == version and hit[1] == top:
+            return hit[2]
+        with self._lock:
+            value = func()
+        self._cache[key] = (version, top, value)
+        return value
+
+    def get_walls(self, side, top, size=None):
+        """
+        Returns a list of (price, size) walls within the band from :param top,
+        nearest to the spread first.
+
+        :param side: (str) 'buy' or 'sell'
+        :param top: (float) The best bid (buy) or ask (sell) price.
+        :param size: (float, default None)
+            The minimum wall size. None uses GdaxWallIndex.min_size.
+        """
+        if top is None:
+            return []
+        if size is None:
+            size = self.min_size
+        if side == 'buy':
+            low, high = top - top * self.within_percent, top
+        else:
+            low, high = top, top + top * self.within_percent
+
+        def func():
+            found = list()
+            for price, level_size in self._walls[side].iter_items(low):
+                if price > high:
+                    break
+                if level_size >= size:
+                    found.append((price, level_size))
+            if side == 'buy':
+                found.reverse()
+            return found
+
+        def scan():
+            # Smaller than the indexed walls.
+            found = sorted((p, s) for p, s in self._levels[side].items()
+                           if low <= p <= high and s >= size)
+            if side == 'buy':
+                found.reverse()
+            return found
+
+        if size < self.min_size:
+            return self._cached(('walls', side, size), side, top, scan, levels=True)
+        return self._cached(('walls', side, size), side, top, func)
+
+    def get_nearest(self, side, top, size=None, skip_top=False):
+        """
+        Returns the (price, size) wall nearest the spread or None.
+        :param skip_top: (bool, default False)
+            True ignores a wall at the :param top price.
+        """
+        for wall in self.get_walls(side, top, size=size):
+            if skip_top and wall[0] == top:
+                continue
+            return wall
+        return None
+
+    def get_top(self, side, top, n=None, size=None):
+        """
+        Returns the :param n (default GdaxWallIndex.measure_size)
+        largest (price, size) walls within the band, largest first.
+        """
+        n = self.measure_size if n is None else n
+        walls = self.get_walls(side, top, size=size)
+        return self._cached(('top', side, n, size), side, top,
+                            lambda: nlargest(n, walls, key=lambda w: w[1]),
+                            levels=size is not None and size < self.min_size)
+
+    def get_wall_size(self, top_bid, top_ask, n=None):
+        """
+        Averages the sizes of the :param n smallest walls on both sides,
+        the way BookSnapshot.calculate_wall_size measures them.
+        Returns GdaxWallIndex.min_size when there are no walls.
+        """
+        n = self.measure_size if n is None else n
+        walls = self.get_walls('buy', top_bid) + self.get_walls('sell', top_ask)
+        measure = nsmallest(n, (w[1] for w in walls))
+        if not measure:
+            return self.min_size
+        return sum(measure) / len(measure)
@@ -39,6 +39,9 @@ USER = 'user'
 MATCHES = 'matches'
 FULL = 'full'
 
+# The exchange feed (see Gdax.set_base_url to use another).
+WS_URL = 'wss://ws-feed.gdax.com'
+
 
 
 class GdaxWebsocketClient:
@@ -53,7 +56,7 @@ class GdaxWebsocketClient:
     SUBSCRIBE_TYPES = ['done', 'received', 'open', 'match']
 
     def __init__(self,
-                 url="wss://ws-feed.gdax.com",
+                 url=WS_URL,
                  products=None,
                  message_type="subscribe",
                  auth=False,
@@ -112,7 +115,9 @@ class GdaxWebsocketClient:
 
         if self.auth:
             timestamp = str(time())
-            message = timestamp + 'GET' + '/users/self'
+            # Websocket subscriptions are signed like a
+            # GET request to /users/self/verify.
+            message = timestamp + 'GET' + '/users/self/verify'
             hmac_key = base64.b64decode(self.api_secret)
             signature = hmac.new(hmac_key, bytes(str(message).encode('utf8')), hashlib.sha256)
             signature_b64 = base64.standard_b64encode(signature.digest())
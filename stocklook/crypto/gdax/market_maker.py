@@ -22,13 +22,18 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 import logging
-from time import sleep
 from stocklook.config import config
-from datetime import datetime, timedelta
+from stocklook.utils.clock import SystemClock
+from stocklook.utils.metrics import NULL_TRACER
+from threading import Event
+from uuid import uuid4
+from collections import deque
 from stocklook.crypto.gdax.api import Gdax, GdaxAPIError
 from stocklook.utils.timetools import now, now_minus, timeout_check, now_plus
 from stocklook.crypto.gdax.feeds.book_feed import GdaxBookFeed, BookSnapshot
+from stocklook.crypto.gdax.feeds.user_feed import GdaxUserFeed
 from stocklook.crypto.gdax.order_mm import GdaxMMOrder, GdaxOrderCancellationError, OrderLockError
+from stocklook.crypto.gdax.order_registry import GdaxOrderRegistry
 
 logger = logging.getLogger(__name__)
 logger.setLevel(config.get('LOG_LEVEL', logging.DEBUG))
@@ -83,7 +88,17 @@ class GdaxMarketMaker:
                  max_open_buys=6,
                  max_open_sells=12,
                  manage_existing_orders=True,
-                 aggressive=True):
+                 aggressive=True,
+                 clock=None,
+                 reactive=False,
+                 coalesce=0.25,
+                 max_idle=30,
+                 min_tick_change=0.01,
+                 user_feed=None,
+                 poll_fills=False,
+                 order_gateway=None,
+                 tracer=None,
+                 reconcile_interval=60):
         """
         Gdax market maker bot automatically trades the spreads.
 
@@ -132,6 +147,47 @@ class GdaxMarketMaker:
         :param aggressive: (bool, default True)
             The aggressive parameter is used to determine how tight or loose to manage order prices.
             An aggressive bot trades more frequently for tighter spreads/margins.
+
+        :param clock: (stocklook.utils.clock.SystemClock, default None)
+            Source of time and sleeps. A SimulatedClock replays
+            recorded feeds (see stocklook.crypto.gdax.simulation).
+
+        :param reactive: (bool, default False)
+            True runs an order cycle when the book feed reports a change
+            (best bid/ask, a ticker move of :param min_tick_change or one
+            of our orders filling) instead of every :param interval seconds.
+
+        :param coalesce: (float, default 0.25)
+            Reactive mode waits this many seconds after the first event
+            so a burst of events runs a single order cycle.
+
+        :param max_idle: (int, float, default 30)
+            Reactive mode still runs an order cycle after
+            this many seconds without events.
+
+        :param min_tick_change: (float, default 0.01)
+            The trade price move that counts as a ticker event.
+
+        :param user_feed: (stocklook.crypto.gdax.feeds.user_feed.GdaxUserFeed, default None)
+            Our order messages from the user channel. Orders are attached to its
+            event bus so fills are pushed instead of polled from the API.
+            None creates a new object unless :param poll_fills.
+
+        :param poll_fills: (bool, default False)
+            True checks orders for fills through the API like before.
+
+        :param order_gateway: (stocklook.crypto.gdax.order_gateway.GdaxOrderGateway, default None)
+            Runs the cancel/replace requests of GdaxMarketMaker.shift_orders
+            concurrently. None cancels and places orders one at a time.
+
+        :param tracer: (stocklook.utils.metrics.CycleTracer, default None)
+            Times each stage of GdaxMarketMaker.cycle and each exchange call
+            (including those made by :param order_gateway). None uses a disabled tracer.
+
+        :param reconcile_interval: (int, float, default 60)
+            Seconds between checking orders through the API while fills
+            are pushed by :param user_feed (orders are also checked each
+            time the user feed reconnects). None checks on reconnects only.
         """
         if book_feed is None:
             book_feed = GdaxBookFeed(product_id=product_id,
@@ -143,13 +199,29 @@ class GdaxMarketMaker:
         if product_id is None:
             product_id = book_feed.product_id
 
+        if clock is None:
+            clock = SystemClock()
+
+        if user_feed is None and not poll_fills:
+            user_feed = GdaxUserFeed(products=product_id, gdax=gdax)
+
         self.book_feed = book_feed
         self.product_id = product_id
         self.gdax = gdax
+        self.clock = clock
+        self.user_feed = user_feed
+        self.order_gateway = order_gateway
+        self.tracer = NULL_TRACER if tracer is None else tracer
+        if order_gateway is not None and not order_gateway.tracer.enabled:
+            order_gateway.tracer = self.tracer
+        self.reconcile_interval = reconcile_interval
+        self.reactive = reactive
+        self.coalesce = coalesce
+        self.max_idle = max_idle
+        self.min_tick_change = min_tick_change
         self.auth = True
         self._wall_size = wall_size
         self.interval = interval
-        self._t_time = datetime.now()
         self.spend_pct = spend_pct
         self.max_spread = max_spread
         self.min_spread = min_spread
@@ -166,18 +238,30 @@ class GdaxMarketMaker:
         self.stop = False
         self._book_snapshot = None
         self._last_ticker = dict()
-        self._orders = dict()
+        self._orders = GdaxOrderRegistry()
         self._fills = dict()
         self._t_data = dict()
         self._tick_prices = dict()
         self._charts = dict()
         self._fill_queue = dict()
+        self._replacing = list()
+
+        self.cycles = 0
+        self._filled = deque()
+        self._orders_synced = False
+        self._synced_time = None
+        self._synced_connections = 0
+        self._wake = Event()
+        self._wake_reasons = set()
+        self._wake_time = None
+        self._event_price = None
+        self.last_reaction = None
 
     def allow_high_frequency_trading(self):
         self._high_frequency = True
 
     def place_order(self, price=None, size=None, side='buy', order=None, op_order=None, adjust_vs_open=True,
-                    adjust_vs_wall=True, check_size=True, check_ticker=True, aggressive=True):
+                    adjust_vs_wall=True, check_size=True, check_ticker=True, aggressive=True, post=True):
         """
         Places new buy and sell orders.
 
@@ -208,6 +292,8 @@ class GdaxMarketMaker:
 
         :param check_ticker: (bool, default
         :param aggressive:
+        :param post: (bool, default True)
+            False returns the priced order without posting or registering it.
         :return:
         """
         if order is not None:
@@ -268,12 +354,126 @@ class GdaxMarketMaker:
         logger.debug("new: {} {} {} @ {}".format(
             side, size, self.product_id, price))
 
-        order.post()
+        if not post:
+            return order
+
+        with self.tracer.call('post'):
+            order.post()
+        self.register_order(order)
+        return order
 
+    def register_order(self, order):
+        """
+        Adds a posted order to GdaxMarketMaker.orders
+        and attaches it to the user feed.
+        """
         assert order.id is not None
         self._orders[order.id] = order
+        if self.user_feed is not None:
+            order.attach(self.user_feed.bus)
+            order.add_fill_callback(self.on_order_filled)
 
-        return order
+    def replace_order(self, old_order, price=None, size=None, side='buy', **kwargs):
+        """
+        Cancels :param old_order and places a new order.
+
+        With a GdaxMarketMaker.order_gateway the new order is priced now
+        and queued behind the cancel. It's held in GdaxMarketMaker.orders
+        under its client_oid until GdaxMarketMaker.reconcile_orders
+        swaps in the posted order.
+
+        :param old_order: (GdaxMMOrder)
+        :param kwargs: GdaxMarketMaker.place_order(**kwargs)
+        :return: (GdaxMMOrder, None) The new order.
+        """
+        if self.order_gateway is None:
+            self.cancel_order(old_order.id)
+            return self.place_order(price, size, side=side, **kwargs)
+
+        self._orders.pop(old_order.id, None)
+        new_order = self.place_order(price, size, side=side, post=False, **kwargs)
+        if new_order is None:
+            # No longer allowed (position size) - just cancel.
+            future = self.order_gateway.cancel(old_order)
+            self._replacing.append((future, old_order, None))
+            return None
+        if new_order.client_oid is None:
+            new_order.client_oid = str(uuid4())
+        self._orders[new_order.client_oid] = new_order
+        future = self.order_gateway.replace(old_order, new_order)
+        self._replacing.append((future, old_order, new_order))
+        return new_order
+
+    def reconcile_orders(self, timeout=None):
+        """
+        Waits for the order gateway's queued replacements and updates
+        GdaxMarketMaker.orders with the results.
+        :return: (list) The new orders that posted.
+        """
+        if not self._replacing:
+            return list()
+        pending, self._replacing = self._replacing, list()
+        with self.tracer.call('gateway_wait'):
+            self.order_gateway.wait([f for f, _, _ in pending], timeout=timeout)
+        posted = list()
+
+        for future, old_order, new_order in pending:
+            if new_order is not None:
+                self._orders.pop(new_order.client_oid, None)
+            try:
+                future.result(timeout=0)
+            except Exception as e:
+                if new_order is not None and old_order.is_cancelled():
+                    # The cancel went through but the post didn't.
+                    new_order = self.repost_order(new_order, e)
+                    if new_order is not None:
+                        posted.append(new_order)
+                elif not isinstance(e, GdaxAPIError):
+                    logger.error("Error replacing order {}: {}".format(old_order.id, e))
+                elif 'done' in str(e):
+                    # Filled before the cancel went through.
+                    self._orders[old_order.id] = old_order
+                    self.handle_fill(old_order.id, replace=True)
+                elif 'not found' not in str(e):
+                    logger.error("Error replacing order {}: {}".format(old_order.id, e))
+                continue
+            if new_order is not None:
+                self.register_order(new_order)
+                posted.append(new_order)
+
+        return posted
+
+    def repost_order(self, order, error):
+        """
+        Places a replacement order whose gateway post failed after its
+        old order was cancelled, re-pricing it against the current book.
+        :param order: (GdaxMMOrder) The unposted replacement.
+        :param error: (Exception) The post error.
+        :return: (GdaxMMOrder, None) The posted order.
+        """
+        logger.warning("Reposting replacement order after error: {}".format(error))
+        try:
+            return self.place_order(order=order, aggressive=self.aggressive)
+        except Exception as e:
+            logger.error("Error reposting order {}: {}".format(order, e))
+            return None
+
+    def cancel_all_orders(self):
+        """
+        Cancels every open order on the product with one API call.
+        :return: (list) The canceled order ids.
+        """
+        if self.order_gateway is not None:
+            self.reconcile_orders()
+            ids = self.order_gateway.cancel_all(self.product_id).result()
+        else:
+            ids = self.gdax.cancel_all_orders(self.product_id)
+        for order_id in ids or ():
+            order = self._orders.pop(order_id, None)
+            if order is not None:
+                order.status = 'canceled'
+                order.detach()
+        return ids
 
     def ticker_changed(self, ticker_key, min_change=0.01):
         return tick_change_check(self.ticker_price,
@@ -285,6 +485,8 @@ class GdaxMarketMaker:
         """
         Access to GdaxChartData objects that are automatically created,
         cached, and/or refreshed on an interval.
+        Every time frame is resampled from the single base candle
+        series kept by Gdax.candle_manager.
         :param time_frame (str, default '5M')
             The timeframe interval of chart data to get.
             5M: 5 minutes
@@ -310,15 +512,18 @@ class GdaxMarketMaker:
 
             chart = GdaxChartData(
                 self.gdax, self.product_id,
-                start, end, granularity=granularity
+                start, end, granularity=granularity,
+                candle_manager=self.gdax.candle_manager
             )
-            chart.get_candles()
+            with self.tracer.call('candles'):
+                chart.get_candles()
 
             self._charts[key] = chart
         elif timed_out:
             chart.start = start
             chart.end = end
-            chart.get_candles()
+            with self.tracer.call('candles'):
+                chart.get_candles()
 
         return chart
 
@@ -331,15 +536,27 @@ class GdaxMarketMaker:
         :return: {GdaxMMOrder.id: GdaxMMOrder}
         """
         self.handle_fill_queue()
-        if not self.ticker_changed('orders', min_change=0.01):
+        if self.user_feed is not None:
+            if not self.reconcile_due():
+                # Fills are pushed by the user feed (see GdaxMarketMaker.handle_fills).
+                return self._orders
+        elif not self.ticker_changed('orders', min_change=0.01):
             return self._orders
 
-        open_orders = self.gdax.get_orders(paginate=False)
+        connections = getattr(self.user_feed, 'connections', 0)
+        with self.tracer.call('get_orders'):
+            open_orders = self.gdax.get_orders(paginate=False)
+        # The account may hold orders for other products (and other market makers).
+        open_orders = [o for o in open_orders
+                       if o.get('product_id', self.product_id) == self.product_id]
         open_ids = [o['id'] for o in open_orders if o['status'] != 'done']
         existing_keys = list(self._orders.keys())
 
         for key in existing_keys:
             if key not in open_ids:
+                order = self._orders[key]
+                if self.user_feed is not None and not self.sync_order(order):
+                    continue
                 self.handle_fill(key)
 
         if self.manage_existing_orders:
@@ -352,9 +569,51 @@ class GdaxMarketMaker:
                 o = GdaxMMOrder(self, self.gdax, self.product_id)
                 o.update(data=o_data)
                 self._orders[o.id] = o
+                if self.user_feed is not None:
+                    o.attach(self.user_feed.bus)
+                    o.add_fill_callback(self.on_order_filled)
 
+        self._orders_synced = True
+        self._synced_time = self.clock.time()
+        self._synced_connections = connections
         return self._orders
 
+    def reconcile_due(self):
+        """
+        Returns True when orders kept up to date by the user feed
+        should be checked through the API: on the first call, each time
+        the feed reconnects and every GdaxMarketMaker.reconcile_interval seconds.
+        """
+        if not self._orders_synced:
+            return True
+        if getattr(self.user_feed, 'connections', 0) != self._synced_connections:
+            return True
+        return (self.reconcile_interval is not None and
+                self.clock.time() - self._synced_time >= self.reconcile_interval)
+
+    def sync_order(self, order):
+        """
+        Updates an order missing from the API's open orders which the
+        user feed hasn't reported done (its messages may have been lost).
+        A cancelled order is dropped from GdaxMarketMaker.orders.
+        :param order: (GdaxMMOrder)
+        :return: (bool) True if the order is filled.
+        """
+        try:
+            with self.tracer.call('get_order'):
+                if order.sync():
+                    return True
+        except GdaxAPIError as e:
+            # Cancelled orders are not found.
+            logger.info("Dropping order {}: {}".format(order.id, e))
+            order.detach()
+            self._orders.pop(order.id, None)
+            return False
+        if order.status in ('canceled', 'rejected'):
+            order.detach()
+            self._orders.pop(order.id, None)
+        return False
+
     @property
     def order_list(self):
         """
@@ -372,8 +631,7 @@ class GdaxMarketMaker:
         on the buy side.
         :return:
         """
-        return {o_id: o for o_id, o in self._orders.items()
-                if o.side == 'buy'}
+        return self._orders.get_orders(side='buy')
 
     @property
     def sell_orders(self):
@@ -382,35 +640,22 @@ class GdaxMarketMaker:
         on the sell side.
         :return:
         """
-        return {o_id: o for o_id, o in self._orders.items()
-                if o.side == 'sell'}
+        return self._orders.get_orders(side='sell')
 
     @property
     def wall_size(self):
         """
-        Calculates bid/ask wall size if one wasn't provided on
-        init.
+        Returns the wall size provided on init or the one
+        measured from the book feed's wall index.
         :return:
         """
-        if self._wall_size is None or self._timeout():
-            snap = self.get_book_snapshot()
-            self._wall_size = snap.calculate_wall_size()
+        if self._wall_size is None:
+            return self.book_feed.get_wall_size()
         return self._wall_size
 
     @property
     def lowest_open_order(self):
-        if self._orders:
-            orders = list(self._orders.values())
-            return min(orders, key=lambda o: o.price)
-        return None
-
-    def _timeout(self):
-        n = datetime.now()
-        out = self._t_time + timedelta(seconds=5)
-        if n > out:
-            self._t_time = n
-            return True
-        return False
+        return self._orders.get_lowest()
 
     @property
     def position_size(self):
@@ -529,12 +774,11 @@ class GdaxMarketMaker:
                 if max_diff > spread:
                     # go for minimum spread
                     if check_price > order.price:
-                        self.cancel_order(order.id)
-                        new_order = self.place_order(check_price,
-                                                     order.size,
-                                                     side=order.side,
-                                                     op_order=order,
-                                                     adjust_vs_open=True)
+                        new_order = self.replace_order(order, check_price,
+                                                       order.size,
+                                                       side=order.side,
+                                                       op_order=order,
+                                                       adjust_vs_open=True)
                         new_orders.append(new_order)
 
             elif order.side == 'sell':
@@ -545,13 +789,12 @@ class GdaxMarketMaker:
                     logger.debug("shift_prices: order stopped. price: {}, "
                                  "stop: {}, ticker: {}".format(
                         order.price, stop, p))
-                    self.cancel_order(order.id)
-                    new_order = self.place_order(stop_sell,
-                                                 order.size,
-                                                 side=order.side,
-                                                 op_order=order,
-                                                 adjust_vs_open=False,
-                                                 check_size=False)
+                    new_order = self.replace_order(order, stop_sell,
+                                                   order.size,
+                                                   side=order.side,
+                                                   op_order=order,
+                                                   adjust_vs_open=False,
+                                                   check_size=False)
                     new_orders.append(new_order)
 
                 else:
@@ -562,14 +805,14 @@ class GdaxMarketMaker:
                         # first check against others
                         if order.price > check_price:
                             # clear for min spread
-                            self.cancel_order(order.id)
-                            new_order = self.place_order(check_price,
-                                                         order.size,
-                                                         side=order.side,
-                                                         op_order=order,
-                                                         adjust_vs_open=False)
+                            new_order = self.replace_order(order, check_price,
+                                                           order.size,
+                                                           side=order.side,
+                                                           op_order=order,
+                                                           adjust_vs_open=False)
                             new_orders.append(new_order)
 
+        self.reconcile_orders()
         return new_orders
 
     def adjust_currency_balance(self, amount, side='buy', filled=False):
@@ -678,6 +921,18 @@ class GdaxMarketMaker:
             new_order = None
         return new_order
 
+    def handle_fills(self):
+        """
+        Handles the orders reported filled by the user feed.
+        :return: (list) The orders handled.
+        """
+        handled = list()
+        while self._filled:
+            order_id = self._filled.popleft()
+            if order_id in self._orders or order_id in self._fill_queue:
+                handled.append(self.handle_fill(order_id))
+        return handled
+
     def handle_fill_queue(self):
         keys = list(self._fill_queue.keys())
         return [self.handle_fill(i) for i in keys]
@@ -686,16 +941,13 @@ class GdaxMarketMaker:
         if not self._high_frequency:
             return False
 
-        o_vals = list(self._orders.values())
-        hf_orders = [o for o in o_vals
-                     if o.target_type == o.HIGH_FREQ]
-        hf_buys = [o for o in hf_orders if o.side == 'buy']
-        hf_sells = [o for o in hf_orders if o.side == 'sell']
+        hf_orders = self._orders.get_orders(target_type=GdaxMMOrder.HIGH_FREQ)
+        hf_buys = [o for o in hf_orders.values() if o.side == 'buy']
+        hf_sells = [o for o in hf_orders.values() if o.side == 'sell']
 
-        try:
-            first_o = [o for o in o_vals
-                       if not o.locked][0]
-        except IndexError:
+        first_o = next((o for o in self._orders.values()
+                        if not o.locked), None)
+        if first_o is None:
             return False
 
         if len(hf_orders) < 2:
@@ -742,7 +994,8 @@ class GdaxMarketMaker:
         order = self._orders.pop(order_id, None)
         logger.debug("Cancelling order: {}".format(order))
         try:
-            check = order.cancel()
+            with self.tracer.call('cancel'):
+                check = order.cancel()
             logger.debug("Order cancel return: {}".format(check))
             assert check[0] in (order_id, None)
         except (GdaxOrderCancellationError,
@@ -849,74 +1102,161 @@ class GdaxMarketMaker:
     def run(self):
         """
         Main method runs in main thread managing the order book on a separate thread.
-        does a refresh every GdaxMarketMaker.interval seconds evaluating open buy and
-        sell orders against each other and the bids/asks.
+        Runs an order cycle (GdaxMarketMaker.cycle) every GdaxMarketMaker.interval
+        seconds, or in reactive mode whenever the book feed reports a change.
         :return:
         """
+        if self.user_feed is not None:
+            self.user_feed.start()
         self.book_feed.start()
-        sleep(10)
+        try:
+            self.loop()
+        finally:
+            self.book_feed.close()
+            if self.user_feed is not None:
+                self.user_feed.close()
+
+    def loop(self, warmup=10):
+        """
+        Runs order cycles until GdaxMarketMaker.stop without starting or
+        closing the feeds, which may be shared with other market makers
+        (see stocklook.crypto.gdax.orchestrator.GdaxMarketMakerOrchestrator).
+        :param warmup: (int, float, default 10)
+            Seconds to let the book feed load before the first cycle.
+        """
+        self.book_feed.add_listener(self.on_book_event)
+        try:
+            self.clock.sleep(warmup)
+            self._wake_time = None
+
+            while not self.stop:
+                self.cycle()
+                if self.reactive:
+                    self.wait_for_event()
+                else:
+                    self.clock.sleep(self.interval)
+        finally:
+            self.book_feed.remove_listener(self.on_book_event)
 
-        while not self.stop:
+    def on_book_event(self, event, message):
+        """
+        GdaxBookFeed listener (called from the feed's thread)
+        waking the reactive loop on relevant changes.
+        """
+        feed = self.book_feed
+        if event == feed.EVENT_TOP:
+            self._notify(event)
+        elif event == feed.EVENT_MATCH:
+            if message.get('maker_order_id') in self._orders \
+                    or message.get('taker_order_id') in self._orders:
+                self._notify('fill')
+            else:
+                price = float(message['price'])
+                last = self._event_price
+                if last is None or abs(price - last) >= self.min_tick_change:
+                    self._event_price = price
+                    self._notify('ticker')
+
+    def on_order_filled(self, order):
+        """
+        GdaxOrder fill callback (called from the user feed's thread).
+        Fills are handled at the start of the next order cycle.
+        """
+        self._filled.append(order.id)
+        self._notify('fill')
 
+    def _notify(self, reason):
+        if self._wake_time is None:
+            self._wake_time = self.clock.time()
+        self._wake_reasons.add(reason)
+        self._wake.set()
+
+    def wait_for_event(self):
+        """
+        Blocks until the book feed reports a change (or GdaxMarketMaker.max_idle
+        seconds pass), then waits GdaxMarketMaker.coalesce seconds so
+        events arriving together are handled by one order cycle.
+        :return: (set) The reasons for waking: 'top', 'ticker', 'fill'.
+        """
+        woke = self.clock.wait(self._wake, self.max_idle)
+        if woke and self.coalesce:
+            self.clock.sleep(self.coalesce)
+        self._wake.clear()
+        reasons, self._wake_reasons = self._wake_reasons, set()
+        return reasons
+
+    def cycle(self):
+        """
+        One order cycle: places a new buy order near a bid wall when the
+        ticker moved and there's size available, then shifts open orders.
+        Stages and exchange calls are timed by GdaxMarketMaker.tracer.
+        :return:
+        """
+        self.cycles += 1
+        if self._wake_time is not None:
+            # Seconds between the first event and the cycle handling it.
+            self.last_reaction = self.clock.time() - self._wake_time
+            self._wake_time = None
+        tracer = self.tracer
+        tracer.start(reaction=self.last_reaction)
+        try:
+            self._cycle(tracer)
+        finally:
+            tracer.finish(orders=len(self._orders))
+
+    def _cycle(self, tracer):
+        with tracer.stage('handle_fills'):
+            self.handle_fills()
+        with tracer.stage('snapshot'):
             snap = self.get_book_snapshot()
             wall_size = self.wall_size
             bid = float(snap.lowest_ask[0])
             bids = snap.bids
+        with tracer.stage('position_size'):
             size_avail = self.position_size
-            tick_price = self.ticker_price
-            new_orders = list()
-            tick_change = self.ticker_changed('run', min_change=0.01)
-
-            if size_avail > 0.01 and bids and tick_change:
-                spend_avail = size_avail * tick_price
-                size_avail = spend_avail / bid
-                logger.debug("Spend available: {}\n"
-                             "Size Available: {}\n".format(
-                    spend_avail, size_avail))
-
-                bid_idx = None
-                for idx, data in enumerate(snap.bids):
-                    price, size, o_id = data
-                    if size >= wall_size and idx >= 3:
-                        bid_idx = idx-1
-                        break
-
-                if bid_idx:
-                    b_price, b_size, b_id = bids[bid_idx]
-                    while not b_price:
-                        bid_idx += 1
-                        try:
-                            b_price, b_size, b_id = bids[bid_idx]
-                        except IndexError:
-                            continue
+        tick_price = self.ticker_price
+        new_orders = list()
+        tick_change = self.ticker_changed('run', min_change=0.01)
 
+        if size_avail > 0.01 and bids and tick_change:
+            spend_avail = size_avail * tick_price
+            size_avail = spend_avail / bid
+            logger.debug("Spend available: {}\n"
+                         "Size Available: {}\n".format(
+                spend_avail, size_avail))
+
+            wall = self.book_feed.get_nearest_wall('buy', size=wall_size, skip_top=True)
+
+            if wall is not None:
+                # Just above the wall.
+                b_price = round(wall[0] + 0.01, 2)
+                with tracer.stage('place_order'):
                     o = self.place_order(b_price,
                                          size_avail,
                                          side='buy',
                                          aggressive=False,
                                          adjust_vs_open=True,
                                          check_ticker=True)
-                    new_orders.append(o.id)
+                new_orders.append(o.id)
 
 
-                else:
-                    logger.debug("No bid index found so no buy.")
-
-                self.register_order_cycle()
-
             else:
-                logger.debug("{} open buy orders\n"
-                             "{} open sell orders\n"
-                             "ticker ${}\n"
-                             "allowed positiion size: {}".format(
-                              len(self.buy_orders), len(self.sell_orders),
-                              tick_price, size_avail))
+                logger.debug("No bid wall found so no buy.")
+
+            self.register_order_cycle()
 
+        else:
+            logger.debug("{} open buy orders\n"
+                         "{} open sell orders\n"
+                         "ticker ${}\n"
+                         "allowed positiion size: {}".format(
+                          len(self.buy_orders), len(self.sell_orders),
+                          tick_price, size_avail))
+
+        with tracer.stage('shift_orders'):
             self.shift_orders(exclude=new_orders)
+        with tracer.stage('handle_high_freq_orders'):
             self.handle_high_freq_orders()
-            sleep(self.interval)
-
-        self.book_feed.close()
 
     def close_open_buy_orders(self, raise_errs=True):
         """
@@ -0,0 +1,168 @@
+"""
+MIT License
+
+Copyright (c) 2017 Zeke Barge
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import logging as lg
+from collections import OrderedDict
+from threading import Thread
+from stocklook.utils.scheduler import RequestScheduler
+from stocklook.crypto.gdax.feeds.multi_book_feed import GdaxMultiBookFeed
+from stocklook.crypto.gdax.feeds.user_feed import GdaxUserFeed
+
+logger = lg.getLogger(__name__)
+
+
+class GdaxMarketMakerOrchestrator:
+    """
+    Runs a GdaxMarketMaker per product in one process, each on its own thread.
+
+    The market makers share:
+        - one full channel socket (a GdaxMultiBookFeed)
+        - one user channel socket and its GdaxOrderEventBus (a GdaxUserFeed)
+        - one RequestScheduler holding the account's API rate budget.
+          Each market maker's Gdax object (see Gdax.with_scheduler) gets a
+          fair share of it, and the book feed's reloads get their own share.
+
+    Example:
+        o = GdaxMarketMakerOrchestrator({'BTC-USD': dict(spend_pct=0.02),
+                                         'ETH-USD': dict(max_open_buys=3)},
+                                        gdax=Gdax(), min_spread=0.05)
+        o.run()
+    """
+    BOOK_CLIENT = 'book_feed'
+
+    def __init__(self, products, gdax=None, rate=3, weights=None,
+                 scheduler=None, book_feed=None, user_feed=None,
+                 warmup=10, market_maker_cls=None, **market_maker_kwargs):
+        """
+        :param products: (list, dict)
+            Product ids or {product_id: GdaxMarketMaker(**kwargs)} overriding
+            :param market_maker_kwargs for that product.
+        :param gdax: (stocklook.crypto.gdax.api.Gdax, default None)
+            None creates a default object.
+        :param rate: (int, float, default 3)
+            Requests per second shared by all market makers.
+        :param weights: (dict, default None)
+            {product_id: weight} relative shares of :param rate (default 1 each).
+        :param scheduler: (stocklook.utils.scheduler.RequestScheduler, default None)
+            None creates one from :param rate and :param weights.
+        :param book_feed: (stocklook.crypto.gdax.feeds.multi_book_feed.GdaxMultiBookFeed, default None)
+            None creates one for the products.
+        :param user_feed: (stocklook.crypto.gdax.feeds.user_feed.GdaxUserFeed, default None)
+            None creates one for the products.
+        :param warmup: (int, float, default 10)
+            Seconds to let the books load before the first order cycles.
+        :param market_maker_cls: (class, default GdaxMarketMaker)
+        :param market_maker_kwargs: GdaxMarketMaker(**kwargs) for every product.
+        """
+        if market_maker_cls is None:
+            from stocklook.crypto.gdax.market_maker import GdaxMarketMaker
+            market_maker_cls = GdaxMarketMaker
+        if gdax is None:
+            from stocklook.crypto.gdax.api import Gdax
+            gdax = Gdax()
+        if not hasattr(products, 'items'):
+            products = OrderedDict((p, dict()) for p in products)
+        product_ids = list(products.keys())
+
+        if scheduler is None:
+            scheduler = RequestScheduler(rate=rate, weights=weights)
+        if book_feed is None:
+            book_feed = GdaxMultiBookFeed(product_ids,
+                                          gdax=gdax.with_scheduler(scheduler, self.BOOK_CLIENT))
+        if user_feed is None:
+            user_feed = GdaxUserFeed(products=product_ids, gdax=gdax)
+
+        self.gdax = gdax
+        self.scheduler = scheduler
+        self.book_feed = book_feed
+        self.user_feed = user_feed
+        self.warmup = warmup
+        self.makers = OrderedDict()
+        self._threads = dict()
+
+        for product_id, kwargs in products.items():
+            kwargs = dict(market_maker_kwargs, **kwargs)
+            self.makers[product_id] = market_maker_cls(
+                book_feed=book_feed.get_book(product_id),
+                product_id=product_id,
+                gdax=gdax.with_scheduler(scheduler, product_id),
+                user_feed=user_feed,
+                **kwargs)
+
+    def __getitem__(self, product_id):
+        return self.makers[product_id]
+
+    def _run_maker(self, product_id):
+        try:
+            self.makers[product_id].loop(warmup=self.warmup)
+        except Exception as e:
+            logger.exception("{} market maker stopped: {}".format(product_id, e))
+
+    def start(self):
+        """
+        Starts the shared feeds and a thread running each market maker's order cycles.
+        """
+        self.user_feed.start()
+        self.book_feed.start()
+        for product_id, maker in self.makers.items():
+            maker.stop = False
+            t = Thread(target=self._run_maker, args=(product_id,),
+                       name='mm-{}'.format(product_id), daemon=True)
+            self._threads[product_id] = t
+            t.start()
+
+    def stop(self):
+        """ Asks every market maker to stop after its current cycle. """
+        for maker in self.makers.values():
+            maker.stop = True
+            maker._wake.set()
+
+    def join(self, timeout=None):
+        for t in self._threads.values():
+            t.join(timeout)
+
+    def close(self):
+        """ Stops the market makers and closes the shared feeds. """
+        self.stop()
+        self.join()
+        self._threads.clear()
+        self.book_feed.close()
+        self.user_feed.close()
+
+    def run(self):
+        """
+        Runs the market makers until they stop (or KeyboardInterrupt).
+        """
+        self.start()
+        try:
+            while any(t.is_alive() for t in self._threads.values()):
+                self.join(timeout=1)
+        except KeyboardInterrupt:
+            logger.info("Stopping market makers.")
+        finally:
+            self.close()
+
+    @property
+    def requests_granted(self):
+        """ {client: requests made} through the shared scheduler. """
+        return dict(self.scheduler.granted)
@@ -23,6 +23,7 @@ SOFTWARE.
 """
 from threading import Thread
 from time import sleep
+from concurrent.futures import Future, CancelledError, TimeoutError as FutureTimeoutError
 from stocklook.utils.timetools import timestamp_from_utc, now
 from .tables import GdaxSQLOrder
 import logging as lg
@@ -160,6 +161,10 @@ class GdaxOrder:
         self.coin_currency, self.base_currency = product.split('-')
         self.order_sys = order_sys
         self._update_time = None
+        self.done_reason = None
+        self._bus = None
+        self._fill_future = None
+        self._fill_callbacks = list()
 
     @property
     def json(self):
@@ -364,6 +369,113 @@ class GdaxOrder:
                              "in GdaxOrderSides"
                              "({})".format(t, GdaxOrderSides.LIST))
 
+    def attach(self, bus):
+        """
+        Keeps the order up to date from a GdaxOrderEventBus (fed by
+        the user channel) instead of polling the API. The order must
+        have been posted.
+
+        :param bus: (stocklook.crypto.gdax.feeds.user_feed.GdaxOrderEventBus)
+        """
+        if self.id is None:
+            raise AttributeError("Post the order before attaching it to an event bus.")
+        self.detach()
+        self._bus = bus
+        if self.status in (None, 'pending', 'open', 'active'):
+            # The bus drops messages about orders it has no state for
+            # (e.g. orders loaded through the API).
+            bus.seed(self.id, self.get_event_state())
+        bus.subscribe(self.id, self.on_event)
+        # Messages may have arrived before we subscribed.
+        state = bus.get_state(self.id)
+        if state is not None:
+            self.on_event(None, state)
+
+    def get_event_state(self):
+        """
+        Returns the order as a GdaxOrderEventBus state.
+        """
+        size = float(self.size or 0)
+        filled = float(self.filled_size or 0)
+        return dict(id=self.id,
+                    status=self.status or 'pending',
+                    side=self.side,
+                    price=float(self.price or 0),
+                    size=size,
+                    remaining_size=max(size - filled, 0.0),
+                    filled_size=filled,
+                    executed_value=float(self.executed_value or 0),
+                    done_reason=getattr(self, 'done_reason', None))
+
+    def detach(self):
+        """
+        Unsubscribes the order from its GdaxOrderEventBus.
+        """
+        if self._bus is not None:
+            self._bus.unsubscribe(self.id, self.on_event)
+            self._bus = None
+
+    def on_event(self, message, state):
+        """
+        GdaxOrderEventBus listener updating the order
+        from its state and resolving fill callbacks.
+        """
+        if state is None:
+            return
+        self.filled_size = state['filled_size']
+        self.executed_value = state['executed_value']
+        if state['size']:
+            self.size = state['size']
+        status = state['status']
+        if status == 'done':
+            self.done_reason = state['done_reason']
+            if self.done_reason == 'canceled':
+                status = 'canceled'
+        if status == 'pending' and self.status == 'open':
+            # A late received message.
+            return
+        self.status = status
+        self._update_time = now()
+        if status == 'done':
+            self._resolve_fill()
+        elif status == 'canceled':
+            future = self.fill_future
+            if not future.done():
+                future.cancel()
+
+    @property
+    def fill_future(self):
+        """
+        A concurrent.futures.Future resolved with the order once it's
+        filled (or cancelled with it). Resolved by GdaxOrder.attach'd
+        event buses, GdaxOrder.is_filled or GdaxOrder.wait_for_fill.
+        """
+        if self._fill_future is None:
+            self._fill_future = Future()
+        return self._fill_future
+
+    def add_fill_callback(self, func):
+        """
+        Calls func(order) once when the order is filled
+        (immediately if it already has been).
+        """
+        if self.fill_future.done() and not self.fill_future.cancelled():
+            func(self)
+        else:
+            self._fill_callbacks.append(func)
+
+    def _resolve_fill(self):
+        future = self.fill_future
+        if future.done():
+            return
+        future.set_result(self)
+        callbacks, self._fill_callbacks = self._fill_callbacks, list()
+        for func in callbacks:
+            try:
+                func(self)
+            except Exception as e:
+                log.error("Fill callback {} failed for {}: {}".format(func, self.id, e))
+
     def is_posted(self) -> bool:
         """
         Returns True when status and id
@@ -389,13 +501,32 @@ class GdaxOrder:
         if self.is_cancelled() or not self.is_posted():
             return False
         elif self.status and self.status == 'done':
+            self._resolve_fill()
             return True
+        elif self._bus is not None:
+            # Kept up to date by the event bus.
+            return False
 
         if update:
             self.update()
 
+        if self.status == 'done':
+            self._resolve_fill()
         return self.status and self.status not in ['canceled', 'open']
 
+    def sync(self):
+        """
+        Updates the order through the API even when it's attached
+        to an event bus (which may have missed messages while the
+        socket was down), resolving fill callbacks.
+        :return: (bool) True if the order is filled.
+        """
+        self.update()
+        if self.status == 'done':
+            self._resolve_fill()
+            return True
+        return False
+
     def wait_for_fill(self, interval=30, timeout=60*60, cancel=False):
         """
         Checks with the API on an interval to see if the order has been
@@ -418,8 +549,25 @@ class GdaxOrder:
             When the order has been magically filled during cancellation.
             Only can occur if :param cancel=True.
 
+        When attached to an event bus this waits on GdaxOrder.fill_future
+        instead of checking the API.
+
         :return:
         """
+        if self._bus is not None:
+            try:
+                self.fill_future.result(timeout=timeout or None)
+                return
+            except FutureTimeoutError:
+                if cancel:
+                    self.cancel()
+                msg = 'Order(id={}, type={}, ' \
+                      'size={}, price={})'.format(self.id, self.order_type,
+                                                  self.size, self.price)
+                raise GdaxOrderFillTimeout(msg)
+            except CancelledError:
+                return
+
         wait_time = 0
         while not self.is_filled():
             if self.is_cancelled():
@@ -460,6 +608,9 @@ class GdaxOrder:
             raise GdaxOrderCancellationError(fail_reason)
 
         self.status = 'canceled'
+        self.detach()
+        if self._fill_future is not None and not self._fill_future.done():
+            self._fill_future.cancel()
         return res
 
     def post(self, sql_obj=None, verify_balance=True):
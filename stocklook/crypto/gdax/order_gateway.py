@@ -0,0 +1,235 @@
+"""
+MIT License
+
+Copyright (c) 2017 Zeke Barge
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import logging as lg
+from itertools import count
+from threading import Thread, Lock
+from queue import PriorityQueue, Empty
+from concurrent.futures import Future, wait as futures_wait
+from stocklook.utils.metrics import NULL_TRACER
+
+logger = lg.getLogger(__name__)
+
+
+class GdaxOrderGateway:
+    """
+    Posts and cancels orders on a pool of worker threads.
+
+    Requests still go through the rate limited Gdax API calls, but they
+    no longer wait on each other's round trips. Queued cancels always
+    run before queued posts so stale orders leave the book first.
+    Every request returns a concurrent.futures.Future. The worker updates
+    the GdaxOrder (GdaxOrder.post/GdaxOrder.cancel) before the future resolves.
+
+    workers=0 queues requests until GdaxOrderGateway.flush (or wait)
+    runs them in priority order on the calling thread - handy
+    for simulations and tests.
+
+    Example:
+        with GdaxOrderGateway(gdax, workers=4) as gateway:
+            futures = [gateway.replace(old, new) for old, new in pairs]
+            gateway.wait(futures)
+    """
+    CANCEL = 0
+    POST = 1
+    _STOP = 99
+
+    def __init__(self, gdax=None, workers=4, tracer=None):
+        """
+        :param gdax: (stocklook.crypto.gdax.api.Gdax, default None)
+            Used by GdaxOrderGateway.cancel_all. None creates a default object when needed.
+        :param workers: (int, default 4)
+            The number of worker threads. 0 runs requests on GdaxOrderGateway.flush.
+        :param tracer: (stocklook.utils.metrics.CycleTracer, default None)
+            Times each post and cancel as 'post' and 'cancel' calls.
+            None uses a disabled tracer (GdaxMarketMaker shares its own).
+        """
+        self._gdax = gdax
+        self.workers = workers
+        self.tracer = NULL_TRACER if tracer is None else tracer
+        self._queue = PriorityQueue()
+        self._seq = count()
+        self._threads = list()
+        self._lock = Lock()
+        self.stats = dict(cancels=0, posts=0, errors=0)
+
+    @property
+    def gdax(self):
+        if self._gdax is None:
+            from stocklook.crypto.gdax.api import Gdax
+            self._gdax = Gdax()
+        return self._gdax
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        """ Starts the worker threads (if not started). """
+        if self._threads or not self.workers:
+            return
+        for i in range(self.workers):
+            t = Thread(target=self._work, name='GdaxOrderGateway-{}'.format(i), daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def close(self):
+        """ Finishes queued requests and stops the worker threads. """
+        if not self._threads:
+            self.flush()
+            return
+        for _ in self._threads:
+            self._queue.put((self._STOP, next(self._seq), None, None))
+        for t in self._threads:
+            t.join()
+        self._threads = list()
+
+    def _submit(self, priority, func, future=None):
+        if future is None:
+            future = Future()
+        if self.workers and not self._threads:
+            self.start()
+        self._queue.put((priority, next(self._seq), func, future))
+        return future
+
+    def _run(self, priority, func, future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = func()
+        except Exception as e:
+            with self._lock:
+                self.stats['errors'] += 1
+            future.set_exception(e)
+        else:
+            key = 'cancels' if priority == self.CANCEL else 'posts'
+            with self._lock:
+                self.stats[key] += 1
+            future.set_result(result)
+
+    def _work(self):
+        while True:
+            priority, _, func, future = self._queue.get()
+            if priority == self._STOP:
+                break
+            self._run(priority, func, future)
+
+    def flush(self):
+        """
+        Runs queued requests on the calling thread
+        (only needed when workers=0).
+        """
+        if self._threads:
+            return
+        while True:
+            try:
+                priority, _, func, future = self._queue.get_nowait()
+            except Empty:
+                break
+            self._run(priority, func, future)
+
+    def wait(self, futures, timeout=None):
+        """
+        Waits for :param futures to finish.
+        :return: concurrent.futures.wait(futures, timeout)
+        """
+        self.flush()
+        return futures_wait(futures, timeout=timeout)
+
+    def post(self, order):
+        """
+        Queues GdaxOrder.post.
+        :return: (Future) resolves to the order.
+        """
+        def func():
+            with self.tracer.call('post'):
+                order.post()
+            return order
+        return self._submit(self.POST, func)
+
+    def cancel(self, order):
+        """
+        Queues GdaxOrder.cancel ahead of any posts.
+        :return: (Future) resolves to the cancel response.
+        """
+        def func():
+            with self.tracer.call('cancel'):
+                return order.cancel()
+        return self._submit(self.CANCEL, func)
+
+    def replace(self, old_order, new_order):
+        """
+        Cancels :param old_order and then posts :param new_order.
+        The new order isn't posted if the cancel fails. In that case
+        the future raises the cancel error (a GdaxAPIError containing
+        'done' means the old order filled).
+        :return: (Future) resolves to the new order.
+        """
+        future = Future()
+        future.set_running_or_notify_cancel()
+
+        def post():
+            with self.tracer.call('post'):
+                new_order.post()
+            return new_order
+
+        def cancel():
+            with self.tracer.call('cancel'):
+                old_order.cancel()
+            self._submit(self.POST, post, future=_Chained(future))
+
+        def on_cancel(f):
+            e = f.exception()
+            if e is not None:
+                future.set_exception(e)
+
+        self._submit(self.CANCEL, cancel).add_done_callback(on_cancel)
+        return future
+
+    def cancel_all(self, product_id=None):
+        """
+        Queues Gdax.cancel_all_orders(product_id) ahead of any posts.
+        :return: (Future) resolves to the list of canceled order ids.
+        """
+        def func():
+            with self.tracer.call('cancel_all'):
+                return self.gdax.cancel_all_orders(product_id)
+        return self._submit(self.CANCEL, func)
+
+
+class _Chained(Future):
+    """ A Future that copies its outcome into another (already running) Future. """
+    def __init__(self, target):
+        super(_Chained, self).__init__()
+        self._target = target
+        self.add_done_callback(self._copy)
+
+    def _copy(self, f):
+        e = f.exception()
+        if e is not None:
+            self._target.set_exception(e)
+        else:
+            self._target.set_result(f.result())
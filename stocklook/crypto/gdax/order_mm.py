@@ -25,6 +25,7 @@ import logging
 from functools import partial
 from stocklook.config import config
 from stocklook.crypto.gdax.order import GdaxOrder, GdaxOrderCancellationError
+from stocklook.crypto.gdax.order_registry import get_free_price, sorted_within
 logger = logging.getLogger(__name__)
 logger.setLevel(config.get('LOG_LEVEL', logging.DEBUG))
 
@@ -73,11 +74,44 @@ class GdaxMMOrder(GdaxOrder):
         self._unlock_method = None
         self._cycle_number = 0
         self._targ_order = None
+        self._registry = None
         self.min_profit = kwargs.pop('min_profit', 0.01)
         self.min_step = kwargs.pop('min_step', 0.01)
 
         GdaxOrder.__init__(self, *args, **kwargs)
 
+    @property
+    def price(self):
+        return GdaxOrder.price.fget(self)
+
+    @price.setter
+    def price(self, x):
+        GdaxOrder.price.fset(self, x)
+        self._reindex()
+
+    @property
+    def side(self):
+        return self._side
+
+    @side.setter
+    def side(self, x):
+        self._side = x
+        self._reindex()
+
+    @property
+    def status(self):
+        return self._status
+
+    @status.setter
+    def status(self, x):
+        self._status = x
+        self._reindex()
+
+    def _reindex(self):
+        # Keeps GdaxOrderRegistry indexes current.
+        if self._registry is not None:
+            self._registry.reindex(self)
+
     @property
     def buying(self):
         return self.side == 'buy'
@@ -149,6 +183,7 @@ class GdaxMMOrder(GdaxOrder):
         if x:
             assert x in self.TARGET_TYPES
             self._target_type = x
+            self._reindex()
 
     @property
     def wall_size(self):
@@ -363,7 +398,7 @@ class GdaxMMOrder(GdaxOrder):
 
     def get_price_incremented(self,
                               p,
-                              other_prices,
+                              other_prices=None,
                               cap_out=None,
                               increment=True,
                               step=0.03,
@@ -374,8 +409,10 @@ class GdaxMMOrder(GdaxOrder):
 
         :param p: (float)
             The price to manipulate.
-        :param other_prices: (list)
+        :param other_prices: (list, default None)
             The other prices to evaluate. The return price should not be
+            within 1 step of them. None uses the market maker's other
+            orders on the same side (see GdaxOrderRegistry.get_free_price).
         :param cap_out:
         :param increment:
         :param step:
@@ -384,25 +421,13 @@ class GdaxMMOrder(GdaxOrder):
         :return:
         """
 
-        # make a range around the current price by 1 step
-        max_p = p + step
-        min_p = p - step
-        check_p = [x for x in other_prices
-                   if x > min_p and x < max_p]
-        p = round(p, 2)
-
-        while check_p:
-            if increment:
-                p += step
-            else:
-                p -= step
-            # refresh the range based on the new
-            p = round(p, 2)
-            max_p = p + step
-            min_p = p - step
-            check_p = [x for x in other_prices
-                       if x >= min_p
-                       and x <= max_p]
+        if other_prices is None:
+            p = self.m._orders.get_free_price(self.side, p, step,
+                                              increment=increment,
+                                              exclude=self)
+        else:
+            other_prices = sorted(other_prices)
+            p = get_free_price(sorted_within(other_prices), p, step, increment)
 
         if cap_out is not None and _force is False:
             # Check to see if price has exceeded the cap
@@ -429,7 +454,7 @@ class GdaxMMOrder(GdaxOrder):
         if self.selling and min_profit is not None:
             # We dont want to sell below minimum spread vs our
             # buy order unless we're stopped out.
-            p2 = self.get_price_target_via_op(min_profit)
+            p2 = round(self.get_price_target_via_op(min_profit), 2)
             if p > self.stop_amount:
                 # not stopped out
                 # so we'll check profit
@@ -461,6 +486,7 @@ class GdaxMMOrder(GdaxOrder):
         """
         if other_prices is None:
             other_prices = self.get_other_order_prices(side=self.side)
+        other_prices = sorted(other_prices)
 
         my_min = self.get_price_adjusted_to_spread(spread=None,
                                                    aggressive=aggressive,
@@ -485,8 +511,8 @@ class GdaxMMOrder(GdaxOrder):
 
             return _adj_price(p, other_prices, increment=increment, step=s)
 
-        min_price = min(other_prices)
-        max_price = max(other_prices)
+        min_price = other_prices[0]
+        max_price = other_prices[-1]
         max_and_step = max_price + step
         min_and_step = min_price - step
 
@@ -539,12 +565,11 @@ class GdaxMMOrder(GdaxOrder):
 
     def get_other_order_prices(self, side='buy'):
         """
-        Returns a list of order prices for a given side (buy or sell).
+        Returns a sorted list of order prices for a given side (buy or sell).
         :param side:
         :return:
         """
-        return [round(o.price, 2) for o in self.m._orders.values()
-                if o.side == side and o.id != self.id]
+        return self.m._orders.get_prices(side, exclude=self)
 
     def get_price_adjusted_to_ticker(self, price=None, ticker=None, aggressive=True, adjust_vs_open=True):
         """
@@ -588,10 +613,8 @@ class GdaxMMOrder(GdaxOrder):
             elif price <= ticker_price:
                 price = ticker_price + spread
 
-        o_prices = self.get_other_order_prices(side=self.side)
-
         return self.get_price_incremented(price,
-                                          o_prices,
+                                          None,
                                           # increment should be safe here
                                           # as we're forcing price lower on buys
                                           # and higher on sells
@@ -599,38 +622,35 @@ class GdaxMMOrder(GdaxOrder):
                                           step=spread,
                                           _force=True)
 
-    def get_price_adjusted_to_wall(self, snap=None, min_idx=2, wall_size=50, bump_value=0.01):
+    def get_price_adjusted_to_wall(self, skip_top=False, wall_size=50, bump_value=0.01):
         """
         Returns the price nearest the wall, sell order placed just below the wall
-        and buy orders placed just above the wall.
-        :param min_idx:
+        and buy orders placed just above the wall. Walls are price levels
+        from the market maker's GdaxBookFeed.walls index.
+        :param skip_top: (bool, default False)
+            True ignores a wall at the best bid/ask.
         :param wall_size:
         :param bump_value:
-        :return:
+        :return: (float, None) None when there's no wall near the spread.
         """
-        if snap is None:
-            snap = self.m.get_book_snapshot(refresh=True)
-        data = (snap.bids if self.side == 'buy' else snap.asks)
-
-        for idx, contents in enumerate(data):
-            # minimum size and index position
-            if contents[1] >= wall_size and idx >= min_idx:
-                w = contents[0]
-                if self.side == 'buy':
-
-                    if idx == 0:
-                        # first index we'd market buy
-                        return w - bump_value
-
-                    # price above the wall
-                    return w + bump_value
-                else:
-
-                    if idx == 0:
-                        # first index we'd market buy
-                        return w + bump_value
-                    # price below the wall
-                    return w - bump_value
+        feed = self.m.book_feed
+        wall = feed.get_nearest_wall(self.side, size=wall_size, skip_top=skip_top)
+        if wall is None:
+            return None
+        w = wall[0]
+        at_top = w == feed.get_top_price(self.side)
+        if self.side == 'buy':
+            if at_top:
+                # in front of it we'd market buy
+                return w - bump_value
+            # price above the wall
+            return w + bump_value
+        else:
+            if at_top:
+                # in front of it we'd market sell
+                return w + bump_value
+            # price below the wall
+            return w - bump_value
 
     def register_target_order(self, order=None, price=None, size=None, lock=True, override=False):
         """
@@ -691,7 +711,7 @@ class GdaxMMOrder(GdaxOrder):
 
     def get_price_adjusted_to_wall_and_target_type(
             self, p=None, side=None, wall_size=None, step=None,
-            min_wall_idx=0, min_profit=None,
+            skip_top_wall=False, min_profit=None,
             adj_vs_open=True):
         """
         Adjusts order price if needed to avoid market buying at a minimum.
@@ -701,7 +721,8 @@ class GdaxMMOrder(GdaxOrder):
         :param side:
         :param wall_size:
         :param step:
-        :param min_wall_idx:
+        :param skip_top_wall: (bool, default False)
+            True ignores a wall at the best bid/ask.
         :param min_profit:
         :param adj_vs_open:
         :return:
@@ -712,16 +733,17 @@ class GdaxMMOrder(GdaxOrder):
         min_profit = (self.min_profit if not min_profit else min_profit)
         side = (self.side if side is None else side)
 
-        op = self.get_other_order_prices(side=self.side)
-        s = self.m.get_book_snapshot(refresh=True)
-        bprice, bsize, bid = s.highest_bid
-        aprice, asize, aid = s.lowest_ask
+        feed = self.m.book_feed
+        bprice = feed.get_top_price('buy')
+        aprice = feed.get_top_price('sell')
 
         wall_adj_price = self.get_price_adjusted_to_wall(
-            snap=s, min_idx=min_wall_idx,
+            skip_top=skip_top_wall,
             wall_size=wall_size, bump_value=step)
+        if wall_adj_price is None:
+            wall_adj_price = p
         owall_adj_price = self.get_price_incremented(
-            wall_adj_price, op,
+            wall_adj_price, None,
             step=step,
             increment=self.selling,
             min_profit=min_profit,
@@ -740,7 +762,7 @@ class GdaxMMOrder(GdaxOrder):
 
         if adj_vs_open:
             p = self.get_price_incremented(
-                p, op,
+                p, None,
                 step=step,
                 increment=side == 'sell',
                 min_profit=min_profit,
@@ -763,7 +785,7 @@ class GdaxMMOrder(GdaxOrder):
 
         self.price = self.get_price_incremented(
             self.price,
-            self.get_other_order_prices(self.side),
+            None,
             increment=self.selling,
             step=self.min_step,
             min_profit=self.min_profit,
@@ -0,0 +1,313 @@
+"""
+MIT License
+
+Copyright (c) 2017 Zeke Barge
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from bisect import bisect_left, bisect_right
+from threading import RLock
+from collections.abc import MutableMapping
+
+
+class GdaxOrderRegistry(MutableMapping):
+    """
+    A dictionary of {order id: GdaxOrder} indexed by side,
+    status, target_type and sorted price.
+
+    GdaxMMOrder objects reindex themselves when their price, side,
+    status or target_type changes while registered. Other orders
+    must be passed to GdaxOrderRegistry.reindex after changing.
+
+    Orders updated by an event bus reindex themselves from the
+    feed's thread so the indexes are guarded by a lock.
+
+    Example:
+        reg = GdaxOrderRegistry()
+        reg[order.id] = order
+        reg.get_orders(side='buy', status='open')
+        reg.get_nearest_price('sell', 101.5)
+        reg.get_free_price('buy', 99.0, step=0.03, increment=False)
+    """
+    def __init__(self, orders=None):
+        """
+        :param orders: (dict, default None) {order id: GdaxOrder}
+        """
+        self._lock = RLock()
+        self._orders = dict()
+        self._keys = dict()  # id: (side, status, target_type, price)
+        self._index = dict(side=dict(), status=dict(), target_type=dict())
+        self._prices = dict()  # side: sorted [price]
+        self._price_ids = dict()  # side: [id] in GdaxOrderRegistry._prices order
+        if orders:
+            self.update(orders)
+
+    # ------------------------------------------------
+    # Mapping
+    # ------------------------------------------------
+
+    def __getitem__(self, order_id):
+        return self._orders[order_id]
+
+    def __setitem__(self, order_id, order):
+        with self._lock:
+            if order_id in self._orders:
+                self._remove(order_id)
+            self._orders[order_id] = order
+            self._add(order_id, order)
+        try:
+            order._registry = self
+        except AttributeError:
+            pass
+
+    def __delitem__(self, order_id):
+        with self._lock:
+            order = self._orders.pop(order_id)
+            self._remove(order_id)
+        if getattr(order, '_registry', None) is self:
+            order._registry = None
+
+    def pop(self, order_id, *default):
+        with self._lock:
+            return super(GdaxOrderRegistry, self).pop(order_id, *default)
+
+    def __contains__(self, order_id):
+        return order_id in self._orders
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._orders))
+
+    def __len__(self):
+        return len(self._orders)
+
+    def __repr__(self):
+        return 'GdaxOrderRegistry({})'.format(self._orders)
+
+    def copy(self):
+        """ Returns a dict copy of the orders. """
+        with self._lock:
+            return dict(self._orders)
+
+    # ------------------------------------------------
+    # Indexes
+    # ------------------------------------------------
+
+    @staticmethod
+    def _get_keys(order):
+        price = order.price
+        if price is not None:
+            price = round(float(price), 2)
+        return (order.side, order.status,
+                getattr(order, 'target_type', None), price)
+
+    def _add(self, order_id, order):
+        keys = self._get_keys(order)
+        side, status, target_type, price = keys
+        self._keys[order_id] = keys
+        for name, value in zip(('side', 'status', 'target_type'), keys[:3]):
+            self._index[name].setdefault(value, set()).add(order_id)
+        if price is not None:
+            prices = self._prices.setdefault(side, list())
+            ids = self._price_ids.setdefault(side, list())
+            idx = bisect_right(prices, price)
+            prices.insert(idx, price)
+            ids.insert(idx, order_id)
+
+    def _remove(self, order_id):
+        keys = self._keys.pop(order_id)
+        side, status, target_type, price = keys
+        for name, value in zip(('side', 'status', 'target_type'), keys[:3]):
+            ids = self._index[name][value]
+            ids.discard(order_id)
+            if not ids:
+                del self._index[name][value]
+        if price is not None:
+            prices, ids = self._prices[side], self._price_ids[side]
+            idx = bisect_left(prices, price)
+            idx += ids[idx:bisect_right(prices, price)].index(order_id)
+            del prices[idx]
+            del ids[idx]
+
+    def reindex(self, order):
+        """
+        Updates the indexes of a registered order
+        after its price, side, status or target_type changed.
+        """
+        order_id = order.id
+        with self._lock:
+            if self._orders.get(order_id, None) is not order:
+                return
+            if self._keys[order_id] != self._get_keys(order):
+                self._remove(order_id)
+                self._add(order_id, order)
+
+    def get_ids(self, side=None, status=None, target_type=None):
+        """
+        Returns a set of the order ids matching every
+        index value that isn't None.
+        """
+        with self._lock:
+            sets = [self._index[name].get(value, set())
+                    for name, value in (('side', side),
+                                        ('status', status),
+                                        ('target_type', target_type))
+                    if value is not None]
+            if not sets:
+                return set(self._orders)
+            sets.sort(key=len)
+            return sets[0].intersection(*sets[1:])
+
+    def get_orders(self, side=None, status=None, target_type=None):
+        """
+        Returns a dictionary of {order id: GdaxOrder} matching
+        every index value that isn't None.
+        """
+        with self._lock:
+            ids = self.get_ids(side=side, status=status, target_type=target_type)
+            return {o_id: self._orders[o_id] for o_id in ids}
+
+    def count(self, side=None, status=None, target_type=None):
+        return len(self.get_ids(side=side, status=status, target_type=target_type))
+
+    # ------------------------------------------------
+    # Prices
+    # ------------------------------------------------
+
+    def get_prices(self, side, exclude=None):
+        """
+        Returns a sorted list of the order prices on :param side.
+        :param exclude: (GdaxOrder, str, default None)
+            An order (or order id) to leave out.
+        """
+        with self._lock:
+            prices = self._prices.get(side, [])
+            exclude = _get_id(exclude)
+            if exclude is None or exclude not in self._keys:
+                return list(prices)
+            ids = self._price_ids[side]
+            return [p for p, o_id in zip(prices, ids) if o_id != exclude]
+
+    def get_lowest(self, side=None):
+        """ Returns the order with the lowest price or None. """
+        with self._lock:
+            sides = [side] if side is not None else list(self._prices)
+            best = None
+            for s in sides:
+                ids = self._price_ids.get(s, None)
+                if ids:
+                    order = self._orders[ids[0]]
+                    if best is None or order.price < best.price:
+                        best = order
+            return best
+
+    def _count_within(self, side, low, high, inclusive=True, exclude=None):
+        with self._lock:
+            prices = self._prices.get(side, None)
+            if not prices:
+                return 0
+            if inclusive:
+                start, end = bisect_left(prices, low), bisect_right(prices, high)
+            else:
+                start, end = bisect_right(prices, low), bisect_left(prices, high)
+            count = max(end - start, 0)
+            exclude = _get_id(exclude)
+            if count and exclude is not None and exclude in self._keys:
+                keys = self._keys[exclude]
+                price = keys[3]
+                if keys[0] == side and price is not None and \
+                        (low <= price <= high if inclusive else low < price < high):
+                    count -= 1
+            return count
+
+    def has_price_within(self, side, price, step, inclusive=True, exclude=None):
+        """
+        Returns True when an order on :param side is
+        priced within :param step of :param price.
+        """
+        return self._count_within(side, price - step, price + step,
+                                  inclusive=inclusive, exclude=exclude) > 0
+
+    def get_nearest_price(self, side, price, exclude=None):
+        """
+        Returns the order price on :param side closest
+        to :param price or None when there are none.
+        """
+        with self._lock:
+            prices = self._prices.get(side, None)
+            if not prices:
+                return None
+            exclude = _get_id(exclude)
+            ids = self._price_ids[side]
+            idx = bisect_left(prices, price)
+            best = None
+            # Look one order past the excluded one on each side.
+            for i in (idx - 2, idx - 1, idx, idx + 1):
+                if 0 <= i < len(prices) and ids[i] != exclude:
+                    p = prices[i]
+                    if best is None or abs(p - price) < abs(best - price):
+                        best = p
+            return best
+
+    def get_free_price(self, side, price, step, increment=True, exclude=None):
+        """
+        Steps :param price up (or down) by :param step until no other
+        order on :param side is priced within one step of it.
+        See GdaxMMOrder.get_price_incremented.
+        """
+        with self._lock:
+            return get_free_price(partial_within(self, side, exclude), price, step, increment)
+
+
+def _get_id(order):
+    return getattr(order, 'id', order)
+
+
+def partial_within(registry, side, exclude=None):
+    """ Returns within(low, high, inclusive) for GdaxOrderRegistry prices on a side. """
+    def within(low, high, inclusive):
+        return registry._count_within(side, low, high,
+                                      inclusive=inclusive,
+                                      exclude=exclude) > 0
+    return within
+
+
+def sorted_within(prices):
+    """ Returns within(low, high, inclusive) for a sorted list of prices. """
+    def within(low, high, inclusive):
+        if inclusive:
+            return bisect_right(prices, high) > bisect_left(prices, low)
+        return bisect_left(prices, high) > bisect_right(prices, low)
+    return within
+
+
+def get_free_price(within, price, step, increment=True):
+    """
+    Steps :param price by :param step until within(price - step, price + step, inclusive)
+    is False. The first check excludes the range bounds, the rest include them.
+    :return: (float) The price rounded to 2 places.
+    """
+    inclusive = False
+    check = within(price - step, price + step, inclusive)
+    price = round(price, 2)
+    while check:
+        price = round(price + step if increment else price - step, 2)
+        inclusive = True
+        check = within(price - step, price + step, inclusive)
+    return price
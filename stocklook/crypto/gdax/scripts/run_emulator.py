@@ -0,0 +1,57 @@
+"""
+MIT License
+
+Copyright (c) 2017 Zeke Barge
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from time import sleep
+from stocklook.crypto.gdax.emulator import GdaxEmulator
+from stocklook.crypto.gdax.simulation import load_feed_log
+
+# None streams a synthetic order flow, otherwise a GdaxBookFeed(log_to=...) capture.
+CAPTURE_PATH = None
+PORT = 8080
+# Messages per second (None replays a capture at SPEED times its recorded pace).
+RATE = 2000
+SPEED = 10
+
+
+def run_emulator():
+    snapshot, messages = None, None
+    if CAPTURE_PATH is not None:
+        snapshot, messages = load_feed_log(CAPTURE_PATH)
+    emulator = GdaxEmulator(messages, snapshot, port=PORT, rate=RATE, speed=SPEED)
+    emulator.start()
+    print("Serving {} and {}\n"
+          "Point Gdax objects at it with Gdax.set_base_url(url, ws_url).".format(
+           emulator.url, emulator.ws_url))
+    try:
+        while not emulator.finished:
+            sleep(10)
+            print("sent: {} requests: {} dropped: {}".format(
+                emulator.sent, emulator.requests, emulator.dropped))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.close()
+
+
+if __name__ == '__main__':
+    run_emulator()
@@ -0,0 +1,659 @@
+"""
+MIT License
+
+Copyright (c) 2017 Zeke Barge
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Replays recorded full-channel websocket messages through GdaxMarketMaker.
+
+    GdaxBookFeed(log_to=open('btc.pkl', 'wb')) records a feed
+    (pickled messages, optionally preceded by a level 3 book snapshot).
+
+    snapshot, messages = load_feed_log('btc.pkl')
+    sim = MarketMakerSimulation(messages, 'BTC-USD', snapshot=snapshot,
+                                balances={'USD': 10000, 'BTC': 0},
+                                min_spread=0.20, max_spread=0.50)
+    report = sim.run()
+    report.fills, report.summary()
+
+The market maker trades against a SimulatedOrderGateway in place of Gdax:
+resting orders are filled by replayed trades once the size queued ahead of
+them at their price (estimated from the book when they were posted) has
+traded or been cancelled. Time comes from a SimulatedClock which replays
+the messages that arrive during each GdaxMarketMaker.run sleep.
+"""
+import pickle
+import logging as lg
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from itertools import chain
+from time import perf_counter
+from uuid import uuid4
+from stocklook.utils.clock import SimulatedClock
+from stocklook.crypto.gdax.api import GdaxAPIError
+from stocklook.crypto.gdax.account import GdaxAccount
+from stocklook.crypto.gdax.feeds.bar_feed import match_time_to_utc
+from stocklook.crypto.gdax.feeds.book_feed import GdaxBookFeed
+from stocklook.crypto.gdax.feeds.user_feed import GdaxOrderEventBus
+
+logger = lg.getLogger(__name__)
+
+
+def read_feed_log(path):
+    """
+    Yields every object pickled to :param path
+    (the GdaxBookFeed log_to file).
+    """
+    with open(path, 'rb') as fh:
+        while True:
+            try:
+                yield pickle.load(fh)
+            except EOFError:
+                break
+
+
+def load_feed_log(path):
+    """
+    Returns (snapshot, messages) from a feed log. The snapshot is
+    the first record when it's a level 3 book ({'bids', 'asks',
+    'sequence'}) rather than a message, otherwise None.
+    """
+    records = read_feed_log(path)
+    try:
+        first = next(records)
+    except StopIteration:
+        return None, iter(())
+    if 'type' not in first and 'bids' in first:
+        return first, records
+    return None, chain([first], records)
+
+
+def get_message_time(msg):
+    try:
+        return match_time_to_utc(msg['time'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class _Response:
+    """ Stands in for requests.Response. """
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class SimulatedOrderGateway:
+    """
+    Replaces stocklook.crypto.gdax.api.Gdax for a market maker:
+    orders, fills and accounts are kept in memory and resting
+    orders are filled by replayed trades.
+
+    Queue position
+    ------------------
+    When a limit order rests at a price level, the orders already at that
+    level are recorded as queued ahead of it. Trades and cancels of those
+    orders shrink the queue. A trade at the order's price against an order
+    that isn't ahead of it fills it, and any trade through its price
+    fills it completely.
+    """
+    def __init__(self, product_id, clock, balances=None,
+                 maker_fee=0.0, taker_fee=0.003, snapshot=None):
+        """
+        :param product_id: (str) 'BTC-USD', etc.
+        :param clock: (stocklook.utils.clock.SimulatedClock)
+        :param balances: (dict, default {'USD': 10000, coin: 0})
+        :param maker_fee: (float, default 0.0)
+        :param taker_fee: (float, default 0.003)
+        :param snapshot: (dict, default None)
+            The level 3 book GdaxBookFeed initializes from.
+        """
+        coin, currency = product_id.split('-')
+        if balances is None:
+            balances = {currency: 10000.0, coin: 0.0}
+        self.product_id = product_id
+        self.coin = coin
+        self.currency = currency
+        self.clock = clock
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.snapshot = snapshot
+        self.book_feed = None
+        self.user_bus = None
+        self.balances = {k: float(v) for k, v in balances.items()}
+        self.start_balances = dict(self.balances)
+        self.api_key = self.api_secret = self.api_passphrase = ''
+        self.fills = list()
+        self._orders = OrderedDict()  # id: order data
+        self._open = OrderedDict()    # id: order data (resting)
+        self._ahead = dict()          # id: {book order id: size queued ahead}
+        self._ahead_index = dict()    # book order id: set(our order ids)
+        self._trade_id = 0
+
+    # ------------------------------------------------
+    # Gdax API
+    # ------------------------------------------------
+
+    @property
+    def accounts(self):
+        return {c: self.get_account(c) for c in self.balances}
+
+    def get_account(self, currency):
+        bal = self.balances.get(currency, 0.0)
+        data = dict(id=currency, currency=currency, balance=bal,
+                    available=bal, hold=0.0, profile_id='simulation')
+        return GdaxAccount(data, self)
+
+    def sync_accounts(self):
+        pass
+
+    def get_book(self, product, level=2):
+        return self.snapshot
+
+    def post_order(self, order_json):
+        price = float(order_json.get('price', 0) or 0)
+        size = float(order_json.get('size', 0) or 0)
+        side = order_json['side']
+        order = dict(id=str(uuid4()),
+                     price=price,
+                     size=size,
+                     product_id=order_json.get('product_id', self.product_id),
+                     side=side,
+                     stp='dc',
+                     type=order_json.get('type', 'limit'),
+                     time_in_force=order_json.get('time_in_force', 'GTC'),
+                     post_only=False,
+                     created_at=self.clock.time(),
+                     fill_fees=0.0,
+                     filled_size=0.0,
+                     executed_value=0.0,
+                     status='open',
+                     settled=False)
+        self._orders[order['id']] = order
+
+        best = self._get_best(opposite_of=side)
+        crosses = best is not None and (order['type'] == 'market'
+                                        or (side == 'buy' and price >= best)
+                                        or (side == 'sell' and price <= best))
+        self._publish(order, 'received', order_type=order['type'])
+        if crosses:
+            self._fill(order, size, best, liquidity='T')
+        else:
+            self._rest(order)
+            self._publish(order, 'open', remaining_size=size)
+        return dict(order)
+
+    def delete(self, url_extension, **kwargs):
+        order_id = url_extension.split('/')[-1]
+        order = self._orders.get(order_id, None)
+        if order is None:
+            raise GdaxAPIError("<404>: method: delete:{}, "
+                               "{{'message': 'order not found'}}".format(url_extension))
+        if order['status'] == 'done':
+            raise GdaxAPIError("<400>: method: delete:{}, "
+                               "{{'message': 'Order already done'}}".format(url_extension))
+        order['status'] = 'canceled'
+        self._unrest(order_id)
+        self._publish(order, 'done', reason='canceled',
+                      remaining_size=order['size'] - order['filled_size'])
+        return _Response([order_id])
+
+    def cancel_all_orders(self, product_id=None):
+        ids = [o_id for o_id, o in self._open.items()
+               if product_id is None or o['product_id'] == product_id]
+        for o_id in ids:
+            self.delete('orders/{}'.format(o_id))
+        return ids
+
+    def get_orders(self, order_id=None, paginate=True, status='all'):
+        if order_id:
+            try:
+                return dict(self._orders[order_id])
+            except KeyError:
+                raise GdaxAPIError("<404>: method: get:orders/{}, "
+                                   "{{'message': 'NotFound'}}".format(order_id))
+        return [dict(o) for o in self._open.values()]
+
+    def get_fills(self, order_id=None, product_id=None, paginate=True, params=None):
+        fills = [f for f in reversed(self.fills)
+                 if (order_id is None or f['order_id'] == order_id)
+                 and (product_id is None or f['product_id'] == product_id)]
+        return [dict(f) for f in fills]
+
+    # ------------------------------------------------
+    # Matching
+    # ------------------------------------------------
+
+    def _get_best(self, opposite_of):
+        feed = self.book_feed
+        if feed is None or feed._bids is None:
+            return None
+        try:
+            return feed.get_ask() if opposite_of == 'buy' else feed.get_bid()
+        except ValueError:
+            # Empty tree
+            return None
+
+    def _rest(self, order):
+        self._open[order['id']] = order
+        ahead = dict()
+        feed = self.book_feed
+        if feed is not None and feed._bids is not None:
+            if order['side'] == 'buy':
+                level = feed.get_bids(order['price'])
+            else:
+                level = feed.get_asks(order['price'])
+            for o in level or ():
+                ahead[o['id']] = o['size']
+                self._ahead_index.setdefault(o['id'], set()).add(order['id'])
+        self._ahead[order['id']] = ahead
+
+    def _unrest(self, order_id):
+        self._open.pop(order_id, None)
+        for book_id in self._ahead.pop(order_id, dict()):
+            ours = self._ahead_index.get(book_id, None)
+            if ours is not None:
+                ours.discard(order_id)
+                if not ours:
+                    del self._ahead_index[book_id]
+
+    def _reduce_ahead(self, book_id, size=None):
+        """ Shrinks (or removes when size is None) a book
+        order queued ahead of our orders. """
+        for order_id in list(self._ahead_index.get(book_id, ())):
+            ahead = self._ahead[order_id]
+            if size is None or ahead.get(book_id, 0) <= size:
+                ahead.pop(book_id, None)
+                self._ahead_index[book_id].discard(order_id)
+            else:
+                ahead[book_id] -= size
+        if not self._ahead_index.get(book_id, True):
+            del self._ahead_index[book_id]
+
+    def _fill(self, order, size, price, liquidity='M'):
+        remaining = order['size'] - order['filled_size']
+        size = min(size, remaining)
+        if size <= 0:
+            return
+        value = size * price
+        fee = value * (self.maker_fee if liquidity == 'M' else self.taker_fee)
+        if order['side'] == 'buy':
+            self.balances[self.currency] -= value + fee
+            self.balances[self.coin] = self.balances.get(self.coin, 0.0) + size
+        else:
+            self.balances[self.coin] = self.balances.get(self.coin, 0.0) - size
+            self.balances[self.currency] += value - fee
+        order['filled_size'] += size
+        order['executed_value'] += value
+        order['fill_fees'] += fee
+        self._trade_id += 1
+        self.fills.append(dict(created_at=self.clock.time(),
+                               trade_id=self._trade_id,
+                               product_id=order['product_id'],
+                               order_id=order['id'],
+                               price=price,
+                               size=size,
+                               fee=fee,
+                               side=order['side'],
+                               liquidity=liquidity,
+                               settled=True))
+        id_key = 'maker_order_id' if liquidity == 'M' else 'taker_order_id'
+        self._publish(order, 'match', size=size, price=price,
+                      trade_id=self._trade_id, **{id_key: order['id']})
+        if order['filled_size'] >= order['size'] - 1e-12:
+            order['status'] = 'done'
+            order['done_reason'] = 'filled'
+            order['settled'] = True
+            self._unrest(order['id'])
+            self._publish(order, 'done', reason='filled', remaining_size=0.0)
+
+    def _publish(self, order, msg_type, **fields):
+        """ Sends a user channel message about :param order to the user bus. """
+        if self.user_bus is None:
+            return
+        msg = dict(type=msg_type,
+                   time=self.clock.time(),
+                   product_id=order['product_id'],
+                   side=order['side'],
+                   price=order['price'],
+                   size=order['size'])
+        if msg_type != 'match':
+            msg['order_id'] = order['id']
+        msg.update(fields)
+        self.user_bus.publish(msg)
+
+    def on_feed_message(self, msg):
+        """
+        Applies a replayed full-channel message to resting orders.
+        """
+        msg_type = msg.get('type', None)
+        if msg_type == 'match':
+            self._on_match(msg)
+        elif msg_type == 'done':
+            self._reduce_ahead(msg.get('order_id', None))
+        elif msg_type == 'change':
+            try:
+                old, new = float(msg['old_size']), float(msg['new_size'])
+            except (KeyError, TypeError, ValueError):
+                return
+            if new < old:
+                self._reduce_ahead(msg.get('order_id', None), old - new)
+
+    def _on_match(self, msg):
+        if not self._open:
+            return
+        price = float(msg['price'])
+        size = float(msg['size'])
+        maker_id = msg.get('maker_order_id', None)
+        side = msg['side']  # The maker's side.
+
+        for order in list(self._open.values()):
+            if order['side'] != side:
+                continue
+            o_price = order['price']
+            through = o_price > price if side == 'buy' else o_price < price
+            if through:
+                # The market traded past our price.
+                self._fill(order, order['size'], o_price)
+            elif o_price == price and maker_id not in self._ahead[order['id']]:
+                # A maker behind us traded - our turn came first.
+                self._fill(order, size, o_price)
+
+        if maker_id in self._ahead_index:
+            self._reduce_ahead(maker_id, size)
+
+    def get_value(self, price):
+        """ Returns the account value in currency at :param price. """
+        return self.balances.get(self.currency, 0.0) + \
+               self.balances.get(self.coin, 0.0) * price
+
+
+class GdaxReplayBookFeed(GdaxBookFeed):
+    """
+    A GdaxBookFeed reading recorded messages instead of a websocket.
+    Messages are applied to the book (and to the gateway's resting
+    orders) as the SimulatedClock passes their time.
+    """
+    def __init__(self, messages, product_id, gateway):
+        """
+        :param messages: (iterable) Full-channel messages in sequence order.
+        :param product_id: (str)
+        :param gateway: (SimulatedOrderGateway)
+        """
+        GdaxBookFeed.__init__(self, product_id=product_id, gdax=gateway, auth=False)
+        self.gateway = gateway
+        gateway.book_feed = self
+        self._messages = iter(messages)
+        self._pending = None
+        self.finished = False
+        self.replayed = 0
+        self.gaps = 0
+        self.errors = 0
+        self.last_time = None
+
+    def start(self):
+        self.stop = False
+
+    def close(self):
+        self.stop = True
+
+    def peek_time(self):
+        """ Returns the time of the next message or None. """
+        if self._pending is None:
+            try:
+                self._pending = next(self._messages)
+            except StopIteration:
+                self.finished = True
+                return None
+        return get_message_time(self._pending)
+
+    def on_message(self, message):
+        sequence = message.get('sequence', None)
+        if sequence is None:
+            return
+        if self._sequence == -1 and self.gateway.snapshot is None:
+            self.gateway.snapshot = dict(sequence=sequence - 1, bids=[], asks=[])
+        elif self._sequence != -1 and sequence > self._sequence + 1:
+            # A recording gap: carry on rather than reconnecting.
+            self.gaps += 1
+            self._sequence = sequence - 1
+        try:
+            GdaxBookFeed.on_message(self, message)
+        except (AssertionError, KeyError, ValueError, TypeError) as e:
+            self.errors += 1
+            logger.debug("Replay error on {}: {}".format(message, e))
+
+    def replay_until(self, t):
+        """
+        Applies every message with a time at or before :param t.
+        :return: (int) the number of messages applied.
+        """
+        count = 0
+        while True:
+            msg_time = self.peek_time()
+            if self.finished or (msg_time is not None and msg_time > t):
+                break
+            msg, self._pending = self._pending, None
+            if msg_time is not None:
+                self.gateway.clock.set_time(msg_time)
+            self.on_message(msg)
+            self.gateway.on_feed_message(msg)
+            if msg_time is not None:
+                self.last_time = msg_time
+            count += 1
+        self.replayed += count
+        return count
+
+
+class SimulatedUserFeed:
+    """
+    Stands in for stocklook.crypto.gdax.feeds.user_feed.GdaxUserFeed:
+    the SimulatedOrderGateway publishes our order messages straight
+    to the event bus.
+    """
+    def __init__(self, gateway, bus=None):
+        """
+        :param gateway: (SimulatedOrderGateway)
+        :param bus: (GdaxOrderEventBus, default None)
+            None creates a new object.
+        """
+        if bus is None:
+            bus = GdaxOrderEventBus()
+        self.bus = bus
+        self.connections = 0
+        gateway.user_bus = bus
+
+    def start(self):
+        self.connections += 1
+
+    def close(self):
+        pass
+
+
+class SimulationReport:
+    """
+    The outcome of a MarketMakerSimulation.
+    """
+    def __init__(self, gateway, start_price, end_price, latencies,
+                 cycles, feed, wall_seconds, sim_seconds, reactions=()):
+        self.fills = pd.DataFrame(gateway.fills, columns=[
+            'created_at', 'trade_id', 'product_id', 'order_id', 'price',
+            'size', 'fee', 'side', 'liquidity', 'settled'])
+        self.start_balances = gateway.start_balances
+        self.end_balances = dict(gateway.balances)
+        self.start_price = start_price
+        self.end_price = end_price
+        self.start_value = self._value(self.start_balances, gateway, start_price)
+        self.end_value = self._value(self.end_balances, gateway, end_price)
+        self.latencies = np.asarray(latencies, dtype=float)
+        self.reactions = np.asarray(reactions, dtype=float)
+        self.cycles = cycles
+        self.messages = feed.replayed
+        self.gaps = feed.gaps
+        self.errors = feed.errors
+        self.wall_seconds = wall_seconds
+        self.sim_seconds = sim_seconds
+
+    @staticmethod
+    def _value(balances, gateway, price):
+        return balances.get(gateway.currency, 0.0) + \
+               balances.get(gateway.coin, 0.0) * (price or 0.0)
+
+    @property
+    def pnl(self):
+        """ Mark-to-market profit in the quote currency. """
+        return self.end_value - self.start_value
+
+    @property
+    def fees(self):
+        return float(self.fills['fee'].sum()) if not self.fills.empty else 0.0
+
+    def summary(self):
+        lat = self.latencies
+        has_lat = lat.size > 0
+        return OrderedDict([
+            ('messages', self.messages),
+            ('cycles', self.cycles),
+            ('fills', len(self.fills.index)),
+            ('buys', int((self.fills['side'] == 'buy').sum())),
+            ('sells', int((self.fills['side'] == 'sell').sum())),
+            ('fees', round(self.fees, 2)),
+            ('pnl', round(self.pnl, 2)),
+            ('start_value', round(self.start_value, 2)),
+            ('end_value', round(self.end_value, 2)),
+            ('cycle_ms_mean', float(lat.mean() * 1000) if has_lat else None),
+            ('cycle_ms_p50', float(np.percentile(lat, 50) * 1000) if has_lat else None),
+            ('cycle_ms_p99', float(np.percentile(lat, 99) * 1000) if has_lat else None),
+            ('cycle_ms_max', float(lat.max() * 1000) if has_lat else None),
+            ('reaction_s_mean', float(self.reactions.mean()) if self.reactions.size else None),
+            ('reaction_s_max', float(self.reactions.max()) if self.reactions.size else None),
+            ('gaps', self.gaps),
+            ('errors', self.errors),
+            ('sim_seconds', self.sim_seconds),
+            ('wall_seconds', round(self.wall_seconds, 3)),
+        ])
+
+    def __repr__(self):
+        return 'SimulationReport({})'.format(
+            ', '.join('{}={}'.format(k, v) for k, v in self.summary().items()))
+
+
+class MarketMakerSimulation:
+    """
+    Runs GdaxMarketMaker.run against replayed messages
+    with a SimulatedClock and SimulatedOrderGateway.
+
+    The report's cycle latencies are the wall time of each
+    GdaxMarketMaker.cycle and its reactions the simulated seconds
+    between a book event and the cycle that handled it.
+    """
+    def __init__(self, messages, product_id='BTC-USD', snapshot=None,
+                 balances=None, maker_fee=0.0, taker_fee=0.003,
+                 market_maker_cls=None, **market_maker_kwargs):
+        """
+        :param messages: (iterable) Recorded full-channel messages.
+        :param product_id: (str, default 'BTC-USD')
+        :param snapshot: (dict, default None)
+            Level 3 book at the start of the recording.
+            None starts from an empty book.
+        :param balances: (dict, default {'USD': 10000, coin: 0})
+        :param maker_fee: (float, default 0.0)
+        :param taker_fee: (float, default 0.003)
+        :param market_maker_cls: (class, default GdaxMarketMaker)
+        :param market_maker_kwargs: GdaxMarketMaker(**kwargs)
+        """
+        if market_maker_cls is None:
+            from stocklook.crypto.gdax.market_maker import GdaxMarketMaker
+            market_maker_cls = GdaxMarketMaker
+        self.clock = SimulatedClock()
+        self.gateway = SimulatedOrderGateway(product_id, self.clock,
+                                             balances=balances,
+                                             maker_fee=maker_fee,
+                                             taker_fee=taker_fee,
+                                             snapshot=snapshot)
+        self.feed = GdaxReplayBookFeed(messages, product_id, self.gateway)
+        start = self.feed.peek_time()
+        self.clock.advance_to(start or 0.0)
+        self.clock.on_advance(self._on_advance)
+        if not market_maker_kwargs.get('poll_fills', False):
+            market_maker_kwargs.setdefault('user_feed', SimulatedUserFeed(self.gateway))
+        self.market_maker = market_maker_cls(book_feed=self.feed,
+                                             product_id=product_id,
+                                             gdax=self.gateway,
+                                             clock=self.clock,
+                                             **market_maker_kwargs)
+        self.latencies = list()
+        self.reactions = list()
+        self.max_cycles = None
+        self._cycle = self.market_maker.cycle
+        self.market_maker.cycle = self._timed_cycle
+
+    @property
+    def cycles(self):
+        return self.market_maker.cycles
+
+    def _timed_cycle(self):
+        start = perf_counter()
+        try:
+            return self._cycle()
+        finally:
+            self.latencies.append(perf_counter() - start)
+            mm = self.market_maker
+            if mm.last_reaction is not None:
+                self.reactions.append(mm.last_reaction)
+                mm.last_reaction = None
+
+    def _on_advance(self, t):
+        self.feed.replay_until(t)
+        if self.feed.finished or (self.max_cycles and self.cycles >= self.max_cycles):
+            self.market_maker.stop = True
+
+    def _get_price(self):
+        ticker = self.feed.get_current_ticker()
+        if ticker is not None:
+            return float(ticker['price'])
+        best = [p for p in (self.gateway._get_best('buy'),
+                            self.gateway._get_best('sell')) if p is not None]
+        return sum(best) / len(best) if best else None
+
+    def run(self, max_cycles=None):
+        """
+        Runs the market maker until the messages run out.
+        :param max_cycles: (int, default None) Stops early after this many cycles.
+        :return: (SimulationReport)
+        """
+        self.max_cycles = max_cycles
+        wall = perf_counter()
+        sim_start = self.clock.time()
+        # Load the opening book before pricing the starting balances.
+        self.feed.replay_until(sim_start)
+        start_price = self._get_price()
+        self.market_maker.run()
+        return SimulationReport(self.gateway,
+                                start_price=start_price,
+                                end_price=self._get_price(),
+                                latencies=self.latencies,
+                                cycles=self.cycles,
+                                feed=self.feed,
+                                wall_seconds=perf_counter() - wall,
+                                sim_seconds=self.clock.time() - sim_start,
+                                reactions=self.reactions)
@@ -0,0 +1,234 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from stocklook.crypto.gdax.analysis import (Strategy, MACDRSIMaker, TradeSet,
+                                           get_backtest_cache, run_macd_rsi_windows,
+                                           get_macd_rsi_frame)
+from stocklook.crypto.gdax.backtest import (get_macd_rsi_grid, sweep_macd_rsi,
+                                           get_halving_schedule, successive_halving,
+                                           halve_macd_rsi, SweepPool, BacktestCache,
+                                           get_code_version, sweep_macd_rsi_arrays)
+from stocklook.quant.frame import IndicatorFrame
+
+
+def get_candles(n=400, seed=1):
+    rng = np.random.RandomState(seed)
+    close = 50 + np.abs(rng.randn(n).cumsum())
+    df = pd.DataFrame({'time': pd.date_range('2017-09-01', periods=n, freq='4h')[::-1],
+                       'open': close,
+                       'high': close + 1,
+                       'low': close - 1,
+                       'close': close,
+                       'volume': rng.rand(n) * 100})
+    df = IndicatorFrame(df)
+    df.compute('macd', 'rsi_6')
+    return df
+
+
+@pytest.mark.parametrize('margin', [False, True])
+def test_sweep_matches_strategy(margin):
+    df = get_candles()
+    buy_ratios, sell_ratios = get_macd_rsi_grid(multipliers=[1, 3, 10, 40])
+    res = sweep_macd_rsi(df, buy_ratios, sell_ratios, funds=1500,
+                         position_size=5, margin=margin, record_trades=True)
+
+    strat = Strategy(df.copy(), margin=margin, funds=1500, position_size=5)
+    for b, s in zip(buy_ratios, sell_ratios):
+        strat.add_decision_maker(MACDRSIMaker, buy_ratio=b, sell_ratio=s)
+    strat.execute()
+
+    summary = res.summary()
+    trades = res.get_trades()
+    assert summary['trades'].sum() > 0
+    for idx, maker in enumerate(strat.makers):
+        tset = maker.tset
+        row = summary.iloc[idx]
+        assert row['trades'] == tset.trades
+        assert row['end_funds'] == pytest.approx(tset.funds, abs=1e-6)
+        assert row['pnl'] == tset.get_pnl()
+        assert row['macd_buy_point'] == maker.macd_buy_point
+        if tset.trades:
+            assert row['bought'] == pytest.approx(tset.get_total_bought(), abs=1e-6)
+            expected = tset.to_frame()
+            actual = trades.loc[trades['maker_id'] == idx]
+            assert actual['type'].tolist() == expected['type'].tolist()
+            assert np.allclose(actual['size'].values, expected['size'].values)
+
+
+def test_trade_set_totals_match_frame():
+    tset = TradeSet(funds=1000, capacity=2)
+    times = pd.date_range('2017-09-01', periods=50, freq='h')
+    rng = np.random.RandomState(0)
+    for t, p in zip(times, 10 + rng.rand(50)):
+        if rng.rand() < 0.6:
+            tset.buy(t, 5, p)
+        else:
+            tset.sell(t, 7, p)
+    tset.close_positions(times[-1], 10.0)
+    assert tset.position_size == pytest.approx(0)
+
+    df = tset.to_frame()
+    assert len(df.index) == tset.trades
+    assert df.columns.tolist() == ['time', 'size', 'price', 'type', 'total']
+    assert pd.api.types.is_datetime64_any_dtype(df['time'])
+    assert tset.get_total_bought() == pytest.approx(-df.loc[df['type'] == 'buy', 'size'].sum())
+    assert tset.get_total_sold() == pytest.approx(df.loc[df['type'] == 'sell', 'size'].sum())
+    assert tset.funds == pytest.approx(1000 + df['total'].sum())
+    assert tset.data[0] == df.iloc[0][TradeSet.COLUMNS].tolist()
+    assert tset.df is df
+
+
+def test_grid_matches_run_macd_rsi_decisions():
+    buy_ratios, sell_ratios = get_macd_rsi_grid()
+    assert len(buy_ratios) == 15 * 99 * 2
+    assert (buy_ratios[0], sell_ratios[0]) == (0.1, 0.1)
+    assert (buy_ratios[99], sell_ratios[99]) == (0.1, 0.5)
+    assert (buy_ratios[15 * 99 + 99], sell_ratios[15 * 99 + 99]) == (0.5, 0.1)
+
+
+def test_sweep_pool_matches_sweep():
+    frames = [get_candles(300, seed=s) for s in (1, 2, 3)]
+    buy_ratios, sell_ratios = get_macd_rsi_grid(multipliers=[1, 5, 20])
+    seen = list()
+    with SweepPool(workers=2, chunk_size=20) as pool:
+        for i, df in enumerate(frames):
+            pool.add_series((i, 300), df)
+        summary = pool.run(buy_ratios, sell_ratios, funds=1500,
+                           callback=lambda key, df: seen.append(key))
+        directory = pool.directory
+    assert not os.path.exists(directory)
+    assert len(seen) == 3 * 5
+
+    for i, df in enumerate(frames):
+        expected = sweep_macd_rsi(df, buy_ratios, sell_ratios, funds=1500).summary()
+        actual = summary.loc[summary['key_0'] == i].reset_index(drop=True)
+        assert (actual['key_1'] == 300).all()
+        assert actual['maker_id'].tolist() == expected['maker_id'].tolist()
+        assert np.allclose(actual['end_funds'], expected['end_funds'])
+        assert actual['trades'].tolist() == expected['trades'].tolist()
+
+
+def test_backtest_cache_sweeps_missing_cells(tmp_path):
+    df = get_candles(300)
+    cache = BacktestCache(str(tmp_path))
+    key = cache.get_key(product='LTC-USD', granularity=14400, funds=1500)
+    assert key != BacktestCache(str(tmp_path), version='other').get_key(
+        product='LTC-USD', granularity=14400, funds=1500)
+
+    buy_ratios, sell_ratios = get_macd_rsi_grid(multipliers=[1, 5, 20])
+    _, first = np.unique(np.c_[buy_ratios, sell_ratios], axis=0, return_index=True)
+    buy_ratios, sell_ratios = buy_ratios[np.sort(first)], sell_ratios[np.sort(first)]
+    half = len(buy_ratios) // 2
+    cache.sweep(key, df, buy_ratios[:half], sell_ratios[:half], funds=1500)
+    missing = cache.get_missing(key, buy_ratios, sell_ratios)
+    assert not missing[:half].any() and missing[half:].all()
+    assert cache.get_missing(key, buy_ratios[:half], sell_ratios[:half], trades=True).all()
+
+    summary, trades = cache.sweep(key, df, buy_ratios, sell_ratios,
+                                  funds=1500, record_trades=True)
+    assert not cache.get_missing(key, buy_ratios, sell_ratios, trades=True).any()
+    expected = sweep_macd_rsi(df, buy_ratios, sell_ratios, funds=1500, record_trades=True)
+    exp_summary = expected.summary()
+    assert summary.columns.tolist() == exp_summary.columns.tolist()
+    assert summary['maker_id'].tolist() == exp_summary['maker_id'].tolist()
+    assert np.allclose(summary['end_funds'], exp_summary['end_funds'])
+    exp_trades = expected.get_trades()
+    assert len(trades.index) == len(exp_trades.index)
+    assert trades['maker_id'].tolist() == exp_trades['maker_id'].tolist()
+    assert trades['type'].tolist() == exp_trades['type'].tolist()
+    assert (trades['time'].values == exp_trades['time'].values).all()
+
+    # A reordered subset is reassembled from the cache.
+    idx = np.arange(len(buy_ratios))[::-7]
+    sub = cache.get_summary(key, buy_ratios[idx], sell_ratios[idx])
+    assert np.allclose(sub['end_funds'], exp_summary['end_funds'].values[idx])
+
+
+def test_run_macd_rsi_windows_uses_cache(tmp_path):
+    data_dir = str(tmp_path)
+    cache = get_backtest_cache(data_dir)
+    frames = [get_candles(200, seed=s) for s in (1, 2)]
+    windows = [(pd.Timestamp('2017-09-01'), pd.Timestamp('2017-10-01')),
+               (pd.Timestamp('2017-10-01'), pd.Timestamp('2017-11-01'))]
+    for (start, end), df in zip(windows, frames):
+        key = cache.get_key(versioned=False, kind='candles', product='LTC-USD',
+                            granularity=14400, start=start, end=end)
+        cache.write(key, pd.DataFrame(df), 'candles')
+
+    buy_ratios, sell_ratios = get_macd_rsi_grid(multipliers=[1, 5])
+    first = run_macd_rsi_windows(data_dir, 'LTC-USD', windows, 14400,
+                                 buy_ratios[:10], sell_ratios[:10], workers=1, funds=1500)
+    df = run_macd_rsi_windows(data_dir, 'LTC-USD', windows, 14400,
+                              buy_ratios, sell_ratios, workers=1, funds=1500)
+    assert len(first.index) == 20 and len(df.index) == 2 * len(buy_ratios)
+    for i, frame in enumerate(frames):
+        expected = sweep_macd_rsi(frame, buy_ratios, sell_ratios, funds=1500).summary()
+        actual = df.loc[df['window'] == i]
+        assert (actual['start'] == windows[i][0]).all()
+        assert actual['maker_id'].tolist() == expected['maker_id'].tolist()
+        assert np.allclose(actual['end_funds'], expected['end_funds'])
+
+
+def test_macd_rsi_frame_recomputes_cached_indicators(tmp_path):
+    cache = get_backtest_cache(str(tmp_path))
+    start, end = pd.Timestamp('2017-09-01'), pd.Timestamp('2017-10-01')
+    candles = get_candles(200)
+    stale = pd.DataFrame(candles)
+    stale['macd'] = 0.0
+    key = cache.get_key(versioned=False, kind='candles', product='LTC-USD',
+                        granularity=14400, start=start, end=end)
+    cache.write(key, stale, 'candles')
+    sdf = get_macd_rsi_frame(cache, 'LTC-USD', start, end, 14400)
+    assert np.allclose(sdf['macd'], candles['macd'])
+    assert np.allclose(sdf['rsi_6'], candles['rsi_6'])
+
+
+def test_code_version_covers_dependencies():
+    assert get_code_version() == get_code_version()
+    assert get_code_version() != get_code_version(sweep_macd_rsi_arrays)
+
+
+def test_successive_halving_schedule():
+    assert get_halving_schedule(400, min_bars=50) == [50, 100, 200, 400]
+    assert get_halving_schedule(300, min_bars=50, keep=0.25) == [50, 200, 300]
+    seen = list()
+
+    def evaluate(idx, bars):
+        seen.append((len(idx), bars))
+        return idx % 10  # the last digit is the score
+
+    res = successive_halving(evaluate, 40, 400, min_bars=50)
+    assert seen == [(40, 50), (20, 100), (10, 200), (5, 400)]
+    assert res.survivors.tolist() == [9, 19, 29, 39, 8]
+    assert res.evaluated_bars == 40 * 50 + 20 * 100 + 10 * 200 + 5 * 400
+    assert res.saved == pytest.approx(1 - 8000 / 16000)
+    assert res.summary()['kept'].tolist() == [20, 10, 5, 5]
+
+
+def test_halve_macd_rsi_survivors_match_sweep():
+    df = get_candles(400)
+    buy_ratios, sell_ratios = get_macd_rsi_grid(multipliers=[1, 3, 10, 40])
+    summary, res = halve_macd_rsi(df, buy_ratios, sell_ratios, min_bars=50, funds=1500)
+    assert len(summary.index) == len(res.survivors) < len(buy_ratios)
+    assert res.saved == pytest.approx(0.5)
+    full = sweep_macd_rsi(df, buy_ratios, sell_ratios, funds=1500).summary()
+    expected = full.loc[res.survivors]
+    assert summary['maker_id'].tolist() == res.survivors.tolist()
+    assert np.allclose(summary['end_funds'].values, expected['end_funds'].values)
+    assert summary['profit'].is_monotonic_decreasing
+
+
+def test_strategy_search():
+    df = get_candles(200)
+    buy_ratios, sell_ratios = get_macd_rsi_grid(ratios=((0.1, 0.5), (1, 2)),
+                                                multipliers=[1, 3, 10])
+    strat = Strategy(df.copy(), funds=1500, position_size=5)
+    for b, s in zip(buy_ratios, sell_ratios):
+        strat.add_decision_maker(MACDRSIMaker, buy_ratio=b, sell_ratio=s)
+    res = strat.search(min_bars=50, keep=0.5)
+    assert len(strat.makers) == len(res.survivors) == 3
+    full = sweep_macd_rsi(df, buy_ratios, sell_ratios, funds=1500).summary()
+    for maker, idx in zip(strat.makers, res.survivors):
+        assert maker.buy_ratio == buy_ratios[idx]
+        assert maker.tset.funds == pytest.approx(full['end_funds'][idx])
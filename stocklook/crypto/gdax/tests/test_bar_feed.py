@@ -0,0 +1,88 @@
+import pandas as pd
+from stocklook.crypto.gdax.feeds.bar_feed import (BarAggregator, GdaxOHLCWriter,
+                                                  match_time_to_utc)
+
+T0 = 1500000000 - (1500000000 % 300)
+
+
+class Recorder:
+    def __init__(self):
+        self.bars = list()
+
+    def __call__(self, bar):
+        self.bars.append(bar)
+
+
+class FakeViewer:
+    GRANULARITY = 300
+    loaded = list()
+
+    def __init__(self, pair=None, db=None):
+        self.pair = pair
+
+    def load_df(self, df, thread=True, raise_on_error=True):
+        self.loaded.append((self.pair, df))
+
+
+def test_match_time_to_utc():
+    assert match_time_to_utc('2017-09-02T17:05:49.250000Z') == 1504371949.25
+    assert match_time_to_utc('2017-09-02T17:05:49Z') == 1504371949
+
+
+def test_bars_close_on_next_bucket():
+    on_bar, on_final = Recorder(), Recorder()
+    agg = BarAggregator([60, 300], allowed_lateness=0,
+                        on_bar=on_bar, on_final=on_final)
+    agg.add_trade('BTC-USD', 10.0, 1.0, T0 + 1)
+    agg.add_trade('BTC-USD', 12.0, 2.0, T0 + 30)
+    agg.add_trade('BTC-USD', 9.0, 1.0, T0 + 59)
+    agg.add_trade('BTC-USD', 11.0, 1.0, T0 + 61)
+    assert len(on_bar.bars) == 1
+    bar = on_bar.bars[0]
+    assert (bar['granularity'], bar['time']) == (60, T0)
+    assert (bar['open'], bar['high'], bar['low'], bar['close']) == (10.0, 12.0, 9.0, 9.0)
+    assert bar['volume'] == 4.0
+    assert on_final.bars == on_bar.bars
+
+    agg.flush(now=T0 + 300)
+    five = [b for b in on_bar.bars if b['granularity'] == 300]
+    assert len(five) == 1
+    assert (five[0]['open'], five[0]['close'], five[0]['volume']) == (10.0, 11.0, 5.0)
+    assert agg.get_open_bar('BTC-USD', 60) is None
+
+
+def test_late_trades_amend_or_drop():
+    on_bar, on_amend, on_final = Recorder(), Recorder(), Recorder()
+    agg = BarAggregator(60, allowed_lateness=5, on_bar=on_bar,
+                        on_amend=on_amend, on_final=on_final)
+    agg.add_trade('ETH-USD', 10.0, 1.0, T0 + 10)
+    agg.add_trade('ETH-USD', 11.0, 1.0, T0 + 61)
+    assert len(on_bar.bars) == 1 and not on_final.bars
+
+    # Within the lateness window: amends the closed bar.
+    agg.add_trade('ETH-USD', 8.0, 1.0, T0 + 50)
+    assert on_amend.bars[-1]['low'] == 8.0
+    assert on_amend.bars[-1]['amended'] == 1
+    assert on_amend.bars[-1]['close'] == 8.0
+
+    # Past the window: finalized, then later trades are dropped.
+    agg.add_trade('ETH-USD', 11.0, 1.0, T0 + 70)
+    assert len(on_final.bars) == 1
+    assert on_final.bars[0]['volume'] == 2.0
+    agg.add_trade('ETH-USD', 7.0, 1.0, T0 + 20)
+    assert agg.late_trades == 1
+    assert on_final.bars[0]['low'] == 8.0
+
+
+def test_writer_loads_final_five_minute_bars():
+    FakeViewer.loaded = list()
+    writer = GdaxOHLCWriter(db=object(), viewer_cls=FakeViewer)
+    agg = BarAggregator([60, 300], allowed_lateness=0, on_final=writer)
+    agg.add_match(dict(product_id='BTC-USD', price='100.5', size='0.5',
+                       time=pd.Timestamp(T0 + 3, unit='s').strftime('%Y-%m-%dT%H:%M:%S.%fZ')))
+    agg.flush(now=T0 + 300)
+    assert len(FakeViewer.loaded) == 1
+    pair, df = FakeViewer.loaded[0]
+    assert pair == 'BTC-USD'
+    assert df.iloc[0]['time'] == T0
+    assert df.iloc[0]['close'] == 100.5
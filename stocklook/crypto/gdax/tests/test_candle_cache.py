@@ -0,0 +1,60 @@
+import pytest
+from time import time
+from stocklook.crypto.gdax.candle_cache import (GdaxCandleCache, align_down,
+                                                merge_intervals, subtract_intervals)
+
+GRAN = 60
+
+
+class FakeFetcher:
+    """Generates one candle per bucket and records each requested range."""
+    def __init__(self):
+        self.calls = list()
+
+    def __call__(self, product, start, end, granularity):
+        self.calls.append((start, end))
+        return [[t, 1.0, 2.0, 1.5, 1.6, 10.0]
+                for t in reversed(range(start, end, granularity))]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = GdaxCandleCache(str(tmp_path / 'candles.sqlite3'))
+    yield c
+    c.close()
+
+
+def test_interval_math():
+    assert merge_intervals([[5, 10], [0, 5], [20, 30], [25, 40]]) == [[0, 10], [20, 40]]
+    assert subtract_intervals(0, 50, [[10, 20], [30, 40]]) == [[0, 10], [20, 30], [40, 50]]
+    assert subtract_intervals(10, 20, [[0, 50]]) == []
+
+
+def test_only_missing_ranges_fetched(cache):
+    fetch = FakeFetcher()
+    end = align_down(time(), GRAN) - GRAN * 1000
+    start = end - GRAN * 100
+
+    rows = cache.get_candles('BTC-USD', start, end, GRAN, fetch)
+    assert len(rows) == 101
+    assert rows[0][0] > rows[-1][0]
+    assert len(fetch.calls) == 1
+
+    # Fully cached - no API call.
+    assert cache.get_candles('BTC-USD', start, end, GRAN, fetch) == rows
+    assert len(fetch.calls) == 1
+
+    # Extending the range only fetches the new tail.
+    cache.get_candles('BTC-USD', start, end + GRAN * 10, GRAN, fetch)
+    assert fetch.calls[-1] == (end + GRAN, end + GRAN * 11)
+
+
+def test_live_bucket_is_refetched(cache):
+    fetch = FakeFetcher()
+    now = time()
+    start = align_down(now, GRAN) - GRAN * 10
+    cache.get_candles('BTC-USD', start, now, GRAN, fetch)
+    cache.get_candles('BTC-USD', start, now, GRAN, fetch)
+    live = align_down(time(), GRAN)
+    assert fetch.calls[-1][0] >= live - GRAN
+    assert cache.get_coverage('BTC-USD', GRAN)[0][1] <= live
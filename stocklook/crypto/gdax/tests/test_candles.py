@@ -0,0 +1,60 @@
+from time import time
+from stocklook.crypto.gdax.api import Gdax
+from stocklook.crypto.gdax.candles import GdaxCandleManager
+from stocklook.crypto.gdax.candle_cache import align_down
+from stocklook.crypto.gdax.tests.test_candle_cache import FakeFetcher, GRAN, cache
+
+
+def test_gdax_chunks_and_merges_candles(cache):
+    gdax = Gdax(key='k', secret='s', passphrase='p', candle_cache=cache)
+    requested = list()
+
+    def fake_request(product, start, end, granularity):
+        requested.append((start, end))
+        # Overlap one bucket with the previous chunk to check de-duplication.
+        return [[t, 1.0, 2.0, 1.5, 1.6, 10.0]
+                for t in reversed(range(start - granularity, end, granularity))]
+
+    gdax._request_candles = fake_request
+    end = align_down(time(), GRAN) - GRAN * 1000
+    start = end - GRAN * 700
+
+    df = gdax.get_candles_frame('BTC-USD', start, end, GRAN, use_cache=False)
+    assert len(requested) == 3
+    assert all((e - s) // GRAN <= gdax.MAX_CANDLES for s, e in requested)
+    assert df['time'].is_monotonic_decreasing
+    assert not df['time'].duplicated().any()
+    assert str(df['time'].dtype).startswith('datetime64')
+
+
+class FakeGdax:
+    def __init__(self):
+        self.calls = list()
+
+    def get_candles(self, product, start, end, granularity):
+        self.calls.append((start, end, granularity))
+        return FakeFetcher()(product, start, min(end, int(time())), granularity)
+
+
+def test_candle_manager_resamples_one_series():
+    gdax = FakeGdax()
+    m = GdaxCandleManager(gdax, base_granularity=300, refresh_seconds=3600)
+    start = align_down(time(), 3600) - 3600 * 10
+    h1 = m.get_candles('BTC-USD', 3600, start=start)
+    m15 = m.get_candles('BTC-USD', 900, start=start + 3600)
+    assert len(gdax.calls) == 1
+    assert all(g == 300 for _, _, g in gdax.calls)
+    assert len(h1) == 11 and h1['time'].is_monotonic_decreasing
+    assert h1['volume'].iloc[1] == 120.0
+    assert m15['time'].iloc[-1].value // 10 ** 9 == start + 3600
+
+
+def test_candle_manager_end_within_bucket():
+    m = GdaxCandleManager(FakeGdax(), base_granularity=300, refresh_seconds=3600)
+    start = align_down(time(), 3600) - 3600 * 10
+    end = start + 3600 * 5 + 1800
+    df = m.get_candles('BTC-USD', 3600, start=start, end=end, include_partial=False)
+    assert len(df) == 5
+    assert df['time'].iloc[0].value // 10 ** 9 == start + 3600 * 4
+    df = m.get_candles('BTC-USD', 3600, start=start, end=end)
+    assert len(df) == 6 and df['volume'].iloc[0] == 70.0
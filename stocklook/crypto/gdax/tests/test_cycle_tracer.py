@@ -0,0 +1,72 @@
+import json
+from stocklook.utils.metrics import CycleTracer, JsonFileExporter, NULL_TRACER
+from stocklook.crypto.gdax.order_gateway import GdaxOrderGateway
+from stocklook.crypto.gdax.simulation import MarketMakerSimulation
+from stocklook.crypto.gdax.tests.test_order_gateway import _Order
+from stocklook.crypto.gdax.tests.test_simulation import make_feed
+
+
+def test_tracer_records():
+    records = list()
+    tracer = CycleTracer('mm', capacity=2, exporters=[records.append])
+    for i in range(3):
+        tracer.start(n=i)
+        with tracer.stage('a'):
+            with tracer.call('post'):
+                pass
+            with tracer.call('post'):
+                pass
+        tracer.finish()
+    assert [r['n'] for r in tracer.records] == [1, 2]
+    assert len(records) == 3
+    assert list(records[0]['stages']) == ['a']
+    assert records[0]['calls']['post'][0] == 2
+    stats = tracer.get_stats()
+    assert sorted(stats) == ['mm', 'mm.a', 'mm.call.post']
+    assert stats['mm.call.post']['count'] == 6
+    assert stats['mm']['p99'] >= stats['mm.a']['p50']
+
+    # Exporter errors don't break the cycle.
+    tracer.exporters.append(lambda r: 1 / 0)
+    tracer.start()
+    assert tracer.finish()['cycle'] == 4
+
+    assert NULL_TRACER.finish() is None
+    with NULL_TRACER.stage('a'):
+        NULL_TRACER.add('a', 1.0)
+    assert not NULL_TRACER.records and not NULL_TRACER.registry.keys
+
+
+def test_market_maker_cycle_trace(tmp_path):
+    path = str(tmp_path / 'trace.jsonl')
+    tracer = CycleTracer('mm', exporters=[JsonFileExporter(path)])
+    snapshot, messages = make_feed(600)
+    sim = MarketMakerSimulation(messages, 'BTC-USD', snapshot=snapshot,
+                                balances={'USD': 10000, 'BTC': 0},
+                                spend_pct=0.05, min_spread=0.05, max_spread=0.10,
+                                interval=2, manage_existing_orders=False,
+                                tracer=tracer)
+    report = sim.run()
+    assert tracer.cycles == report.cycles
+    with open(path) as fh:
+        lines = [json.loads(line) for line in fh]
+    assert len(lines) == report.cycles
+    assert set(lines[-1]['stages']) >= {'handle_fills', 'snapshot', 'shift_orders'}
+    stats = tracer.get_stats()
+    assert stats['mm']['count'] == report.cycles
+    assert stats['mm.call.post']['count'] > 0
+    assert stats['mm.shift_orders']['p95'] is not None
+
+
+def test_gateway_calls_traced():
+    tracer = CycleTracer('mm')
+    calls = list()
+    pairs = [(_Order('old{}'.format(i), calls), _Order('new{}'.format(i), calls))
+             for i in range(20)]
+    tracer.start()
+    with GdaxOrderGateway(workers=4, tracer=tracer) as gateway:
+        gateway.wait([gateway.replace(old, new) for old, new in pairs], timeout=10)
+    record = tracer.finish()
+    assert record['calls']['cancel'][0] == 20
+    assert record['calls']['post'][0] == 20
+    assert tracer.get_stats()['mm.call.post']['count'] == 20
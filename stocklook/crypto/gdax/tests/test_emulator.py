@@ -0,0 +1,88 @@
+import io
+import os
+import time
+from itertools import islice
+from stocklook.crypto.gdax.api import Gdax
+from stocklook.crypto.gdax.order import GdaxOrder
+from stocklook.crypto.gdax.emulator import (GdaxEmulator, generate_order_flow,
+                                            encode_frame, read_frame, OP_TEXT)
+from stocklook.crypto.gdax.feeds.book_feed import GdaxBookFeed
+from stocklook.crypto.gdax.feeds.user_feed import GdaxUserFeed
+
+
+def masked_frame(payload):
+    frame = encode_frame(payload)
+    head = 2 + {126: 2, 127: 8}.get(frame[1], 0)
+    mask = os.urandom(4)
+    body = bytes(b ^ mask[i % 4] for i, b in enumerate(frame[head:]))
+    return bytes([frame[0], frame[1] | 0x80]) + frame[2:head] + mask + body
+
+
+def wait_for(func, timeout=10):
+    end = time.time() + timeout
+    while not func():
+        assert time.time() < end
+        time.sleep(0.05)
+
+
+def test_frames_round_trip():
+    for n in (5, 300, 70000):
+        payload = 'x' * n
+        assert read_frame(io.BytesIO(masked_frame(payload))) == (OP_TEXT, payload.encode())
+    assert read_frame(io.BytesIO(b'')) == (None, None)
+
+
+def test_emulator_rest():
+    snapshot, messages = generate_order_flow(seed=1, start=1500000000)
+    emu = GdaxEmulator(messages, snapshot, restamp=False)
+    emu.book.on_message(dict(type='heartbeat', sequence=snapshot['sequence']))
+    for message in islice(messages, 1000):
+        emu.publish(message)
+
+    status, book = emu.handle_request('get', ['products', 'BTC-USD', 'book'], {'level': '3'}, None)
+    assert status == 200 and book['sequence'] == emu.book._sequence
+    status, top = emu.handle_request('get', ['products', 'BTC-USD', 'book'], {'level': '1'}, None)
+    assert float(top['bids'][0][0]) == emu.book.get_bid()
+    assert float(top['bids'][0][1]) == sum(float(b[1]) for b in book['bids']
+                                           if b[0] == top['bids'][0][0])
+    _, candles = emu.handle_request('get', ['products', 'BTC-USD', 'candles'],
+                                    {'granularity': '60', 'start': '2017-07-14T02:40:00Z'}, None)
+    assert sum(c[5] for c in candles) == sum(t[2] for t in emu.trades)
+    assert emu.handle_request('get', ['products', 'ETH-USD', 'ticker'], {}, None)[0] == 404
+
+    # A buy crossing the spread fills at the best ask.
+    ask = emu.book.get_ask()
+    _, order = emu.handle_request('post', ['orders'], {}, dict(side='buy', price=str(ask + 1),
+                                                              size='1', product_id='BTC-USD'))
+    _, fills = emu.handle_request('get', ['fills'], {'order_id': order['id']}, None)
+    assert fills[0]['price'] == str(ask) and fills[0]['liquidity'] == 'T'
+    _, accounts = emu.handle_request('get', ['accounts'], {}, None)
+    assert {a['currency']: a['balance'] for a in accounts}['BTC'] == '1.0'
+
+
+def test_emulator_serves_the_stack():
+    snapshot, messages = generate_order_flow(seed=2)
+    emu = GdaxEmulator(list(islice(messages, 1500)), snapshot, rate=1000,
+                       balances={'USD': 10000, 'BTC': 5})
+    emu.start()
+    gdax = emu.configure(Gdax('key', 'c2VjcmV0', 'passphrase'))
+    feed = GdaxBookFeed('BTC-USD', gdax=gdax)
+    user = GdaxUserFeed(['BTC-USD'], gdax=gdax)
+    try:
+        feed.start()
+        user.start()
+        wait_for(lambda: emu.finished and feed._sequence == emu.book._sequence)
+        assert feed.get_current_book() == emu.book.get_current_book()
+        assert float(gdax.get_ticker('BTC-USD')['price']) == emu.trades[-1][1]
+
+        bid = emu.book.get_bid()
+        order = GdaxOrder(gdax, 'BTC-USD', side='sell', price=bid, size=1.0)
+        order.post()
+        order.attach(user.bus)
+        wait_for(lambda: order.fill_future.done())
+        assert gdax.get_orders(paginate=False) == []
+        assert gdax.get_fills(order_id=order.id, paginate=False)[0]['price'] == str(bid)
+    finally:
+        feed.close()
+        user.close()
+        emu.close()
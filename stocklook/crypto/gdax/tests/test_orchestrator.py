@@ -0,0 +1,142 @@
+import time
+from threading import Thread
+import stocklook.crypto.gdax.api as gdax_api
+import stocklook.utils.api as utils_api
+from stocklook.utils.scheduler import RequestScheduler
+from stocklook.crypto.gdax.api import Gdax
+from stocklook.crypto.gdax.feeds.book_feed import GdaxBookFeed
+from stocklook.crypto.gdax.feeds.multi_book_feed import GdaxMultiBookFeed
+from stocklook.crypto.gdax.orchestrator import GdaxMarketMakerOrchestrator
+from stocklook.crypto.gdax.tests.test_simulation import make_feed
+
+PRODUCTS = ['BTC-USD', 'ETH-USD']
+
+
+def make_gdax():
+    return Gdax('key', 'c2VjcmV0', 'passphrase')
+
+
+class _Books:
+    """ Serves Gdax.get_book snapshots by product. """
+    api_key = api_secret = api_passphrase = ''
+
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+
+    def get_book(self, product, level=3):
+        return self.snapshots[product]
+
+
+def test_scheduler_shares_slots_fairly():
+    scheduler = RequestScheduler(rate=20)
+    grants = list()
+
+    def request(client, priority, delay=0.0):
+        time.sleep(delay)
+        scheduler.acquire(client, priority)
+        grants.append((client, priority))
+
+    request('BTC-USD', 1)
+    threads = [Thread(target=request, args=('BTC-USD', p, 0.005 * i))
+               for i, p in enumerate((2, 2, 2, 0))]
+    threads.append(Thread(target=request, args=('ETH-USD', 1, 0.03)))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    # ETH-USD hasn't used its share, cancels go before BTC-USD's other requests.
+    assert grants[:3] == [('BTC-USD', 1), ('ETH-USD', 1), ('BTC-USD', 0)]
+    assert scheduler.granted == {'BTC-USD': 5, 'ETH-USD': 1}
+    assert not scheduler.waiting
+
+
+def test_scheduler_rate_and_weights():
+    scheduler = RequestScheduler(rate=50, weights={'a': 3})
+    grants = list()
+
+    def worker(client):
+        for _ in range(12):
+            scheduler.acquire(client)
+            grants.append(client)
+
+    threads = [Thread(target=worker, args=(c,)) for c in 'ab']
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert time.time() - start >= 23 / 50
+    # 'a' gets ~3 of every 4 slots while both are busy.
+    assert 7 <= grants[:12].count('a') <= 10
+
+
+def test_multi_book_feed_dispatches_by_product():
+    feeds = {p: make_feed(400, seed=i) for i, p in enumerate(PRODUCTS)}
+    books = _Books({p: snap for p, (snap, _) in feeds.items()})
+    multi = GdaxMultiBookFeed(PRODUCTS, gdax=books)
+    singles = dict()
+    streams = list()
+    for p, (snap, messages) in feeds.items():
+        singles[p] = GdaxBookFeed(p, gdax=books)
+        streams.append([dict(m, product_id=p) for m in messages])
+    for pair in zip(*streams):
+        for message in pair:
+            multi.on_message(message)
+            singles[message['product_id']].on_message(message)
+    multi.on_message(dict(type='subscriptions'))
+    for p in PRODUCTS:
+        assert multi.get_book(p).get_current_book() == singles[p].get_current_book()
+        assert multi.get_book(p).get_nearest_wall('buy') == singles[p].get_nearest_wall('buy')
+
+    # Closing one product's book reloads it instead of closing the socket.
+    book = multi.get_book('BTC-USD')
+    book.close()
+    assert book._sequence == -1 and not multi.running
+
+
+def test_orchestrator_shares_feeds_and_budget(monkeypatch):
+    calls = list()
+
+    def call_api(url, method='get', _before_attempt=None, **kwargs):
+        _before_attempt()
+        calls.append((method, url))
+        return url
+
+    monkeypatch.setattr(gdax_api, 'call_api', call_api)
+    o = GdaxMarketMakerOrchestrator({'BTC-USD': dict(spend_pct=0.02), 'ETH-USD': dict()},
+                                    gdax=make_gdax(), rate=100, spend_pct=0.01)
+    btc, eth = o['BTC-USD'], o['ETH-USD']
+    assert btc.spend_pct == 0.02 and eth.spend_pct == 0.01
+    assert btc.book_feed is o.book_feed.get_book('BTC-USD')
+    assert btc.user_feed is eth.user_feed is o.user_feed
+    assert o.user_feed.products == PRODUCTS
+    assert btc.gdax.scheduler is eth.gdax.scheduler is o.scheduler
+    assert btc.gdax.api_key == 'key' and o.gdax.scheduler is None
+
+    btc.gdax.delete('orders/1')
+    eth.gdax.get('orders')
+    assert calls == [('delete', Gdax.API_URL + 'orders/1'), ('get', Gdax.API_URL + 'orders')]
+    assert o.requests_granted == {'BTC-USD': 1, 'ETH-USD': 1}
+
+
+def test_scheduler_slot_per_attempt(monkeypatch):
+    statuses = [503, 429, 200]
+
+    class Response:
+        def __init__(self, status_code):
+            self.status_code = status_code
+            self.url = 'orders'
+
+        def json(self):
+            return dict()
+
+    monkeypatch.setattr(utils_api, 'sleep', lambda s: None)
+    monkeypatch.setattr(utils_api.requests, 'request',
+                        lambda method, url, **kwargs: Response(statuses.pop(0)))
+    scheduler = RequestScheduler(rate=100)
+    gdax = make_gdax().with_scheduler(scheduler, 'BTC-USD')
+    try:
+        assert gdax.call_api(Gdax.API_URL + 'orders').status_code == 200
+    finally:
+        utils_api.CIRCUIT_BREAKERS.clear()
+    assert scheduler.granted['BTC-USD'] == 3
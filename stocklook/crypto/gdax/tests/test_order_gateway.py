@@ -0,0 +1,120 @@
+import time
+import pytest
+from threading import Lock
+from stocklook.crypto.gdax.api import GdaxAPIError
+from stocklook.crypto.gdax.order import GdaxOrder
+from stocklook.crypto.gdax.order_gateway import GdaxOrderGateway
+from stocklook.crypto.gdax.simulation import MarketMakerSimulation
+from stocklook.crypto.gdax.tests.test_simulation import make_feed
+from stocklook.crypto.gdax.tests.test_user_feed import make_gateway
+
+
+class _Order:
+    """ Records GdaxOrder.post/cancel calls. """
+    def __init__(self, name, calls, delay=0.0, cancel_error=None):
+        self.name = name
+        self.calls = calls
+        self.delay = delay
+        self.cancel_error = cancel_error
+        self.lock = Lock()
+
+    def post(self):
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls.append(('post', self.name))
+
+    def cancel(self):
+        time.sleep(self.delay)
+        if self.cancel_error is not None:
+            raise self.cancel_error
+        with self.lock:
+            self.calls.append(('cancel', self.name))
+        return [self.name]
+
+
+def test_cancels_run_before_posts():
+    calls = list()
+    gateway = GdaxOrderGateway(workers=0)
+    posted = gateway.post(_Order('a', calls))
+    replaced = gateway.replace(_Order('b', calls), _Order('c', calls))
+    failed = gateway.replace(_Order('d', calls, cancel_error=GdaxAPIError('Order already done')),
+                             _Order('e', calls))
+    gateway.wait([posted, replaced, failed])
+    assert calls == [('cancel', 'b'), ('post', 'a'), ('post', 'c')]
+    assert replaced.result().name == 'c'
+    with pytest.raises(GdaxAPIError):
+        failed.result()
+    assert gateway.stats == dict(cancels=1, posts=2, errors=1)
+
+
+def test_replace_pairs_run_concurrently():
+    calls = list()
+    pairs = [(_Order('old{}'.format(i), calls, delay=0.05),
+              _Order('new{}'.format(i), calls, delay=0.05)) for i in range(8)]
+    start = time.time()
+    with GdaxOrderGateway(workers=4) as gateway:
+        futures = [gateway.replace(old, new) for old, new in pairs]
+        done, _ = gateway.wait(futures, timeout=10)
+    assert len(done) == 8
+    assert time.time() - start < 0.05 * 16 / 2
+    for old, new in pairs:
+        assert calls.index(('cancel', old.name)) < calls.index(('post', new.name))
+
+
+def test_cancel_all_orders():
+    gateway, bus = make_gateway()
+    orders = [GdaxOrder(gateway, 'BTC-USD', side='buy', price=95.0 - i, size=1.0)
+              for i in range(3)]
+    for o in orders:
+        o.post()
+    order_gateway = GdaxOrderGateway(gateway, workers=0)
+    future = order_gateway.cancel_all('BTC-USD')
+    assert not future.done()  # queued until flushed
+    order_gateway.flush()
+    assert sorted(future.result()) == sorted(o.id for o in orders)
+    assert gateway.get_orders() == []
+
+
+def test_market_maker_gateway_matches_sequential():
+    summaries = list()
+    for use_gateway in (False, True):
+        snapshot, messages = make_feed(1500)
+        sim = MarketMakerSimulation(messages, 'BTC-USD', snapshot=snapshot,
+                                    balances={'USD': 10000, 'BTC': 0},
+                                    spend_pct=0.05, min_spread=0.05, max_spread=0.10,
+                                    interval=2, manage_existing_orders=False)
+        if use_gateway:
+            sim.market_maker.order_gateway = GdaxOrderGateway(sim.gateway, workers=0)
+        summaries.append(sim.run().summary())
+    assert summaries[0]['fills'] > 0
+    for key in ('fills', 'buys', 'sells', 'pnl', 'errors'):
+        assert summaries[0][key] == summaries[1][key]
+    assert not sim.market_maker._replacing
+
+
+def test_replace_reposts_when_post_fails():
+    snapshot = dict(sequence=10, bids=[[99.0, 2.0, 'b1']], asks=[[101.0, 3.0, 'a1']])
+    sim = MarketMakerSimulation([], snapshot=snapshot, balances={'USD': 10000, 'BTC': 0},
+                                manage_existing_orders=False)
+    sim.feed.on_message(dict(type='heartbeat', sequence=11))
+    mm, gateway = sim.market_maker, sim.gateway
+    mm.order_gateway = GdaxOrderGateway(gateway, workers=0)
+    kwargs = dict(check_size=False, adjust_vs_open=False, check_ticker=False)
+    old = mm.place_order(98.0, 1.0, side='buy', **kwargs)
+
+    post_order = gateway.post_order
+    errors = [GdaxAPIError('<503>: method: post:orders, Service Unavailable')]
+
+    def flaky_post(order_json):
+        if errors:
+            raise errors.pop()
+        return post_order(order_json)
+
+    gateway.post_order = flaky_post
+    new = mm.replace_order(old, 97.5, 1.0, side='buy', **kwargs)
+    posted = mm.reconcile_orders()
+    assert not errors
+    assert old.status == 'canceled' and old.id not in mm._orders
+    assert posted == [new] and new.id in mm._orders
+    assert new.client_oid not in mm._orders
+    assert [o['id'] for o in gateway.get_orders()] == [new.id]
@@ -0,0 +1,106 @@
+import numpy as np
+from threading import Event, Thread
+from stocklook.utils.clock import SimulatedClock
+from stocklook.crypto.gdax.order_mm import GdaxMMOrder
+from stocklook.crypto.gdax.order_registry import GdaxOrderRegistry, get_free_price, sorted_within
+from stocklook.crypto.gdax.simulation import SimulatedOrderGateway
+
+
+class _MarketMaker:
+    def __init__(self):
+        self._orders = GdaxOrderRegistry()
+
+
+def make_order(m, i, side, price, **kwargs):
+    gateway = SimulatedOrderGateway('BTC-USD', SimulatedClock())
+    o = GdaxMMOrder(m, gateway, 'BTC-USD', side=side, price=price, size=1.0,
+                    id='o{}'.format(i), status='open', **kwargs)
+    m._orders[o.id] = o
+    return o
+
+
+def scan_free_price(p, other_prices, step, increment):
+    # The linear scan GdaxMMOrder.get_price_incremented used to do.
+    check_p = [x for x in other_prices if p - step < x < p + step]
+    p = round(p, 2)
+    while check_p:
+        p = round(p + step if increment else p - step, 2)
+        check_p = [x for x in other_prices if p - step <= x <= p + step]
+    return p
+
+
+def test_registry_indexes():
+    m = _MarketMaker()
+    reg = m._orders
+    buys = [make_order(m, i, 'buy', 100 - i * 0.1) for i in range(5)]
+    sells = [make_order(m, i + 5, 'sell', 101 + i * 0.1) for i in range(5)]
+    assert len(reg) == 10
+    assert set(reg.get_orders(side='buy')) == {o.id for o in buys}
+    assert reg.get_prices('sell') == [101.0, 101.1, 101.2, 101.3, 101.4]
+    assert reg.get_prices('buy', exclude=buys[0]) == [99.6, 99.7, 99.8, 99.9]
+    assert reg.get_lowest() is buys[-1]
+
+    # Orders reindex themselves.
+    buys[0].status = 'done'
+    sells[0].target_type = GdaxMMOrder.HIGH_FREQ
+    sells[1].price = 105.0
+    assert list(reg.get_orders(status='done')) == [buys[0].id]
+    assert reg.count(side='buy', status='open') == 4
+    assert list(reg.get_orders(target_type=GdaxMMOrder.HIGH_FREQ)) == [sells[0].id]
+    assert reg.get_prices('sell')[-1] == 105.0
+
+    assert reg.get_nearest_price('sell', 101.15) == 101.2
+    assert reg.get_nearest_price('sell', 101.12, exclude=sells[2]) == 101.0
+    assert reg.has_price_within('buy', 99.62, 0.03)
+    assert not reg.has_price_within('buy', 99.62, 0.03, exclude=buys[4])
+
+    del reg[sells[1].id]
+    assert sells[1]._registry is None and 105.0 not in reg.get_prices('sell')
+    sells[1].price = 50.0
+    assert reg.get_lowest('sell') is sells[0]
+
+
+def test_free_price_matches_scan():
+    rng = np.random.RandomState(0)
+    for _ in range(200):
+        m = _MarketMaker()
+        prices = np.round(100 + rng.randint(-30, 30, size=rng.randint(1, 40)) * 0.01, 2)
+        orders = [make_order(m, i, 'buy', p) for i, p in enumerate(prices)]
+        p = round(100 + rng.randint(-30, 30) * 0.01, 2)
+        step = [0.01, 0.02, 0.03, 0.05][rng.randint(4)]
+        increment = bool(rng.rand() < 0.5)
+        expected = scan_free_price(p, prices.tolist(), step, increment)
+        assert get_free_price(sorted_within(sorted(prices)), p, step, increment) == expected
+        assert m._orders.get_free_price('buy', p, step, increment) == expected
+
+        o = orders[0]
+        others = [x.price for x in orders[1:]]
+        assert o.get_price_incremented(p, None, increment=increment, step=step,
+                                       min_profit=None) == \
+            scan_free_price(p, others, step, increment)
+
+
+def test_registry_reindex_from_another_thread():
+    m = _MarketMaker()
+    orders = [make_order(m, i, 'buy', 100.0 + i * 0.05) for i in range(50)]
+    stop = Event()
+
+    def flip_status():
+        # Like an event bus updating orders from the feed's thread.
+        while not stop.is_set():
+            for o in orders:
+                o.status = 'done' if o.status == 'open' else 'open'
+
+    thread = Thread(target=flip_status)
+    thread.start()
+    try:
+        for _ in range(2000):
+            ids = m._orders.get_ids(side='buy', status='open')
+            assert ids <= set(m._orders)
+            m._orders.get_free_price('buy', 101.0, 0.03)
+            m._orders.get_nearest_price('buy', 101.0)
+    finally:
+        stop.set()
+        thread.join()
+    assert sum(m._orders.count(status=s) for s in ('open', 'done')) == 50
+    assert len(m._orders.get_prices('buy')) == 50
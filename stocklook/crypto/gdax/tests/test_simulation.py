@@ -0,0 +1,174 @@
+import pickle
+import numpy as np
+import pandas as pd
+from stocklook.utils.clock import SimulatedClock, SystemClock
+from stocklook.crypto.gdax.simulation import (GdaxReplayBookFeed, MarketMakerSimulation,
+                                              SimulatedOrderGateway, load_feed_log)
+
+T0 = 1500000000
+
+
+def iso(t):
+    return pd.Timestamp(t, unit='s').strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def make_feed(n=3000, seed=0, mid=100.0):
+    """
+    Returns (snapshot, messages): a level 3 book and a consistent
+    stream of open/match/done messages one every 0.5 seconds.
+    """
+    rng = np.random.RandomState(seed)
+    book = {'buy': dict(), 'sell': dict()}   # id: [price, size]
+    ids = iter(range(10 ** 9))
+    for i in range(40):
+        book['buy']['b{}'.format(next(ids))] = [round(mid - 0.05 - i * 0.05, 2),
+                                                 25.0 if i % 7 == 3 else 1.0 + i % 3]
+        book['sell']['a{}'.format(next(ids))] = [round(mid + 0.05 + i * 0.05, 2),
+                                                  25.0 if i % 7 == 3 else 1.0 + i % 3]
+    seq = 1000
+    snapshot = dict(sequence=seq,
+                    bids=[[p, s, k] for k, (p, s) in book['buy'].items()],
+                    asks=[[p, s, k] for k, (p, s) in book['sell'].items()])
+    messages = list()
+
+    def best(side):
+        orders = book[side]
+        if side == 'buy':
+            return max(orders.items(), key=lambda kv: (kv[1][0], -int(kv[0][1:])))
+        return min(orders.items(), key=lambda kv: (kv[1][0], int(kv[0][1:])))
+
+    for i in range(n):
+        seq += 1
+        t = iso(T0 + i * 0.5)
+        r = rng.rand()
+        side = 'buy' if rng.rand() < 0.5 else 'sell'
+        if r < 0.45 or len(book[side]) < 5:
+            oid = '{}{}'.format('b' if side == 'buy' else 'a', next(ids))
+            bid, ask = best('buy')[1][0], best('sell')[1][0]
+            if side == 'buy':
+                price = round(bid - 0.05 * rng.randint(-1, 6), 2)
+                price = min(price, round(ask - 0.01, 2))
+            else:
+                price = round(ask + 0.05 * rng.randint(-1, 6), 2)
+                price = max(price, round(bid + 0.01, 2))
+            size = float(rng.randint(1, 4))
+            book[side][oid] = [price, size]
+            messages.append(dict(type='open', sequence=seq, time=t, product_id='BTC-USD',
+                                 order_id=oid, side=side, price=str(price),
+                                 remaining_size=str(size)))
+        elif r < 0.8:
+            oid, (price, size) = best(side)
+            fill = min(size, float(rng.randint(1, 3)))
+            messages.append(dict(type='match', sequence=seq, time=t, product_id='BTC-USD',
+                                 maker_order_id=oid, taker_order_id='t{}'.format(i),
+                                 side=side, price=str(price), size=str(fill)))
+            if fill >= size:
+                del book[side][oid]
+                seq += 1
+                messages.append(dict(type='done', sequence=seq, time=t, product_id='BTC-USD',
+                                     order_id=oid, side=side, price=str(price),
+                                     remaining_size='0', reason='filled'))
+            else:
+                book[side][oid][1] = size - fill
+        else:
+            oid = rng.choice(sorted(book[side]))
+            price, size = book[side].pop(oid)
+            messages.append(dict(type='done', sequence=seq, time=t, product_id='BTC-USD',
+                                 order_id=oid, side=side, price=str(price),
+                                 remaining_size=str(size), reason='canceled'))
+    return snapshot, messages
+
+
+def make_gateway(snapshot):
+    clock = SimulatedClock(T0)
+    gateway = SimulatedOrderGateway('BTC-USD', clock, snapshot=snapshot)
+    feed = GdaxReplayBookFeed([], 'BTC-USD', gateway)
+    feed.on_message(dict(type='heartbeat', sequence=snapshot['sequence'] + 1))
+    return gateway, feed
+
+
+def test_clocks_offer_the_same_methods():
+    def public(cls):
+        return {k for k in dir(cls) if not k.startswith('_')}
+    assert public(SystemClock) <= public(SimulatedClock)
+    assert public(SimulatedClock) - public(SystemClock) <= {'advance_to', 'on_advance', 'set_time'}
+    clock = SystemClock()
+    assert abs((clock.utcnow() - SimulatedClock(clock.time()).utcnow()).total_seconds()) < 5
+
+
+def test_gateway_queue_position():
+    snapshot = dict(sequence=10, bids=[[99.0, 2.0, 'b1'], [98.0, 5.0, 'b2']],
+                    asks=[[101.0, 3.0, 'a1']])
+    gateway, feed = make_gateway(snapshot)
+    order = gateway.post_order(dict(side='buy', price='99.0', size='1.0',
+                                    type='limit', product_id='BTC-USD'))
+    assert order['status'] == 'open'
+
+    # The order queued ahead of ours trades: no fill.
+    gateway.on_feed_message(dict(type='match', side='buy', price='99.0',
+                                 size='1.5', maker_order_id='b1'))
+    assert gateway.get_orders(order['id'])['filled_size'] == 0
+    # It's cancelled, then a later order at our price trades: we fill first.
+    gateway.on_feed_message(dict(type='done', order_id='b1', side='buy', price='99.0'))
+    gateway.on_feed_message(dict(type='match', side='buy', price='99.0',
+                                 size='0.4', maker_order_id='b9'))
+    assert gateway.get_orders(order['id'])['filled_size'] == 0.4
+    # Trading through our price fills the rest.
+    gateway.on_feed_message(dict(type='match', side='buy', price='98.0',
+                                 size='1.0', maker_order_id='b2'))
+    o = gateway.get_orders(order['id'])
+    assert o['status'] == 'done' and o['filled_size'] == 1.0
+    assert gateway.balances['BTC'] == 1.0
+    assert gateway.balances['USD'] == 10000 - 99.0
+
+    # Crossing orders fill immediately as the taker.
+    sell = gateway.post_order(dict(side='sell', price='98.5', size='1.0', type='limit'))
+    assert sell['status'] == 'done' and gateway.fills[-1]['liquidity'] == 'T'
+    assert gateway.fills[-1]['price'] == 99.0  # the book's best bid
+
+
+def test_feed_log_round_trip(tmp_path):
+    snapshot, messages = make_feed(20)
+    path = str(tmp_path / 'feed.pkl')
+    with open(path, 'wb') as fh:
+        pickle.dump(snapshot, fh)
+        for m in messages:
+            pickle.dump(m, fh)
+    snap, msgs = load_feed_log(path)
+    assert snap == snapshot
+    assert list(msgs) == messages
+
+
+def test_market_maker_replay():
+    snapshot, messages = make_feed(3000)
+    sim = MarketMakerSimulation(messages, 'BTC-USD', snapshot=snapshot,
+                                balances={'USD': 10000, 'BTC': 0},
+                                spend_pct=0.05, min_spread=0.05, max_spread=0.10,
+                                interval=2, manage_existing_orders=False)
+    report = sim.run()
+    summary = report.summary()
+    assert report.messages == len(messages)
+    assert report.errors == 0 and report.gaps == 0
+    assert report.cycles > 100
+    assert summary['fills'] > 0
+    assert summary['cycle_ms_mean'] is not None
+    assert report.sim_seconds >= 1400
+    assert np.isfinite(report.pnl)
+
+
+def test_reactive_market_maker_replay():
+    reports = dict()
+    for reactive in (False, True):
+        snapshot, messages = make_feed(1500)
+        sim = MarketMakerSimulation(messages, 'BTC-USD', snapshot=snapshot,
+                                    balances={'USD': 10000, 'BTC': 0},
+                                    spend_pct=0.05, min_spread=0.05, max_spread=0.10,
+                                    interval=2, manage_existing_orders=False,
+                                    reactive=reactive, coalesce=0.25)
+        reports[reactive] = sim.run().summary()
+    polling, reactive = reports[False], reports[True]
+    assert reactive['errors'] == 0 and reactive['cycles'] > 100
+    # coalesce + the SimulatedClock.wait step.
+    assert reactive['reaction_s_max'] <= 0.25 + 0.1 + 1e-9
+    assert polling['reaction_s_max'] > 1
+    assert reactive['reaction_s_mean'] < polling['reaction_s_mean']
@@ -0,0 +1,126 @@
+from stocklook.utils.clock import SimulatedClock
+from stocklook.crypto.gdax.order import GdaxOrder
+from stocklook.crypto.gdax.feeds.user_feed import GdaxOrderEventBus
+from stocklook.crypto.gdax.simulation import SimulatedOrderGateway, SimulatedUserFeed, GdaxReplayBookFeed, \
+    MarketMakerSimulation
+
+
+def make_gateway():
+    snapshot = dict(sequence=10, bids=[[99.0, 2.0, 'b1']], asks=[[101.0, 3.0, 'a1']])
+    gateway = SimulatedOrderGateway('BTC-USD', SimulatedClock(1500000000), snapshot=snapshot)
+    feed = GdaxReplayBookFeed([], 'BTC-USD', gateway)
+    feed.on_message(dict(type='heartbeat', sequence=11))
+    user_feed = SimulatedUserFeed(gateway)
+    return gateway, user_feed.bus
+
+
+def test_order_event_bus_state():
+    bus = GdaxOrderEventBus(max_done=1)
+    seen = list()
+    bus.subscribe('o1', lambda msg, state: seen.append((msg['type'], state['status'])))
+    bus.publish(dict(type='received', order_id='o1', side='buy', price='10.0', size='2.0'))
+    bus.publish(dict(type='open', order_id='o1', remaining_size='2.0'))
+    # Matches against orders the bus hasn't seen are ignored.
+    bus.publish(dict(type='match', maker_order_id='x', taker_order_id='y', size='1', price='9'))
+    bus.publish(dict(type='match', maker_order_id='o1', taker_order_id='y',
+                     size='0.5', price='10.0'))
+    state = bus.get_state('o1')
+    assert state['filled_size'] == 0.5 and state['remaining_size'] == 1.5
+    assert state['executed_value'] == 5.0
+
+    bus.publish(dict(type='done', order_id='o1', reason='canceled', remaining_size='1.5'))
+    assert seen == [('received', 'pending'), ('open', 'open'),
+                    ('match', 'open'), ('done', 'done')]
+    assert bus.get_state('o1')['done_reason'] == 'canceled'
+
+    bus.publish(dict(type='received', order_id='o2', side='buy', price='10.0', size='1.0'))
+    bus.publish(dict(type='done', order_id='o2', reason='filled'))
+    assert bus.get_state('o1') is None  # max_done
+    assert bus.message_count == 7
+
+
+def test_order_fill_future():
+    gateway, bus = make_gateway()
+    order = GdaxOrder(gateway, 'BTC-USD', side='buy', price=99.0, size=1.0)
+    order.post()
+    order.attach(bus)
+    filled = list()
+    order.add_fill_callback(filled.append)
+    assert not order.fill_future.done() and not order.is_filled()
+
+    gateway.on_feed_message(dict(type='match', side='buy', price='98.0',
+                                 size='1.0', maker_order_id='b1'))
+    assert order.fill_future.result(timeout=0) is order
+    assert filled == [order] and order.is_filled()
+    assert order.filled_size == 1.0 and order.executed_value == 99.0
+
+    # A crossing order fills before it's attached.
+    taker = GdaxOrder(gateway, 'BTC-USD', side='buy', price=102.0, size=1.0)
+    taker.post()
+    taker.attach(bus)
+    assert taker.fill_future.done() and taker.status == 'done'
+    taker.add_fill_callback(filled.append)
+    assert filled == [order, taker]
+
+
+def test_order_cancel_cancels_future():
+    gateway, bus = make_gateway()
+    order = GdaxOrder(gateway, 'BTC-USD', side='buy', price=95.0, size=1.0)
+    order.post()
+    order.attach(bus)
+    order.cancel()
+    assert order.fill_future.cancelled()
+    assert bus.get_state(order.id)['done_reason'] == 'canceled'
+
+
+def test_order_attached_without_received():
+    gateway, bus = make_gateway()
+    gateway.user_bus = None
+    order = GdaxOrder(gateway, 'BTC-USD', side='buy', price=99.0, size=1.0)
+    order.post()
+    gateway.user_bus = bus
+    order.attach(bus)
+    assert bus.get_state(order.id)['status'] == 'open'
+
+    gateway.on_feed_message(dict(type='match', side='buy', price='98.0',
+                                 size='1.0', maker_order_id='b1'))
+    assert order.fill_future.result(timeout=0) is order
+    assert order.filled_size == 1.0
+
+
+def test_market_maker_reconciles_orders():
+    snapshot = dict(sequence=10, bids=[[99.0, 2.0, 'b1']], asks=[[101.0, 3.0, 'a1']])
+    sim = MarketMakerSimulation([], snapshot=snapshot,
+                                balances={'USD': 10000, 'BTC': 5},
+                                reconcile_interval=60)
+    sim.feed.on_message(dict(type='heartbeat', sequence=11))
+    mm, gateway, bus = sim.market_maker, sim.gateway, sim.market_maker.user_feed.bus
+
+    # Placed before the market maker started and while the socket was down.
+    gateway.user_bus = None
+    o1 = GdaxOrder(gateway, 'BTC-USD', side='sell', price=101.0, size=1.0)
+    o2 = GdaxOrder(gateway, 'BTC-USD', side='sell', price=101.5, size=1.0)
+    o1.post()
+    o2.post()
+    gateway.user_bus = bus
+    assert set(mm.orders) == {o1.id, o2.id}
+
+    # Adopted orders get their fills pushed.
+    gateway.on_feed_message(dict(type='match', side='sell', price='101.0',
+                                 size='1.0', maker_order_id='x'))
+    assert list(mm._filled) == [o1.id]
+
+    # A fill missed while the socket was down is found
+    # through the API once the feed reconnects.
+    gateway.user_bus = None
+    gateway.on_feed_message(dict(type='match', side='sell', price='101.5',
+                                 size='3.0', maker_order_id='x'))
+    gateway.user_bus = bus
+    assert not mm.reconcile_due() and o2.id in mm.orders
+    mm.user_feed.connections += 1
+    assert mm.reconcile_due()
+    assert o2.id not in mm.orders and o2.id in mm._fills
+    assert not mm.reconcile_due()
+
+    sim.clock.advance_to(sim.clock.time() + 60)
+    assert mm.reconcile_due()
@@ -0,0 +1,64 @@
+from collections import defaultdict
+from stocklook.crypto.gdax.feeds.wall_index import GdaxWallIndex
+from stocklook.crypto.gdax.tests.test_simulation import make_feed, make_gateway
+
+
+def get_levels(feed, side):
+    levels = defaultdict(float)
+    book = feed.get_current_book()
+    for price, size, _ in book['bids' if side == 'buy' else 'asks']:
+        levels[price] += size
+    return levels
+
+
+def scan_walls(feed, side, size, within_percent=0.01):
+    levels = get_levels(feed, side)
+    top = feed.get_top_price(side)
+    if side == 'buy':
+        band = [p for p in levels if top * (1 - within_percent) <= p <= top]
+        band.sort(reverse=True)
+    else:
+        band = sorted(p for p in levels if top <= p <= top * (1 + within_percent))
+    return [(p, levels[p]) for p in band if levels[p] >= size]
+
+
+def test_wall_index_tracks_book():
+    snapshot, messages = make_feed(600, seed=3)
+    gateway, feed = make_gateway(snapshot)
+    feed.walls.set_min_size(3)
+    for i, msg in enumerate(messages):
+        feed.on_message(msg)
+        if i % 25:
+            continue
+        for side in ('buy', 'sell'):
+            expected = scan_walls(feed, side, 3)
+            assert feed.walls.get_walls(side, feed.get_top_price(side)) == expected
+            assert feed.get_nearest_wall(side) == (expected[0] if expected else None)
+            top = sorted(expected, key=lambda w: -w[1])[:2]
+            assert sorted(w[1] for w in feed.get_top_walls(side, n=2)) == \
+                sorted(w[1] for w in top)
+            assert feed.get_nearest_wall(side, size=20) == \
+                next(iter(scan_walls(feed, side, 20)), None)
+
+
+def test_wall_index_queries():
+    walls = GdaxWallIndex(min_size=10, within_percent=0.01, measure_size=2)
+    for price, size in ((100.0, 12), (99.9, 3), (99.5, 30), (98.0, 50)):
+        walls.update('buy', price, size)
+    walls.update('sell', 100.1, 15)
+    assert walls.get_walls('buy', 100.0) == [(100.0, 12), (99.5, 30)]  # 98 is outside 1%
+    assert walls.get_nearest('buy', 100.0, skip_top=True) == (99.5, 30)
+    assert walls.get_top('buy', 100.0, n=1) == [(99.5, 30)]
+    assert walls.get_wall_size(100.0, 100.1) == (12 + 15) / 2
+
+    walls.update('buy', 100.0, 4)
+    assert walls.get_walls('buy', 100.0) == [(99.5, 30)]
+    # Smaller walls are found without changing the minimum.
+    assert walls.get_walls('buy', 100.0, size=3) == [(100.0, 4), (99.9, 3), (99.5, 30)]
+    assert walls.get_top('buy', 100.0, n=1, size=3) == [(99.5, 30)]
+    assert walls.min_size == 10 and walls.get_walls('buy', 100.0) == [(99.5, 30)]
+    walls.update('buy', 99.9, 0)
+    assert walls.get_walls('buy', 100.0, size=3) == [(100.0, 4), (99.5, 30)]
+    walls.update('buy', 99.5, 0)
+    assert walls.get_level_size('buy', 99.5) == 0.0
+    assert walls.get_nearest('buy', 100.0, size=10) is None
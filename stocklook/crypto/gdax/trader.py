@@ -59,6 +59,9 @@ class GdaxTrader:
         These objects are assigned to GdaxAnalyzer objects so they'll
         all be analyzing the same set(s) of data refreshed on a timely basis.
 
+        All charts are resampled from one base candle series
+        per product kept by Gdax.candle_manager.
+
         ChartData objects are assigned as follows:
             GdaxTrader.h: 4 hours of data, 5 minutes timeframes
             GdaxTrader.d: 1 day of data, 15 minutes timeframes
@@ -91,7 +94,8 @@ class GdaxTrader:
                                        self.product,
                                        start,
                                        end,
-                                       granularity)
+                                       granularity,
+                                       candle_manager=self.gdax.candle_manager)
             else:
                 self.h.refresh(start=start, end=end)
 
@@ -106,7 +110,8 @@ class GdaxTrader:
                                        self.product,
                                        start,
                                        end,
-                                       granularity)
+                                       granularity,
+                                       candle_manager=self.gdax.candle_manager)
             else:
                 self.d.refresh(start=start, end=end)
 
@@ -122,7 +127,8 @@ class GdaxTrader:
                                        self.product,
                                        start,
                                        end,
-                                       granularity)
+                                       granularity,
+                                       candle_manager=self.gdax.candle_manager)
             else:
                 self.w.refresh(start=start, end=end)
 
@@ -138,7 +144,8 @@ class GdaxTrader:
                                        self.product,
                                        start,
                                        end,
-                                       granularity)
+                                       granularity,
+                                       candle_manager=self.gdax.candle_manager)
             else:
                 self.m.refresh(start=start, end=end)
             self.times['m'] = end
@@ -1,3 +1,4 @@
 from .insidebars import InsideBars
 from .pattern import Pattern
-from .stairstep import HigherHighs
\ No newline at end of file
+from .stairstep import HigherHighs, LowerLows
+from .scanner import PatternScanner, INSIDE_BARS, HIGHER_HIGHS, LOWER_LOWS
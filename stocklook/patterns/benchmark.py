@@ -0,0 +1,64 @@
+""" benchmark.py
+Times PatternScanner on a 100k bar series against the per-start-index
+iterrows() scan GdaxChartData used to find pattern runs.
+
+Usage:
+    python -m stocklook.patterns.benchmark [n_bars] [legacy_n_bars]
+"""
+import sys
+import numpy as np
+import pandas as pd
+from timeit import default_timer
+from stocklook.patterns.scanner import PatternScanner, INSIDE_BARS, HIGHER_HIGHS, LOWER_LOWS
+from stocklook.patterns.legacy import legacy_get_run
+
+
+def make_bars(n, seed=0):
+    rng = np.random.RandomState(seed)
+    close = 100 + rng.randn(n).cumsum()
+    return pd.DataFrame(dict(open=close,
+                             high=close + rng.rand(n),
+                             low=close - rng.rand(n),
+                             close=close,
+                             time=pd.date_range('2017-01-01', periods=n, freq='min')))
+
+
+def legacy_scan_all(df, kind):
+    """ Every run found by calling the legacy loop from each start index. """
+    runs, i, n = list(), 0, df.index.size
+    while i < n:
+        data = legacy_get_run(df[i:], kind)
+        if data is None:
+            i += 1
+        else:
+            runs.append(data)
+            i += len(data)
+    return runs
+
+
+def main(n=100000, legacy_n=2000):
+    kinds = (INSIDE_BARS, HIGHER_HIGHS, LOWER_LOWS)
+    df = make_bars(n)
+    t = default_timer()
+    scanner = PatternScanner(df)
+    counts = {k: len(scanner.scan(k)) for k in kinds}
+    new_secs = default_timer() - t
+
+    small = make_bars(legacy_n)
+    t = default_timer()
+    for k in kinds:
+        legacy_scan_all(small, k)
+    legacy_secs = default_timer() - t
+    per_bar = legacy_secs / legacy_n
+
+    print("PatternScanner: {} bars, all runs of {} "
+          "patterns in {:.3f}s {}".format(n, len(kinds), new_secs, counts))
+    print("Legacy iterrows scan: {} bars in {:.3f}s, "
+          "~{:.1f}s extrapolated to {} bars "
+          "({:.0f}x slower)".format(legacy_n, legacy_secs, per_bar * n, n,
+                                    per_bar * n / max(new_secs, 1e-9)))
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,38 @@
+""" legacy.py
+The iterrows() loops GdaxChartData used to find pattern runs, kept as
+the reference PatternScanner is checked and benchmarked against.
+"""
+from stocklook.patterns.scanner import INSIDE_BARS, HIGHER_HIGHS, LOWER_LOWS
+
+CONDITIONS = {
+    INSIDE_BARS: lambda h, l, last_h, last_l: h <= last_h and l >= last_l,
+    HIGHER_HIGHS: lambda h, l, last_h, last_l: h > last_h and l > last_l,
+    LOWER_LOWS: lambda h, l, last_h, last_l: h < last_h and l < last_l,
+}
+
+
+def legacy_get_run(df, kind):
+    """ The iterrows() loop GdaxChartData.get_inside_bars used.
+    """
+    data = []
+    for idx, rec in df.iterrows():
+        o, h, l, c, t = rec['open'], rec['high'], rec['low'], rec['close'], rec['time']
+        if not data:
+            data.append([o, h, l, c, t])
+        else:
+            _, last_h, last_l, _, _ = data[-1]
+            if CONDITIONS[kind](h, l, last_h, last_l):
+                data.append([o, h, l, c, t])
+            else:
+                break
+    if len(data) > 1:
+        return data
+
+
+def legacy_get_last_run(df, kind):
+    """ The first run found scanning forward from each start index.
+    """
+    for i in range(df.index.size):
+        data = legacy_get_run(df[i:], kind)
+        if data is not None:
+            return data
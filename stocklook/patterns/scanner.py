@@ -0,0 +1,137 @@
+import numpy as np
+from stocklook.patterns.insidebars import InsideBars
+from stocklook.patterns.stairstep import HigherHighs, LowerLows
+
+INSIDE_BARS = 'inside_bars'
+HIGHER_HIGHS = 'higher_highs'
+LOWER_LOWS = 'lower_lows'
+
+PATTERN_CLASSES = {
+    INSIDE_BARS: InsideBars,
+    HIGHER_HIGHS: HigherHighs,
+    LOWER_LOWS: LowerLows,
+}
+
+
+def get_pattern_mask(high, low, kind):
+    """
+    Returns a boolean array where mask[i] is True when bar i
+    continues the pattern from bar i - 1:
+        inside_bars: high[i] <= high[i-1] and low[i] >= low[i-1]
+        higher_highs: high[i] > high[i-1] and low[i] > low[i-1]
+        lower_lows: high[i] < high[i-1] and low[i] < low[i-1]
+    mask[0] is always False. Comparisons with nan are False.
+
+    :param high: (np.array)
+    :param low: (np.array)
+    :param kind: (str) INSIDE_BARS, HIGHER_HIGHS or LOWER_LOWS
+    :return: (np.array) of bool
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    mask = np.zeros(len(high), dtype=bool)
+    if len(high) < 2:
+        return mask
+    h, ph = high[1:], high[:-1]
+    l, pl = low[1:], low[:-1]
+    if kind == INSIDE_BARS:
+        mask[1:] = (h <= ph) & (l >= pl)
+    elif kind == HIGHER_HIGHS:
+        mask[1:] = (h > ph) & (l > pl)
+    elif kind == LOWER_LOWS:
+        mask[1:] = (h < ph) & (l < pl)
+    else:
+        raise KeyError("Unknown pattern '{}', expected one "
+                       "of {}".format(kind, list(PATTERN_CLASSES)))
+    return mask
+
+
+def find_runs(mask):
+    """
+    Returns the (start, end) bar positions (inclusive) of every
+    maximal pattern run where :param mask is a get_pattern_mask result.
+    Each run starts at the bar before its first True mask value.
+    :return: (np.array) shape (n_runs, 2)
+    """
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1) - 1
+    ends = np.flatnonzero(edges == -1) - 1
+    return np.column_stack((starts, ends))
+
+
+class PatternScanner:
+    """
+    Finds every inside bars/higher highs/lower lows run in a
+    set of candles in linear time.
+
+    Rows are compared in the order given, so for Gdax candles
+    (newest first) the first run found is the most recent one.
+    """
+    COLUMNS = ['open', 'high', 'low', 'close', 'time']
+
+    def __init__(self, df):
+        """
+        :param df: (pd.DataFrame) with open, high, low, close and time columns.
+        """
+        self.df = df
+        self._high = df['high'].values
+        self._low = df['low'].values
+        self._rows = None
+        self._runs = dict()
+
+    @property
+    def rows(self):
+        """
+        [[open, high, low, close, time], ...] built once and
+        sliced into pattern data.
+        """
+        if self._rows is None:
+            cols = [self.df[c].tolist() for c in self.COLUMNS]
+            self._rows = [list(r) for r in zip(*cols)]
+        return self._rows
+
+    def get_runs(self, kind):
+        """
+        Returns (start, end) positions of every run of :param kind.
+        """
+        try:
+            return self._runs[kind]
+        except KeyError:
+            runs = find_runs(get_pattern_mask(self._high, self._low, kind))
+            self._runs[kind] = runs
+            return runs
+
+    def make_pattern(self, kind, start, end):
+        return PATTERN_CLASSES[kind](self.rows[start:end + 1])
+
+    def scan(self, kind):
+        """
+        Returns every run of :param kind as a list of
+        InsideBars/HigherHighs/LowerLows objects.
+        """
+        return [self.make_pattern(kind, s, e) for s, e in self.get_runs(kind)]
+
+    def first(self, kind, start=0):
+        """
+        Returns the first run of :param kind found scanning from
+        position :param start (a run already in progress at
+        :param start is cut to begin there) or None.
+        """
+        runs = self.get_runs(kind)
+        i = np.searchsorted(runs[:, 1], start, side='right')
+        if i < len(runs):
+            s, e = runs[i]
+            return self.make_pattern(kind, max(s, start), e)
+        return None
+
+    def at(self, kind, start=0):
+        """
+        Returns the run of :param kind beginning exactly
+        at position :param start (continuing to the end of
+        the run it's part of) or None.
+        """
+        runs = self.get_runs(kind)
+        i = np.searchsorted(runs[:, 0], start, side='right') - 1
+        if i >= 0 and runs[i, 0] <= start < runs[i, 1]:
+            return self.make_pattern(kind, start, runs[i, 1])
+        return None
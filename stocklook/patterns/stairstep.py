@@ -6,4 +6,11 @@ class HigherHighs(Pattern):
     def last_high(self):
         pass
     def last_low(self):
-        pass
\ No newline at end of file
+        pass
+
+
+class LowerLows(Pattern):
+    def last_high(self):
+        pass
+    def last_low(self):
+        pass
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+from stocklook.patterns.scanner import PatternScanner, get_pattern_mask, find_runs
+from stocklook.patterns.legacy import CONDITIONS, legacy_get_run, legacy_get_last_run
+
+""" tests.py
+Unit tests for patterns module
+"""
+
+
+def pattern_test_bars(n=300):
+    np.random.seed(5)
+    close = 100 + np.random.randn(n).cumsum()
+    high = np.round(close + np.random.rand(n) * 3, 0)
+    low = np.round(close - np.random.rand(n) * 3, 0)
+    return pd.DataFrame(dict(open=close, high=high, low=low, close=close,
+                             time=pd.date_range('2017-01-01', periods=n, freq='5min')))
+
+
+def test_find_runs():
+    """ [patterns.scanner] Test run boundaries from a mask
+    """
+    mask = np.array([False, True, True, False, False, True, False, True])
+    np.testing.assert_array_equal(find_runs(mask), [[0, 2], [4, 5], [6, 7]])
+    assert len(find_runs(np.zeros(5, dtype=bool))) == 0
+
+
+def test_scanner_matches_legacy():
+    """ [patterns.scanner] Test scanner runs against the iterrows() loops
+    """
+    df = pattern_test_bars()
+    scanner = PatternScanner(df)
+    for kind in CONDITIONS:
+        runs = scanner.scan(kind)
+        assert runs, kind
+        assert scanner.first(kind).data == legacy_get_last_run(df, kind)
+        for i in (0, 3, 17, 101):
+            expected = legacy_get_run(df[i:], kind)
+            actual = scanner.at(kind, i)
+            assert (actual.data if actual is not None else None) == expected
+            expected = legacy_get_last_run(df[i:], kind)
+            actual = scanner.first(kind, i)
+            assert (actual.data if actual is not None else None) == expected
+
+        # Every bar continuing a run is covered by exactly one run.
+        mask = get_pattern_mask(df['high'], df['low'], kind)
+        assert sum(len(r.data) - 1 for r in runs) == mask.sum()
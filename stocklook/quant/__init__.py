@@ -1,3 +1,3 @@
 # Took this module from https://github.com/hamiltonkibbe/stocks/blob/master/quant/
 
-from stocklook.quant.rsi import RSI
\ No newline at end of file
+from stocklook.quant.rsi import RSI, RSIState
\ No newline at end of file
@@ -1,7 +1,50 @@
 #!/usr/bin/env python
 import numpy as np
-from numpy import array, zeros, append, sum, subtract, empty, nan
-from pandas import Series, stats, concat
+from numpy import subtract, nan
+from pandas import Series
+
+
+def _as_float_array(data):
+    """ Returns data as a float numpy array (None becomes nan).
+    """
+    return np.asarray(data, dtype=float)
+
+
+def _lag_apply(span, data, func):
+    """ Applies func(cur, prev) where prev is the value *span - 1* points
+    before cur. The first span - 1 values are nan.
+    :param span: Window length (lag + 1).
+    :param data: Data to process.
+    :param func: Vectorized function of (cur, prev) arrays.
+    :returns: numpy array the same length as data.
+    """
+    data = _as_float_array(data)
+    lag = span - 1
+    out = np.full(len(data), nan)
+    if lag < len(data):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out[lag:] = func(data[lag:], data[:len(data) - lag])
+    return out
+
+
+def _rolling_sum(span, data):
+    """ Calculate n-point rolling sum using a cumulative sum.
+    Windows containing nan (and the first span - 1 points) are nan.
+    """
+    data = _as_float_array(data)
+    out = np.full(len(data), nan)
+    if span <= 0 or span > len(data):
+        return out
+    isnan = np.isnan(data)
+    csum = np.cumsum(np.where(isnan, 0.0, data))
+    cnan = np.cumsum(isnan)
+    sums = csum[span - 1:].copy()
+    sums[1:] -= csum[:-span]
+    nans = cnan[span - 1:].copy()
+    nans[1:] -= cnan[:-span]
+    sums[nans > 0] = nan
+    out[span - 1:] = sums
+    return out
 
 
 # ------------------------------------------------
@@ -14,7 +57,9 @@ def moving_average(span, data):
     :param data: Data to average.
     :returns: Moving average as a numpy array.
     """
-    return np.array(stats.moments.rolling_mean(data, span))
+    if span <= 0:
+        return np.full(len(data), nan)
+    return _rolling_sum(span, data) / span
 
 
 def exp_weighted_moving_average(span, data):
@@ -23,13 +68,15 @@ def exp_weighted_moving_average(span, data):
     :param data: Data to average.
     :returns: Exponentially weighted moving average as a numpy array.
     """
-    return np.array(stats.moments.ewma(data, span=span))
+    return Series(_as_float_array(data)).ewm(span=span).mean().values
 
 def mag_diff(data, average):
-    return np.array([np.nan if (avg is None or cur is None) else (cur - avg) for cur, avg in zip(data, average)])
+    return _as_float_array(data) - _as_float_array(average)
 
 def percent_diff(data, average):
-    return np.array([np.nan if (avg is None or avg == 0.0 or cur is None) else ((cur - avg) / (avg + 1e-1000)) for cur,avg in zip(data, average)])
+    data, average = _as_float_array(data), _as_float_array(average)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(average == 0.0, nan, (data - average) / average)
 
 
 # ------------------------------------------------
@@ -42,7 +89,9 @@ def percent_change(data):
     :param data: Data to process
     :returns: Percent change in data as a numpy array.
     """
-    return np.array(Series(data).pct_change().values)
+    # Gaps are padded with the previous value like Series.pct_change used to.
+    data = Series(_as_float_array(data)).ffill().values
+    return _lag_apply(2, data, lambda cur, prev: cur / prev - 1)
 
 
 
@@ -52,7 +101,7 @@ def moving_stdev(span, data):
     :param span: Length of moving window.
     :returns: Moving standard deviation as a numpy array.
     """
-    return np.array(stats.moments.rolling_std(data, span))
+    return Series(_as_float_array(data)).rolling(span).std().values
 
 
 def moving_var(span, data):
@@ -61,7 +110,9 @@ def moving_var(span, data):
     :param span: Length of moving window.
     :returns: moving variance as a numpy array.
     """
-    return np.array(stats.moments.rolling_var(data, span))
+    # pandas' rolling variance is used rather than a cumulative
+    # sum of squares, which loses precision on large price levels.
+    return Series(_as_float_array(data)).rolling(span).var().values
 
 
 # ------------------------------------------------
@@ -77,27 +128,18 @@ def momentum(span, data):
     :param data: Raw data to analyze.
     :returns: Momentum as a numpy array.
     """
-    momentum = np.array([100 * (cur / prev) for cur, prev in zip(data[span-1:], data)])
-    blank = np.zeros(span-1)
-    blank[:] = np.nan
-    return append(blank, momentum) #.astype(float)
+    return _lag_apply(span, data, lambda cur, prev: 100 * (cur / prev))
 
 def rate_of_change(span, data):
     """ Calculate rate of change
     """
-    roc = np.array([((cur - prev) / prev) for cur, prev in zip(data[span-1:], data)])
-    blank = np.zeros(span-1)
-    blank[:] = np.nan
-    return append(blank, roc).astype(float)
+    return _lag_apply(span, data, lambda cur, prev: (cur - prev) / prev)
 
 
 def velocity(span, data):
     """ Calculate velocity
     """
-    velocity = np.array([((cur - prev) / (span - 1)) for cur, prev in zip(data[span-1:], data)])
-    blank = np.zeros(span-1)
-    blank[:] = np.nan
-    return append(blank, velocity).astype(float)
+    return _lag_apply(span, data, lambda cur, prev: (cur - prev) / (span - 1))
 
 
 def acceleration(span, data, vel=None):
@@ -105,10 +147,12 @@ def acceleration(span, data, vel=None):
     """
     if vel is None:
         vel = velocity(span, data)
-    acceleration = np.array([((cur - prev) / (span - 1)) for cur, prev in zip(vel[span-1:], vel)])
-    blank = zeros(span-1)
-    blank[:] = nan
-    return append(blank, acceleration).astype(float)
+    return velocity(span, vel)
+
+
+def _macd(data):
+    return subtract(exp_weighted_moving_average(12, data),
+                    exp_weighted_moving_average(26, data))
 
 
 def macd(data=None, fast_ewma=None, slow_ewma=None):
@@ -123,13 +167,8 @@ def macd(data=None, fast_ewma=None, slow_ewma=None):
         Either raw data or the 12 and 26 day EWMAs must be provided, all three
         are not necessary.
     """
-  #  return exp_weighted_value_oscillator(12, 26, data, fast_ewma, slow_ewma)
     if fast_ewma is None and slow_ewma is None:
-        if data is not None:
-            slow_ewma = exp_weighted_moving_average(26, data)
-            fast_ewma = exp_weighted_moving_average(12, data)
-        else:
-            pass
+        return _macd(data).astype(float)
     return subtract(fast_ewma, slow_ewma).astype(float)
 
 
@@ -143,11 +182,7 @@ def macd_signal(data=None, macd=None):
         Either raw data or the MACD must be provided, both ar not necessary
     """
     if macd is None:
-        if data is not None:
-            macd = macd(data)
-        else:
-            pass
-        pass
+        macd = _macd(data)
     return exp_weighted_moving_average(9, macd)
 
 
@@ -164,12 +199,10 @@ def macd_hist(data=None, macd=None, macd_signal=None):
         Either raw data or the MACD and MACD signal must be provided, all three
         are not necessary.
     """
-    if macd is None and macd_signal is None:
-        if data is not None:
-            macd = macd(data)
-            macd_signal = macd_signal(macd=macd)
-        else:
-            pass
+    if macd is None:
+        macd = _macd(data)
+    if macd_signal is None:
+        macd_signal = exp_weighted_moving_average(9, macd)
     return subtract(macd, macd_signal)
 
 
@@ -177,11 +210,8 @@ def value_oscillator(fast_ma_len=5,slow_ma_len=20, data=None, fast_ma=None, slow
     """ Calculate value oscillator
     """
     if fast_ma is None and slow_ma is None:
-        if data is not None:
-            slow_ma = moving_average(slow_ma_len, data)
-            fast_ma = moving_average(fast_ma_len, data)
-        else:
-            pass
+        slow_ma = moving_average(slow_ma_len, data)
+        fast_ma = moving_average(fast_ma_len, data)
     return subtract(fast_ma, slow_ma).astype(float)
 
 
@@ -189,13 +219,9 @@ def exp_weighted_value_oscillator(fast_ma_len=5, slow_ma_len=20, data=None, fast
     """ Calculate exponentially weighted value oscillator
     """
     if fast_ma is None and slow_ma is None:
-        if data is not None:
-            slow_ma = exp_weighted_moving_average(slow_ma_len, data)
-            fast_ma = exp_weighted_moving_average(fast_ma_len, data)
-        else:
-            # Error
-            pass
-        return subtract(fast_ma, slow_ma).astype(float)
+        slow_ma = exp_weighted_moving_average(slow_ma_len, data)
+        fast_ma = exp_weighted_moving_average(fast_ma_len, data)
+    return subtract(fast_ma, slow_ma).astype(float)
 
 
 def trix(span, data):
@@ -205,15 +231,18 @@ def trix(span, data):
     first = (exp_weighted_moving_average(span, data))
     second = (exp_weighted_moving_average(span, first))
     third = (exp_weighted_moving_average(span, second))
-    trix = [((cur - prev) / prev) for cur, prev in zip(third[span-1:], third)]
-    blank = np.zeros(span - 1)
-    blank[:] = nan
-    return append(blank, trix).astype(float)
+    return _lag_apply(span, third, lambda cur, prev: (cur - prev) / prev)
 
 def chandes_momentum_oscillator(span, data):
-    blank = np.zeros(span)
-    blank[:] = nan
-    deltas = append(blank, [cur - prev for cur, prev in zip(data[span:], data)]).astype(float)
+    """ Calculate Chande Momentum Oscillator
+    100 * (sum of gains - sum of losses) / (sum of gains + sum of losses)
+    over the last *span* one-point changes.
+    """
+    deltas = _lag_apply(2, data, lambda cur, prev: cur - prev)
+    gains = _rolling_sum(span, np.where(deltas > 0, deltas, 0.0))
+    losses = _rolling_sum(span, np.where(deltas < 0, -deltas, 0.0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 * (gains - losses) / (gains + losses)
 
 
 def relative_strength_index(span, data):
@@ -225,14 +254,14 @@ def relative_strength_index(span, data):
 def relative_momentum_index(span, deltaspan, data):
     """ Calculate RMI
     """
-    blank = np.zeros(deltaspan)
-    blank[:] = nan
-    deltas = append(blank, [cur - prev for cur, prev in zip(data[deltaspan:], data)]).astype(float)
-    gains = array([x if x > 0 else 0 for x in deltas]).astype(float)
-    losses = array([-x if x < 0 else 0 for x in deltas]).astype(float)
+    deltas = _lag_apply(deltaspan + 1, data, lambda cur, prev: cur - prev)
+    # nan deltas count as neither gains nor losses.
+    gains = np.where(deltas > 0, deltas, 0.0)
+    losses = np.where(deltas < 0, -deltas, 0.0)
     avg_gains = moving_average(span, gains)
     avg_losses = moving_average(span, losses)
-    return array([100 - (100 / (1 + gain/loss))  for gain, loss in zip(avg_gains, avg_losses)]).astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 - (100 / (1 + avg_gains / avg_losses))
 
 
 
@@ -243,21 +272,16 @@ def relative_momentum_index(span, deltaspan, data):
 def accumulation_distribution(high, low, close, volume, prev=0):
     """ Calculate Accumulation/Distribution
     """
-    money_flow_volume = array([v *  (((c - l) - (h - c)) / (h - l)) for h, l, c, v in zip(high, low, close, volume)]).astype(float)
-    adl = zeros(len(money_flow_volume))
-    for i in range(len(money_flow_volume)):
-        adl[i] = prev + money_flow_volume[i]
-        prev = adl[i]
-    return adl.astype(float)
+    high, low = _as_float_array(high), _as_float_array(low)
+    close, volume = _as_float_array(close), _as_float_array(volume)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        money_flow_volume = volume * (((close - low) - (high - close)) / (high - low))
+    return prev + np.cumsum(money_flow_volume)
 
 
 def chaikin_oscillator(high=None, low=None, close=None, volume=None, prev=0,adl=None):
     if adl is None:
-        if high is not None and low is not None and close is not None and volume is not None:
-            adl = accumulation_distribution(high, low, close, volume, prev)
-            fast_ma = exp_weighted_moving_average(3, adl)
-            slow_ma = exp_weighted_moving_average(10, adl)
-        else:
-            # Error
-            pass
-        return subtract(fast_ma, slow_ma).astype(float)
+        adl = accumulation_distribution(high, low, close, volume, prev)
+    fast_ma = exp_weighted_moving_average(3, adl)
+    slow_ma = exp_weighted_moving_average(10, adl)
+    return subtract(fast_ma, slow_ma).astype(float)
@@ -0,0 +1,110 @@
+""" benchmark.py
+Times the vectorized stocklook.quant.analysis kernels against the
+element-by-element implementations they replaced.
+
+Usage:
+    python -m stocklook.quant.benchmark [n_points]
+"""
+import sys
+import numpy as np
+from timeit import default_timer
+import stocklook.quant.analysis as analysis
+
+
+# ------------------------------------------------
+# Legacy implementations (list comprehensions over zip)
+# ------------------------------------------------
+
+def legacy_momentum(span, data):
+    m = np.array([100 * (cur / prev) for cur, prev in zip(data[span-1:], data)])
+    return np.append(np.full(span - 1, np.nan), m)
+
+
+def legacy_rate_of_change(span, data):
+    roc = np.array([((cur - prev) / prev) for cur, prev in zip(data[span-1:], data)])
+    return np.append(np.full(span - 1, np.nan), roc)
+
+
+def legacy_velocity(span, data):
+    v = np.array([((cur - prev) / (span - 1)) for cur, prev in zip(data[span-1:], data)])
+    return np.append(np.full(span - 1, np.nan), v)
+
+
+def legacy_mag_diff(data, average):
+    return np.array([np.nan if (avg is None or cur is None) else (cur - avg)
+                     for cur, avg in zip(data, average)])
+
+
+def legacy_relative_momentum_index(span, deltaspan, data):
+    deltas = np.append(np.full(deltaspan, np.nan),
+                       [cur - prev for cur, prev in zip(data[deltaspan:], data)])
+    gains = np.array([x if x > 0 else 0 for x in deltas]).astype(float)
+    losses = np.array([-x if x < 0 else 0 for x in deltas]).astype(float)
+    avg_gains = analysis.moving_average(span, gains)
+    avg_losses = analysis.moving_average(span, losses)
+    return np.array([100 - (100 / (1 + gain / loss))
+                     for gain, loss in zip(avg_gains, avg_losses)])
+
+
+def legacy_accumulation_distribution(high, low, close, volume, prev=0):
+    mfv = np.array([v * (((c - l) - (h - c)) / (h - l))
+                    for h, l, c, v in zip(high, low, close, volume)])
+    adl = np.zeros(len(mfv))
+    for i in range(len(mfv)):
+        adl[i] = prev + mfv[i]
+        prev = adl[i]
+    return adl
+
+
+def timed(func, *args, repeat=1):
+    best = None
+    for _ in range(repeat):
+        t = default_timer()
+        res = func(*args)
+        t = default_timer() - t
+        best = t if best is None else min(best, t)
+    return best, res
+
+
+def run_benchmark(n=1000000, seed=0):
+    """ Returns a list of (name, legacy_secs, vectorized_secs, max_abs_diff).
+    """
+    rng = np.random.RandomState(seed)
+    close = 100 + rng.randn(n).cumsum() * 0.1 + 1000
+    high = close + rng.rand(n)
+    low = close - rng.rand(n)
+    volume = rng.rand(n) * 10
+    average = analysis.moving_average(20, close)
+
+    cases = [
+        ('momentum', legacy_momentum, analysis.momentum, (14, close)),
+        ('rate_of_change', legacy_rate_of_change, analysis.rate_of_change, (14, close)),
+        ('velocity', legacy_velocity, analysis.velocity, (14, close)),
+        ('mag_diff', legacy_mag_diff, analysis.mag_diff, (close, average)),
+        ('relative_momentum_index', legacy_relative_momentum_index,
+         analysis.relative_momentum_index, (14, 3, close)),
+        ('accumulation_distribution', legacy_accumulation_distribution,
+         analysis.accumulation_distribution, (high, low, close, volume)),
+    ]
+
+    results = list()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for name, legacy, vectorized, args in cases:
+            legacy_secs, expected = timed(legacy, *args)
+            new_secs, actual = timed(vectorized, *args, repeat=3)
+            diff = np.nanmax(np.abs(np.nan_to_num(expected) - np.nan_to_num(actual)))
+            results.append((name, legacy_secs, new_secs, diff))
+
+    return results
+
+
+def main(n=1000000):
+    print("{:<28}{:>12}{:>16}{:>10}{:>12}".format(
+        'indicator', 'legacy (s)', 'vectorized (s)', 'speedup', 'max diff'))
+    for name, legacy_secs, new_secs, diff in run_benchmark(n):
+        print("{:<28}{:>12.4f}{:>16.4f}{:>9.1f}x{:>12.2e}".format(
+            name, legacy_secs, new_secs, legacy_secs / max(new_secs, 1e-9), diff))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
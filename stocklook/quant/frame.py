@@ -0,0 +1,251 @@
+""" frame.py
+A pandas DataFrame of OHLCV candles whose indicator columns
+are computed the first time they're accessed.
+
+    df = IndicatorFrame(candles)
+    df['macdh']    # computes macd and macds (its dependencies) then macdh
+    df['macdh']    # memoized - now a regular column
+
+Each indicator declares the columns it depends on so only the
+requested indicators (and what they need) are ever computed.
+Computed columns live in the frame itself, so they're dropped along
+with it when the candles are reloaded. IndicatorFrame.invalidate()
+clears them after modifying candles in place.
+"""
+import re
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, Series
+from stocklook.quant.rsi import RSI
+
+
+class Indicator:
+    """ A lazily computed column.
+    :param name: (str) The column name.
+    :param depends: (tuple) Column names that must exist before func is called.
+    :param func: (callable) func(frame) -> array-like the length of the frame.
+    """
+    def __init__(self, name, depends, func):
+        self.name = name
+        self.depends = tuple(depends)
+        self.func = func
+
+    def __repr__(self):
+        return "Indicator('{}', depends={})".format(self.name, self.depends)
+
+
+# Static indicators by name and parametric indicators by pattern.
+INDICATORS = dict()
+INDICATOR_PATTERNS = list()
+
+
+def register_indicator(name, depends=()):
+    """ Decorator registering func(frame) as indicator :param name.
+    """
+    def decorate(func):
+        INDICATORS[name] = Indicator(name, depends, func)
+        return func
+    return decorate
+
+
+def register_indicator_pattern(pattern):
+    """ Decorator registering a factory for parametric indicators.
+    The factory receives the regex match and returns an Indicator.
+    """
+    def decorate(factory):
+        INDICATOR_PATTERNS.append((re.compile(pattern), factory))
+        return factory
+    return decorate
+
+
+def get_indicator(name):
+    """ Returns the Indicator for a column name or None.
+    """
+    try:
+        return INDICATORS[name]
+    except KeyError:
+        pass
+    for regex, factory in INDICATOR_PATTERNS:
+        m = regex.match(name)
+        if m is not None:
+            ind = factory(m)
+            INDICATORS[name] = ind
+            return ind
+    return None
+
+
+def ema(series, window):
+    """ Exponential moving average (span) like stockstats computed it.
+    """
+    return series.ewm(ignore_na=False, span=window, min_periods=1, adjust=True).mean()
+
+
+def smma(series, window):
+    """ Wilder's smoothed moving average.
+    """
+    return series.ewm(ignore_na=False, alpha=1.0 / window, min_periods=0, adjust=True).mean()
+
+
+# ------------------------------------------------
+# Indicators
+# Rows are processed in frame order (the Gdax API
+# returns candles newest first).
+# ------------------------------------------------
+
+@register_indicator('range', depends=('high', 'low'))
+def _range(df):
+    return df['high'] - df['low']
+
+
+@register_indicator('price_change', depends=('close',))
+def _price_change(df):
+    close = df['close']
+    return close - close.shift(-1)
+
+
+@register_indicator('rsi', depends=('close',))
+def _rsi(df):
+    return RSI(df['close'], 14)
+
+
+@register_indicator('velocity', depends=('range', 'volume'))
+def _velocity(df):
+    """ The average of the range and volume rates vs their averages.
+    """
+    rng, volume = df['range'], df['volume']
+    avg_range = rng.mean()
+    avg_volume = volume[volume > 0].mean()
+    return ((rng / avg_range + volume / avg_volume) / 2).round(2)
+
+
+@register_indicator('macd', depends=('close',))
+def _macd(df):
+    close = df['close']
+    return ema(close, 12) - ema(close, 26)
+
+
+@register_indicator('macds', depends=('macd',))
+def _macds(df):
+    return ema(df['macd'], 9)
+
+
+@register_indicator('macdh', depends=('macd', 'macds'))
+def _macdh(df):
+    return df['macd'] - df['macds']
+
+
+@register_indicator('tr', depends=('high', 'low', 'close'))
+def _tr(df):
+    high, low = df['high'].values, df['low'].values
+    close = df['close'].values
+    prev_close = np.empty_like(close)
+    if len(close):
+        prev_close[0] = close[0]
+        prev_close[1:] = close[:-1]
+    tr = np.maximum(high - low, np.maximum(np.abs(high - prev_close),
+                                           np.abs(low - prev_close)))
+    return np.nan_to_num(tr)
+
+
+@register_indicator('atr', depends=('tr',))
+def _atr(df):
+    return smma(df['tr'], 14)
+
+
+@register_indicator_pattern(r'^sma(\d+)$')
+def _sma_factory(m):
+    n = int(m.group(1))
+    return Indicator(m.group(0), ('close',),
+                     lambda df: df['close'].rolling(n).mean())
+
+
+@register_indicator_pattern(r'^(sma\d+)_diff$')
+def _sma_diff_factory(m):
+    sma = m.group(1)
+    return Indicator(m.group(0), ('close', sma),
+                     lambda df: df['close'] - df[sma])
+
+
+@register_indicator_pattern(r'^rsi_(\d+)$')
+def _stock_rsi_factory(m):
+    """ rsi_N: 100 * smma(gains) / (smma(gains) + smma(losses)),
+    50 for the first row and where there was no change.
+    """
+    n = int(m.group(1))
+
+    def func(df):
+        close = df['close'].values
+        diff = np.zeros_like(close)
+        diff[1:] = np.diff(close)
+        up = smma(Series(np.where(diff > 0, diff, 0.0)), n).values
+        down = smma(Series(np.where(diff < 0, -diff, 0.0)), n).values
+        total = up + down
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = np.where(total != 0, 100 * (up / total), 50.0)
+        if len(rsi):
+            rsi[0] = 50.0
+        return np.nan_to_num(rsi)
+    return Indicator(m.group(0), ('close',), func)
+
+
+class IndicatorFrame(DataFrame):
+    """ DataFrame computing registered indicator columns on first access.
+    """
+    @property
+    def _constructor(self):
+        return IndicatorFrame
+
+    def __getitem__(self, key):
+        if isinstance(key, str) and key not in self.columns:
+            ind = get_indicator(key)
+            if ind is not None:
+                self.compute(key)
+        return DataFrame.__getitem__(self, key)
+
+    def compute(self, *names):
+        """ Computes the named indicators (and their dependencies)
+        if they haven't been already.
+        :return: (IndicatorFrame) self
+        """
+        for name in names:
+            if name in self.columns:
+                continue
+            ind = get_indicator(name)
+            if ind is None:
+                raise KeyError("Unknown indicator '{}'".format(name))
+            for dep in ind.depends:
+                if dep not in self.columns:
+                    self.compute(dep)
+            values = ind.func(self)
+            with pd.option_context('mode.chained_assignment', None):
+                DataFrame.__setitem__(self, name, values)
+        return self
+
+    def invalidate(self, names=None):
+        """ Drops computed indicator columns so they're recomputed
+        on next access. Call after modifying candle values in place.
+        :param names: (list, default None)
+            Indicator or candle column names - indicators computed from
+            them are dropped too. None drops all indicators.
+        :return: (IndicatorFrame) self
+        """
+        if names is None:
+            names = [c for c in self.columns
+                     if isinstance(c, str) and get_indicator(c) is not None]
+        else:
+            # Include anything computed from the dropped columns.
+            names = set(names)
+            changed = True
+            while changed:
+                changed = False
+                for c in self.columns:
+                    ind = get_indicator(c) if isinstance(c, str) else None
+                    if ind is not None and c not in names \
+                            and names.intersection(ind.depends):
+                        names.add(c)
+                        changed = True
+        drop = [c for c in names if c in self.columns
+                and get_indicator(c) is not None]
+        if drop:
+            self.drop(drop, axis=1, inplace=True)
+        return self
@@ -2,10 +2,11 @@ import pandas
 import pandas as pd
 import numpy as np
 import datetime
-import matplotlib.pyplot as plt
 
 
 def rsi_test():
+    import matplotlib.pyplot as plt
+
     # Window length for moving average
     window_length = 14
 
@@ -52,6 +53,22 @@ def rsi_test():
     plt.show()
 
 
+def wilder_smooth(values, seed, n):
+    """
+    Wilder-smooths :param values starting from :param seed:
+        avg[i] = ((avg[i - 1] * (n - 1)) + values[i]) / n
+    This is an exponential moving average with alpha = 1 / n
+    so the recurrence runs in pandas' compiled ewm kernel.
+
+    :param values: (np.array)
+    :param seed: (float) The average before values[0].
+    :param n: (int) The smoothing period.
+    :return: (np.array) the same length as :param values.
+    """
+    data = np.concatenate(([seed], values))
+    return pd.Series(data).ewm(alpha=1.0 / n, adjust=False).mean().values[1:]
+
+
 def RSI(prices, n=14):
     # RSI = 100 - (100 / (1 + RS))
     # where RS = (Wilder-smoothed n-period average of gains / Wilder-smoothed n-period average of -losses)
@@ -64,31 +81,110 @@ def RSI(prices, n=14):
     #     ...
     #     n: lookback period for first Wilder smoothing seed value
     #     n+1: first RSI
+    # Values before the first RSI are 0.0.
 
     # First, calculate the gain or loss from one price to the next. The first value is nan so replace with 0.
     deltas = (prices - prices.shift(1)).fillna(0)
 
-    # Calculate the straight average seed values.
-    # The first delta is always zero, so we will use a slice of the first n deltas starting at 1,
-    # and filter only deltas > 0 to get gains and deltas < 0 to get losses
-    avg_of_gains = deltas[1:n + 1][deltas > 0].sum() / n
-    avg_of_losses = -deltas[1:n + 1][deltas < 0].sum() / n
-
     # Set up pd.Series container for RSI values
     rsi_series = pd.Series(0.0, deltas.index)
-
-    # Now calculate RSI using the Wilder smoothing method, starting with n+1 delta.
-    up = lambda x: x if x > 0 else 0
-    down = lambda x: -x if x < 0 else 0
-    i = n + 1
-    for d in deltas[n + 1:]:
-        avg_of_gains = ((avg_of_gains * (n - 1)) + up(d)) / n
-        avg_of_losses = ((avg_of_losses * (n - 1)) + down(d)) / n
-        if avg_of_losses != 0:
-            rs = avg_of_gains / avg_of_losses
-            rsi_series[i] = 100 - (100 / (1 + rs))
+    if len(deltas) <= n + 1:
+        return rsi_series
+
+    values = deltas.values.astype(float)
+    gains = np.where(values > 0, values, 0.0)
+    losses = np.where(values < 0, -values, 0.0)
+
+    # Calculate the straight average seed values from the
+    # first n deltas (the first delta is always zero).
+    avg_of_gains = wilder_smooth(gains[n + 1:], gains[1:n + 1].sum() / n, n)
+    avg_of_losses = wilder_smooth(losses[n + 1:], losses[1:n + 1].sum() / n, n)
+
+    # Now calculate RSI from the Wilder-smoothed averages, starting with n+1 delta.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(avg_of_losses != 0,
+                       100 - (100 / (1 + avg_of_gains / avg_of_losses)),
+                       100.0)
+    rsi_series.iloc[n + 1:] = rsi
+
+    return rsi_series
+
+
+class RSIState:
+    """
+    Streaming RSI producing the same values as stocklook.quant.rsi.RSI
+    one price at a time in O(1) - for live feeds where recomputing
+    the whole series on every tick is wasteful.
+
+    Example:
+        state = RSIState.from_prices(df['close'], n=14)
+        state.update(new_close)  # -> next RSI value
+    """
+    def __init__(self, n=14):
+        self.n = n
+        self.count = 0
+        self.prev_price = None
+        self.avg_of_gains = 0.0
+        self.avg_of_losses = 0.0
+        self.value = 0.0
+        self._gain_sum = 0.0
+        self._loss_sum = 0.0
+
+    @classmethod
+    def from_prices(cls, prices, n=14):
+        """
+        Returns an RSIState seeded with a history of prices.
+        :param prices: (iterable, pd.Series)
+        """
+        state = cls(n=n)
+        for p in prices:
+            state.update(p)
+        return state
+
+    @property
+    def ready(self):
+        """True once an RSI value has been produced."""
+        return self.count > self.n + 1
+
+    def update(self, price):
+        """
+        Adds the next price and returns the updated RSI value.
+        Returns 0.0 until n + 2 prices have been seen like RSI does.
+        :param price: (float)
+        :return: (float)
+        """
+        n = self.n
+        if self.prev_price is None:
+            delta = 0.0
         else:
-            rsi_series[i] = 100
-        i += 1
-
-    return rsi_series
\ No newline at end of file
+            delta = price - self.prev_price
+            if delta != delta:
+                # nan price(s) count as no change.
+                delta = 0.0
+        self.prev_price = price
+        i = self.count
+        self.count += 1
+
+        gain = delta if delta > 0 else 0
+        loss = -delta if delta < 0 else 0
+
+        if i == 0:
+            return self.value
+
+        if i <= n:
+            # Accumulate the straight average seed values.
+            self._gain_sum += gain
+            self._loss_sum += loss
+            if i == n:
+                self.avg_of_gains = self._gain_sum / n
+                self.avg_of_losses = self._loss_sum / n
+            return self.value
+
+        self.avg_of_gains = ((self.avg_of_gains * (n - 1)) + gain) / n
+        self.avg_of_losses = ((self.avg_of_losses * (n - 1)) + loss) / n
+        if self.avg_of_losses != 0:
+            rs = self.avg_of_gains / self.avg_of_losses
+            self.value = 100 - (100 / (1 + rs))
+        else:
+            self.value = 100
+        return self.value
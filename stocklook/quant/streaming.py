@@ -0,0 +1,365 @@
+""" streaming.py
+Incremental (O(1) per bar) indicator states.
+
+Each indicator is a small object with an update(bar) method that
+accepts either a scalar price or a bar (a dict, pandas row or any
+mapping with 'open', 'high', 'low', 'close', 'volume' and 'time' keys)
+and returns the new value. States can be composed into an
+IndicatorPipeline per (product, granularity) which keeps the
+latest value of every indicator available in O(1).
+
+Example:
+    pipeline = IndicatorPipeline.default('BTC-USD', 60 * 5)
+    pipeline.seed(df)             # historical candles
+    pipeline.update(new_bar)      # each closed bar afterwards
+    pipeline['sma50'], pipeline['macdh']
+"""
+import logging as lg
+from collections import deque, OrderedDict
+from numbers import Number
+from math import isnan, isfinite
+from stocklook.quant.rsi import RSIState
+
+logger = lg.getLogger(__name__)
+
+NAN = float('nan')
+
+
+def get_bar_value(bar, column='close'):
+    """ Returns a scalar from :param bar or the bar itself if it's a number.
+    """
+    if isinstance(bar, Number):
+        return bar
+    return bar[column]
+
+
+class IndicatorState:
+    """ Base class for streaming indicators.
+    Subclasses implement update(bar) and set self.value.
+    """
+    column = 'close'
+
+    def __init__(self):
+        self.value = NAN
+        self.count = 0
+
+    @property
+    def ready(self):
+        """ True once the indicator has produced a value.
+        """
+        return not isnan(self.value)
+
+    def update(self, bar):
+        raise NotImplementedError()
+
+    def __repr__(self):
+        return "{}(value={})".format(self.__class__.__name__, self.value)
+
+
+class SMAState(IndicatorState):
+    """ n-period simple moving average, nan until n values have been seen
+    like Series.rolling(n).mean(). It's also nan while a nan (or inf) is
+    in the window, which is left out of the running sum.
+    """
+    def __init__(self, n, column='close'):
+        IndicatorState.__init__(self)
+        self.n = n
+        self.column = column
+        self._window = deque(maxlen=n)
+        self._sum = 0.0
+        self._missing = 0
+
+    def update(self, bar):
+        x = get_bar_value(bar, self.column)
+        if len(self._window) == self.n:
+            old = self._window[0]
+            if isfinite(old):
+                self._sum -= old
+            else:
+                self._missing -= 1
+        self._window.append(x)
+        if isfinite(x):
+            self._sum += x
+        else:
+            self._missing += 1
+        self.count += 1
+        if len(self._window) == self.n:
+            self.value = NAN if self._missing else self._sum / self.n
+        return self.value
+
+
+class EMAState(IndicatorState):
+    """ Exponential moving average matching
+    Series.ewm(span=n, adjust=adjust).mean().
+
+    The adjusted form keeps a running weighted numerator and
+    denominator so each update is still O(1). Like ewm(ignore_na=False),
+    a nan (or inf) input adds nothing but still decays the weight of
+    earlier values, and the previous value is returned.
+    """
+    def __init__(self, n=None, column='close', adjust=True, alpha=None):
+        """
+        :param n: (int) The span. alpha = 2 / (n + 1)
+        :param column: (str, default 'close')
+        :param adjust: (bool, default True)
+        :param alpha: (float, default None) Overrides the alpha derived from n.
+        """
+        IndicatorState.__init__(self)
+        if alpha is None:
+            alpha = 2.0 / (n + 1)
+        self.n = n
+        self.alpha = alpha
+        self.column = column
+        self.adjust = adjust
+        self._num = 0.0
+        self._den = 0.0
+        self._weight = 1.0  # of the previous value (adjust=False)
+
+    def update(self, bar):
+        x = get_bar_value(bar, self.column)
+        decay = 1.0 - self.alpha
+        self.count += 1
+        if self.adjust:
+            self._num *= decay
+            self._den *= decay
+            if isfinite(x):
+                self._num += x
+                self._den += 1.0
+                self.value = self._num / self._den
+        elif isnan(self.value):
+            if isfinite(x):
+                self.value = x
+                self._weight = 1.0
+        else:
+            self._weight *= decay
+            if isfinite(x):
+                self.value = ((self._weight * self.value + self.alpha * x) /
+                              (self._weight + self.alpha))
+                self._weight = 1.0
+        return self.value
+
+
+class SMMAState(EMAState):
+    """ Wilder's smoothed moving average (alpha = 1 / n).
+    """
+    def __init__(self, n, column='close', adjust=True):
+        EMAState.__init__(self, n, column=column, adjust=adjust, alpha=1.0 / n)
+
+
+class MACDState(IndicatorState):
+    """ Moving Average Convergence Divergence.
+        macd: fast EMA - slow EMA
+        macds: signal-period EMA of macd
+        macdh: macd - macds
+    """
+    def __init__(self, fast=12, slow=26, signal=9, column='close'):
+        IndicatorState.__init__(self)
+        self.column = column
+        self._fast = EMAState(fast, column)
+        self._slow = EMAState(slow, column)
+        self._signal = EMAState(signal)
+        self.macds = NAN
+        self.macdh = NAN
+
+    @property
+    def macd(self):
+        return self.value
+
+    def update(self, bar):
+        x = get_bar_value(bar, self.column)
+        self.value = self._fast.update(x) - self._slow.update(x)
+        self.macds = self._signal.update(self.value)
+        self.macdh = self.value - self.macds
+        self.count += 1
+        return self.value
+
+
+class TRState(IndicatorState):
+    """ True range:
+        max(high - low, abs(high - prev_close), abs(low - prev_close))
+    The first bar has no previous close so its range is high - low.
+    """
+    def __init__(self):
+        IndicatorState.__init__(self)
+        self.prev_close = None
+
+    def update(self, bar):
+        high, low, close = bar['high'], bar['low'], bar['close']
+        tr = high - low
+        if self.prev_close is not None:
+            tr = max(tr, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        self.value = tr
+        self.count += 1
+        return self.value
+
+
+class ATRState(IndicatorState):
+    """ Average true range: Wilder-smoothed (SMMA) true range.
+    """
+    def __init__(self, n=14):
+        IndicatorState.__init__(self)
+        self.n = n
+        self._tr = TRState()
+        self._smma = SMMAState(n)
+
+    @property
+    def tr(self):
+        return self._tr.value
+
+    def update(self, bar):
+        self.value = self._smma.update(self._tr.update(bar))
+        self.count += 1
+        return self.value
+
+
+class WilderRSIState(RSIState):
+    """ stocklook.quant.rsi.RSIState accepting bars.
+    """
+    def __init__(self, n=14, column='close'):
+        RSIState.__init__(self, n=n)
+        self.column = column
+
+    def update(self, bar):
+        return RSIState.update(self, get_bar_value(bar, self.column))
+
+
+class IndicatorPipeline:
+    """ A named collection of indicator states for one
+    (product, granularity) series, updated one closed bar at a time.
+
+    Indicators with extra outputs (like MACDState.macds) can be exposed
+    under their own names with IndicatorPipeline.add(..., outputs={...}).
+    """
+    def __init__(self, product=None, granularity=None):
+        self.product = product
+        self.granularity = granularity
+        self.last_time = None
+        self.last_bar = None
+        self.count = 0
+        self._states = OrderedDict()
+        self._outputs = OrderedDict()
+        self._latest = dict()
+
+    def add(self, name, state, outputs=None):
+        """
+        Adds an indicator state to the pipeline.
+        :param name: (str) The name the state's value is published as.
+        :param state: (IndicatorState)
+        :param outputs: (dict, default None)
+            {published_name: state_attribute} for additional values.
+        :return: (IndicatorState) the state.
+        """
+        self._states[name] = state
+        self._outputs[name] = 'value'
+        if outputs:
+            for out_name, attr in outputs.items():
+                self._outputs[out_name] = (name, attr)
+        return state
+
+    @classmethod
+    def default(cls, product=None, granularity=None):
+        """ Returns a pipeline with the indicator set used by GdaxChartData.
+        """
+        p = cls(product, granularity)
+        for n in (5, 8, 18, 50, 100, 200):
+            p.add('sma{}'.format(n), SMAState(n))
+        p.add('rsi', WilderRSIState(14))
+        p.add('macd', MACDState(), outputs=dict(macds='macds', macdh='macdh'))
+        p.add('atr', ATRState(14), outputs=dict(tr='tr'))
+        return p
+
+    @property
+    def states(self):
+        return self._states
+
+    @property
+    def latest(self):
+        """ Returns a dictionary of the latest values {name: value}.
+        """
+        return self._latest
+
+    def get(self, name, default=None):
+        return self._latest.get(name, default)
+
+    def __getitem__(self, name):
+        return self._latest[name]
+
+    def update(self, bar):
+        """
+        Feeds one closed bar to every indicator.
+        Bars at or before the last bar's time are ignored.
+        :param bar: (dict, pd.Series) with open/high/low/close/volume/time
+        :return: (bool) True if the bar was applied.
+        """
+        t = bar.get('time', None) if hasattr(bar, 'get') else None
+        if t is not None and self.last_time is not None and t <= self.last_time:
+            logger.debug("{} {}: ignoring bar at {}, last bar "
+                         "was {}".format(self.product, self.granularity,
+                                         t, self.last_time))
+            return False
+
+        for state in self._states.values():
+            state.update(bar)
+
+        latest = self._latest
+        for name, out in self._outputs.items():
+            if out == 'value':
+                latest[name] = self._states[name].value
+            else:
+                latest[name] = getattr(self._states[out[0]], out[1])
+
+        self.last_time = t
+        self.last_bar = bar
+        self.count += 1
+        return True
+
+    def seed(self, df):
+        """
+        Feeds historical candles (oldest first) to the pipeline.
+        :param df: (pd.DataFrame) with open/high/low/close/volume/time columns
+            in any order - rows are sorted by time before being applied.
+        :return: (int) the number of bars applied.
+        """
+        if 'time' in df.columns:
+            df = df.sort_values('time')
+        applied = 0
+        for row in df.to_dict('records'):
+            applied += self.update(row)
+        return applied
+
+    def __repr__(self):
+        return "IndicatorPipeline(product='{}', granularity={}, " \
+               "bars={})".format(self.product, self.granularity, self.count)
+
+
+class IndicatorEngine:
+    """ Holds one IndicatorPipeline per (product, granularity).
+    """
+    def __init__(self, factory=None):
+        """
+        :param factory: (callable, default IndicatorPipeline.default)
+            factory(product, granularity) -> IndicatorPipeline
+        """
+        if factory is None:
+            factory = IndicatorPipeline.default
+        self.factory = factory
+        self._pipelines = dict()
+
+    def get_pipeline(self, product, granularity):
+        key = (product, granularity)
+        try:
+            return self._pipelines[key]
+        except KeyError:
+            p = self.factory(product, granularity)
+            self._pipelines[key] = p
+            return p
+
+    def seed(self, product, granularity, df):
+        return self.get_pipeline(product, granularity).seed(df)
+
+    def update(self, product, granularity, bar):
+        return self.get_pipeline(product, granularity).update(bar)
+
+    def latest(self, product, granularity):
+        return self.get_pipeline(product, granularity).latest
@@ -177,6 +177,227 @@ def test_relative_momentum_index():
     result = analysis.relative_momentum_index(4,2, sin_signal)
 
 
+
+# ------------------------------------------------
+# Wilder RSI
+# ------------------------------------------------
+
+
+def legacy_rsi(prices, n=14):
+    """ Element-by-element RSI loop that RSI() replaced.
+    """
+    import pandas as pd
+    deltas = (prices - prices.shift(1)).fillna(0)
+    avg_of_gains = deltas[1:n + 1][deltas > 0].sum() / n
+    avg_of_losses = -deltas[1:n + 1][deltas < 0].sum() / n
+    rsi_series = pd.Series(0.0, deltas.index)
+    i = n + 1
+    for d in deltas[n + 1:]:
+        avg_of_gains = ((avg_of_gains * (n - 1)) + (d if d > 0 else 0)) / n
+        avg_of_losses = ((avg_of_losses * (n - 1)) + (-d if d < 0 else 0)) / n
+        if avg_of_losses != 0:
+            rsi_series.iloc[i] = 100 - (100 / (1 + avg_of_gains / avg_of_losses))
+        else:
+            rsi_series.iloc[i] = 100
+        i += 1
+    return rsi_series
+
+
+def rsi_test_prices():
+    import pandas as pd
+    np.random.seed(7)
+    prices = pd.Series(100 + np.random.randn(500).cumsum())
+    # A flat stretch with no losses and a gap in the data.
+    prices.iloc[50:80] = prices.iloc[50]
+    prices.iloc[200] = np.nan
+    return prices
+
+
+def test_wilder_rsi_matches_legacy():
+    """ [quant.rsi] Test vectorized RSI against the legacy loop
+    """
+    from stocklook.quant.rsi import RSI
+    prices = rsi_test_prices()
+    for n in (1, 2, 6, 14):
+        np.testing.assert_allclose(RSI(prices, n).values,
+                                   legacy_rsi(prices, n).values,
+                                   rtol=1e-10, atol=1e-10)
+    short = prices.iloc[:10]
+    np.testing.assert_array_equal(RSI(short, 14).values, legacy_rsi(short, 14).values)
+
+
+def test_rsi_state_matches_rsi():
+    """ [quant.rsi] Test streaming RSIState.update against RSI
+    """
+    from stocklook.quant.rsi import RSI, RSIState
+    prices = rsi_test_prices()
+    expected = RSI(prices, 14).values
+    state = RSIState(14)
+    streamed = [state.update(p) for p in prices]
+    np.testing.assert_allclose(streamed, expected, rtol=1e-10, atol=1e-10)
+
+    seeded = RSIState.from_prices(prices.iloc[:-1], 14)
+    assert abs(seeded.update(prices.iloc[-1]) - expected[-1]) < 1e-10
+
+
+# ------------------------------------------------
+# Streaming indicators
+# ------------------------------------------------
+
+
+def streaming_test_bars():
+    import pandas as pd
+    np.random.seed(11)
+    close = 100 + np.random.randn(300).cumsum()
+    high = close + np.random.rand(300)
+    low = close - np.random.rand(300)
+    return pd.DataFrame(dict(time=np.arange(300), open=close, high=high,
+                             low=low, close=close, volume=np.random.rand(300)))
+
+
+def test_streaming_sma_ema_macd():
+    """ [quant.streaming] Test SMA/EMA/MACD states against pandas
+    """
+    from stocklook.quant.streaming import SMAState, EMAState, MACDState
+    close = streaming_test_bars()['close']
+    sma, ema, macd = SMAState(18), EMAState(12), MACDState()
+    sma_vals, ema_vals, macdh_vals = list(), list(), list()
+    for x in close:
+        sma_vals.append(sma.update(x))
+        ema_vals.append(ema.update(x))
+        macd.update(x)
+        macdh_vals.append(macd.macdh)
+    expected_macd = close.ewm(span=12).mean() - close.ewm(span=26).mean()
+    expected_macdh = expected_macd - expected_macd.ewm(span=9).mean()
+    np.testing.assert_allclose(sma_vals, close.rolling(18).mean(), rtol=1e-10)
+    np.testing.assert_allclose(ema_vals, close.ewm(span=12).mean(), rtol=1e-10)
+    np.testing.assert_allclose(macdh_vals, expected_macdh, rtol=1e-8, atol=1e-10)
+
+
+def test_streaming_atr():
+    """ [quant.streaming] Test ATR state against pandas
+    """
+    from stocklook.quant.streaming import ATRState
+    df = streaming_test_bars()
+    prev = df['close'].shift(1)
+    tr = np.maximum(df['high'] - df['low'],
+                    np.maximum((df['high'] - prev).abs(), (df['low'] - prev).abs()))
+    tr.iloc[0] = df['high'].iloc[0] - df['low'].iloc[0]
+    atr = ATRState(14)
+    vals = [atr.update(bar) for bar in df.to_dict('records')]
+    np.testing.assert_allclose(vals, tr.ewm(alpha=1 / 14).mean(), rtol=1e-10)
+
+
+def test_streaming_sma_with_nan():
+    """ [quant.streaming] Test SMA state skips nan values like rolling().mean()
+    """
+    import pandas as pd
+    from stocklook.quant.streaming import SMAState
+    values = [1, 2, np.nan, 4, 5, 6, 7]
+    sma = SMAState(3)
+    out = [sma.update(x) for x in values]
+    np.testing.assert_allclose(out, pd.Series(values).rolling(3).mean())
+    assert out[-2:] == [5.0, 6.0]
+
+    np.random.seed(1)
+    values = np.random.rand(200)
+    values[np.random.randint(0, 200, 10)] = np.nan
+    sma = SMAState(5)
+    out = [sma.update(x) for x in values]
+    np.testing.assert_allclose(out, pd.Series(values).rolling(5).mean(), rtol=1e-10)
+
+
+def test_streaming_ema_macd_with_nan():
+    """ [quant.streaming] Test EMA/MACD states skip nan values like ewm()
+    """
+    from stocklook.quant.streaming import EMAState, MACDState
+    close = streaming_test_bars()['close']
+    close.iloc[[0, 40, 41, 150]] = np.nan
+    for adjust in (True, False):
+        ema = EMAState(12, adjust=adjust)
+        vals = [ema.update(x) for x in close]
+        np.testing.assert_allclose(vals, close.ewm(span=12, adjust=adjust).mean(),
+                                   rtol=1e-10)
+    macd = MACDState()
+    macdh_vals = list()
+    for x in close:
+        macd.update(x)
+        macdh_vals.append(macd.macdh)
+    expected_macd = close.ewm(span=12).mean() - close.ewm(span=26).mean()
+    expected_macdh = expected_macd - expected_macd.ewm(span=9).mean()
+    np.testing.assert_allclose(macdh_vals, expected_macdh, rtol=1e-8, atol=1e-10)
+    assert np.isfinite(macdh_vals[1:]).all()
+
+
+def test_streaming_atr_with_nan():
+    """ [quant.streaming] Test ATR state skips a nan true range like ewm()
+    """
+    from stocklook.quant.streaming import ATRState
+    df = streaming_test_bars()
+    df.loc[100, 'high'] = np.nan
+    prev = df['close'].shift(1)
+    tr = np.maximum(df['high'] - df['low'],
+                    np.maximum((df['high'] - prev).abs(), (df['low'] - prev).abs()))
+    tr.iloc[0] = df['high'].iloc[0] - df['low'].iloc[0]
+    atr = ATRState(14)
+    vals = [atr.update(bar) for bar in df.to_dict('records')]
+    np.testing.assert_allclose(vals, tr.ewm(alpha=1 / 14).mean(), rtol=1e-10)
+    assert np.isfinite(vals).all()
+
+
+def test_indicator_pipeline_seed_and_update():
+    """ [quant.streaming] Test pipeline seeding (any row order) and updates
+    """
+    from stocklook.quant.rsi import RSI
+    from stocklook.quant.streaming import IndicatorPipeline
+    df = streaming_test_bars()
+    p = IndicatorPipeline.default('BTC-USD', 60)
+    assert p.seed(df.iloc[:-1].iloc[::-1]) == len(df) - 1
+    last = df.iloc[-1].to_dict()
+    assert p.update(last)
+    assert not p.update(last)
+    assert abs(p['sma50'] - df['close'].iloc[-50:].mean()) < 1e-9
+    assert abs(p['rsi'] - RSI(df['close'], 14).iloc[-1]) < 1e-9
+    assert set(['macd', 'macds', 'macdh', 'atr', 'tr']).issubset(p.latest)
+
+
+# ------------------------------------------------
+# Lazy indicator frames
+# ------------------------------------------------
+
+
+def test_indicator_frame_lazy_dependencies():
+    """ [quant.frame] Test indicators compute on access with their dependencies
+    """
+    from stocklook.quant.frame import IndicatorFrame
+    df = IndicatorFrame(streaming_test_bars())
+    assert 'macd' not in df.columns
+    macdh = df['macdh']
+    assert set(['macd', 'macds', 'macdh']).issubset(df.columns)
+    assert 'atr' not in df.columns
+    np.testing.assert_allclose(macdh, df['macd'] - df['macds'])
+    np.testing.assert_allclose(df['sma18_diff'],
+                               df['close'] - df['close'].rolling(18).mean())
+    assert isinstance(df[10:], IndicatorFrame)
+
+    # Memoized until invalidated.
+    df.loc[:, 'close'] = df['close'] * 2
+    np.testing.assert_allclose(df['macdh'], macdh)
+    df.invalidate(['close'])
+    assert 'macd' not in df.columns and 'sma18_diff' not in df.columns
+    np.testing.assert_allclose(df['macdh'], macdh * 2, atol=1e-10)
+
+
+def test_indicator_frame_velocity():
+    """ [quant.frame] Test vectorized velocity against the row-wise version
+    """
+    from stocklook.quant.frame import IndicatorFrame
+    df = IndicatorFrame(streaming_test_bars())
+    rng = df['high'] - df['low']
+    ar, av = rng.mean(), df.loc[df['volume'] > 0, 'volume'].mean()
+    expected = [round(((r / ar) + (v / av)) / 2, 2) for r, v in zip(rng, df['volume'])]
+    np.testing.assert_allclose(df['velocity'], expected)
+
 if  __name__ == '__main__':
     test_zero_length_moving_average()
     test_unit_length_exp_weighted_moving_average()
@@ -1,17 +1,27 @@
 import time
+from threading import Lock
 
 
 def rate_limited(maxPerSecond):
+    """
+    Decorator limiting calls to :param maxPerSecond across all threads.
+
+    Each call reserves the next free time slot under a lock
+    and then sleeps (outside the lock) until that slot arrives,
+    so concurrent callers are spaced evenly rather than bunched.
+    """
     minInterval = 1.0 / float(maxPerSecond)
     def decorate(func):
-        lastTimeCalled = [0.0]
+        nextTimeAllowed = [0.0]
+        lock = Lock()
         def rateLimitedFunction(*args,**kargs):
-            elapsed = time.clock() - lastTimeCalled[0]
-            leftToWait = minInterval - elapsed
+            with lock:
+                now = time.monotonic()
+                slot = max(now, nextTimeAllowed[0])
+                nextTimeAllowed[0] = slot + minInterval
+            leftToWait = slot - now
             if leftToWait>0:
                 time.sleep(leftToWait)
-            ret = func(*args,**kargs)
-            lastTimeCalled[0] = time.clock()
-            return ret
+            return func(*args,**kargs)
         return rateLimitedFunction
-    return decorate
\ No newline at end of file
+    return decorate
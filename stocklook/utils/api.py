@@ -1,48 +1,331 @@
+import re
+import random
 import requests
-from time import sleep
+import logging as lg
+from time import sleep, monotonic
+from threading import Lock
+from urllib.parse import urlparse
+from stocklook.utils.metrics import MetricsRegistry
+
+logger = lg.getLogger(__name__)
 
 
 class APIError(Exception):
     pass
 
 
-def call_api(url, method='get', _api_exception_cls=None, **kwargs):
+class CircuitOpenError(APIError):
+    """
+    Raised without calling the API when the circuit
+    breaker for a host is open.
+    """
+    pass
+
+
+class RetryPolicy:
+    """
+    Decides whether (and how long to wait before) a failed
+    API call is retried.
+
+    Failures are classified by exception class and response status code:
+        - Connection errors and timeouts are retried.
+        - 429 and 5xx responses listed in RetryPolicy.retry_statuses are retried.
+        - Everything else (4xx, unexpected exceptions) is raised immediately.
+
+    Non-idempotent methods (POST) are only retried when the request
+    provably never reached the server (connect errors/timeouts) or
+    the server rejected it without processing (429, 503).
+    """
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    UNPROCESSED_STATUSES = (429, 503)
+    RETRY_EXCEPTIONS = (requests.exceptions.ConnectionError,
+                        requests.exceptions.Timeout,
+                        requests.exceptions.ChunkedEncodingError)
+    UNSENT_EXCEPTIONS = (requests.exceptions.ConnectTimeout,)
+    IDEMPOTENT_METHODS = ('get', 'delete')
+
+    def __init__(self,
+                 max_attempts=5,
+                 backoff_base=0.5,
+                 backoff_max=30.0,
+                 jitter=0.5,
+                 retry_statuses=None,
+                 retry_exceptions=None,
+                 idempotent_methods=None):
+        """
+        :param max_attempts: (int, default 5)
+            The total number of attempts (including the first) before giving up.
+
+        :param backoff_base: (float, default 0.5)
+            Seconds to wait before the first retry. Doubles on each retry.
+
+        :param backoff_max: (float, default 30.0)
+            The maximum number of seconds to wait between attempts.
+
+        :param jitter: (float, default 0.5)
+            Fraction of the backoff that is randomized. 0.5 waits
+            between 50% and 100% of the computed backoff.
+
+        :param retry_statuses: (tuple, default RetryPolicy.RETRY_STATUSES)
+            HTTP status codes that are considered transient.
+
+        :param retry_exceptions: (tuple, default RetryPolicy.RETRY_EXCEPTIONS)
+            Exception classes that are considered transient.
+
+        :param idempotent_methods: (tuple, default ('get', 'delete'))
+            Methods that are always safe to retry on transient failures.
+        """
+        assert max_attempts >= 1
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.retry_statuses = (self.RETRY_STATUSES if retry_statuses is None
+                               else tuple(retry_statuses))
+        self.retry_exceptions = (self.RETRY_EXCEPTIONS if retry_exceptions is None
+                                 else tuple(retry_exceptions))
+        self.idempotent_methods = (self.IDEMPOTENT_METHODS if idempotent_methods is None
+                                   else tuple(idempotent_methods))
+
+    def get_backoff(self, attempt):
+        """
+        Returns the number of seconds to wait after a failed attempt.
+        :param attempt: (int) The 1-based number of the attempt that failed.
+        :return: (float)
+        """
+        backoff = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        if self.jitter:
+            backoff -= backoff * self.jitter * random.random()
+        return backoff
+
+    def is_retryable_exception(self, method, exc):
+        if not isinstance(exc, self.retry_exceptions):
+            return False
+        if method in self.idempotent_methods:
+            return True
+        return isinstance(exc, self.UNSENT_EXCEPTIONS)
+
+    def is_retryable_status(self, method, status_code):
+        if status_code not in self.retry_statuses:
+            return False
+        if method in self.idempotent_methods:
+            return True
+        return status_code in self.UNPROCESSED_STATUSES
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a host is down.
+
+    States:
+        closed: calls go through, consecutive failures are counted.
+        open: calls raise CircuitOpenError until recovery_timeout passes.
+        half_open: one trial call goes through - success closes the
+                   circuit, failure opens it again.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, host, failure_threshold=5, recovery_timeout=30.0, clock=monotonic):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._get_state()
+
+    def _get_state(self):
+        if self._state == self.OPEN \
+                and self._clock() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_running = False
+        return self._state
+
+    def allow_request(self):
+        """
+        Returns True when a call may be made to the host.
+        Only one trial call is let through while half open.
+        """
+        with self._lock:
+            state = self._get_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._state = self.CLOSED
+            self._trial_running = False
+
+    def release_trial(self):
+        """
+        Lets another trial call through after one that
+        ended without telling us anything about the host.
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN \
+                    or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("Circuit opened for host {} after {} "
+                                   "failures.".format(self.host, self._failures))
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._trial_running = False
+
+    def __repr__(self):
+        return "CircuitBreaker(host='{}', state='{}', failures={})".format(
+            self.host, self.state, self._failures)
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+API_METRICS = MetricsRegistry()
+CIRCUIT_BREAKERS = dict()
+_CIRCUIT_LOCK = Lock()
+_ID_SEGMENT = re.compile(r'^([0-9a-fA-F]{8}-[0-9a-fA-F\-]{27}|\d+)$')
+
+
+def get_circuit_breaker(host, **kwargs):
+    """
+    Returns the shared CircuitBreaker for a host,
+    creating it with :param kwargs if needed.
+    """
+    try:
+        return CIRCUIT_BREAKERS[host]
+    except KeyError:
+        with _CIRCUIT_LOCK:
+            breaker = CIRCUIT_BREAKERS.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(host, **kwargs)
+                CIRCUIT_BREAKERS[host] = breaker
+        return breaker
+
+
+def get_endpoint_key(url, method='get'):
     """
-    This method is rate limited to ~3 calls per second max.
-    It should handle ALL communication with the Gdax API.
+    Returns a low-cardinality key for metrics like:
+        'GET api.gdax.com/orders/:id'
+    Order IDs and numeric path segments are replaced with ':id'.
+    """
+    p = urlparse(url)
+    parts = [(':id' if _ID_SEGMENT.match(s) else s)
+             for s in p.path.split('/') if s]
+    return '{} {}/{}'.format(method.upper(), p.netloc, '/'.join(parts))
+
+
+def call_api(url, method='get', _api_exception_cls=None, _retry_policy=None,
+             _before_attempt=None, **kwargs):
+    """
+    Calls a REST API retrying transient failures with exponential backoff.
+    This method should handle ALL communication with exchange APIs.
+
+    Every call is counted and timed in stocklook.utils.api.API_METRICS
+    per endpoint, and guarded by a per-host CircuitBreaker that raises
+    CircuitOpenError without calling the API while the host is failing.
+
     :param url:
     :param method: ('get', 'delete', 'post')
-    :param kwargs:
-    :return:
+
+    :param _api_exception_cls: (Exception, default APIError)
+        The exception class raised on non-retryable error responses
+        or when retries have been exhausted.
+
+    :param _retry_policy: (RetryPolicy, default DEFAULT_RETRY_POLICY)
+
+    :param _before_attempt: (callable, default None)
+        Called with no arguments before every attempt (retries included),
+        e.g. to wait for a rate limiter slot.
+
+    :param kwargs: requests.request(**kwargs)
+    :return: (requests.Response)
     """
-    try:
-        if method == 'get':
-            res = requests.get(url, **kwargs)
-        elif method == 'delete':
-            res = requests.delete(url, **kwargs)
-        elif method == 'post':
-            res = requests.post(url, **kwargs)
-        else:
-            raise NotImplementedError("Method '{}' not available "
-                                      "for calling API.".format(method))
-    except Exception as e:
-        e = str(e)
-        retry = '11001' in e \
-                or 'unreachable host' in e \
-                or ('forcibly' in e
-                    and 'existing' in e)\
-                or '504' in e
+    if method not in ('get', 'delete', 'post'):
+        raise NotImplementedError("Method '{}' not available "
+                                  "for calling API.".format(method))
+    if _api_exception_cls is None:
+        _api_exception_cls = APIError
+    if _retry_policy is None:
+        _retry_policy = DEFAULT_RETRY_POLICY
+
+    key = get_endpoint_key(url, method)
+    breaker = get_circuit_breaker(urlparse(url).netloc)
+    metrics = API_METRICS
+    attempt = 0
+
+    while True:
+        attempt += 1
+        last_attempt = attempt >= _retry_policy.max_attempts
+
+        if not breaker.allow_request():
+            metrics.incr(key, 'circuit_rejected')
+            raise CircuitOpenError("Circuit open for host '{}', "
+                                   "not calling {}".format(breaker.host, key))
+
+        if _before_attempt is not None:
+            _before_attempt()
 
-        if retry:
-            sleep(1)
-            return call_api(url, method=method, **kwargs)
+        metrics.incr(key, 'calls')
+        t = monotonic()
+        try:
+            res = requests.request(method, url, **kwargs)
+        except Exception as e:
+            metrics.observe(key, monotonic() - t)
+            metrics.incr(key, type(e).__name__)
+            if not _retry_policy.is_retryable_exception(method, e):
+                breaker.release_trial()
+                raise
+            breaker.record_failure()
+            if last_attempt:
+                metrics.incr(key, 'exhausted')
+                raise _api_exception_cls("method: {}:{} failed after {} "
+                                         "attempts: {}".format(method, url, attempt, e)) from e
+            wait = _retry_policy.get_backoff(attempt)
+            logger.debug("Retrying {} in {}s after error: {}".format(key, round(wait, 2), e))
+            metrics.incr(key, 'retries')
+            sleep(wait)
+            continue
+
+        metrics.observe(key, monotonic() - t)
+        metrics.incr(key, 'status_{}'.format(res.status_code))
 
-        raise
+        if res.status_code == 200:
+            breaker.record_success()
+            return res
+
+        retryable = _retry_policy.is_retryable_status(method, res.status_code)
+        if retryable:
+            breaker.record_failure()
+        else:
+            # The host is up, the request was just bad.
+            breaker.record_success()
 
-    if res.status_code != 200:
+        if retryable and not last_attempt:
+            wait = _retry_policy.get_backoff(attempt)
+            logger.debug("Retrying {} in {}s after status "
+                         "{}".format(key, round(wait, 2), res.status_code))
+            metrics.incr(key, 'retries')
+            sleep(wait)
+            continue
 
-        if res.status_code == 504:
-            return call_api(url, method=method, **kwargs)
+        if retryable:
+            metrics.incr(key, 'exhausted')
 
         try:
             res_json = res.json()
@@ -53,11 +336,4 @@ def call_api(url, method='get', _api_exception_cls=None, **kwargs):
                                                method,
                                                res.url,
                                                res_json)
-        if _api_exception_cls is None:
-            _api_exception_cls = APIError
-
         raise _api_exception_cls(msg)
-
-    return res
-
-
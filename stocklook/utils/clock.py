@@ -0,0 +1,132 @@
+"""
+MIT License
+
+Copyright (c) 2017 Zeke Barge
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import time as _time
+from datetime import datetime
+
+
+class SystemClock:
+    """
+    The wall clock. Bots take a clock object instead of calling
+    time.time/time.sleep/datetime.now directly so a SimulatedClock
+    can be swapped in during backtests.
+    """
+    def time(self):
+        """ UTC seconds. """
+        return _time.time()
+
+    def now(self):
+        """ Local datetime. """
+        return datetime.now()
+
+    def utcnow(self):
+        """ Naive UTC datetime. """
+        return datetime.utcnow()
+
+    def sleep(self, seconds):
+        _time.sleep(seconds)
+
+    def wait(self, event, timeout=None):
+        """
+        Waits up to :param timeout seconds for a threading.Event.
+        :return: (bool) True if the event was set.
+        """
+        return event.wait(timeout)
+
+
+class SimulatedClock(SystemClock):
+    """
+    A clock that only moves when told to.
+
+    SimulatedClock.sleep advances the time instantly. A callback
+    registered with SimulatedClock.on_advance(func) is called with
+    the new time before sleep returns, which is how replays process
+    the events that would have happened while sleeping.
+    """
+    def __init__(self, start=0.0, resolution=0.1):
+        """
+        :param start: (float, default 0.0)
+            The starting UTC time in seconds.
+        :param resolution: (float, default 0.1)
+            The step in seconds SimulatedClock.wait advances
+            by while checking its event.
+        """
+        self._time = float(start)
+        self.resolution = resolution
+        self._callbacks = list()
+        self.sleeps = 0
+
+    def time(self):
+        return self._time
+
+    def now(self):
+        return datetime.fromtimestamp(self._time)
+
+    def utcnow(self):
+        return datetime.utcfromtimestamp(self._time)
+
+    def on_advance(self, func):
+        """
+        Registers func(new_time) to be called
+        every time the clock moves forward.
+        """
+        self._callbacks.append(func)
+
+    def advance_to(self, t):
+        """
+        Moves the clock to UTC time :param t (never backwards).
+        Callbacks run before the clock reaches t and may
+        step it forward with SimulatedClock.set_time.
+        """
+        t = max(float(t), self._time)
+        for func in self._callbacks:
+            func(t)
+        self._time = t
+
+    def set_time(self, t):
+        """
+        Moves the clock forward without calling callbacks - used
+        by callbacks to time events between the old and new time.
+        """
+        if t > self._time:
+            self._time = float(t)
+
+    def sleep(self, seconds):
+        self.sleeps += 1
+        self.advance_to(self._time + max(seconds, 0))
+
+    def wait(self, event, timeout=None):
+        """
+        Advances the clock by SimulatedClock.resolution until
+        :param event is set (by an on_advance callback) or
+        :param timeout seconds have passed.
+        """
+        end = None if timeout is None else self._time + timeout
+        while not event.is_set():
+            if end is not None and self._time >= end:
+                break
+            step = self.resolution
+            if end is not None:
+                step = min(step, end - self._time)
+            self.advance_to(self._time + step)
+        return event.is_set()
@@ -0,0 +1,428 @@
+"""
+MIT License
+
+Copyright (c) 2017 Zeke Barge
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import json
+import logging as lg
+from time import time, monotonic
+from bisect import bisect_left
+from collections import deque, defaultdict, OrderedDict
+from threading import Lock
+
+logger = lg.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets.
+# Anything slower than the last bound lands in the overflow bucket.
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                           0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram:
+    """
+    Thread-safe latency histogram.
+
+    Keeps cumulative bucket counts (for the lifetime of the object)
+    along with a rolling window of the most recent samples so
+    percentiles reflect current conditions rather than all-time history.
+    """
+    def __init__(self, buckets=None, window=1000):
+        """
+        :param buckets: (tuple, default DEFAULT_LATENCY_BUCKETS)
+            Sorted upper bounds (in seconds) of each bucket.
+
+        :param window: (int, default 1000)
+            The number of recent samples kept for percentile calculations.
+        """
+        if buckets is None:
+            buckets = DEFAULT_LATENCY_BUCKETS
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self._samples = deque(maxlen=window)
+        self._lock = Lock()
+
+    def observe(self, seconds):
+        """
+        Records one latency sample.
+        :param seconds: (float)
+        :return: None
+        """
+        idx = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[idx] += 1
+            self.count += 1
+            self.total += seconds
+            self._samples.append(seconds)
+            if self.min is None or seconds < self.min:
+                self.min = seconds
+            if self.max is None or seconds > self.max:
+                self.max = seconds
+
+    @property
+    def mean(self):
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def percentile(self, pct):
+        """
+        Returns the given percentile (0-100) of the
+        rolling sample window or None when empty.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        idx = int(round((pct / 100) * (len(samples) - 1)))
+        return samples[idx]
+
+    def percentiles(self, pcts=(50, 95, 99)):
+        """
+        Returns a dictionary of {'p50': seconds, ...}
+        computed from one sort of the sample window.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        out = dict()
+        for p in pcts:
+            key = 'p{}'.format(p)
+            if not samples:
+                out[key] = None
+            else:
+                out[key] = samples[int(round((p / 100) * (len(samples) - 1)))]
+        return out
+
+    def to_dict(self):
+        labels = ['<={}'.format(b) for b in self.buckets] + ['>{}'.format(self.buckets[-1])]
+        data = dict(count=self.count,
+                    total=self.total,
+                    mean=self.mean,
+                    min=self.min,
+                    max=self.max,
+                    buckets=dict(zip(labels, self.counts)))
+        data.update(self.percentiles())
+        return data
+
+    def __repr__(self):
+        p = self.percentiles()
+        return "LatencyHistogram(count={}, p50={}, p95={}, p99={})".format(
+            self.count, p['p50'], p['p95'], p['p99'])
+
+
+class MetricsRegistry:
+    """
+    A keyed collection of counters and latency histograms.
+
+    Example:
+        m = MetricsRegistry()
+        m.incr('GET api.gdax.com/products', 'calls')
+        m.observe('GET api.gdax.com/products', 0.12)
+        m.snapshot()
+    """
+    def __init__(self, buckets=None, window=1000):
+        self._buckets = buckets
+        self._window = window
+        self._counters = defaultdict(lambda: defaultdict(int))
+        self._histograms = dict()
+        self._lock = Lock()
+
+    def incr(self, key, counter, amount=1):
+        with self._lock:
+            self._counters[key][counter] += amount
+
+    def observe(self, key, seconds):
+        self.get_histogram(key).observe(seconds)
+
+    def get_histogram(self, key):
+        try:
+            return self._histograms[key]
+        except KeyError:
+            with self._lock:
+                h = self._histograms.get(key)
+                if h is None:
+                    h = LatencyHistogram(self._buckets, self._window)
+                    self._histograms[key] = h
+            return h
+
+    def get_counters(self, key):
+        with self._lock:
+            return dict(self._counters.get(key, dict()))
+
+    @property
+    def keys(self):
+        with self._lock:
+            return sorted(set(self._counters.keys()) | set(self._histograms.keys()))
+
+    def snapshot(self):
+        """
+        Returns a dictionary like:
+            {key: {'counters': {...}, 'latency': {...}}}
+        """
+        data = dict()
+        for key in self.keys:
+            h = self._histograms.get(key)
+            data[key] = dict(counters=self.get_counters(key),
+                             latency=(h.to_dict() if h is not None else None))
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+class _Stage:
+    """ Context manager timing one stage (or exchange call) of a CycleTracer. """
+    __slots__ = ('tracer', 'name', 'call', 't0')
+
+    def __init__(self, tracer, name, call=False):
+        self.tracer = tracer
+        self.name = name
+        self.call = call
+
+    def __enter__(self):
+        self.t0 = monotonic()
+        return self
+
+    def __exit__(self, *args):
+        self.tracer.add(self.name, monotonic() - self.t0, call=self.call)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class CycleTracer:
+    """
+    Times the stages of a repeating loop like GdaxMarketMaker.cycle.
+
+    Each stage and exchange call is timed with the monotonic clock into
+    rolling histograms (CycleTracer.registry, keyed '<name>.<stage>' and
+    '<name>.call.<call>'). Every cycle leaves a trace record in a ring
+    buffer (CycleTracer.records) and is passed to each exporter:
+
+        {'cycle': 12, 'time': 1510000000.0, 'seconds': 0.031,
+         'stages': {'snapshot': 0.001, 'shift_orders': 0.025, ...},
+         'calls': {'post': [2, 0.41], ...}, **fields}
+
+    Stages may nest, so stage times don't have to add up to 'seconds'.
+    Calls may be timed from other threads (e.g. GdaxOrderGateway workers)
+    and are added to whichever cycle is running when they finish.
+
+    Example:
+        tracer = CycleTracer('mm', exporters=[LogExporter(every=100)])
+        tracer.start()
+        with tracer.stage('snapshot'):
+            ...
+        with tracer.call('post'):
+            order.post()
+        tracer.finish()
+        tracer.get_stats()
+    """
+    enabled = True
+
+    def __init__(self, name='cycle', registry=None, capacity=1000, exporters=None):
+        """
+        :param name: (str, default 'cycle')
+            The histogram key prefix.
+        :param registry: (MetricsRegistry, default None)
+            None creates a new object.
+        :param capacity: (int, default 1000)
+            The number of cycle records kept.
+        :param exporters: (list, default None)
+            Callables called exporter(record) after each cycle.
+        """
+        self.name = name
+        self.registry = MetricsRegistry() if registry is None else registry
+        self.records = deque(maxlen=capacity)
+        self.exporters = list(exporters or ())
+        self.cycles = 0
+        self._record = None
+        self._t0 = None
+        self._lock = Lock()
+
+    def start(self, **fields):
+        """ Starts a cycle record with optional extra :param fields. """
+        with self._lock:
+            self.cycles += 1
+            self._record = dict(cycle=self.cycles, time=time(),
+                                stages=OrderedDict(), calls=OrderedDict())
+            self._record.update(fields)
+            self._t0 = monotonic()
+
+    def finish(self, **fields):
+        """
+        Closes the current cycle record, stores it and exports it.
+        :return: (dict, None) The record.
+        """
+        with self._lock:
+            record = self._record
+            if record is None:
+                return None
+            self._record = None
+            seconds = monotonic() - self._t0
+            record['seconds'] = seconds
+            record.update(fields)
+        self.registry.observe(self.name, seconds)
+        self.records.append(record)
+        for exporter in self.exporters:
+            try:
+                exporter(record)
+            except Exception as e:
+                logger.error("Exporter {} failed: {}".format(exporter, e))
+        return record
+
+    def stage(self, name):
+        """ Returns a context manager timing stage :param name. """
+        return _Stage(self, name)
+
+    def call(self, name):
+        """ Returns a context manager timing exchange call :param name. """
+        return _Stage(self, name, call=True)
+
+    def add(self, name, seconds, call=False):
+        """ Records :param seconds spent in a stage or exchange call. """
+        if call:
+            self.registry.observe('{}.call.{}'.format(self.name, name), seconds)
+        else:
+            self.registry.observe('{}.{}'.format(self.name, name), seconds)
+        with self._lock:
+            record = self._record
+            if record is None:
+                return
+            if call:
+                calls = record['calls']
+                count, total = calls.get(name, (0, 0.0))
+                calls[name] = [count + 1, total + seconds]
+            else:
+                stages = record['stages']
+                stages[name] = stages.get(name, 0.0) + seconds
+
+    def get_stats(self, pcts=(50, 95, 99)):
+        """
+        Returns {key: {'count', 'mean', 'max', 'p50', 'p95', 'p99'}}
+        for the cycle, every stage and every exchange call.
+        """
+        stats = dict()
+        for key in self.registry.keys:
+            if key != self.name and not key.startswith(self.name + '.'):
+                continue
+            h = self.registry.get_histogram(key)
+            data = dict(count=h.count, mean=h.mean, max=h.max)
+            data.update(h.percentiles(pcts))
+            stats[key] = data
+        return stats
+
+
+class NullTracer(CycleTracer):
+    """
+    A disabled CycleTracer: stages and calls return one shared
+    no-op context manager and nothing is recorded.
+    """
+    enabled = False
+
+    def __init__(self):
+        CycleTracer.__init__(self, capacity=0)
+
+    def start(self, **fields):
+        pass
+
+    def finish(self, **fields):
+        return None
+
+    def stage(self, name):
+        return _NULL_STAGE
+
+    def call(self, name):
+        return _NULL_STAGE
+
+    def add(self, name, seconds, call=False):
+        pass
+
+
+NULL_TRACER = NullTracer()
+
+
+def format_record(record):
+    """ Formats a CycleTracer record as one log line. """
+    stages = ' '.join('{}={:.4f}'.format(k, v) for k, v in record['stages'].items())
+    calls = ' '.join('{}={}/{:.4f}'.format(k, c, t) for k, (c, t) in record['calls'].items())
+    return 'cycle {} {:.4f}s {}{}'.format(record['cycle'], record['seconds'], stages,
+                                         ' calls ' + calls if calls else '')
+
+
+class LogExporter:
+    """ Logs every :param every'th cycle record as one line. """
+    def __init__(self, log=None, level=lg.INFO, every=1):
+        self.log = logger if log is None else log
+        self.level = level
+        self.every = every
+
+    def __call__(self, record):
+        if record['cycle'] % self.every == 0:
+            self.log.log(self.level, format_record(record))
+
+
+class JsonFileExporter:
+    """ Appends each cycle record to a file as a line of JSON. """
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, record):
+        with open(self.path, 'a') as fh:
+            fh.write(json.dumps(record) + '\n')
+
+
+class HttpExporter:
+    """
+    POSTs cycle records as a JSON list to :param url
+    in batches of :param batch_size.
+    """
+    def __init__(self, url, batch_size=50, timeout=5):
+        self.url = url
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._batch = list()
+
+    def __call__(self, record):
+        self._batch.append(record)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._batch:
+            return
+        import requests
+        batch, self._batch = self._batch, list()
+        requests.post(self.url, json=batch, timeout=self.timeout)
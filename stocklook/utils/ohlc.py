@@ -1,4 +1,5 @@
-from pandas import DataFrame, Series
+import numpy as np
+from pandas import DataFrame, Series, to_datetime
 from stockstats import StockDataFrame
 from stocklook.utils.timetools import timestamp_to_utc_int
 
@@ -11,6 +12,101 @@ V = 'volume'
 
 OHLC_COLUMNS = [O, H, L, C, T, V]
 
+# Columns get_feed_arrays reads times from (before the index).
+FEED_TIME_COLUMNS = ('datetime', 'date', T)
+
+# backtrader.utils.date2num of 1970-01-01 (its proleptic Gregorian ordinal).
+EPOCH_DATE_NUM = 719163.0
+
+
+def get_utc_seconds(times):
+    """
+    Returns int64 UTC seconds for an array-like of UTC integers
+    or (naive UTC) datetimes.
+    """
+    times = np.asarray(times)
+    if np.issubdtype(times.dtype, np.datetime64):
+        return times.astype('datetime64[s]').astype(np.int64)
+    if times.dtype == object:
+        return to_datetime(times).values.astype('datetime64[s]').astype(np.int64)
+    return times.astype(np.int64)
+
+
+def resample_ohlcv(df, granularity, base_granularity=None, now_time=None, include_partial=True):
+    """
+    Aggregates OHLCV candles into coarser buckets of :param granularity seconds.
+
+    Buckets are aligned to multiples of the granularity since the
+    UTC epoch like Gdax aligns its candles (4 hour buckets start at
+    00:00, 04:00, ... UTC, daily buckets at midnight UTC).
+
+    :param df: (DataFrame) with time, open, high, low, close and volume columns.
+        time may be UTC integers or (naive UTC) datetimes. Rows may be in
+        either time order and the result keeps the same order.
+
+    :param granularity: (int) Bucket size in seconds.
+
+    :param base_granularity: (int, default None)
+        The granularity of the input candles.
+        None uses the smallest gap between input candles.
+
+    :param now_time: (int, default None)
+        The current UTC time. The bucket containing it is the partial
+        "current" bar. None treats the last bucket as complete only when
+        the last input candle closes it.
+
+    :param include_partial: (bool, default True)
+        False drops the last bucket when it isn't complete yet.
+
+    :return: (DataFrame) with the same columns (time, low, high, open, close, volume)
+    """
+    columns = [T, L, H, O, C, V]
+    if df.empty:
+        return DataFrame(columns=columns)
+
+    secs = get_utc_seconds(df[T].values)
+    descending = len(secs) > 1 and secs[0] > secs[-1]
+    order = np.argsort(secs, kind='mergesort')
+    secs = secs[order]
+
+    buckets = secs - (secs % granularity)
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.concatenate((starts[1:], [len(buckets)])) - 1
+
+    opens = df[O].values[order]
+    closes = df[C].values[order]
+    data = {
+        T: buckets[starts],
+        L: np.minimum.reduceat(df[L].values[order].astype(float), starts),
+        H: np.maximum.reduceat(df[H].values[order].astype(float), starts),
+        O: opens[starts],
+        C: closes[ends],
+        V: np.add.reduceat(df[V].values[order].astype(float), starts),
+    }
+    out = DataFrame(data, columns=columns)
+
+    if not include_partial:
+        last_bucket = out[T].iloc[-1]
+        if now_time is None:
+            base = base_granularity
+            if base is None:
+                gaps = np.diff(secs)
+                gaps = gaps[gaps > 0]
+                base = gaps.min() if len(gaps) else granularity
+            complete = secs[-1] + base >= last_bucket + granularity
+        else:
+            complete = now_time >= last_bucket + granularity
+        if not complete:
+            out = out.iloc[:-1]
+
+    if np.issubdtype(np.asarray(df[T].values).dtype, np.datetime64) \
+            or df[T].dtype == object:
+        out[T] = to_datetime(out[T], unit='s')
+
+    if descending:
+        out = out.iloc[::-1]
+    return out.reset_index(drop=True)
+
 
 class OhlcData:
     def __init__(self, data=None, columns=None, update_method=None):
@@ -90,6 +186,49 @@ class OhlcSeries:
         pass
 
 
-
-
-
+def get_date_nums(times):
+    """
+    Returns a float64 array of backtrader date numbers
+    for naive datetimes or UTC seconds (vectorized date2num).
+    """
+    times = np.asarray(times)
+    if np.issubdtype(times.dtype, np.number):
+        secs = times.astype(np.float64)
+    else:
+        secs = to_datetime(times).values.astype('datetime64[ns]').astype(np.int64) / 1e9
+    return EPOCH_DATE_NUM + secs / 86400.0
+
+
+def get_feed_arrays(data, price_multiplier=1.0):
+    """
+    Returns a dict of ascending float64 arrays (datetime, open, high, low,
+    close, volume, openinterest) for stocklook.apis.btrader.NumpyData.
+
+    :param data: (pd.DataFrame, dict)
+        Candles with open/high/low/close and optional volume/openinterest
+        columns. Times come from a datetime/date/time column (datetimes or
+        UTC seconds) or the index.
+    :param price_multiplier: (float, default 1.0)
+        Multiplies every price (converts BTC-quoted prices to USD).
+    """
+    if isinstance(data, dict):
+        data = DataFrame(data)
+    for c in FEED_TIME_COLUMNS:
+        if c in data.columns:
+            times = data[c].values
+            break
+    else:
+        times = data.index.values
+
+    arrays = dict()
+    arrays['datetime'] = get_date_nums(times)
+    order = np.argsort(arrays['datetime'], kind='mergesort')
+    arrays['datetime'] = arrays['datetime'][order]
+    for c in (O, H, L, C):
+        arrays[c] = np.asarray(data[c].values, dtype=np.float64)[order] * price_multiplier
+    for c in (V, 'openinterest'):
+        if c in data.columns:
+            arrays[c] = np.asarray(data[c].values, dtype=np.float64)[order]
+        else:
+            arrays[c] = np.zeros(len(order))
+    return arrays
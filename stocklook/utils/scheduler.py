@@ -0,0 +1,116 @@
+"""
+MIT License
+
+Copyright (c) 2017 Zeke Barge
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from heapq import heappush, heappop
+from itertools import count
+from collections import defaultdict
+from threading import Condition
+from time import monotonic
+
+
+class RequestScheduler:
+    """
+    Shares one request rate budget between several clients
+    (e.g. the market makers of a GdaxMarketMakerOrchestrator).
+
+    Requests are granted one every 1 / :param rate seconds like
+    stocklook.utils.rate_limited. When requests are waiting the
+    next slot goes to the client that has used the least of its
+    share (weighted fair queuing), so a busy client can't starve
+    the others. A client's own requests go lowest priority first.
+
+    Example:
+        scheduler = RequestScheduler(rate=3)
+        scheduler.acquire('BTC-USD', priority=0)  # blocks for a slot
+        requests.delete(...)
+    """
+    def __init__(self, rate=3, weights=None):
+        """
+        :param rate: (int, float, default 3)
+            The requests per second shared by every client.
+        :param weights: (dict, default None)
+            {client: weight} A client with weight 2 gets twice the
+            slots of a client with weight 1 when both are busy.
+            Clients default to weight 1.
+        """
+        self.rate = rate
+        self.interval = 1.0 / float(rate)
+        self.weights = dict(weights or dict())
+        self.granted = defaultdict(int)
+        self._cond = Condition()
+        self._seq = count()
+        self._waiting = dict()            # client: heap of (priority, seq)
+        self._vtime = defaultdict(float)  # client: virtual time used
+        self._vclock = 0.0
+        self._next_time = 0.0
+
+    def _next_client(self):
+        return min(self._waiting,
+                   key=lambda c: (self._vtime[c], self._waiting[c][0]))
+
+    def acquire(self, client=None, priority=1):
+        """
+        Blocks until :param client may make a request.
+        :param client: (hashable, default None)
+        :param priority: (int, default 1)
+            Lower goes first among the client's waiting requests.
+        """
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heap = self._waiting.get(client, None)
+            if heap is None:
+                # An idle client doesn't bank slots it didn't use.
+                heap = self._waiting[client] = list()
+                self._vtime[client] = max(self._vtime[client], self._vclock)
+            heappush(heap, ticket)
+            # The new request may go before the one waiting on a slot.
+            self._cond.notify_all()
+
+            while True:
+                if heap[0] != ticket or self._next_client() != client:
+                    self._cond.wait()
+                    continue
+                now = monotonic()
+                wait = self._next_time - now
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heappop(heap)
+                if not heap:
+                    del self._waiting[client]
+                self._vclock = self._vtime[client]
+                self._vtime[client] += 1.0 / self.weights.get(client, 1)
+                self._next_time = now + self.interval
+                self.granted[client] += 1
+                self._cond.notify_all()
+                return
+
+    def call(self, client, priority, func, *args, **kwargs):
+        """ Calls func(*args, **kwargs) in :param client's next slot. """
+        self.acquire(client, priority)
+        return func(*args, **kwargs)
+
+    @property
+    def waiting(self):
+        with self._cond:
+            return {c: len(h) for c, h in self._waiting.items()}
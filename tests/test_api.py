@@ -0,0 +1,127 @@
+import pytest
+import requests
+import stocklook.utils.api as api
+from stocklook.utils.api import (call_api, APIError, CircuitOpenError,
+                                 CircuitBreaker, RetryPolicy, get_endpoint_key)
+
+
+class FakeResponse:
+    def __init__(self, status_code, url='https://api.test.com/products'):
+        self.status_code = status_code
+        self.url = url
+
+    def json(self):
+        return {'message': 'status {}'.format(self.status_code)}
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(api, 'sleep', lambda s: None)
+    api.CIRCUIT_BREAKERS.clear()
+    api.API_METRICS.clear()
+
+
+def patch_responses(monkeypatch, results):
+    calls = list()
+
+    def fake_request(method, url, **kwargs):
+        calls.append((method, url))
+        r = results[min(len(calls), len(results)) - 1]
+        if isinstance(r, Exception):
+            raise r
+        return FakeResponse(r, url)
+
+    monkeypatch.setattr(api.requests, 'request', fake_request)
+    return calls
+
+
+def test_retry_until_success(monkeypatch):
+    calls = patch_responses(monkeypatch, [504, 502, 200])
+    res = call_api('https://api.test.com/products')
+    assert res.status_code == 200
+    assert len(calls) == 3
+    counters = api.API_METRICS.get_counters('GET api.test.com/products')
+    assert counters['retries'] == 2
+    assert counters['status_200'] == 1
+
+
+def test_max_attempts_exhausted(monkeypatch):
+    calls = patch_responses(monkeypatch, [504])
+    policy = RetryPolicy(max_attempts=3)
+    with pytest.raises(APIError):
+        call_api('https://api.test.com/products', _retry_policy=policy)
+    assert len(calls) == 3
+
+
+def test_client_error_not_retried(monkeypatch):
+    calls = patch_responses(monkeypatch, [400])
+    with pytest.raises(APIError):
+        call_api('https://api.test.com/products')
+    assert len(calls) == 1
+
+
+def test_post_not_retried_on_read_timeout(monkeypatch):
+    calls = patch_responses(monkeypatch, [requests.exceptions.ReadTimeout('slow')])
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        call_api('https://api.test.com/orders', method='post')
+    assert len(calls) == 1
+
+
+def test_connection_errors_retried(monkeypatch):
+    err = requests.exceptions.ConnectionError('unreachable host')
+    calls = patch_responses(monkeypatch, [err, err, 200])
+    assert call_api('https://api.test.com/products').status_code == 200
+    assert len(calls) == 3
+
+
+def test_backoff_is_exponential_and_capped():
+    p = RetryPolicy(backoff_base=1, backoff_max=5, jitter=0)
+    assert [p.get_backoff(i) for i in range(1, 6)] == [1, 2, 4, 5, 5]
+    p = RetryPolicy(backoff_base=1, jitter=0.5)
+    for _ in range(20):
+        assert 1 <= p.get_backoff(2) <= 2
+
+
+def test_circuit_breaker_fails_fast(monkeypatch):
+    t = [0.0]
+    api.CIRCUIT_BREAKERS['api.test.com'] = CircuitBreaker(
+        'api.test.com', failure_threshold=3, recovery_timeout=10, clock=lambda: t[0])
+    calls = patch_responses(monkeypatch, [503])
+
+    with pytest.raises(APIError):
+        call_api('https://api.test.com/products', _retry_policy=RetryPolicy(max_attempts=3))
+    assert len(calls) == 3
+
+    with pytest.raises(CircuitOpenError):
+        call_api('https://api.test.com/products')
+    assert len(calls) == 3
+
+    # Half open after the recovery timeout lets one trial through.
+    t[0] = 11
+    calls = patch_responses(monkeypatch, [200])
+    assert call_api('https://api.test.com/products').status_code == 200
+    assert api.CIRCUIT_BREAKERS['api.test.com'].state == CircuitBreaker.CLOSED
+
+
+def test_endpoint_key_normalizes_ids():
+    url = 'https://api.gdax.com/orders/d0c5340b-6d6c-49d9-b567-48c4bfca13d2'
+    assert get_endpoint_key(url, 'delete') == 'DELETE api.gdax.com/orders/:id'
+
+
+def test_rate_limited_spaces_concurrent_calls():
+    from time import monotonic
+    from threading import Thread
+    from stocklook.utils import rate_limited
+    times = list()
+
+    @rate_limited(20)
+    def f():
+        times.append(monotonic())
+
+    threads = [Thread(target=f) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 6 calls at 20/sec need at least 5 intervals of 0.05s.
+    assert max(times) - min(times) >= 0.24
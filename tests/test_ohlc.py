@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from stocklook.utils.ohlc import resample_ohlcv, get_date_nums, get_feed_arrays
+
+
+def make_candles(start, n, granularity=300):
+    times = np.arange(start, start + n * granularity, granularity)
+    close = np.arange(n, dtype=float) + 100
+    return pd.DataFrame(dict(time=times, low=close - 1, high=close + 1,
+                             open=close - 0.5, close=close, volume=np.ones(n)))
+
+
+def test_resample_alignment_and_values():
+    # Starts 10 minutes into a 15 minute bucket.
+    df = make_candles(900 * 1000 + 600, 7)
+    out = resample_ohlcv(df, 900)
+    assert list(out['time']) == [900 * 1000, 900 * 1001, 900 * 1002]
+    first, second = out.iloc[0], out.iloc[1]
+    assert first['open'] == 99.5 and first['close'] == 100 and first['volume'] == 1
+    assert second['open'] == 100.5 and second['close'] == 103
+    assert second['high'] == 104 and second['low'] == 100
+    assert second['volume'] == 3
+
+
+def test_resample_partial_bar_and_order():
+    df = make_candles(3600 * 100, 14)
+    out = resample_ohlcv(df, 3600)
+    assert len(out) == 2 and out['volume'].tolist() == [12, 2]
+    # The last hour only has 2 of 12 candles.
+    out = resample_ohlcv(df, 3600, include_partial=False)
+    assert len(out) == 1
+    out = resample_ohlcv(df, 3600, include_partial=False, now_time=3600 * 102)
+    assert len(out) == 2
+
+    # Newest first in, newest first out, datetimes preserved.
+    desc = df.iloc[::-1].copy()
+    desc['time'] = pd.to_datetime(desc['time'], unit='s')
+    out = resample_ohlcv(desc, 3600)
+    assert out['time'].iloc[0] == pd.Timestamp(3600 * 101, unit='s')
+    assert out['close'].iloc[0] == df['close'].iloc[-1]
+
+
+def test_date_nums():
+    # backtrader.utils.date2num counts days from 0001-01-01 (day 1).
+    dt = datetime(2017, 1, 1, 12)
+    expected = dt.toordinal() + 0.5
+    assert get_date_nums([dt])[0] == expected
+    secs = (dt - datetime(1970, 1, 1)).total_seconds()
+    assert get_date_nums(np.array([secs]))[0] == expected
+    assert get_date_nums(np.array([dt], dtype='datetime64[ns]'))[0] == expected
+
+
+def test_feed_arrays_sorted_and_multiplied():
+    df = make_candles(1500000000, 5)[::-1]
+    arrays = get_feed_arrays(df, price_multiplier=2.0)
+    assert sorted(arrays) == ['close', 'datetime', 'high', 'low',
+                              'open', 'openinterest', 'volume']
+    assert (np.diff(arrays['datetime']) > 0).all()
+    assert np.allclose(arrays['close'], (np.arange(5) + 100) * 2.0)
+    assert np.allclose(arrays['low'], (np.arange(5) + 99) * 2.0)
+    assert np.allclose(arrays['volume'], 1) and not arrays['openinterest'].any()
+
+    # Times may come from the index and dicts are accepted.
+    data = dict(open=[2.0, 1.0], high=[2.0, 1.0], low=[2.0, 1.0], close=[2.0, 1.0])
+    arrays = get_feed_arrays(pd.DataFrame(data, index=[datetime(2017, 1, 2),
+                                                        datetime(2017, 1, 1)]))
+    assert arrays['close'].tolist() == [1.0, 2.0]
+    assert arrays['datetime'].tolist() == [datetime(2017, 1, 1).toordinal(),
+                                           datetime(2017, 1, 2).toordinal()]
+    assert get_feed_arrays(dict(data, time=[1, 0]))['close'].tolist() == [1.0, 2.0]